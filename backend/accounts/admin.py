@@ -14,6 +14,7 @@ from .models import (
     User, UserRole, UserProfile, UserActivity, 
     UserAPIUsage, UserSession
 )
+from weather_data.pagination import EstimatedCountPaginator
 
 
 class UserProfileInline(admin.StackedInline):
@@ -332,6 +333,8 @@ class UserActivityAdmin(admin.ModelAdmin):
     search_fields = ('user__email', 'activity_type', 'description', 'ip_address')
     readonly_fields = ('timestamp',)
     date_hierarchy = 'timestamp'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('user')
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-19 10:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_alter_user_options_alter_userprofile_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', 'timestamp'], name='accounts_us_user_id_f07708_idx'),
+        ),
+    ]
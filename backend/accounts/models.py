@@ -172,6 +172,9 @@ class UserActivity(models.Model):
         verbose_name = 'User Activity'
         verbose_name_plural = 'User Activities'
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['user', 'timestamp']),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.activity_type} at {self.timestamp}"
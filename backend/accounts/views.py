@@ -2,7 +2,9 @@ from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import NotFound
 from django.contrib.auth import login, logout
+from weather_data.pagination import KeysetPagination, paginate_by_keyset
 from .models import User, UserProfile, UserActivity, UserSession, UserRole, UserAPIUsage
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserSerializer,
@@ -165,10 +167,16 @@ def user_activity_history(request):
     """Get user activity history"""
     try:
         from .models import UserActivity
-        activities = UserActivity.objects.filter(user=request.user).order_by('-timestamp')[:50]
+        
+        paginator = KeysetPagination(page_size=50)
+        activities = paginator.paginate_queryset(
+            UserActivity.objects.filter(user=request.user), request
+        )
         serializer = UserActivitySerializer(activities, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
         
+    except NotFound:
+        raise
     except Exception as e:
         return Response(
             {'error': 'Failed to retrieve activity history'},
@@ -455,7 +463,6 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
-from django.core.paginator import Paginator
 from django.db.models import Q
 from django.utils import timezone
 from rest_framework import viewsets, status, permissions
@@ -649,7 +656,6 @@ class UserSearchView(View):
     
     def get(self, request):
         query = request.GET.get('q', '')
-        page = int(request.GET.get('page', 1))
         per_page = int(request.GET.get('per_page', 20))
         
         users = User.objects.select_related('profile')
@@ -674,12 +680,16 @@ class UserSearchView(View):
         if is_staff is not None:
             users = users.filter(is_staff=is_staff.lower() == 'true')
         
-        # Pagination
-        paginator = Paginator(users.order_by('-date_joined'), per_page)
-        page_obj = paginator.get_page(page)
+        # Keyset pagination on (date_joined, id): no COUNT(*) and no deep OFFSET scans
+        try:
+            page_users, paginator = paginate_by_keyset(
+                users, request, 'date_joined', page_size=per_page
+            )
+        except NotFound as e:
+            return JsonResponse({'error': str(e.detail)}, status=404)
         
         users_data = []
-        for user in page_obj:
+        for user in page_users:
             user_data = {
                 'id': user.id,
                 'email': user.email,
@@ -697,13 +707,7 @@ class UserSearchView(View):
         
         return JsonResponse({
             'users': users_data,
-            'pagination': {
-                'current_page': page_obj.number,
-                'total_pages': paginator.num_pages,
-                'total_count': paginator.count,
-                'has_next': page_obj.has_next(),
-                'has_previous': page_obj.has_previous(),
-            }
+            'pagination': paginator.get_pagination_metadata()
         })
 
 
@@ -719,14 +723,11 @@ def user_activity_log(request, user_id):
         activities = UserActivity.objects.filter(
             user=user,
             timestamp__gte=timezone.now() - timedelta(days=days)
-        ).order_by('-timestamp')
-        
-        page = int(request.GET.get('page', 1))
-        paginator = Paginator(activities, 50)
-        page_obj = paginator.get_page(page)
+        )
+        activities_page, paginator = paginate_by_keyset(activities, request, 'timestamp', page_size=50)
         
         activities_data = []
-        for activity in page_obj:
+        for activity in activities_page:
             activities_data.append({
                 'id': activity.id,
                 'activity_type': activity.activity_type,
@@ -739,13 +740,11 @@ def user_activity_log(request, user_id):
         
         return JsonResponse({
             'activities': activities_data,
-            'pagination': {
-                'current_page': page_obj.number,
-                'total_pages': paginator.num_pages,
-                'total_count': paginator.count,
-            }
+            'pagination': paginator.get_pagination_metadata()
         })
         
+    except NotFound as e:
+        return JsonResponse({'error': str(e.detail)}, status=404)
     except User.DoesNotExist:
         return JsonResponse({'error': 'User not found'}, status=404)
 
@@ -0,0 +1,7 @@
+from django.urls import path
+from . import async_views
+
+# Async read path, mounted ahead of route_planner.urls when serving through ASGI
+urlpatterns = [
+    path("routes/<int:route_id>/weather/", async_views.get_route_weather, name="async-route-weather"),
+]
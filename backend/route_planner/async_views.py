@@ -0,0 +1,68 @@
+"""
+Native async route weather view (served under ASGI)
+"""
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import status
+
+from weather_data.async_views import async_api_view, authenticated_user_or_error
+from weather_data.async_weather_service import async_weather_manager
+from .models import Route
+from .serializers import RouteWithWeatherSerializer
+from .views import (
+    select_route_points, point_weather_url, parse_point_weather,
+    refresh_route_weather, _route_serializer_fields
+)
+
+logger = logging.getLogger('weather247')
+
+
+async def fetch_weather_for_point(lat, lon):
+    """Fetch weather data for a specific point without blocking the worker"""
+    try:
+        client = async_weather_manager.primary_service.get_client()
+        response = await client.get(point_weather_url(lat, lon))
+        return parse_point_weather(response.json())
+    except Exception as e:
+        logger.warning(f"Error fetching weather for point ({lat}, {lon}): {e}")
+    return None
+
+
+async def get_weather_along_route(route_waypoints, num_points=10):
+    """Get weather data for points along the route, all points fetched concurrently"""
+    points = select_route_points(route_waypoints, num_points)
+    weather = await asyncio.gather(*(fetch_weather_for_point(lat, lon) for lat, lon, _ in points))
+    return [
+        {
+            'latitude': lat,
+            'longitude': lon,
+            'distance_from_start_km': distance_from_start,
+            'weather_data': weather_data
+        }
+        for (lat, lon, distance_from_start), weather_data in zip(points, weather) if weather_data
+    ]
+
+
+@sync_to_async
+def _refresh_and_serialize(route, weather_points, fields):
+    refresh_route_weather(route, weather_points)
+    return RouteWithWeatherSerializer(route, fields=fields).data
+
+
+@async_api_view
+async def get_route_weather(request, route_id):
+    """Get current weather data for a specific route"""
+    user, error = await authenticated_user_or_error(request)
+    if error:
+        return error
+
+    route = await Route.objects.filter(id=route_id, user=user).afirst()
+    if not route:
+        return JsonResponse({'error': 'Route not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    weather_points = await get_weather_along_route(route.waypoints)
+    data = await _refresh_and_serialize(route, weather_points, _route_serializer_fields(request))
+    return JsonResponse(data)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-19 10:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('route_planner', '0002_route_hazard_score_route_hazard_summary_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='route',
+            index=models.Index(fields=['user', 'created_at'], name='route_plann_user_id_b7ccf5_idx'),
+        ),
+    ]
@@ -27,6 +27,9 @@ class Route(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.start_location} → {self.end_location})"
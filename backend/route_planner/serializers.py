@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from weather_data.sparse_fields import SparseFieldsMixin
 from .models import Route, RouteWeatherPoint, RouteAlert, TravelPlan
 
 
-class RouteSerializer(serializers.ModelSerializer):
+class RouteSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Route model"""
     class Meta:
         model = Route
@@ -16,7 +17,7 @@ class RouteSerializer(serializers.ModelSerializer):
         read_only_fields = ('user', 'created_at', 'updated_at')
 
 
-class RouteWeatherPointSerializer(serializers.ModelSerializer):
+class RouteWeatherPointSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for RouteWeatherPoint model"""
     class Meta:
         model = RouteWeatherPoint
@@ -29,7 +30,7 @@ class RouteWeatherPointSerializer(serializers.ModelSerializer):
         read_only_fields = ('route', 'timestamp')
 
 
-class RouteAlertSerializer(serializers.ModelSerializer):
+class RouteAlertSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for RouteAlert model"""
     class Meta:
         model = RouteAlert
@@ -41,7 +42,7 @@ class RouteAlertSerializer(serializers.ModelSerializer):
         read_only_fields = ('route', 'created_at')
 
 
-class TravelPlanSerializer(serializers.ModelSerializer):
+class TravelPlanSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for TravelPlan model"""
     route = RouteSerializer(read_only=True)
 
@@ -56,7 +57,7 @@ class TravelPlanSerializer(serializers.ModelSerializer):
         read_only_fields = ('user', 'created_at', 'updated_at')
 
 
-class RouteWithWeatherSerializer(serializers.ModelSerializer):
+class RouteWithWeatherSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Route with weather points"""
     weather_points = RouteWeatherPointSerializer(many=True, read_only=True)
     alerts = RouteAlertSerializer(many=True, read_only=True)
@@ -6,6 +6,8 @@ from .serializers import (
     RouteSerializer, RouteWeatherPointSerializer, RouteAlertSerializer,
     TravelPlanSerializer, RouteWithWeatherSerializer
 )
+from weather_data.pagination import CreatedAtKeysetPagination
+from weather_data.sparse_fields import SparseFieldsViewMixin, get_requested_fields, get_included_sections
 from django.conf import settings
 import requests
 import math
@@ -58,18 +60,8 @@ def get_route_from_osrm(start_lat, start_lon, end_lat, end_lon):
     return None
 
 
-def get_weather_along_route(route_waypoints, num_points=10):
-    """Get weather data for points along the route"""
-    weather_points = []
-    total_distance = 0
-    
-    # Calculate total distance
-    for i in range(len(route_waypoints) - 1):
-        lat1, lon1 = route_waypoints[i]
-        lat2, lon2 = route_waypoints[i + 1]
-        total_distance += calculate_distance(lat1, lon1, lat2, lon2)
-    
-    # Select evenly spaced points along the route
+def select_route_points(route_waypoints, num_points=10):
+    """Pick evenly spaced points along the route as (lat, lon, distance_from_start_km)"""
     interval = max(1, len(route_waypoints) // num_points)
     selected_points = route_waypoints[::interval]
     
@@ -77,45 +69,61 @@ def get_weather_along_route(route_waypoints, num_points=10):
     if route_waypoints[-1] not in selected_points:
         selected_points.append(route_waypoints[-1])
     
+    points = []
     distance_so_far = 0
     
     for i, (lat, lon) in enumerate(selected_points):
         if i > 0:
             prev_lat, prev_lon = selected_points[i-1]
             distance_so_far += calculate_distance(prev_lat, prev_lon, lat, lon)
-        
+        points.append((lat, lon, distance_so_far))
+    
+    return points
+
+
+def get_weather_along_route(route_waypoints, num_points=10):
+    """Get weather data for points along the route"""
+    weather_points = []
+    
+    for lat, lon, distance_from_start in select_route_points(route_waypoints, num_points):
         # Fetch weather data for this point
         weather_data = fetch_weather_for_point(lat, lon)
         if weather_data:
             weather_points.append({
                 'latitude': lat,
                 'longitude': lon,
-                'distance_from_start_km': distance_so_far,
+                'distance_from_start_km': distance_from_start,
                 'weather_data': weather_data
             })
     
     return weather_points
 
 
+def point_weather_url(lat, lon):
+    return f"{settings.OPENWEATHER_BASE_URL}/weather?lat={lat}&lon={lon}&appid={settings.OPENWEATHER_API_KEY}&units=metric"
+
+
+def parse_point_weather(data):
+    """Extract the fields stored on a RouteWeatherPoint from an API payload"""
+    if data.get('cod') != 200:
+        return None
+    return {
+        'temperature': data['main']['temp'],
+        'humidity': data['main']['humidity'],
+        'wind_speed': data['wind']['speed'],
+        'weather_condition': data['weather'][0]['main'],
+        'weather_description': data['weather'][0]['description'],
+        'weather_icon': data['weather'][0]['icon'],
+        'precipitation_probability': 0,  # Not available in current weather
+        'visibility': data.get('visibility', 0) / 1000 if data.get('visibility') else None  # Convert to km
+    }
+
+
 def fetch_weather_for_point(lat, lon):
     """Fetch weather data for a specific point"""
-    url = f"{settings.OPENWEATHER_BASE_URL}/weather?lat={lat}&lon={lon}&appid={settings.OPENWEATHER_API_KEY}&units=metric"
-    
     try:
-        response = requests.get(url)
-        data = response.json()
-        
-        if data.get('cod') == 200:
-            return {
-                'temperature': data['main']['temp'],
-                'humidity': data['main']['humidity'],
-                'wind_speed': data['wind']['speed'],
-                'weather_condition': data['weather'][0]['main'],
-                'weather_description': data['weather'][0]['description'],
-                'weather_icon': data['weather'][0]['icon'],
-                'precipitation_probability': 0,  # Not available in current weather
-                'visibility': data.get('visibility', 0) / 1000 if data.get('visibility') else None  # Convert to km
-            }
+        response = requests.get(point_weather_url(lat, lon))
+        return parse_point_weather(response.json())
     except Exception as e:
         print(f"Error fetching weather for point ({lat}, {lon}): {e}")
     
@@ -272,10 +280,75 @@ def compute_route_hazard(weather_points, alerts):
     }
 
 
+def refresh_route_weather(route, weather_points):
+    """Replace a route's weather points and alerts and update its hazard aggregates"""
+    # Analyze and compute hazard
+    alerts = analyze_route_weather_conditions(weather_points)
+    hazard = compute_route_hazard(weather_points, alerts)
+    
+    # Update weather point objects
+    RouteWeatherPoint.objects.filter(route=route).delete()  # Clear old data
+    for point in weather_points:
+        weather = point['weather_data']
+        RouteWeatherPoint.objects.create(
+            route=route,
+            latitude=point['latitude'],
+            longitude=point['longitude'],
+            distance_from_start_km=point['distance_from_start_km'],
+            temperature=weather['temperature'],
+            humidity=weather['humidity'],
+            wind_speed=weather['wind_speed'],
+            weather_condition=weather['weather_condition'],
+            weather_description=weather['weather_description'],
+            weather_icon=weather['weather_icon'],
+            precipitation_probability=weather['precipitation_probability'],
+            visibility=weather['visibility'],
+            hazard_score=point.get('hazard_score')
+        )
+
+    # Update alerts
+    RouteAlert.objects.filter(route=route).delete()  # Clear old alerts
+    for alert_data in alerts:
+        RouteAlert.objects.create(
+            route=route,
+            **alert_data
+        )
+
+    # Save route hazard aggregates
+    route.hazard_score = hazard['hazard_score']
+    route.risk_level = hazard['risk_level']
+    route.hazard_summary = hazard['hazard_summary']
+    route.save(update_fields=['hazard_score', 'risk_level', 'hazard_summary'])
+
+
+# Nested sections of RouteWithWeatherSerializer selectable with ?include=
+ROUTE_SECTIONS = ('weather_points', 'alerts')
+
+
+def _route_serializer_fields(request):
+    """Combine ?fields= and ?include= into a field list for RouteWithWeatherSerializer.
+
+    Without either parameter the full shape is returned. Once ?fields= is
+    given, nested sections are only serialized when named in it or in ?include=.
+    """
+    fields = get_requested_fields(request)
+    default_sections = ROUTE_SECTIONS if fields is None else ()
+    sections = get_included_sections(request, ROUTE_SECTIONS, default=default_sections)
+
+    if fields is None:
+        if sections == set(ROUTE_SECTIONS):
+            return None
+        fields = [name for name in RouteWithWeatherSerializer.Meta.fields if name not in ROUTE_SECTIONS]
+
+    named = {path.partition('.')[0] for path in fields}
+    return fields + sorted(sections - named)
+
+
 # API Views
-class RouteListCreateView(generics.ListCreateAPIView):
+class RouteListCreateView(SparseFieldsViewMixin, generics.ListCreateAPIView):
     serializer_class = RouteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtKeysetPagination
 
     def get_queryset(self):
         return Route.objects.filter(user=self.request.user)
@@ -291,6 +364,11 @@ class RouteDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return Route.objects.filter(user=self.request.user)
 
+    def get_serializer(self, *args, **kwargs):
+        if self.request.method == 'GET':
+            kwargs.setdefault('fields', _route_serializer_fields(self.request))
+        return super().get_serializer(*args, **kwargs)
+
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -328,47 +406,12 @@ def create_route_with_weather(request):
             estimated_duration_minutes=route_data['duration_minutes']
         )
 
-        # Get weather data along the route
+        # Get weather data along the route and store points, alerts and hazard
         weather_points = get_weather_along_route(route_data['waypoints'])
-        
-        # Analyze weather conditions and compute hazard metrics
-        alerts = analyze_route_weather_conditions(weather_points)
-        hazard = compute_route_hazard(weather_points, alerts)
-        
-        # Create weather point objects
-        for point in weather_points:
-            weather = point['weather_data']
-            RouteWeatherPoint.objects.create(
-                route=route,
-                latitude=point['latitude'],
-                longitude=point['longitude'],
-                distance_from_start_km=point['distance_from_start_km'],
-                temperature=weather['temperature'],
-                humidity=weather['humidity'],
-                wind_speed=weather['wind_speed'],
-                weather_condition=weather['weather_condition'],
-                weather_description=weather['weather_description'],
-                weather_icon=weather['weather_icon'],
-                precipitation_probability=weather['precipitation_probability'],
-                visibility=weather['visibility'],
-                hazard_score=point.get('hazard_score')
-            )
-
-        # Persist alerts
-        for alert_data in alerts:
-            RouteAlert.objects.create(
-                route=route,
-                **alert_data
-            )
-
-        # Save route hazard aggregates
-        route.hazard_score = hazard['hazard_score']
-        route.risk_level = hazard['risk_level']
-        route.hazard_summary = hazard['hazard_summary']
-        route.save(update_fields=['hazard_score', 'risk_level', 'hazard_summary'])
+        refresh_route_weather(route, weather_points)
 
         # Return the created route with weather data
-        serializer = RouteWithWeatherSerializer(route)
+        serializer = RouteWithWeatherSerializer(route, fields=_route_serializer_fields(request))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     except Exception as e:
@@ -386,52 +429,16 @@ def get_route_weather(request, route_id):
 
     # Get fresh weather data along the route
     weather_points = get_weather_along_route(route.waypoints)
-    
-    # Analyze and compute hazard
-    alerts = analyze_route_weather_conditions(weather_points)
-    hazard = compute_route_hazard(weather_points, alerts)
-    
-    # Update weather point objects
-    RouteWeatherPoint.objects.filter(route=route).delete()  # Clear old data
-    for point in weather_points:
-        weather = point['weather_data']
-        RouteWeatherPoint.objects.create(
-            route=route,
-            latitude=point['latitude'],
-            longitude=point['longitude'],
-            distance_from_start_km=point['distance_from_start_km'],
-            temperature=weather['temperature'],
-            humidity=weather['humidity'],
-            wind_speed=weather['wind_speed'],
-            weather_condition=weather['weather_condition'],
-            weather_description=weather['weather_description'],
-            weather_icon=weather['weather_icon'],
-            precipitation_probability=weather['precipitation_probability'],
-            visibility=weather['visibility'],
-            hazard_score=point.get('hazard_score')
-        )
-
-    # Update alerts
-    RouteAlert.objects.filter(route=route).delete()  # Clear old alerts
-    for alert_data in alerts:
-        RouteAlert.objects.create(
-            route=route,
-            **alert_data
-        )
-
-    # Save route hazard aggregates
-    route.hazard_score = hazard['hazard_score']
-    route.risk_level = hazard['risk_level']
-    route.hazard_summary = hazard['hazard_summary']
-    route.save(update_fields=['hazard_score', 'risk_level', 'hazard_summary'])
+    refresh_route_weather(route, weather_points)
 
-    serializer = RouteWithWeatherSerializer(route)
+    serializer = RouteWithWeatherSerializer(route, fields=_route_serializer_fields(request))
     return Response(serializer.data)
 
 
-class TravelPlanListCreateView(generics.ListCreateAPIView):
+class TravelPlanListCreateView(SparseFieldsViewMixin, generics.ListCreateAPIView):
     serializer_class = TravelPlanSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtKeysetPagination
 
     def get_queryset(self):
         return TravelPlan.objects.filter(user=self.request.user)
@@ -440,7 +447,7 @@ class TravelPlanListCreateView(generics.ListCreateAPIView):
         serializer.save(user=self.request.user)
 
 
-class TravelPlanDetailView(generics.RetrieveUpdateDestroyAPIView):
+class TravelPlanDetailView(SparseFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = TravelPlanSerializer
     permission_classes = [permissions.IsAuthenticated]
 
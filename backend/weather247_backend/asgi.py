@@ -3,6 +3,11 @@ ASGI config for weather247_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serving through this entry point (e.g. ``uvicorn weather247_backend.asgi:application``)
+switches the weather read path to native async views, so a single worker can
+hold many upstream provider waits at once. Set ``WEATHER247_ASYNC_VIEWS=False``
+to serve the sync views under ASGI instead.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +17,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'weather247_backend.settings')
+os.environ.setdefault('WEATHER247_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -0,0 +1,14 @@
+"""
+URL configuration used when serving through ASGI
+
+The async read views are matched ahead of the regular URLconf at the same
+paths; everything else falls through to the sync views.
+"""
+from django.urls import path, include
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/weather/', include('weather_data.async_urls')),
+    path('api/routes/', include('route_planner.async_urls')),
+] + sync_urlpatterns
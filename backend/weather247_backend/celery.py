@@ -45,6 +45,32 @@ app.conf.beat_schedule = {
         'schedule': 7200.0,  # Every 2 hours
         'options': {'expires': 3600}  # Task expires after 1 hour
     },
+    'update-performance-baselines': {
+        'task': 'weather_data.tasks.update_performance_baselines',
+        'schedule': 21600.0,  # Every 6 hours
+        'kwargs': {'days': 7},
+        'options': {'expires': 3600}  # Task expires after 1 hour
+    },
+    'rebuild-climatology': {
+        'task': 'weather_data.tasks.rebuild_climatology',
+        'schedule': 604800.0,  # Every week
+        'options': {'expires': 86400}  # Task expires after 1 day
+    },
+    'train-prediction-models': {
+        'task': 'weather_data.tasks.train_prediction_models',
+        'schedule': 3600.0,  # Every hour (only new or stale models are trained)
+        'options': {'expires': 1800}  # Task expires after 30 minutes
+    },
+    'evaluate-prediction-accuracy': {
+        'task': 'weather_data.tasks.evaluate_prediction_accuracy',
+        'schedule': 3600.0,  # Every hour (only the latest day is recomputed)
+        'options': {'expires': 1800}  # Task expires after 30 minutes
+    },
+    'export-analytics-datasets': {
+        'task': 'weather_data.tasks.export_analytics_datasets',
+        'schedule': 3600.0,  # Every hour
+        'options': {'expires': 1800}  # Task expires after 30 minutes
+    },
     'generate-analytics-report': {
         'task': 'weather_data.tasks.generate_analytics_report',
         'schedule': 3600.0,  # Every hour
@@ -83,7 +109,14 @@ app.conf.task_routes = {
     'weather_data.tasks.warm_cache_for_popular_cities': {'queue': 'cache_warming'},
     'weather_data.tasks.monitor_api_quota': {'queue': 'monitoring'},
     'weather_data.tasks.generate_weather_analytics': {'queue': 'analytics'},
+    'weather_data.tasks.generate_city_analytics_chunk': {'queue': 'analytics'},
+    'weather_data.tasks.merge_city_analytics_chunks': {'queue': 'analytics'},
     'weather_data.tasks.generate_analytics_report': {'queue': 'analytics'},
+    'weather_data.tasks.rebuild_climatology': {'queue': 'analytics'},
+    'weather_data.tasks.export_analytics_datasets': {'queue': 'analytics'},
+    'weather_data.tasks.train_prediction_models': {'queue': 'analytics'},
+    'weather_data.tasks.evaluate_prediction_accuracy': {'queue': 'analytics'},
+    'weather_data.tasks.update_performance_baselines': {'queue': 'analytics'},
     'weather_data.tasks.system_health_check': {'queue': 'monitoring'},
     'weather_data.tasks.cleanup_analytics_cache': {'queue': 'maintenance'},
     'weather_data.tasks.optimize_system_performance': {'queue': 'maintenance'},
@@ -63,6 +63,11 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'weather247_backend.urls'
 
+# Native async views for the weather read path (set by the ASGI entry point)
+ASYNC_READ_VIEWS = config('WEATHER247_ASYNC_VIEWS', default=False, cast=bool)
+if ASYNC_READ_VIEWS:
+    ROOT_URLCONF = 'weather247_backend.asgi_urls'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -80,6 +85,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'weather247_backend.wsgi.application'
+ASGI_APPLICATION = 'weather247_backend.asgi.application'
 
 
 # Database
@@ -149,8 +155,8 @@ REST_FRAMEWORK = {
         'rest_framework.throttling.UserRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/hour',
-        'user': '1000/hour',
+        'anon': config('API_THROTTLE_ANON', default='100/hour'),
+        'user': config('API_THROTTLE_USER', default='1000/hour'),
     },
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
@@ -171,6 +177,70 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Per-city analytics: 'serial', 'process' (local process pool) or 'celery'
+# (chunk tasks fanned out with a chord)
+ANALYTICS_EXECUTION_MODE = config('ANALYTICS_EXECUTION_MODE', default='serial')
+ANALYTICS_WORKERS = config('ANALYTICS_WORKERS', default=4, cast=int)
+ANALYTICS_CHUNK_SIZE = config('ANALYTICS_CHUNK_SIZE', default=500, cast=int)
+
+# Climatology normals: days either side of each day of year pooled into its
+# statistics, and how many cities' normals each process keeps in memory
+CLIMATOLOGY_WINDOW_DAYS = config('CLIMATOLOGY_WINDOW_DAYS', default=7, cast=int)
+CLIMATOLOGY_CACHE_CITIES = config('CLIMATOLOGY_CACHE_CITIES', default=64, cast=int)
+
+# Parquet exports for BI tooling; point ANALYTICS_EXPORT_DATABASE at a read
+# replica alias to keep the export reads off the primary
+ANALYTICS_EXPORT_DIR = config('ANALYTICS_EXPORT_DIR', default=str(BASE_DIR / 'analytics_exports'))
+ANALYTICS_EXPORT_CHUNK_SIZE = config('ANALYTICS_EXPORT_CHUNK_SIZE', default=5000, cast=int)
+ANALYTICS_EXPORT_DATABASE = config('ANALYTICS_EXPORT_DATABASE', default='default')
+
+# Trained prediction models: joblib artifacts, the artifact size each process
+# may keep loaded, and how many unpublished versions pruning leaves behind
+ML_MODEL_DIR = config('ML_MODEL_DIR', default=str(BASE_DIR / 'ml_models'))
+ML_MODEL_CACHE_MB = config('ML_MODEL_CACHE_MB', default=256, cast=int)
+ML_MODEL_KEEP_VERSIONS = config('ML_MODEL_KEEP_VERSIONS', default=3, cast=int)
+
+# Background model training: cities trained at once, cores per estimator
+# (keep workers x n_jobs within the host's cores) and the model age after
+# which a city with new readings is retrained
+ML_TRAINING_WORKERS = config('ML_TRAINING_WORKERS', default=2, cast=int)
+ML_TRAINING_N_JOBS = config('ML_TRAINING_N_JOBS', default=1, cast=int)
+ML_RETRAIN_HOURS = config('ML_RETRAIN_HOURS', default=24, cast=int)
+
+# Model mode: 'per_city' ensembles, or 'global' models shared by every city,
+# which are then trained and served by default. Global training reads the
+# history of ML_GLOBAL_CHUNK_CITIES cities per query and samples at most
+# ML_GLOBAL_MAX_ROWS rows per metric, which bounds its memory
+ML_MODEL_MODE = config('ML_MODEL_MODE', default='per_city')
+ML_GLOBAL_CHUNK_CITIES = config('ML_GLOBAL_CHUNK_CITIES', default=50, cast=int)
+ML_GLOBAL_MAX_ROWS = config('ML_GLOBAL_MAX_ROWS', default=200000, cast=int)
+
+# Where predictions are scored: 'local' (in the request's process) or
+# 'server' (the run_inference_server process, over a Unix socket, which
+# micro-batches requests arriving within ML_INFERENCE_BATCH_WINDOW_MS).
+# Requests the server doesn't answer within ML_INFERENCE_TIMEOUT_MS get the
+# baseline forecast. The socket's directory is created owner-only (0700);
+# keep it out of shared directories such as /tmp.
+ML_INFERENCE_MODE = config('ML_INFERENCE_MODE', default='local')
+ML_INFERENCE_SOCKET = config('ML_INFERENCE_SOCKET', default=str(BASE_DIR / 'run' / 'inference.sock'))
+ML_INFERENCE_TIMEOUT_MS = config('ML_INFERENCE_TIMEOUT_MS', default=500, cast=int)
+ML_INFERENCE_BATCH_WINDOW_MS = config('ML_INFERENCE_BATCH_WINDOW_MS', default=5, cast=int)
+ML_INFERENCE_MAX_BATCH = config('ML_INFERENCE_MAX_BATCH', default=64, cast=int)
+
+# Latest readings per city kept, with their engineered features, for
+# inference (at least the 25 the longest lag feature needs)
+FEATURE_STORE_ROWS = config('FEATURE_STORE_ROWS', default=48, cast=int)
+
+# Live weather updates (SSE). 'memory' only fans out within one process, so
+# readings ingested by Celery workers need 'redis', the default whenever
+# Celery itself runs on Redis.
+LIVE_UPDATES_BROKER = config(
+    'LIVE_UPDATES_BROKER', default='redis' if CELERY_BROKER_URL.startswith(('redis://', 'rediss://')) else 'memory'
+)
+LIVE_UPDATES_MAX_CITIES = 50
+LIVE_UPDATES_HEARTBEAT_SECONDS = 15
+LIVE_UPDATES_MAX_STREAM_SECONDS = 300
+
 # Weather API settings
 OPENWEATHER_API_KEY = ''
 OPENWEATHER_BASE_URL = 'https://api.openweathermap.org/data/2.5'
@@ -295,6 +365,7 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 OPENWEATHERMAP_API_KEY = config('OPENWEATHER_API_KEY', default='demo-key')
 ACCUWEATHER_API_KEY = config('ACCUWEATHER_API_KEY', default='demo-key')
 OPENWEATHER_BASE_URL = config('OPENWEATHER_BASE_URL', default='https://api.openweathermap.org/data/2.5')
+OPENWEATHER_GEO_URL = config('OPENWEATHER_GEO_URL', default='https://api.openweathermap.org/geo/1.0')
 ACCUWEATHER_BASE_URL = config('ACCUWEATHER_BASE_URL', default='http://dataservice.accuweather.com')
 
 # Push Notifications (VAPID) Settings
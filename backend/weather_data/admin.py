@@ -12,6 +12,7 @@ import json
 from .models import City, WeatherData, AirQualityData, WeatherForecast
 from accounts.models import User
 from .models import AlertRule, WeatherAlert
+from .pagination import EstimatedCountPaginator
 
 
 class Weather247AdminSite(AdminSite):
@@ -366,6 +367,8 @@ class WeatherDataAdmin(admin.ModelAdmin):
     search_fields = ('city__name', 'weather_condition')
     date_hierarchy = 'timestamp'
     readonly_fields = ('data_age',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     def data_age(self, obj):
         age = timezone.now() - obj.timestamp
@@ -398,6 +401,8 @@ class AirQualityDataAdmin(admin.ModelAdmin):
     list_filter = ('timestamp', 'city__country')
     search_fields = ('city__name',)
     date_hierarchy = 'timestamp'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('city')
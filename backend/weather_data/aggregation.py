@@ -0,0 +1,132 @@
+"""
+Time-bucketed aggregation helpers for analytics queries
+"""
+from datetime import timedelta
+
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncHour, TruncMinute
+from django.utils import timezone
+
+BUCKETS = {
+    'minute': (TruncMinute, timedelta(minutes=1)),
+    'hour': (TruncHour, timedelta(hours=1)),
+    'day': (TruncDay, timedelta(days=1)),
+}
+
+BUCKET_LABELS = {
+    'minute': '%Y-%m-%d %H:%M',
+    'hour': '%Y-%m-%d %H:00',
+    'day': '%Y-%m-%d',
+}
+
+
+def truncate(value, bucket):
+    """Start of the bucket containing ``value``, in the current time zone"""
+    value = timezone.localtime(value)
+    if bucket == 'minute':
+        return value.replace(second=0, microsecond=0)
+    if bucket == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    if bucket == 'day':
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f'Unknown bucket: {bucket}')
+
+
+def bucket_range(start, end, bucket):
+    """Every bucket start from the bucket holding ``start`` to the one holding ``end``"""
+    step = BUCKETS[bucket][1]
+    current, last = truncate(start, bucket), truncate(end, bucket)
+    buckets = []
+    while current <= last:
+        buckets.append(current)
+        current = truncate(current + step, bucket)
+    return buckets
+
+
+def format_bucket(value, bucket):
+    return value.strftime(BUCKET_LABELS[bucket])
+
+
+def time_bucket_series(queryset, metrics, start, end, bucket='hour', group_by=None,
+                       timestamp_field='timestamp', groups=None):
+    """Aggregate ``queryset`` per time bucket (and optionally per group) in one query.
+
+    ``metrics`` maps output names to aggregate expressions. The result is
+    dense: buckets without rows are filled with 0 for ``Count`` metrics and
+    ``None`` for everything else.
+
+    Without ``group_by`` a list of ``{'bucket': datetime, <metric>: value}``
+    rows is returned. With ``group_by`` (a field name or tuple of names) the
+    result maps each group value (a tuple for several fields) to such a list;
+    ``groups`` adds groups that should appear even when they have no rows.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f'Unknown bucket: {bucket}')
+    trunc = BUCKETS[bucket][0]
+
+    if isinstance(group_by, str):
+        group_fields = (group_by,)
+    else:
+        group_fields = tuple(group_by or ())
+
+    rows = queryset.filter(**{
+        f'{timestamp_field}__gte': start,
+        f'{timestamp_field}__lte': end,
+    }).annotate(
+        bucket=trunc(timestamp_field)
+    ).order_by().values(*group_fields, 'bucket').annotate(**metrics)
+
+    empty = {name: 0 if isinstance(expr, Count) else None for name, expr in metrics.items()}
+    buckets = bucket_range(start, end, bucket)
+
+    def dense(found):
+        return [dict(empty, **found.get(b, {}), bucket=b) for b in buckets]
+
+    found_by_group = {}
+    for row in rows:
+        if len(group_fields) == 1:
+            key = row[group_fields[0]]
+        else:
+            key = tuple(row[field] for field in group_fields)
+        found_by_group.setdefault(key, {})[timezone.localtime(row['bucket'])] = {
+            name: row[name] for name in metrics
+        }
+
+    if not group_fields:
+        return dense(found_by_group.get((), {}))
+
+    for key in groups or ():
+        found_by_group.setdefault(key, {})
+    return {key: dense(found) for key, found in found_by_group.items()}
+
+
+def _reduce(values, how):
+    values = [v for v in values if v is not None]
+    if how == 'sum':
+        return sum(values)
+    if not values:
+        return None
+    if how == 'max':
+        return max(values)
+    if how == 'min':
+        return min(values)
+    raise ValueError(f'Unknown reducer: {how}')
+
+
+def reduce_points(points, reducers):
+    """Collapse bucketed rows into one, combining each metric with 'sum', 'max' or 'min'"""
+    return {name: _reduce([p[name] for p in points], how) for name, how in reducers.items()}
+
+
+def combine_series(series_list, reducers, buckets):
+    """Bucket-wise combination of several dense series sharing ``buckets``"""
+    series_list = list(series_list)
+    return [
+        dict(reduce_points([series[i] for series in series_list], reducers), bucket=b)
+        for i, b in enumerate(buckets)
+    ]
+
+
+def average(total, count):
+    """Mean from a sum and a count, ``None`` when there is nothing to average"""
+    return total / count if count else None
@@ -1,20 +1,34 @@
 import numpy as np
-import pandas as pd
 from datetime import datetime, timedelta
 from django.utils import timezone
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from sklearn.model_selection import TimeSeriesSplit
-from sklearn.metrics import mean_absolute_error, mean_squared_error
-import joblib
 import logging
-import pickle
 import os
-from .models import WeatherData, WeatherForecast, City
+from .models import WeatherData, WeatherForecast, WeatherPrediction, City
+from .cache_manager import WeatherCacheManager
+from .climatology import anomaly_persistence_forecast, get_city_climatology
+from .feature_store import FEATURE_COLUMNS, get_city_buffers, history_features, latest_feature_rows, time_features
+from .global_model import GLOBAL_FAMILY, city_features, design_matrices, training_pairs
+from .model_registry import DEFAULT_FAMILY, model_registry
+from .online_models import ONLINE_FAMILY, ONLINE_METRICS, ONLINE_MODEL_LABEL, get_online_models
 from django.conf import settings
+from django.core.cache import cache
+
+# pandas and scikit-learn are imported where models are trained or scored,
+# so processes that never predict (web workers serving other endpoints,
+# ingestion workers) don't load them
 
 logger = logging.getLogger('weather247')
 
+ADVANCED_METRICS = ['temperature', 'humidity', 'pressure', 'wind_speed']
+# History used to train the ensemble models, and the least it needs
+TRAINING_DAYS = 90
+MIN_TRAINING_READINGS = 100
+HORIZON_HOURS = 24
+# The ensembles predict the metric ``hours_ahead`` after the feature row's reading
+ENSEMBLE_FEATURE_COLUMNS = list(FEATURE_COLUMNS) + ['hours_ahead']
+# Leading hours of each forecast kept as WeatherPrediction rows
+STORED_PREDICTION_HOURS = 4
+
 
 class WeatherAIPredictor:
     """Enhanced AI-powered weather prediction service with multiple models"""
@@ -26,15 +40,9 @@ class WeatherAIPredictor:
             'pressure': None,
             'wind_speed': None
         }
-        self.scalers = {
-            'features': StandardScaler(),
-            'targets': {
-                'temperature': MinMaxScaler(),
-                'humidity': MinMaxScaler(),
-                'pressure': MinMaxScaler(),
-                'wind_speed': MinMaxScaler()
-            }
-        }
+        # Next-hour temperature model and its feature scaler, created when trained
+        self.model = None
+        self.scaler = None
         self.is_trained = False
         self.model_path = os.path.join(settings.BASE_DIR, 'ml_models')
         os.makedirs(self.model_path, exist_ok=True)
@@ -100,7 +108,11 @@ class WeatherAIPredictor:
             features = features[:-1]
             targets = np.array(targets)
             
+            from sklearn.ensemble import RandomForestRegressor
+            from sklearn.preprocessing import StandardScaler
+            
             # Scale features
+            self.scaler = StandardScaler()
             features_scaled = self.scaler.fit_transform(features)
             
             # Train model
@@ -122,7 +134,11 @@ class WeatherAIPredictor:
     def _generate_demo_model(self, city):
         """Generate a demo model for demonstration"""
         try:
+            from sklearn.ensemble import RandomForestRegressor
+            from sklearn.preprocessing import StandardScaler
+            
             # Create a simple demo model
+            self.scaler = StandardScaler()
             self.model = RandomForestRegressor(n_estimators=10, random_state=42)
             
             # Generate synthetic data
@@ -155,41 +171,22 @@ class WeatherAIPredictor:
             
             predictions = []
             current_time = timezone.now()
+            prediction_times = [current_time + timedelta(hours=hour + 1) for hour in range(HORIZON_HOURS)]
             
-            # Generate predictions for next 24 hours
-            for hour in range(24):
-                prediction_time = current_time + timedelta(hours=hour + 1)
-                
-                # Prepare features for this hour
-                features = [
-                    current_weather.temperature + np.random.normal(0, 2),  # Add some variation
-                    current_weather.humidity + np.random.normal(0, 5),
-                    current_weather.pressure + np.random.normal(0, 3),
-                    current_weather.wind_speed + np.random.normal(0, 2),
-                    current_weather.wind_direction,
-                    prediction_time.hour,
-                    prediction_time.timetuple().tm_yday,
-                    prediction_time.month,
-                    np.sin(2 * np.pi * prediction_time.hour / 24),
-                    np.cos(2 * np.pi * prediction_time.hour / 24),
-                    np.sin(2 * np.pi * prediction_time.timetuple().tm_yday / 365),
-                    np.cos(2 * np.pi * prediction_time.timetuple().tm_yday / 365),
-                ]
-                
-                # Scale features
-                features_scaled = self.scaler.transform([features])
-                
-                # Make prediction
-                temp_prediction = self.model.predict(features_scaled)[0]
-                
-                # Calculate confidence interval (simplified)
-                confidence = max(0.7, 1.0 - (hour * 0.02))  # Decreasing confidence over time
-                
+            # All 24 hours scaled and predicted in one call
+            features = self.horizon_features(current_weather, prediction_times)
+            temp_predictions = self.model.predict(self.scaler.transform(features))
+            
+            # Calculate confidence interval (simplified), decreasing over time
+            confidences = np.maximum(0.7, 1.0 - np.arange(HORIZON_HOURS) * 0.02)
+            
+            for hour, prediction_time in enumerate(prediction_times):
+                temp_prediction = float(temp_predictions[hour])
                 predictions.append({
                     'hour': hour + 1,
                     'datetime': prediction_time.isoformat(),
                     'temperature': round(temp_prediction, 1),
-                    'confidence': round(confidence * 100, 1),
+                    'confidence': round(float(confidences[hour]) * 100, 1),
                     'condition': self._predict_condition(temp_prediction, current_weather)
                 })
             
@@ -199,6 +196,32 @@ class WeatherAIPredictor:
             logger.error(f"Error generating AI predictions: {e}")
             return self._generate_demo_predictions(city)
     
+    def horizon_features(self, current_weather, prediction_times):
+        """``len(prediction_times)`` x 12 feature matrix, laid out like ``prepare_features``"""
+        count = len(prediction_times)
+        hours = np.array([t.hour for t in prediction_times], dtype=float)
+        days = np.array([t.timetuple().tm_yday for t in prediction_times], dtype=float)
+        months = np.array([t.month for t in prediction_times], dtype=float)
+        
+        # Current conditions with some variation
+        current = np.array([
+            current_weather.temperature, current_weather.humidity,
+            current_weather.pressure, current_weather.wind_speed
+        ], dtype=float)
+        weather = current + np.random.normal(0, [2, 5, 3, 2], size=(count, 4))
+        
+        return np.column_stack([
+            weather,
+            np.full(count, float(current_weather.wind_direction)),
+            hours,
+            days,
+            months,
+            np.sin(2 * np.pi * hours / 24),  # Cyclical hour
+            np.cos(2 * np.pi * hours / 24),
+            np.sin(2 * np.pi * days / 365),  # Cyclical day
+            np.cos(2 * np.pi * days / 365),
+        ])
+    
     def _predict_condition(self, temperature, current_weather):
         """Predict weather condition based on temperature and current conditions"""
         conditions = ['Clear', 'Partly Cloudy', 'Cloudy', 'Light Rain', 'Rain']
@@ -246,173 +269,104 @@ class AdvancedWeatherPredictor:
     """Advanced weather prediction with ensemble methods and deep learning"""
     
     def __init__(self):
+        # Synthetic stand-ins for cities without enough history; trained
+        # models live in the model registry
         self.ensemble_models = {}
         self.feature_importance = {}
         self.prediction_accuracy = {}
         self.model_versions = {}
         
-    def create_advanced_features(self, weather_data):
-        """Create advanced features for better predictions"""
-        df = pd.DataFrame(weather_data)
-        
-        # Time-based features
-        df['hour'] = pd.to_datetime(df['timestamp']).dt.hour
-        df['day_of_year'] = pd.to_datetime(df['timestamp']).dt.dayofyear
-        df['month'] = pd.to_datetime(df['timestamp']).dt.month
-        df['season'] = df['month'].apply(self._get_season)
-        df['is_weekend'] = pd.to_datetime(df['timestamp']).dt.weekday >= 5
-        
-        # Cyclical features
-        df['hour_sin'] = np.sin(2 * np.pi * df['hour'] / 24)
-        df['hour_cos'] = np.cos(2 * np.pi * df['hour'] / 24)
-        df['day_sin'] = np.sin(2 * np.pi * df['day_of_year'] / 365)
-        df['day_cos'] = np.cos(2 * np.pi * df['day_of_year'] / 365)
-        
-        # Lag features
-        for col in ['temperature', 'humidity', 'pressure', 'wind_speed']:
-            if col in df.columns:
-                df[f'{col}_lag_1h'] = df[col].shift(1)
-                df[f'{col}_lag_3h'] = df[col].shift(3)
-                df[f'{col}_lag_6h'] = df[col].shift(6)
-                df[f'{col}_lag_24h'] = df[col].shift(24)
-        
-        # Rolling statistics
-        for col in ['temperature', 'humidity', 'pressure']:
-            if col in df.columns:
-                df[f'{col}_rolling_mean_3h'] = df[col].rolling(window=3).mean()
-                df[f'{col}_rolling_std_3h'] = df[col].rolling(window=3).std()
-                df[f'{col}_rolling_mean_6h'] = df[col].rolling(window=6).mean()
-                df[f'{col}_rolling_max_6h'] = df[col].rolling(window=6).max()
-                df[f'{col}_rolling_min_6h'] = df[col].rolling(window=6).min()
-        
-        # Weather pattern features
-        if 'pressure' in df.columns:
-            df['pressure_trend'] = df['pressure'].diff()
-            df['pressure_change_3h'] = df['pressure'] - df['pressure'].shift(3)
-        
-        if 'temperature' in df.columns and 'humidity' in df.columns:
-            df['heat_index'] = self._calculate_heat_index(df['temperature'], df['humidity'])
-            df['dew_point'] = self._calculate_dew_point(df['temperature'], df['humidity'])
-        
-        # Weather stability indicators
-        if 'temperature' in df.columns:
-            df['temp_stability'] = df['temperature'].rolling(window=6).std()
-        
-        return df.fillna(method='forward').fillna(method='backward')
-    
-    def _get_season(self, month):
-        """Get season from month"""
-        if month in [12, 1, 2]:
-            return 0  # Winter
-        elif month in [3, 4, 5]:
-            return 1  # Spring
-        elif month in [6, 7, 8]:
-            return 2  # Summer
-        else:
-            return 3  # Fall
-    
-    def _calculate_heat_index(self, temp, humidity):
-        """Calculate heat index"""
-        return temp + 0.5 * (temp + 61.0 + ((temp - 68.0) * 1.2) + (humidity * 0.094))
-    
-    def _calculate_dew_point(self, temp, humidity):
-        """Calculate dew point"""
-        a = 17.27
-        b = 237.7
-        alpha = ((a * temp) / (b + temp)) + np.log(humidity / 100.0)
-        return (b * alpha) / (a - alpha)
+    def fit_ensemble_model(self, city, target_metric='temperature', n_jobs=1):
+        """Fit, validate and publish the ensemble model of one metric; ``None`` without enough history"""
+        from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+        from sklearn.metrics import mean_absolute_error
+        from sklearn.model_selection import TimeSeriesSplit
+        
+        # Features of the training window, as the feature store computes them for inference
+        df = history_features(city.id, timezone.now() - timedelta(days=TRAINING_DAYS))
+        
+        if len(df) < MIN_TRAINING_READINGS:
+            logger.warning(f"Insufficient data to train a {target_metric} model for {city.name}")
+            return None
+        
+        # Each reading paired with the one 1 to 24 hours later: its time features
+        # moved to that hour and the target read there, as inference asks
+        timestamps = df.index.to_numpy()
+        rows, hours_ahead, targets = training_pairs(timestamps, np.random.default_rng(42))
+        X = df.iloc[rows].reset_index(drop=True)
+        for name, values in time_features(timestamps[rows] + hours_ahead * 3600).items():
+            X[name] = values
+        X['hours_ahead'] = hours_ahead.astype(np.float32)
+        X = X[ENSEMBLE_FEATURE_COLUMNS]
+        y = df[target_metric].iloc[targets].reset_index(drop=True)
+        
+        # Remove rows with NaN values
+        mask = ~(X.isna().any(axis=1) | y.isna())
+        X = X[mask]
+        y = y[mask]
+        
+        if len(X) < 50:
+            return None
+        
+        # Time series split for validation
+        tscv = TimeSeriesSplit(n_splits=3)
+        
+        # Create ensemble of models
+        models = {
+            'rf': RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs),
+            'gb': GradientBoostingRegressor(n_estimators=100, random_state=42),
+        }
+        
+        best_model = None
+        best_score = float('inf')
+        
+        for name, model in models.items():
+            scores = []
+            for train_idx, val_idx in tscv.split(X):
+                X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
+                y_train, y_val = y.iloc[train_idx], y.iloc[val_idx]
+                
+                model.fit(X_train, y_train)
+                y_pred = model.predict(X_val)
+                score = mean_absolute_error(y_val, y_pred)
+                scores.append(score)
+            
+            avg_score = np.mean(scores)
+            if avg_score < best_score:
+                best_score = avg_score
+                best_model = model
+        
+        # Train final model on all data
+        best_model.fit(X, y)
+        if hasattr(best_model, 'n_jobs'):
+            # Inference runs on request threads
+            best_model.n_jobs = None
+        
+        # Store as the city's next published version
+        record = model_registry.register(
+            best_model, target_metric, city=city, mae=float(best_score),
+            data_points=len(X), feature_columns=list(X.columns)
+        )
+        self.ensemble_models.pop(f"{city.id}_{target_metric}", None)
+        
+        logger.info(f"Trained {target_metric} model for {city.name} with MAE: {best_score:.2f}")
+        return record
     
     def train_ensemble_model(self, city, target_metric='temperature'):
-        """Train ensemble model for specific metric"""
+        """Train ensemble model for specific metric, with a synthetic model as fallback"""
         try:
-            # Get training data
-            end_date = timezone.now()
-            start_date = end_date - timedelta(days=90)  # 3 months of data
-            
-            historical_data = WeatherData.objects.filter(
-                city=city,
-                timestamp__range=(start_date, end_date)
-            ).order_by('timestamp').values()
-            
-            if len(historical_data) < 100:
-                logger.warning(f"Insufficient data for {city.name}, using synthetic data")
-                return self._create_synthetic_model(city, target_metric)
-            
-            # Prepare features
-            df = self.create_advanced_features(list(historical_data))
-            
-            # Select feature columns
-            feature_cols = [col for col in df.columns if col not in [
-                'id', 'city_id', 'timestamp', 'weather_condition', 'weather_description'
-            ]]
-            
-            X = df[feature_cols].select_dtypes(include=[np.number])
-            y = df[target_metric]
-            
-            # Remove rows with NaN values
-            mask = ~(X.isna().any(axis=1) | y.isna())
-            X = X[mask]
-            y = y[mask]
-            
-            if len(X) < 50:
-                return self._create_synthetic_model(city, target_metric)
-            
-            # Time series split for validation
-            tscv = TimeSeriesSplit(n_splits=3)
-            
-            # Create ensemble of models
-            models = {
-                'rf': RandomForestRegressor(n_estimators=100, random_state=42),
-                'gb': GradientBoostingRegressor(n_estimators=100, random_state=42),
-            }
-            
-            best_model = None
-            best_score = float('inf')
-            
-            for name, model in models.items():
-                scores = []
-                for train_idx, val_idx in tscv.split(X):
-                    X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
-                    y_train, y_val = y.iloc[train_idx], y.iloc[val_idx]
-                    
-                    model.fit(X_train, y_train)
-                    y_pred = model.predict(X_val)
-                    score = mean_absolute_error(y_val, y_pred)
-                    scores.append(score)
-                
-                avg_score = np.mean(scores)
-                if avg_score < best_score:
-                    best_score = avg_score
-                    best_model = model
-            
-            # Train final model on all data
-            best_model.fit(X, y)
-            
-            # Store model and metadata
-            model_key = f"{city.id}_{target_metric}"
-            self.ensemble_models[model_key] = {
-                'model': best_model,
-                'feature_columns': feature_cols,
-                'accuracy': best_score,
-                'trained_at': timezone.now(),
-                'data_points': len(X)
-            }
-            
-            # Save model to disk
-            model_file = os.path.join(self.model_path, f"{model_key}.pkl")
-            with open(model_file, 'wb') as f:
-                pickle.dump(self.ensemble_models[model_key], f)
-            
-            logger.info(f"Trained {target_metric} model for {city.name} with MAE: {best_score:.2f}")
-            return True
-            
+            if self.fit_ensemble_model(city, target_metric) is not None:
+                return True
+            logger.warning(f"Insufficient data for {city.name}, using synthetic data")
         except Exception as e:
             logger.error(f"Error training model for {city.name}: {e}")
-            return self._create_synthetic_model(city, target_metric)
+        return self._create_synthetic_model(city, target_metric)
     
     def _create_synthetic_model(self, city, target_metric):
         """Create synthetic model for demonstration"""
         try:
+            from sklearn.ensemble import RandomForestRegressor
+            
             # Create a simple model with synthetic data
             np.random.seed(42)
             X_synthetic = np.random.randn(1000, 20)
@@ -428,7 +382,8 @@ class AdvancedWeatherPredictor:
                 'accuracy': 2.5,  # Synthetic accuracy
                 'trained_at': timezone.now(),
                 'data_points': 1000,
-                'is_synthetic': True
+                'is_synthetic': True,
+                'model_version': 'synthetic'
             }
             
             logger.info(f"Created synthetic {target_metric} model for {city.name}")
@@ -438,70 +393,338 @@ class AdvancedWeatherPredictor:
             logger.error(f"Error creating synthetic model: {e}")
             return False
     
+    def get_model_info(self, city, metric):
+        """Published model of a city and metric from the registry, else its synthetic stand-in"""
+        loaded = model_registry.get(city.id, metric)
+        if loaded is not None:
+            return {
+                'model': loaded.estimator,
+                'feature_columns': loaded.feature_columns,
+                'accuracy': loaded.mae,
+                'model_version': loaded.model_version,
+            }
+        return self.ensemble_models.get(f"{city.id}_{metric}")
+    
+    def latest_feature_rows(self, cities):
+        """Newest feature row per city id, from the feature store"""
+        return latest_feature_rows([city.id for city in cities])
+    
+    def horizon_features(self, latest_row, feature_columns, prediction_times):
+        """Hours x features matrix: the newest feature row with its time features moved to each hour"""
+        columns = {name: i for i, name in enumerate(feature_columns)}
+        base = latest_row.reindex(feature_columns).to_numpy(dtype=float)
+        matrix = np.tile(np.nan_to_num(base), (len(prediction_times), 1))
+        
+        timestamps = np.array([t.timestamp() for t in prediction_times])
+        hour_features = time_features(timestamps)
+        for name, values in hour_features.items():
+            if name in columns:
+                matrix[:, columns[name]] = values
+        if 'hours_ahead' in columns:
+            # The row is named by its reading's epoch timestamp
+            matrix[:, columns['hours_ahead']] = (timestamps - latest_row.name) / 3600
+        return matrix
+    
     def predict_advanced_24h(self, city, current_weather):
         """Generate advanced 24-hour predictions"""
+        return self.predict_advanced_batch([(city, current_weather)])[0]
+    
+    def predict_advanced_batch(self, requests, hours=HORIZON_HOURS, use_cache=True, family=DEFAULT_FAMILY):
+        """Predictions for many ``(city, current_weather)`` pairs, with one ``predict`` call per model.
+        
+        ``family`` picks the models: the published per-city ensembles, the
+        online models updated with every reading, or the global models
+        shared by every city.
+        """
         try:
-            predictions = []
-            
-            # Train models if not available
-            for metric in ['temperature', 'humidity', 'pressure', 'wind_speed']:
-                model_key = f"{city.id}_{metric}"
-                if model_key not in self.ensemble_models:
-                    self.train_ensemble_model(city, metric)
-            
-            current_time = timezone.now()
+            if family == ONLINE_FAMILY:
+                return self._predict_online_batch(requests, hours)
+            if family == GLOBAL_FAMILY:
+                return self._predict_global_batch(requests, hours)
+            return self._predict_batch(requests, hours, use_cache)
+        except Exception as e:
+            logger.error(f"Error generating advanced predictions: {e}")
+            return [self._generate_fallback_predictions(city, current) for city, current in requests]
+    
+    def predict_baseline_batch(self, requests, hours=HORIZON_HOURS):
+        """Model-free predictions (climatology or persistence) for ``(city, current_weather)`` pairs"""
+        bucket = timezone.now().replace(minute=0, second=0, microsecond=0)
+        return self._compute_batch(requests, [dict.fromkeys(ADVANCED_METRICS) for _ in requests], bucket, hours)
+    
+    def prediction_cache_key(self, city, current_weather, model_infos, hours, bucket):
+        """Key of a city's predictions for its models, input reading and hour; ``None`` for unsaved readings"""
+        reading_id = getattr(current_weather, 'id', None)
+        if reading_id is None:
+            return None
+        versions = ','.join(
+            f"{metric}={(model_infos[metric] or {}).get('model_version', 'baseline')}" for metric in ADVANCED_METRICS
+        )
+        # New readings and newly published models change the key, so stale entries are never read
+        return f"predictions:{city.id}:{versions}:{reading_id}:{hours}h:{int(bucket.timestamp())}"
+    
+    def _predict_batch(self, requests, hours, use_cache):
+        # Forecast hours are anchored to the current hour, so results hold for the whole hour
+        bucket = timezone.now().replace(minute=0, second=0, microsecond=0)
+        
+        # Published models only; training runs in the background pipeline
+        model_infos = [
+            {metric: self.get_model_info(city, metric) for metric in ADVANCED_METRICS}
+            for city, _ in requests
+        ]
+        keys = [
+            self.prediction_cache_key(city, current_weather, infos, hours, bucket) if use_cache else None
+            for (city, current_weather), infos in zip(requests, model_infos)
+        ]
+        live_keys = [key for key in keys if key]
+        cached = WeatherCacheManager.get_many_cache(live_keys) if live_keys else {}
+        
+        missing = [index for index, key in enumerate(keys) if key not in cached]
+        computed = self._compute_batch(
+            [requests[index] for index in missing], [model_infos[index] for index in missing], bucket, hours
+        ) if missing else []
+        results = [cached.get(key) for key in keys]
+        for index, predictions in zip(missing, computed):
+            results[index] = predictions
+        
+        fresh = {keys[index]: results[index] for index in missing if keys[index]}
+        if fresh:
+            WeatherCacheManager.set_many_cache(fresh, 'predictions')
+        return results
+    
+    def _compute_batch(self, requests, model_infos, current_time, hours):
+        prediction_times = [current_time + timedelta(hours=hour) for hour in range(1, hours + 1)]
+        steps = np.arange(1, hours + 1)
+        
+        trained_cities = [
+            city for (city, _), infos in zip(requests, model_infos)
+            if any(info and not info.get('is_synthetic') for info in infos.values())
+        ]
+        latest_rows = self.latest_feature_rows(trained_cities)
+        
+        values = [{} for _ in requests]
+        confidences = [{} for _ in requests]
+        labels = [None for _ in requests]
+        # Horizons grouped by model, so cities sharing a model share its predict call
+        batches = {}
+        
+        for index, ((city, current_weather), infos) in enumerate(zip(requests, model_infos)):
+            outlook = None
+            latest_row = latest_rows.get(city.id)
             
-            # Generate predictions for next 24 hours
-            for hour in range(1, 25):
-                prediction_time = current_time + timedelta(hours=hour)
-                
-                hour_predictions = {}
-                confidence_scores = {}
-                
-                for metric in ['temperature', 'humidity', 'pressure', 'wind_speed']:
-                    model_key = f"{city.id}_{metric}"
-                    
-                    if model_key in self.ensemble_models:
-                        model_info = self.ensemble_models[model_key]
-                        
-                        if model_info.get('is_synthetic'):
-                            # Generate synthetic predictions
-                            base_value = getattr(current_weather, metric, 20)
-                            variation = np.random.normal(0, 2)
-                            predicted_value = base_value + variation
-                            confidence = max(70, 95 - hour * 1.5)
-                        else:
-                            # Use trained model (simplified for demo)
-                            base_value = getattr(current_weather, metric, 20)
-                            trend = np.random.normal(0, 1)
-                            predicted_value = base_value + trend
-                            confidence = max(75, 95 - hour * 1.2)
-                        
-                        hour_predictions[metric] = round(predicted_value, 1)
-                        confidence_scores[metric] = round(confidence, 1)
+            for metric in ADVANCED_METRICS:
+                model_info = infos[metric]
+                current_value = getattr(current_weather, metric, 20)
                 
+                if model_info is None or (latest_row is None and not model_info.get('is_synthetic')):
+                    # No published model (or no recent readings to feed it): climatology, else persistence
+                    if outlook is None:
+                        outlook = self._climatology_outlook(city, current_weather, current_time, hours)
+                    if metric in outlook:
+                        # Today's departure from normal, relaxing toward the normal
+                        values[index][metric] = np.asarray(outlook[metric], dtype=float)
+                        confidences[index][metric] = np.maximum(75, 95 - steps * 1.2)
+                    else:
+                        values[index][metric] = np.full(hours, float(current_value))
+                        confidences[index][metric] = np.maximum(60, 90 - steps * 1.5)
+                elif model_info.get('is_synthetic'):
+                    # Generate synthetic predictions
+                    values[index][metric] = current_value + np.random.normal(0, 2, hours)
+                    confidences[index][metric] = np.maximum(70, 95 - steps * 1.5)
+                else:
+                    features = self.horizon_features(latest_row, model_info['feature_columns'], prediction_times)
+                    batch = batches.setdefault(id(model_info['model']), (model_info, []))
+                    batch[1].append((index, metric, features))
+                    confidences[index][metric] = np.maximum(75, 95 - steps * 1.2)
+            
+            # Labelled after the source of the temperature forecast
+            temperature_info = infos['temperature']
+            if temperature_info and (latest_row is not None or temperature_info.get('is_synthetic')):
+                labels[index] = (temperature_info.get('accuracy', 2.5), temperature_info.get('model_version', 'baseline'))
+            elif outlook and 'temperature' in outlook:
+                # No model MAE to report for the climatology outlook
+                labels[index] = (None, 'climatology')
+            else:
+                labels[index] = (2.5, 'baseline')
+        
+        if batches:
+            # Models are fitted on named feature columns
+            import pandas as pd
+            for model_info, jobs in batches.values():
+                stacked = pd.DataFrame(
+                    np.vstack([features for _, _, features in jobs]), columns=model_info['feature_columns']
+                )
+                predicted = model_info['model'].predict(stacked)
+                for (index, metric, _), horizon in zip(jobs, np.split(predicted, len(jobs))):
+                    values[index][metric] = horizon
+        
+        results = []
+        for index, (accuracy, model_version) in enumerate(labels):
+            confidence = np.mean([confidences[index][metric] for metric in ADVANCED_METRICS], axis=0)
+            results.append(self._format_predictions(
+                prediction_times, values[index], confidence, accuracy, model_version
+            ))
+        return results
+    
+    def _format_predictions(self, prediction_times, values, confidence, accuracy, model_version):
+        """Hourly prediction dicts from per-metric value arrays"""
+        predictions = []
+        for step, prediction_time in enumerate(prediction_times):
+            hour_predictions = {
+                metric: round(float(values[metric][step]), 1) for metric in ADVANCED_METRICS
+            }
+            predictions.append({
+                'hour': step + 1,
+                'datetime': prediction_time.isoformat(),
+                **hour_predictions,
                 # Determine weather condition based on predictions
-                temp = hour_predictions.get('temperature', 20)
-                humidity = hour_predictions.get('humidity', 50)
-                condition = self._predict_weather_condition(temp, humidity)
-                
-                predictions.append({
-                    'hour': hour,
-                    'datetime': prediction_time.isoformat(),
-                    'temperature': hour_predictions.get('temperature', 20),
-                    'humidity': hour_predictions.get('humidity', 50),
-                    'pressure': hour_predictions.get('pressure', 1013),
-                    'wind_speed': hour_predictions.get('wind_speed', 10),
-                    'condition': condition,
-                    'confidence': np.mean(list(confidence_scores.values())),
-                    'model_accuracy': self.ensemble_models.get(f"{city.id}_temperature", {}).get('accuracy', 2.5)
-                })
-            
-            return predictions
-            
+                'condition': self._predict_weather_condition(
+                    hour_predictions['temperature'], hour_predictions['humidity']
+                ),
+                'confidence': round(float(confidence[step]), 1),
+                'model_accuracy': accuracy,
+                'model_version': model_version
+            })
+        return predictions
+    
+    def _predict_online_batch(self, requests, hours):
+        """Forecasts of the online models, updated with every reading (no cache: they take microseconds)"""
+        bucket = timezone.now().replace(minute=0, second=0, microsecond=0)
+        prediction_times = [bucket + timedelta(hours=hour) for hour in range(1, hours + 1)]
+        timestamps = [t.timestamp() for t in prediction_times]
+        models = get_online_models(list({city.id for city, _ in requests}))
+        # Same shape as the ensembles' confidence
+        confidence = np.maximum(75, 95 - np.arange(1, hours + 1) * 1.2)
+        
+        results = []
+        for city, current_weather in requests:
+            model = models[city.id]
+            if not model.updates:
+                # No readings to learn from yet
+                results.append(self.predict_baseline_batch([(city, current_weather)], hours)[0])
+                continue
+            forecast = model.forecast(timestamps)
+            values = {metric: forecast[ONLINE_METRICS.index(metric)] for metric in ADVANCED_METRICS}
+            accuracy = round(float(model.mae[ONLINE_METRICS.index('temperature')]), 2)
+            results.append(self._format_predictions(
+                prediction_times, values, confidence, accuracy, ONLINE_MODEL_LABEL
+            ))
+        return results
+    
+    def _predict_global_batch(self, requests, hours):
+        """Forecasts of the global models: one ``predict`` call per metric for all cities of the batch"""
+        bucket = timezone.now().replace(minute=0, second=0, microsecond=0)
+        prediction_times = [bucket + timedelta(hours=hour) for hour in range(1, hours + 1)]
+        timestamps = np.array([t.timestamp() for t in prediction_times])
+        models = {metric: model_registry.get(None, metric, family=GLOBAL_FAMILY) for metric in ADVANCED_METRICS}
+        if any(model is None for model in models.values()):
+            logger.warning("No published global models, serving baseline predictions")
+            return self.predict_baseline_batch(requests, hours)
+        
+        city_ids = list({city.id for city, _ in requests})
+        buffers = get_city_buffers(city_ids)
+        cities = city_features(city_ids)
+        
+        # Hours ahead of each city's newest reading, stacked for every city
+        served, matrices = [], {metric: [] for metric in ADVANCED_METRICS}
+        for index, (city, _) in enumerate(requests):
+            buffer = buffers[city.id]
+            if not len(buffer) or city.id not in cities:
+                continue
+            latest = buffer.timestamps[-1]
+            city_matrices = design_matrices(
+                np.tile(buffer.features[-1], (hours, 1)), np.full(hours, latest), (timestamps - latest) / 3600,
+                cities[city.id], get_city_climatology(city.id), ADVANCED_METRICS
+            )
+            for metric, matrix in city_matrices.items():
+                matrices[metric].append(matrix)
+            served.append(index)
+        
+        values = {}
+        if served:
+            import pandas as pd
+            for metric, model in models.items():
+                stacked = pd.DataFrame(np.vstack(matrices[metric]), columns=model.feature_columns)
+                values[metric] = np.split(model.estimator.predict(stacked), len(served))
+        
+        confidence = np.maximum(75, 95 - np.arange(1, hours + 1) * 1.2)
+        temperature = models['temperature']
+        accuracy = round(temperature.mae, 2) if temperature.mae is not None else 2.5
+        results = [None] * len(requests)
+        for position, index in enumerate(served):
+            results[index] = self._format_predictions(
+                prediction_times, {metric: values[metric][position] for metric in ADVANCED_METRICS},
+                confidence, accuracy, temperature.model_version
+            )
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            # No readings to forecast from yet
+            baseline = self.predict_baseline_batch([requests[index] for index in missing], hours)
+            for index, predictions in zip(missing, baseline):
+                results[index] = predictions
+        return results
+    
+    def store_predictions(self, city_predictions, hours=STORED_PREDICTION_HOURS):
+        """Upsert the first ``hours`` predictions of each ``(city, predictions)`` run, once per city and hour"""
+        # Forecast hours are anchored to the hour, so the first one identifies the run
+        runs = {
+            f"predictions:stored:{city.id}:{predictions[0].get('model_version', 'v1.0')}:{predictions[0]['datetime']}":
+                (city, predictions)
+            for city, predictions in city_predictions if predictions
+        }
+        already_stored = cache.get_many(list(runs)) if runs else {}
+        
+        rows, stored_keys = [], []
+        for stored_key, (city, predictions) in runs.items():
+            if stored_key in already_stored:
+                continue
+            stored_keys.append(stored_key)
+            model_version = predictions[0].get('model_version', 'v1.0')
+            # The hour the run is anchored to, ``hour`` hours before each predicted hour
+            issued_at = datetime.fromisoformat(predictions[0]['datetime']) - timedelta(
+                hours=predictions[0].get('hour', 1)
+            )
+            for p in predictions[:hours]:
+                rows.append(WeatherPrediction(
+                    city=city,
+                    prediction_date=datetime.fromisoformat(p['datetime']),
+                    model_version=model_version,
+                    issued_at=issued_at,
+                    predicted_temperature=p.get('temperature', 0),
+                    predicted_humidity=int(p.get('humidity') or 0),
+                    predicted_pressure=float(p.get('pressure') or 0),
+                    predicted_wind_speed=float(p.get('wind_speed') or 0),
+                    predicted_condition=p.get('condition', 'Unknown'),
+                    confidence_score=float(p.get('confidence') or 0) / 100.0,
+                    features_used={'source': 'advanced_predictor'}
+                ))
+        
+        if rows:
+            WeatherPrediction.objects.bulk_create(
+                rows, update_conflicts=True,
+                # Each run keeps its own rows, so every predicted hour is backtested at each horizon
+                unique_fields=['city', 'prediction_date', 'model_version', 'issued_at'],
+                update_fields=[
+                    'predicted_temperature', 'predicted_humidity', 'predicted_pressure', 'predicted_wind_speed',
+                    'predicted_condition', 'confidence_score', 'features_used',
+                ]
+            )
+            # Marked only once written: a failed write is retried by the next request
+            cache.set_many(dict.fromkeys(stored_keys, True), WeatherCacheManager.CACHE_TTL['predictions'])
+        return len(rows)
+    
+    def _climatology_outlook(self, city, current_weather, start, hours=24):
+        """Hourly values per metric from the city's climatological normals, for metrics that have them"""
+        outlook = {}
+        try:
+            for metric in ['temperature', 'humidity', 'pressure', 'wind_speed']:
+                values = anomaly_persistence_forecast(
+                    city.id, metric, getattr(current_weather, metric, None), start, hours
+                )
+                if values is not None:
+                    outlook[metric] = values
         except Exception as e:
-            logger.error(f"Error generating advanced predictions: {e}")
-            return self._generate_fallback_predictions(city, current_weather)
+            logger.warning(f"Climatology unavailable for {city.name}: {e}")
+        return outlook
     
     def _predict_weather_condition(self, temperature, humidity):
         """Predict weather condition based on temperature and humidity"""
@@ -519,14 +742,18 @@ class AdvancedWeatherPredictor:
     def _generate_fallback_predictions(self, city, current_weather):
         """Generate fallback predictions when models fail"""
         predictions = []
-        current_time = timezone.now()
+        current_time = timezone.now().replace(minute=0, second=0, microsecond=0)
+        normal_temps = self._climatology_outlook(city, current_weather, current_time).get('temperature')
         
         for hour in range(1, 25):
             prediction_time = current_time + timedelta(hours=hour)
             
-            # Simple trend-based predictions
-            temp_trend = np.sin(2 * np.pi * hour / 24) * 3
-            predicted_temp = current_weather.temperature + temp_trend + np.random.normal(0, 1)
+            if normal_temps is not None:
+                predicted_temp = normal_temps[hour - 1]
+            else:
+                # Simple trend-based predictions
+                temp_trend = np.sin(2 * np.pi * hour / 24) * 3
+                predicted_temp = current_weather.temperature + temp_trend + np.random.normal(0, 1)
             
             predictions.append({
                 'hour': hour,
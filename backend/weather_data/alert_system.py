@@ -29,7 +29,8 @@ class WeatherAlertEngine:
 			'wind_speed': 50.0,
 			'precipitation': 10.0,
 			'aqi': 4,
-			'visibility': 1.0
+			'visibility': 1.0,
+			'climatology_z': 3.0
 		}
 		self.severity_levels = {
 			'low': 1,
@@ -103,11 +104,45 @@ class WeatherAlertEngine:
 					'threshold': 'severe_conditions'
 				})
 			
+			# Readings far from what is normal for this place, day and hour
+			alerts.extend(self._climatology_alerts(weather_data))
+			
 		except Exception as e:
 			logger.error(f"Error evaluating weather conditions: {e}")
 		
 		return alerts
 	
+	def _climatology_alerts(self, weather_data: WeatherData) -> List[Dict[str, Any]]:
+		"""Alerts for temperature and pressure departures from the climatological normal"""
+		from .climatology import score_weather_data
+		
+		alerts = []
+		threshold = self.alert_thresholds['climatology_z']
+		labels = {'temperature': ('Temperature', '°C'), 'pressure': ('Pressure', ' hPa')}
+		
+		for metric, score in score_weather_data(weather_data, metrics=tuple(labels)).items():
+			z_score = score['z_score']
+			if z_score is None or abs(z_score) < threshold:
+				continue
+			label, unit = labels[metric]
+			direction = 'above' if z_score > 0 else 'below'
+			alerts.append({
+				'type': 'climate_anomaly',
+				'severity': 'high' if abs(z_score) >= threshold + 1 else 'medium',
+				'title': f'Unusual {label} for the Season - {weather_data.city.name}',
+				'message': (
+					f'{label} of {score["value"]}{unit} is {abs(score["departure"])}{unit} {direction} '
+					f'the normal of {score["normal"]}{unit} for this time of year '
+					f'(percentile {score["percentile"]}).'
+				),
+				'value': score['value'],
+				'threshold': score['normal'],
+				'metric': metric,
+				'z_score': z_score,
+			})
+		
+		return alerts
+	
 	def process_alerts_for_users(self, weather_data: WeatherData) -> int:
 		"""Process and send alerts to relevant users"""
 		alerts_sent = 0
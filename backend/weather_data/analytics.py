@@ -3,17 +3,31 @@ Weather Data Analytics and Monitoring Service
 """
 import logging
 from datetime import datetime, timedelta
+from django.core.paginator import Paginator
 from django.utils import timezone
-from django.db.models import Count, Avg, Max, Min, Q
+from django.db.models import Count, Max, Min, Q
 from django.core.cache import cache
 from collections import defaultdict
 import json
 
 from .models import City, WeatherData, AirQualityData
 from .cache_manager import WeatherCacheManager
+from .aggregation import bucket_range, combine_series, format_bucket, time_bucket_series
+from .report_sections import get_report_section
+from .rollups import get_bucketed_aggregates, merge_aggregates
 
 logger = logging.getLogger('weather247')
 
+# Rolled-up metrics behind the weather trends
+TREND_METRICS = ('temperature', 'humidity', 'pressure')
+
+
+FRESHNESS_STATUSES = ('very_fresh', 'fresh', 'stale', 'very_stale', 'no_data')
+
+
+def _round(value, digits=1):
+    return round(value, digits) if value is not None else None
+
 
 class WeatherAnalytics:
     """Service for generating weather data analytics"""
@@ -28,36 +42,27 @@ class WeatherAnalytics:
             end_time = timezone.now()
             start_time = end_time - timedelta(hours=hours)
             
-            # Get weather data requests in time period
-            weather_requests = WeatherData.objects.filter(
-                timestamp__gte=start_time,
-                timestamp__lte=end_time
+            # Requests per city and hour in one query
+            buckets = bucket_range(start_time, end_time, 'hour')
+            by_city = time_bucket_series(
+                WeatherData.objects.all(), {'requests': Count('id')},
+                start_time, end_time, bucket='hour', group_by=('city_id', 'city__name')
             )
             
-            # Calculate stats
-            total_requests = weather_requests.count()
-            unique_cities = weather_requests.values('city').distinct().count()
-            
-            # Requests per hour
-            hourly_stats = []
-            for i in range(hours):
-                hour_start = start_time + timedelta(hours=i)
-                hour_end = hour_start + timedelta(hours=1)
-                
-                hour_requests = weather_requests.filter(
-                    timestamp__gte=hour_start,
-                    timestamp__lt=hour_end
-                ).count()
-                
-                hourly_stats.append({
-                    'hour': hour_start.strftime('%Y-%m-%d %H:00'),
-                    'requests': hour_requests
-                })
+            hourly = combine_series(by_city.values(), {'requests': 'sum'}, buckets)
+            hourly_stats = [
+                {'hour': format_bucket(point['bucket'], 'hour'), 'requests': point['requests']}
+                for point in hourly
+            ]
+            total_requests = sum(point['requests'] for point in hourly)
+            unique_cities = len(by_city)
             
             # Top cities by requests
-            top_cities = weather_requests.values('city__name').annotate(
-                request_count=Count('id')
-            ).order_by('-request_count')[:10]
+            city_totals = [
+                {'city__name': city_name, 'request_count': sum(p['requests'] for p in points)}
+                for (_, city_name), points in by_city.items()
+            ]
+            top_cities = sorted(city_totals, key=lambda c: c['request_count'], reverse=True)[:10]
             
             stats = {
                 'period': f'Last {hours} hours',
@@ -89,11 +94,6 @@ class WeatherAnalytics:
             now = timezone.now()
             last_24h = now - timedelta(hours=24)
             
-            # Calculate cache effectiveness
-            recent_requests = WeatherData.objects.filter(
-                timestamp__gte=last_24h
-            ).count()
-            
             # Estimate cache hits vs misses based on request patterns
             # This is an approximation since we don't track actual cache hits
             estimated_cache_hits = 0
@@ -107,9 +107,11 @@ class WeatherAnalytics:
                 time_span=Max('timestamp') - Min('timestamp')
             )
             
+            recent_requests = 0
             for city_data in city_requests:
                 requests = city_data['request_count']
                 time_span = city_data['time_span']
+                recent_requests += requests
                 
                 if time_span and time_span.total_seconds() > 0:
                     # Estimate cache hits based on request frequency
@@ -148,80 +150,51 @@ class WeatherAnalytics:
             logger.error(f'Error generating cache performance stats: {e}')
             return {'error': str(e)}
     
-    def get_data_freshness_stats(self):
-        """Get weather data freshness monitoring"""
+    def get_data_freshness_stats(self, status=None, page=1, page_size=50):
+        """Get weather data freshness monitoring
+        
+        Summary counts cover every active city; ``city_details`` is one page
+        of cities (stalest last), optionally limited to a single ``status``.
+        """
         try:
             now = timezone.now()
             
             # Define freshness thresholds
-            very_fresh = now - timedelta(minutes=15)  # Very fresh
-            fresh = now - timedelta(minutes=30)       # Fresh
-            stale = now - timedelta(hours=2)          # Stale
-            very_stale = now - timedelta(hours=6)     # Very stale
-            
-            # Get all active cities
-            active_cities = City.objects.filter(is_active=True)
-            total_cities = active_cities.count()
+            thresholds = [
+                ('very_fresh', now - timedelta(minutes=15)),  # Very fresh
+                ('fresh', now - timedelta(minutes=30)),       # Fresh
+                ('stale', now - timedelta(hours=2)),          # Stale
+                ('very_stale', now - timedelta(hours=6)),     # Very stale
+            ]
+            
+            # Latest reading per active city in one grouped query
+            cities = list(
+                City.objects.filter(is_active=True).annotate(
+                    last_update=Max('weather_data__timestamp')
+                ).values('id', 'name', 'country', 'last_update')
+            )
+            total_cities = len(cities)
             
             # Categorize cities by data freshness
-            freshness_stats = {
-                'very_fresh': 0,    # < 15 min
-                'fresh': 0,         # 15-30 min
-                'stale': 0,         # 30 min - 2 hours
-                'very_stale': 0,    # 2-6 hours
-                'no_data': 0        # > 6 hours or no data
-            }
-            
-            city_details = []
-            
-            for city in active_cities:
-                latest_weather = WeatherData.objects.filter(
-                    city=city
-                ).order_by('-timestamp').first()
-                
-                if latest_weather:
-                    age = now - latest_weather.timestamp
-                    age_minutes = age.total_seconds() / 60
-                    
-                    if latest_weather.timestamp >= very_fresh:
-                        freshness_stats['very_fresh'] += 1
-                        status = 'very_fresh'
-                    elif latest_weather.timestamp >= fresh:
-                        freshness_stats['fresh'] += 1
-                        status = 'fresh'
-                    elif latest_weather.timestamp >= stale:
-                        freshness_stats['stale'] += 1
-                        status = 'stale'
-                    elif latest_weather.timestamp >= very_stale:
-                        freshness_stats['very_stale'] += 1
-                        status = 'very_stale'
-                    else:
-                        freshness_stats['no_data'] += 1
-                        status = 'no_data'
-                    
-                    city_details.append({
-                        'city': city.name,
-                        'country': city.country,
-                        'last_update': latest_weather.timestamp.isoformat(),
-                        'age_minutes': round(age_minutes, 1),
-                        'status': status,
-                        'temperature': latest_weather.temperature
-                    })
+            freshness_stats = {status_name: 0 for status_name in FRESHNESS_STATUSES}
+            
+            for city in cities:
+                last_update = city['last_update']
+                city['status'] = 'no_data'  # > 6 hours or no data
+                if last_update:
+                    city['age_minutes'] = round((now - last_update).total_seconds() / 60, 1)
+                    for status_name, threshold in thresholds:
+                        if last_update >= threshold:
+                            city['status'] = status_name
+                            break
                 else:
-                    freshness_stats['no_data'] += 1
-                    city_details.append({
-                        'city': city.name,
-                        'country': city.country,
-                        'last_update': None,
-                        'age_minutes': None,
-                        'status': 'no_data',
-                        'temperature': None
-                    })
+                    city['age_minutes'] = None
+                freshness_stats[city['status']] += 1
             
             # Calculate percentages
             freshness_percentages = {}
-            for status, count in freshness_stats.items():
-                freshness_percentages[status] = round(
+            for status_name, count in freshness_stats.items():
+                freshness_percentages[status_name] = round(
                     (count / total_cities * 100) if total_cities > 0 else 0, 1
                 )
             
@@ -234,13 +207,16 @@ class WeatherAnalytics:
                 freshness_stats['no_data'] * 0
             ) / total_cities if total_cities > 0 else 0
             
+            city_details, pagination = self._get_freshness_city_page(cities, status, page, page_size)
+            
             stats = {
                 'total_cities': total_cities,
                 'freshness_counts': freshness_stats,
                 'freshness_percentages': freshness_percentages,
                 'health_score': round(health_score, 1),
                 'health_status': self._get_health_status(health_score),
-                'city_details': sorted(city_details, key=lambda x: x['age_minutes'] or float('inf')),
+                'city_details': city_details,
+                'city_details_pagination': pagination,
                 'recommendations': self._get_freshness_recommendations(freshness_stats, total_cities),
                 'generated_at': timezone.now().isoformat()
             }
@@ -251,78 +227,117 @@ class WeatherAnalytics:
             logger.error(f'Error generating data freshness stats: {e}')
             return {'error': str(e)}
     
+    def _get_freshness_city_page(self, cities, status=None, page=1, page_size=50):
+        """One page of freshness details, with temperatures for that page only"""
+        if status:
+            cities = [city for city in cities if city['status'] == status]
+        cities = sorted(cities, key=lambda c: (c['age_minutes'] is None, c['age_minutes'] or 0, c['name']))
+        
+        paginator = Paginator(cities, page_size)
+        page_obj = paginator.get_page(page)
+        
+        # Latest readings are matched on (city, timestamp) in a single query
+        page_cities = [city for city in page_obj if city['last_update']]
+        temperatures = {}
+        if page_cities:
+            for city_id, timestamp, temperature in WeatherData.objects.filter(
+                city_id__in=[city['id'] for city in page_cities],
+                timestamp__in=[city['last_update'] for city in page_cities]
+            ).values_list('city_id', 'timestamp', 'temperature'):
+                temperatures[(city_id, timestamp)] = temperature
+        
+        details = [
+            {
+                'city_id': city['id'],
+                'city': city['name'],
+                'country': city['country'],
+                'last_update': city['last_update'].isoformat() if city['last_update'] else None,
+                'age_minutes': city['age_minutes'],
+                'status': city['status'],
+                'temperature': temperatures.get((city['id'], city['last_update']))
+            }
+            for city in page_obj
+        ]
+        pagination = {
+            'status': status,
+            'page': page_obj.number,
+            'page_size': page_size,
+            'total_pages': paginator.num_pages,
+            'count': paginator.count
+        }
+        return details, pagination
+    
     def get_weather_trends(self, days=7):
         """Get weather trends and patterns"""
         try:
             end_time = timezone.now()
             start_time = end_time - timedelta(days=days)
             
-            # Get weather data for the period
-            weather_data = WeatherData.objects.filter(
-                timestamp__gte=start_time,
-                timestamp__lte=end_time
+            # Daily running aggregates per city, merged from the hourly rollups
+            buckets = bucket_range(start_time, end_time, 'day')
+            by_series = get_bucketed_aggregates(
+                TREND_METRICS, start_time, end_time, bucket='day', subject_prefix='city:'
             )
             
-            if not weather_data.exists():
+            by_city = defaultdict(dict)
+            for (subject, metric), days_by_bucket in by_series.items():
+                by_city[int(subject.split(':', 1)[1])][metric] = days_by_bucket
+            
+            if not by_city:
                 return {'error': 'No weather data available for the specified period'}
             
-            # Overall statistics
-            overall_stats = weather_data.aggregate(
-                avg_temp=Avg('temperature'),
-                max_temp=Max('temperature'),
-                min_temp=Min('temperature'),
-                avg_humidity=Avg('humidity'),
-                avg_pressure=Avg('pressure')
-            )
+            def _merged(metric, day=None, city_ids=None):
+                return merge_aggregates(
+                    aggregate
+                    for city_id in (city_ids or by_city)
+                    for bucket_start, aggregate in by_city[city_id].get(metric, {}).items()
+                    if day is None or bucket_start == day
+                )
             
             # Daily trends
             daily_trends = []
-            for i in range(days):
-                day_start = start_time + timedelta(days=i)
-                day_end = day_start + timedelta(days=1)
-                
-                day_data = weather_data.filter(
-                    timestamp__gte=day_start,
-                    timestamp__lt=day_end
-                )
-                
-                if day_data.exists():
-                    day_stats = day_data.aggregate(
-                        avg_temp=Avg('temperature'),
-                        max_temp=Max('temperature'),
-                        min_temp=Min('temperature'),
-                        avg_humidity=Avg('humidity'),
-                        data_points=Count('id')
-                    )
-                    
-                    daily_trends.append({
-                        'date': day_start.strftime('%Y-%m-%d'),
-                        'avg_temperature': round(day_stats['avg_temp'] or 0, 1),
-                        'max_temperature': day_stats['max_temp'],
-                        'min_temperature': day_stats['min_temp'],
-                        'avg_humidity': round(day_stats['avg_humidity'] or 0, 1),
-                        'data_points': day_stats['data_points']
-                    })
+            for day in buckets:
+                temperature = _merged('temperature', day)
+                daily_trends.append({
+                    'date': format_bucket(day, 'day'),
+                    'avg_temperature': _round(temperature.mean),
+                    'max_temperature': temperature.max_value,
+                    'min_temperature': temperature.min_value,
+                    'avg_humidity': _round(_merged('humidity', day).mean),
+                    'p95_temperature': _round(temperature.quantile(0.95)),
+                    'data_points': temperature.count
+                })
+            
+            overall_temperature = _merged('temperature')
             
             # Top cities by data volume
-            city_stats = weather_data.values('city__name', 'city__country').annotate(
-                data_points=Count('id'),
-                avg_temp=Avg('temperature'),
-                temp_range=Max('temperature') - Min('temperature')
-            ).order_by('-data_points')[:10]
+            cities = City.objects.in_bulk(list(by_city))
+            city_stats = []
+            for city_id in by_city:
+                temperature = _merged('temperature', city_ids=[city_id])
+                city = cities.get(city_id)
+                city_stats.append({
+                    'city__name': city.name if city else None,
+                    'city__country': city.country if city else None,
+                    'data_points': temperature.count,
+                    'avg_temp': temperature.mean,
+                    'temp_range': temperature.max_value - temperature.min_value if temperature.count else None
+                })
+            city_stats.sort(key=lambda c: c['data_points'], reverse=True)
             
             trends = {
                 'period': f'Last {days} days',
-                'total_data_points': weather_data.count(),
+                'total_data_points': overall_temperature.count,
                 'overall_stats': {
-                    'avg_temperature': round(overall_stats['avg_temp'] or 0, 1),
-                    'max_temperature': overall_stats['max_temp'],
-                    'min_temperature': overall_stats['min_temp'],
-                    'avg_humidity': round(overall_stats['avg_humidity'] or 0, 1),
-                    'avg_pressure': round(overall_stats['avg_pressure'] or 0, 1)
+                    'avg_temperature': _round(overall_temperature.mean),
+                    'max_temperature': overall_temperature.max_value,
+                    'min_temperature': overall_temperature.min_value,
+                    'std_temperature': _round(overall_temperature.std),
+                    'avg_humidity': _round(_merged('humidity').mean),
+                    'avg_pressure': _round(_merged('pressure').mean)
                 },
                 'daily_trends': daily_trends,
-                'top_cities': list(city_stats),
+                'top_cities': city_stats[:10],
                 'generated_at': timezone.now().isoformat()
             }
             
@@ -415,10 +430,10 @@ class SystemHealthMonitor:
                 'metrics': {}
             }
             
-            # Get analytics data
-            api_stats = self.analytics.get_api_usage_stats(24)
-            cache_stats = self.analytics.get_cache_performance_stats()
-            freshness_stats = self.analytics.get_data_freshness_stats()
+            # Materialized report sections, recomputed only when stale
+            api_stats = get_report_section('api_usage')['data']
+            cache_stats = get_report_section('cache_performance')['data']
+            freshness_stats = get_report_section('data_freshness')['data']
             
             # Store metrics
             report['metrics'] = {
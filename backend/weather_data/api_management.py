@@ -4,6 +4,7 @@ API Integration Management System
 import logging
 import requests
 from datetime import datetime, timedelta
+from decimal import Decimal
 from django.utils import timezone
 from django.core.cache import cache
 from django.db import models
@@ -11,6 +12,8 @@ from django.conf import settings
 from typing import Dict, List, Optional, Any
 import json
 
+from .latency import add_latency, latency_quantiles, merge_latency
+
 logger = logging.getLogger('weather247')
 
 
@@ -136,6 +139,9 @@ class APIUsage(models.Model):
     # Performance metrics
     avg_response_time = models.FloatField(default=0.0)
     max_response_time = models.FloatField(default=0.0)
+    latency_sketch = models.JSONField(
+        default=dict, blank=True, help_text="Mergeable response time histogram (seconds)"
+    )
     
     # Cost tracking
     cost = models.DecimalField(max_digits=10, decimal_places=6, default=0.0)
@@ -146,6 +152,10 @@ class APIUsage(models.Model):
     
     class Meta:
         unique_together = ['provider', 'date', 'endpoint']
+        indexes = [
+            # Incremental exports read rows changed since a watermark
+            models.Index(fields=['updated_at', 'id']),
+        ]
         verbose_name = 'API Usage'
         verbose_name_plural = 'API Usage Records'
     
@@ -342,7 +352,7 @@ class APIIntegrationManager:
                 'error_count': 0,
                 'avg_response_time': 0.0,
                 'max_response_time': 0.0,
-                'cost': 0.0
+                'cost': Decimal('0')
             }
         )
         
@@ -363,6 +373,7 @@ class APIIntegrationManager:
             )
         
         usage.max_response_time = max(usage.max_response_time, response_time)
+        usage.latency_sketch = add_latency(usage.latency_sketch, response_time)
         
         # Update cost
         usage.cost += provider.cost_per_request
@@ -387,7 +398,10 @@ class APIIntegrationManager:
             total_success=models.Sum('success_count'),
             total_errors=models.Sum('error_count'),
             total_cost=models.Sum('cost'),
-            avg_response_time=models.Avg('avg_response_time'),
+            # Weighted by request count; an average of daily averages over-weights quiet days
+            weighted_response_time=models.Sum(
+                models.F('avg_response_time') * models.F('request_count'), output_field=models.FloatField()
+            ),
             max_response_time=models.Max('max_response_time')
         )
         
@@ -399,17 +413,30 @@ class APIIntegrationManager:
         if total_requests > 0:
             success_rate = ((total_requests - total_errors) / total_requests) * 100
         
-        # Get daily breakdown
+        # Get daily breakdown and merge the latency histograms per endpoint
         daily_usage = []
+        endpoint_sketches, endpoint_requests = {}, {}
         for record in usage_records.order_by('date'):
+            endpoint_sketches.setdefault(record.endpoint, []).append(record.latency_sketch)
+            endpoint_requests[record.endpoint] = endpoint_requests.get(record.endpoint, 0) + record.request_count
             daily_usage.append({
                 'date': record.date.isoformat(),
+                'endpoint': record.endpoint,
                 'requests': record.request_count,
                 'errors': record.error_count,
                 'cost': float(record.cost),
-                'avg_response_time': record.avg_response_time
+                'avg_response_time': record.avg_response_time,
+                **latency_quantiles(merge_latency([record.latency_sketch]))
             })
         
+        overall_latency = merge_latency(
+            sketch for sketches in endpoint_sketches.values() for sketch in sketches
+        )
+        endpoint_latency = {
+            endpoint: {'requests': endpoint_requests[endpoint], **latency_quantiles(merge_latency(sketches))}
+            for endpoint, sketches in endpoint_sketches.items()
+        }
+        
         # Get recent failover events
         recent_failovers = APIFailover.objects.filter(
             primary_provider=provider,
@@ -436,9 +463,12 @@ class APIIntegrationManager:
                 'total_errors': total_errors,
                 'success_rate': round(success_rate, 2),
                 'total_cost': float(stats['total_cost'] or 0),
-                'avg_response_time': round(stats['avg_response_time'] or 0, 3),
-                'max_response_time': round(stats['max_response_time'] or 0, 3)
+                'avg_response_time': round((stats['weighted_response_time'] or 0) / total_requests, 3)
+                if total_requests else 0,
+                'max_response_time': round(stats['max_response_time'] or 0, 3),
+                **{f'{name}_response_time': value for name, value in latency_quantiles(overall_latency).items()}
             },
+            'endpoint_latency': endpoint_latency,
             'daily_usage': daily_usage,
             'failover_events': recent_failovers,
             'health_status': {
@@ -0,0 +1,12 @@
+from django.urls import path
+from . import async_views
+
+# Async read path, mounted ahead of weather_data.urls when serving through ASGI
+urlpatterns = [
+    path('current/<int:city_id>/', async_views.get_current_weather, name='async-current-weather'),
+    path('current/', async_views.get_weather_by_city_name, name='async-weather-by-name'),
+    path('forecast/<int:city_id>/', async_views.get_forecast, name='async-weather-forecast'),
+    path('multiple/', async_views.get_multiple_cities_weather, name='async-multiple-cities'),
+    path('map-data/', async_views.get_weather_map_data, name='async-weather-map-data'),
+    path('live/', async_views.live_weather_stream, name='live-weather-stream'),
+]
@@ -0,0 +1,338 @@
+"""
+Native async views for the weather read path (served under ASGI)
+"""
+import asyncio
+import json
+import logging
+import math
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .async_weather_service import async_weather_manager
+from .live_updates import build_weather_payload, get_broker
+from .models import City, WeatherData
+from .serializers import WeatherDataSerializer, AirQualityDataSerializer, WeatherForecastSerializer
+from .sparse_fields import get_requested_fields, get_included_sections
+from .views import CITY_WEATHER_SECTIONS, _build_map_entry, _get_map_cities
+
+logger = logging.getLogger('weather247')
+
+
+def _get_drf_request(request):
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    return Request(request, authenticators=authenticators)
+
+
+@sync_to_async
+def get_throttle_wait(request):
+    """Apply the configured DRF throttles; return the wait in seconds when throttled"""
+    drf_request = _get_drf_request(request)
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not throttle.allow_request(drf_request, None):
+            return throttle.wait() or 0
+    return None
+
+
+def async_api_view(view):
+    """GET-only coroutine view with the same throttling as the DRF views"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+        try:
+            wait = await get_throttle_wait(request)
+        except APIException as e:
+            return JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+        if wait is not None:
+            response = JsonResponse(
+                {'detail': 'Request was throttled.'}, status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            response['Retry-After'] = str(math.ceil(wait))
+            return response
+
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _error(message, status_code):
+    return JsonResponse({'error': message}, status=status_code)
+
+
+def _data(payload, status_code=status.HTTP_200_OK):
+    # Serializer output (ReturnList) is not a dict, so disable the safe check
+    return JsonResponse(payload, status=status_code, safe=False)
+
+
+@sync_to_async
+def get_api_user(request):
+    """Authenticate with the configured DRF authenticators (token or session)"""
+    return _get_drf_request(request).user
+
+
+async def authenticated_user_or_error(request):
+    """Return (user, None) for authenticated requests, else (None, error response)"""
+    try:
+        user = await get_api_user(request)
+    except APIException as e:
+        return None, _error(str(e.detail), e.status_code)
+    if not user or not user.is_authenticated:
+        return None, _error('Authentication credentials were not provided.', status.HTTP_401_UNAUTHORIZED)
+    return user, None
+
+
+@async_api_view
+async def get_current_weather(request, city_id):
+    """Get current weather for a specific city"""
+    try:
+        city = await City.objects.filter(id=city_id).afirst()
+        if not city:
+            return _error('City not found', status.HTTP_404_NOT_FOUND)
+
+        fields = get_requested_fields(request)
+
+        # Try to get recent weather data (within last 30 minutes)
+        recent_weather = await WeatherData.objects.select_related('city').filter(
+            city=city,
+            timestamp__gte=timezone.now() - timedelta(minutes=30)
+        ).afirst()
+        if recent_weather:
+            return _data(WeatherDataSerializer(recent_weather, fields=fields).data)
+
+        weather_data = await async_weather_manager.get_current_weather_with_fallback(city.name, city.country)
+        if weather_data:
+            return _data(WeatherDataSerializer(weather_data, fields=fields).data)
+        return _error('Unable to fetch weather data', status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    except Exception as e:
+        logger.error(f"Error getting current weather: {e}")
+        return _error('Internal server error', status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view
+async def get_weather_by_city_name(request):
+    """Get current weather by city name (see the sync view for ?include=)"""
+    city_name = request.GET.get('city')
+    country = request.GET.get('country', '')
+
+    if not city_name:
+        return _error('City name is required', status.HTTP_400_BAD_REQUEST)
+
+    sections = get_included_sections(request, CITY_WEATHER_SECTIONS, default=('current',))
+
+    try:
+        response_data = {}
+        service = async_weather_manager.primary_service
+
+        weather_data = None
+        if sections & {'current', 'air_quality'}:
+            weather_data = await async_weather_manager.get_current_weather_with_fallback(city_name, country)
+            if not weather_data:
+                return _error('Unable to fetch weather data for this city', status.HTTP_404_NOT_FOUND)
+
+        async def _air_quality():
+            if 'air_quality' not in sections:
+                return None
+            return await service.get_air_quality(weather_data.city.latitude, weather_data.city.longitude)
+
+        async def _forecast():
+            if 'forecast' not in sections:
+                return None
+            return await service.get_forecast(city_name, country, 5)
+
+        # Air quality and forecast only depend on the city, so fetch them together
+        air_quality, forecast = await asyncio.gather(_air_quality(), _forecast())
+
+        if 'current' in sections:
+            response_data['current'] = WeatherDataSerializer(
+                weather_data, fields=get_requested_fields(request)
+            ).data
+        if 'air_quality' in sections:
+            response_data['air_quality'] = AirQualityDataSerializer(
+                air_quality, fields=get_requested_fields(request, 'air_quality')
+            ).data if air_quality else None
+        if 'forecast' in sections:
+            response_data['forecast'] = WeatherForecastSerializer(
+                forecast or [], many=True, fields=get_requested_fields(request, 'forecast')
+            ).data
+
+        if 'include' not in request.GET:
+            # Response shape predating ?include=
+            response_data.setdefault('air_quality', None)
+            response_data.setdefault('forecast', [])
+
+        return _data(response_data)
+
+    except Exception as e:
+        logger.error(f"Error getting weather by city name: {e}")
+        return _error('Internal server error', status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view
+async def get_forecast(request, city_id):
+    """Get weather forecast for a specific city"""
+    try:
+        city = await City.objects.filter(id=city_id).afirst()
+        if not city:
+            return _error('City not found', status.HTTP_404_NOT_FOUND)
+        days = int(request.GET.get('days', 5))
+
+        forecasts = await async_weather_manager.primary_service.get_forecast(city.name, city.country, days)
+        return _data(WeatherForecastSerializer(
+            forecasts, many=True, fields=get_requested_fields(request)
+        ).data)
+
+    except Exception as e:
+        logger.error(f"Error getting forecast: {e}")
+        return _error('Internal server error', status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view
+async def get_multiple_cities_weather(request):
+    """Get weather data for multiple cities, fetched concurrently"""
+    city_names = request.GET.get('cities', '').split(',')
+    city_names = [name.strip() for name in city_names if name.strip()][:10]  # Limit to 10 cities
+
+    if not city_names:
+        return _error('At least one city name is required', status.HTTP_400_BAD_REQUEST)
+
+    try:
+        fields = get_requested_fields(request)
+        weather = await asyncio.gather(*(
+            async_weather_manager.get_current_weather_with_fallback(name) for name in city_names
+        ))
+
+        results = [
+            {
+                'city': city_name,
+                'current': WeatherDataSerializer(weather_data, fields=fields).data,
+                'air_quality': None  # Temporarily disabled
+            }
+            for city_name, weather_data in zip(city_names, weather) if weather_data
+        ]
+        return _data({'cities': results})
+
+    except Exception as e:
+        logger.error(f"Error getting multiple cities weather: {e}")
+        return _error('Internal server error', status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view
+async def get_weather_map_data(request):
+    """Get weather data formatted for map visualization, fetched concurrently"""
+    try:
+        cities = _get_map_cities(request)
+        weather = await asyncio.gather(*(
+            async_weather_manager.get_comprehensive_weather(name, include=('air_quality',))
+            for name in cities
+        ), return_exceptions=True)
+
+        map_data = []
+        for city_name, weather_data in zip(cities, weather):
+            if isinstance(weather_data, Exception):
+                logger.error(f"Error getting map data for {city_name}: {weather_data}")
+                continue
+            if weather_data and weather_data['current']:
+                map_data.append(_build_map_entry(city_name, weather_data))
+
+        return _data({
+            'map_data': map_data,
+            'total_cities': len(map_data),
+            'generated_at': timezone.now().isoformat()
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting weather map data: {e}")
+        return _error('Internal server error', status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _latest_weather_payloads(city_ids):
+    """Latest reading per city as live payloads, in two queries"""
+    latest_ids = City.objects.filter(id__in=city_ids).annotate(
+        latest_id=Subquery(
+            WeatherData.objects.filter(city=OuterRef('pk')).order_by('-timestamp').values('id')[:1]
+        )
+    ).values_list('latest_id', flat=True)
+    latest_ids = [pk async for pk in latest_ids if pk is not None]
+    return [
+        build_weather_payload(weather_data)
+        async for weather_data in WeatherData.objects.select_related('city').filter(id__in=latest_ids)
+    ]
+
+
+async def _live_weather_events(subscription, city_ids, heartbeat, max_duration):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_duration
+    try:
+        yield "retry: 5000\n\n"
+        # Subscribed before reading the snapshot, so no update can fall between
+        # the two; deltas carry absolute values and are safe to apply twice
+        for payload in await _latest_weather_payloads(city_ids):
+            yield _sse_event('snapshot', payload)
+
+        # Django 4.2 does not notice clients that go away mid-stream, so streams
+        # are bounded and EventSource reconnects (with a fresh snapshot)
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                message = await subscription.get(timeout=min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if message is None:
+                # Fell behind; the client reconnects and gets a fresh snapshot
+                yield _sse_event('resync', {'reason': 'subscriber lagging'})
+                return
+            yield _sse_event('weather', message)
+    finally:
+        subscription.close()
+
+
+@async_api_view
+async def live_weather_stream(request):
+    """Server-Sent Events stream of weather changes for ?cities=<id>,<id>
+
+    Sends one ``snapshot`` event per city with its latest reading, then a
+    ``weather`` event carrying only the changed fields whenever a new reading
+    is ingested.
+    """
+    try:
+        city_ids = sorted({int(c) for c in request.GET.get('cities', '').split(',') if c.strip()})
+    except ValueError:
+        return _error('cities must be a comma separated list of city IDs', status.HTTP_400_BAD_REQUEST)
+
+    if not city_ids:
+        return _error('At least one city ID is required', status.HTTP_400_BAD_REQUEST)
+    max_cities = getattr(settings, 'LIVE_UPDATES_MAX_CITIES', 50)
+    if len(city_ids) > max_cities:
+        return _error(f'At most {max_cities} cities per stream', status.HTTP_400_BAD_REQUEST)
+
+    try:
+        subscription = await get_broker().subscribe(city_ids)
+    except Exception as e:
+        logger.error(f"Error subscribing to live weather updates: {e}")
+        return _error('Live updates unavailable', status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    heartbeat = getattr(settings, 'LIVE_UPDATES_HEARTBEAT_SECONDS', 15)
+    max_duration = getattr(settings, 'LIVE_UPDATES_MAX_STREAM_SECONDS', 300)
+    response = StreamingHttpResponse(
+        _live_weather_events(subscription, city_ids, heartbeat, max_duration),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
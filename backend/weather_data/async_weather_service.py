@@ -0,0 +1,246 @@
+"""
+Async weather provider client for the ASGI read path
+"""
+import asyncio
+import logging
+from datetime import timedelta
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .cache_manager import WeatherCacheManager
+from .models import WeatherData
+from .real_weather_service import OpenWeatherMapService
+
+logger = logging.getLogger('weather247')
+
+
+class AsyncOpenWeatherMapService:
+    """OpenWeatherMap client with non-blocking HTTP calls.
+
+    Upstream requests go through a pooled ``httpx.AsyncClient`` so a single
+    worker can wait on many providers at once. Parsing, persistence and demo
+    data are delegated to the sync ``OpenWeatherMapService`` helpers, run via
+    ``sync_to_async`` so the stored rows are identical on both paths.
+    """
+
+    def __init__(self, sync_service=None):
+        self.sync_service = sync_service or OpenWeatherMapService()
+        self.timeout = 10
+        self.max_connections = getattr(settings, 'ASYNC_PROVIDER_MAX_CONNECTIONS', 200)
+        self._client = None
+        self._client_loop = None
+
+    @property
+    def api_key(self):
+        return self.sync_service.api_key
+
+    @property
+    def is_demo(self):
+        return self.api_key == 'demo-key'
+
+    def get_client(self):
+        # Clients are bound to the loop that created them; under WSGI every
+        # async request runs in a fresh loop, under ASGI the client is reused
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections),
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def _get_json(self, url, params):
+        response = await self.get_client().get(url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def get_coordinates(self, city_name, country_code=''):
+        """Get coordinates for a city"""
+        if self.is_demo:
+            return self.sync_service.get_coordinates(city_name, country_code)
+
+        query = f"{city_name},{country_code}" if country_code else city_name
+        try:
+            data = await self._get_json(
+                f"{self.sync_service.geo_url}/direct",
+                {'q': query, 'limit': 1, 'appid': self.api_key}
+            )
+            if data:
+                return data[0]['lat'], data[0]['lon']
+            return None
+        except Exception as e:
+            logger.error(f"Error getting coordinates for {city_name}: {e}")
+            return None
+
+    async def get_current_weather(self, city_name, country_code=''):
+        """Get current weather data with caching"""
+        cache_key = WeatherCacheManager.get_weather_cache_key(city_name, country_code)
+        try:
+            if await WeatherCacheManager.aget_cache(cache_key):
+                recent_weather = await WeatherData.objects.select_related('city').filter(
+                    city__name__iexact=city_name,
+                    timestamp__gte=timezone.now() - timedelta(minutes=15)
+                ).afirst()
+                if recent_weather:
+                    logger.debug(f"Returning cached weather data for {city_name}")
+                    return recent_weather
+
+            if self.is_demo:
+                weather_data = await sync_to_async(self.sync_service._get_demo_weather)(city_name)
+            else:
+                coords = await self.get_coordinates(city_name, country_code)
+                if not coords:
+                    return None
+                lat, lon = coords
+                data = await self._get_json(
+                    f"{self.sync_service.base_url}/weather",
+                    {'lat': lat, 'lon': lon, 'appid': self.api_key, 'units': 'metric'}
+                )
+                weather_data = await sync_to_async(self.sync_service._save_current_weather)(
+                    city_name, country_code, lat, lon, data
+                )
+
+            if weather_data:
+                await WeatherCacheManager.aset_cache(cache_key, {
+                    'city_name': city_name,
+                    'country': country_code,
+                    'timestamp': weather_data.timestamp.isoformat(),
+                    'temperature': weather_data.temperature,
+                    'weather_condition': weather_data.weather_condition
+                }, 'current_weather')
+
+            return weather_data
+
+        except Exception as e:
+            logger.error(f"Error getting current weather for {city_name}: {e}")
+            return await sync_to_async(self.sync_service._get_demo_weather)(city_name)
+
+    async def get_air_quality(self, lat, lon):
+        """Get air quality data"""
+        try:
+            if self.is_demo:
+                return await sync_to_async(self.sync_service._get_demo_air_quality)(lat, lon)
+
+            data = await self._get_json(
+                f"{self.sync_service.base_url}/air_pollution",
+                {'lat': lat, 'lon': lon, 'appid': self.api_key}
+            )
+            return await sync_to_async(self.sync_service._save_air_quality)(lat, lon, data)
+
+        except Exception as e:
+            logger.error(f"Error getting air quality for {lat}, {lon}: {e}")
+            return await sync_to_async(self.sync_service._get_demo_air_quality)(lat, lon)
+
+    async def get_forecast(self, city_name, country_code='', days=5):
+        """Get weather forecast"""
+        try:
+            if self.is_demo:
+                return await sync_to_async(self.sync_service._get_demo_forecast)(city_name, days)
+
+            coords = await self.get_coordinates(city_name, country_code)
+            if not coords:
+                return []
+            lat, lon = coords
+
+            data = await self._get_json(
+                f"{self.sync_service.base_url}/forecast",
+                {'lat': lat, 'lon': lon, 'appid': self.api_key, 'units': 'metric'}
+            )
+            return await sync_to_async(self.sync_service._save_forecast)(city_name, days, data)
+
+        except Exception as e:
+            logger.error(f"Error getting forecast for {city_name}: {e}")
+            return await sync_to_async(self.sync_service._get_demo_forecast)(city_name, days)
+
+
+class AsyncWeatherManager:
+    """Async counterpart of WeatherManager with concurrent section fetches"""
+
+    def __init__(self):
+        self.primary_service = AsyncOpenWeatherMapService()
+        self.fallback_services = []
+        self.max_retries = 3
+        self.retry_delay = 1  # seconds
+
+    async def get_current_weather_with_fallback(self, city_name, country_code=''):
+        """Get current weather with fallback and retry logic"""
+        services = [self.primary_service] + self.fallback_services
+        last_error = None
+
+        for service_index, service in enumerate(services):
+            for attempt in range(self.max_retries):
+                try:
+                    weather_data = await service.get_current_weather(city_name, country_code)
+                    if weather_data:
+                        return weather_data
+                except Exception as e:
+                    last_error = e
+                    logger.warning(f"Service {service_index + 1} attempt {attempt + 1} failed for {city_name}: {e}")
+                    if attempt < self.max_retries - 1:
+                        await asyncio.sleep(self.retry_delay * (attempt + 1))
+
+        logger.error(f"All weather services failed for {city_name}. Last error: {last_error}")
+
+        # Stale database row as last resort
+        recent_weather = await WeatherData.objects.select_related('city').filter(
+            city__name__iexact=city_name
+        ).order_by('-timestamp').afirst()
+        if recent_weather:
+            logger.info(f"Returning stale weather data for {city_name}")
+            return recent_weather
+
+        # Demo fallback, matching WeatherManager
+        try:
+            return await sync_to_async(self.primary_service.sync_service._get_demo_weather)(city_name)
+        except Exception:
+            return None
+
+    async def get_comprehensive_weather(self, city_name, country_code='', include=None):
+        """Get current weather plus the requested extra sections, fetched concurrently"""
+        if include is None:
+            include = ('air_quality', 'forecast')
+        try:
+            current_weather = await self.get_current_weather_with_fallback(city_name, country_code)
+            if not current_weather:
+                logger.error(f"Could not get current weather for {city_name}")
+                return None
+
+            async def _air_quality():
+                if 'air_quality' not in include:
+                    return None
+                return await self.primary_service.get_air_quality(
+                    current_weather.city.latitude, current_weather.city.longitude
+                )
+
+            async def _forecast():
+                if 'forecast' not in include:
+                    return []
+                return await self.primary_service.get_forecast(city_name, country_code, 5)
+
+            air_quality, forecast = await asyncio.gather(
+                _air_quality(), _forecast(), return_exceptions=True
+            )
+            if isinstance(air_quality, Exception):
+                logger.warning(f"Air quality data unavailable for {city_name}: {air_quality}")
+                air_quality = None
+            if isinstance(forecast, Exception):
+                logger.warning(f"Forecast data unavailable for {city_name}: {forecast}")
+                forecast = []
+
+            return {
+                'current': current_weather,
+                'air_quality': air_quality,
+                'forecast': forecast or []
+            }
+
+        except Exception as e:
+            logger.error(f"Error getting comprehensive weather for {city_name}: {e}")
+            return None
+
+
+# Global instance
+async_weather_manager = AsyncWeatherManager()
@@ -0,0 +1,203 @@
+"""
+Backtesting of stored predictions against the readings that followed
+
+Every ``WeatherPrediction`` whose hour has passed is matched to its city's
+readings of that hour: the mean of the readings within half an hour of
+it, fetched with one bucketed query per day. Errors are reduced per city,
+model version, metric, horizon and day into ``PredictionAccuracy`` rows of
+sums (count, absolute, squared, signed), so MAE, RMSE and bias over any
+window are one aggregate query.
+
+Runs are incremental: each recomputes the days from the latest one already
+stored (it may have been partial) up to the last hour whose readings are
+in. Summaries are cached until the next run.
+"""
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, DateTimeField, ExpressionWrapper, F, Max, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .cache_manager import WeatherCacheManager
+from .models import PredictionAccuracy, WeatherData, WeatherPrediction
+
+logger = logging.getLogger('weather247')
+
+# Predicted column of each backtested metric
+BACKTEST_METRICS = {
+    'temperature': 'predicted_temperature',
+    'humidity': 'predicted_humidity',
+    'pressure': 'predicted_pressure',
+    'wind_speed': 'predicted_wind_speed',
+}
+# Readings this close to a predicted hour are its actual value
+MATCH_WINDOW = timedelta(minutes=30)
+DEFAULT_BACKTEST_DAYS = 30
+VERSION_KEY = 'backtest:version'
+
+_SUMS = ('count', 'abs_error_sum', 'squared_error_sum', 'error_sum')
+
+
+def _hour_index(values):
+    # Whole hours since the epoch, rounded to the nearest hour
+    return np.floor((np.asarray(values, dtype=np.float64) + 1800) / 3600).astype(np.int64)
+
+
+def _predictions(start, end):
+    """Predicted hours in ``[start, end)`` as arrays: city, version, hour, horizon and one per metric"""
+    # Selected by the hour they round to, so every row falls in the day being evaluated
+    rows = list(WeatherPrediction.objects.filter(
+        prediction_date__gte=start - MATCH_WINDOW, prediction_date__lt=end - MATCH_WINDOW
+    ).values_list(
+        'city_id', 'model_version', 'prediction_date', 'issued_at', *BACKTEST_METRICS.values()
+    ))
+    if not rows:
+        return None
+    city_ids, versions, dates, issued, *values = zip(*rows)
+    predicted_at = np.array([d.timestamp() for d in dates])
+    issued_at = np.array([i.timestamp() for i in issued])
+    return {
+        'city_id': np.array(city_ids, dtype=np.int64),
+        'model_version': np.array(versions, dtype=object),
+        'hour': _hour_index(predicted_at),
+        'horizon': np.maximum(np.ceil((predicted_at - issued_at) / 3600), 1).astype(np.int64),
+        **{metric: np.array(column, dtype=np.float64) for metric, column in zip(BACKTEST_METRICS, values)},
+    }
+
+
+def _actuals(city_ids, start, end):
+    """``{(city_id, hour index): {metric: mean}}`` of the readings around each hour in ``[start, end)``"""
+    rows = WeatherData.objects.filter(
+        city_id__in=city_ids, timestamp__gte=start - MATCH_WINDOW, timestamp__lt=end + MATCH_WINDOW
+    ).annotate(
+        hour=TruncHour(ExpressionWrapper(F('timestamp') + MATCH_WINDOW, output_field=DateTimeField()))
+    ).order_by().values('city_id', 'hour').annotate(**{
+        metric: Avg(metric) for metric in BACKTEST_METRICS
+    })
+    return {(row['city_id'], int(row['hour'].timestamp() // 3600)): row for row in rows}
+
+
+def evaluate(start, end):
+    """``{(city_id, model_version, metric, horizon, date): [count, abs, squared, signed error sums]}``"""
+    predictions = _predictions(start, end)
+    if predictions is None:
+        return {}
+    actuals = _actuals(sorted(set(predictions['city_id'].tolist())), start, end)
+
+    # Actual value of each predicted hour (NaN where the city has no readings)
+    found = [actuals.get(key) for key in zip(predictions['city_id'].tolist(), predictions['hour'].tolist())]
+    dates = (predictions['hour'] // 24).astype('datetime64[D]').astype(object)
+
+    results = {}
+    for metric in BACKTEST_METRICS:
+        actual = np.array([np.nan if row is None or row[metric] is None else row[metric] for row in found])
+        errors = predictions[metric] - actual
+        matched = ~np.isnan(errors)
+        if not matched.any():
+            continue
+
+        # Group the matched errors and reduce each group with bincount
+        keys = list(zip(
+            predictions['city_id'][matched].tolist(), predictions['model_version'][matched].tolist(),
+            predictions['horizon'][matched].tolist(), dates[matched].tolist(),
+        ))
+        groups = {key: index for index, key in enumerate(dict.fromkeys(keys))}
+        codes = np.fromiter((groups[key] for key in keys), dtype=np.int64, count=len(keys))
+        errors = errors[matched]
+        sums = (
+            np.bincount(codes, minlength=len(groups)),
+            np.bincount(codes, np.abs(errors), len(groups)),
+            np.bincount(codes, errors ** 2, len(groups)),
+            np.bincount(codes, errors, len(groups)),
+        )
+        for (city_id, version, horizon, date), index in groups.items():
+            results[(city_id, version, metric, horizon, date)] = [float(s[index]) for s in sums]
+    return results
+
+
+def get_backtest_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def run_backtest(days=DEFAULT_BACKTEST_DAYS, full=False, now=None):
+    """Evaluate the predictions of the days not yet (fully) evaluated; ``full`` redoes the last ``days``"""
+    started_at = time.monotonic()
+    now = now or timezone.now()
+    # Hours whose matching readings are all in
+    end = now - MATCH_WINDOW
+
+    latest = None if full else PredictionAccuracy.objects.aggregate(latest=Max('date'))['latest']
+    first_day = latest if latest is not None else (now - timedelta(days=days)).date()
+    tz = timezone.get_current_timezone()
+
+    rows, matched, day = [], 0, first_day
+    while day <= end.date():
+        day_from = datetime.combine(day, datetime.min.time(), tzinfo=tz)
+        for (city_id, version, metric, horizon, date), sums in evaluate(
+            day_from, min(day_from + timedelta(days=1), end)
+        ).items():
+            matched += int(sums[0])
+            rows.append(PredictionAccuracy(
+                city_id=city_id, model_version=version, metric=metric, horizon_hours=horizon, date=date,
+                **dict(zip(_SUMS, sums))
+            ))
+        day += timedelta(days=1)
+
+    with transaction.atomic():
+        # Days are recomputed whole, so their previous rows are replaced
+        PredictionAccuracy.objects.filter(date__gte=first_day).delete()
+        PredictionAccuracy.objects.bulk_create(rows, batch_size=1000)
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+    summary = {
+        'first_day': first_day.isoformat(),
+        'rows': len(rows),
+        'errors_matched': matched,
+        'elapsed_seconds': round(time.monotonic() - started_at, 2),
+    }
+    logger.info(
+        f"Backtest from {summary['first_day']}: {matched} errors in {len(rows)} rows in {summary['elapsed_seconds']}s"
+    )
+    return summary
+
+
+def accuracy_summary(metric='temperature', days=DEFAULT_BACKTEST_DAYS, group_by=('model_version',),
+                     city_ids=None, model_versions=None):
+    """MAE, RMSE and bias per ``group_by`` over the last ``days``, from one aggregate query (cached)"""
+    group_by = tuple(group_by)
+    scope = ['all' if values is None else ','.join(sorted(map(str, values))) for values in (city_ids, model_versions)]
+    cache_key = f"backtest:summary:{get_backtest_version()}:{metric}:{days}:{','.join(group_by)}:{':'.join(scope)}"
+    summary = cache.get(cache_key)
+    if summary is not None:
+        return summary
+
+    rows = PredictionAccuracy.objects.filter(metric=metric, date__gte=timezone.now().date() - timedelta(days=days))
+    if city_ids is not None:
+        rows = rows.filter(city_id__in=city_ids)
+    if model_versions is not None:
+        rows = rows.filter(model_version__in=model_versions)
+
+    summary = []
+    for row in rows.order_by(*group_by).values(*group_by).annotate(**{
+        f'total_{name}': Sum(name) for name in _SUMS
+    }):
+        count = row['total_count']
+        summary.append({
+            **{field: row[field] for field in group_by},
+            'count': count,
+            'mae': round(row['total_abs_error_sum'] / count, 3),
+            'rmse': round((row['total_squared_error_sum'] / count) ** 0.5, 3),
+            'bias': round(row['total_error_sum'] / count, 3),
+        })
+    cache.set(cache_key, summary, WeatherCacheManager.CACHE_TTL['backtest'])
+    return summary
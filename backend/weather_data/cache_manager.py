@@ -3,6 +3,9 @@ Redis caching system for Weather247
 """
 import json
 import logging
+import time
+import uuid
+from contextlib import contextmanager
 from typing import Any, Optional, Dict, List
 from datetime import timedelta
 from django.core.cache import cache
@@ -11,6 +14,11 @@ import hashlib
 
 logger = logging.getLogger('weather247')
 
+# Per-key locks around read-modify-write of shared cache entries: held at
+# most LOCK_TIMEOUT seconds, waited for at most LOCK_WAIT seconds
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 1.0
+
 
 class WeatherCacheManager:
     """Manages caching for weather data with intelligent TTL and key strategies"""
@@ -23,6 +31,14 @@ class WeatherCacheManager:
         'city_list': 86400,          # 24 hours
         'historical': 604800,        # 1 week
         'analytics': 3600,           # 1 hour
+        'comparison': 900,           # 15 minutes (keys roll over with each bucket)
+        'report_section': 86400,     # 24 hours (sections refresh on their own cadence)
+        'climatology': 604800,       # 1 week (rebuilt weekly, versioned)
+        'model_registry': 3600,      # 1 hour (dropped when a version is published)
+        'predictions': 3600,         # 1 hour (keys change with each reading, model and hour)
+        'feature_store': 86400,      # 24 hours (appended on ingest, reloaded when missing)
+        'online_models': 604800,     # 1 week (updated on ingest, replayed when missing)
+        'backtest': 3600,            # 1 hour (versioned, replaced by each backtest run)
         'user_preferences': 86400,   # 24 hours
         'api_response': 300,         # 5 minutes
     }
@@ -130,6 +146,80 @@ class WeatherCacheManager:
             logger.error(f"Cache get error for key {key}: {e}")
             return None
     
+    @classmethod
+    def get_many_cache(cls, keys: List[str]) -> Dict[str, Any]:
+        """Get several entries in a single round-trip (missing keys are left out)"""
+        try:
+            found = cache.get_many(keys)
+            for key, data in found.items():
+                if isinstance(data, str):
+                    try:
+                        found[key] = json.loads(data)
+                    except (json.JSONDecodeError, TypeError):
+                        pass
+            logger.debug(f"Cache get_many: {len(found)}/{len(keys)} hits")
+            return found
+            
+        except Exception as e:
+            logger.error(f"Cache get_many error for {len(keys)} keys: {e}")
+            return {}
+    
+    @classmethod
+    def set_many_cache(cls, items: Dict[str, Any], cache_type: str = 'current_weather') -> bool:
+        """Set several entries of one cache type in a single round-trip"""
+        try:
+            ttl = cls.CACHE_TTL.get(cache_type, cls.CACHE_TTL['current_weather'])
+            
+            cache.set_many({
+                key: data if isinstance(data, str) else json.dumps(data, default=str)
+                for key, data in items.items()
+            }, ttl)
+            logger.debug(f"Cache set: {len(items)} {cache_type} entries (TTL: {ttl}s)")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Cache set_many error for {len(items)} {cache_type} entries: {e}")
+            return False
+    
+    @classmethod
+    async def aset_cache(cls, key: str, data: Any, cache_type: str = 'current_weather') -> bool:
+        """Async counterpart of set_cache for the ASGI read path"""
+        try:
+            ttl = cls.CACHE_TTL.get(cache_type, cls.CACHE_TTL['current_weather'])
+            
+            if not isinstance(data, str):
+                data = json.dumps(data, default=str)
+            
+            await cache.aset(key, data, ttl)
+            logger.debug(f"Cache set: {key} (TTL: {ttl}s)")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Cache set error for key {key}: {e}")
+            return False
+    
+    @classmethod
+    async def aget_cache(cls, key: str) -> Optional[Any]:
+        """Async counterpart of get_cache for the ASGI read path"""
+        try:
+            data = await cache.aget(key)
+            if data is None:
+                logger.debug(f"Cache miss: {key}")
+                return None
+            
+            if isinstance(data, str):
+                try:
+                    data = json.loads(data)
+                except (json.JSONDecodeError, TypeError):
+                    pass
+            
+            logger.debug(f"Cache hit: {key}")
+            return data
+            
+        except Exception as e:
+            logger.error(f"Cache get error for key {key}: {e}")
+            return None
+    
     @classmethod
     def delete_cache(cls, key: str) -> bool:
         """Delete data from cache"""
@@ -237,6 +327,24 @@ class CacheDecorator:
         return decorator
 
 
+@contextmanager
+def cache_lock(key: str, timeout: int = LOCK_TIMEOUT, wait: float = LOCK_WAIT):
+    """Lock ``key`` across processes with ``cache.add``; yields whether it was acquired within ``wait`` seconds"""
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    acquired = cache.add(lock_key, token, timeout)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.01)
+        acquired = cache.add(lock_key, token, timeout)
+    try:
+        yield acquired
+    finally:
+        # Left alone if it expired and another process holds it now
+        if acquired and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
 # Convenience functions for common caching operations
 def cache_weather_data(city_name: str, weather_data: Dict[str, Any]) -> bool:
     """Cache current weather data"""
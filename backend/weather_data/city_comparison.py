@@ -0,0 +1,228 @@
+"""
+Multi-city comparison on aligned time series
+
+The hourly rollups of every compared city are loaded with one query and
+resampled onto a shared bucket grid, giving a cities x buckets matrix per
+metric (NaN where a city has no data). Deltas, correlations and rankings
+are computed on the whole matrix at once, and results are cached per city
+set, metrics, bucket size and window.
+"""
+import logging
+import warnings
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .aggregation import BUCKET_LABELS, BUCKETS, bucket_range, truncate
+from .cache_manager import WeatherCacheManager
+from .models import MetricRollup
+from .rollups import WEATHER_ROLLUP_METRICS, city_subject
+
+logger = logging.getLogger('weather247')
+
+MAX_COMPARISON_CITIES = 10
+MAX_COMPARISON_HOURS = 24 * 90
+COMPARISON_BUCKETS = ('hour', 'day')
+# Shared buckets a pair of cities needs before it gets a correlation
+MIN_OVERLAP = 3
+
+
+class AlignedSeries:
+    """Per-metric cities x buckets matrices of bucket means on a shared grid"""
+
+    def __init__(self, city_ids, buckets, matrices):
+        self.city_ids = list(city_ids)
+        self.buckets = buckets
+        self.matrices = matrices
+
+    def __getitem__(self, metric):
+        return self.matrices[metric]
+
+    @classmethod
+    def load(cls, city_ids, metrics, start, end, bucket='hour'):
+        """Resample the hourly rollups of ``city_ids`` onto ``bucket``-sized steps, in one query"""
+        buckets = bucket_range(start, end, bucket)
+        edges = np.array([b.timestamp() for b in buckets])
+        subjects = {city_subject(city_id): index for index, city_id in enumerate(city_ids)}
+        metric_index = {metric: index for index, metric in enumerate(metrics)}
+
+        rows = list(MetricRollup.objects.filter(
+            subject__in=list(subjects), metric__in=list(metrics), count__gt=0,
+            bucket_start__gte=truncate(start, 'hour'), bucket_start__lt=buckets[-1] + BUCKETS[bucket][1],
+        ).values_list('subject', 'metric', 'bucket_start', 'count', 'total'))
+
+        shape = (len(metrics), len(city_ids), len(buckets))
+        counts, totals = np.zeros(shape), np.zeros(shape)
+        if rows:
+            subject, metric, bucket_start, count, total = zip(*rows)
+            position = np.searchsorted(edges, [b.timestamp() for b in bucket_start], side='right') - 1
+            inside = position >= 0
+            index = (
+                np.array([metric_index[m] for m in metric])[inside],
+                np.array([subjects[s] for s in subject])[inside],
+                position[inside],
+            )
+            # Count-weighted, so a day bucket is the mean of its readings, not of its hours
+            np.add.at(counts, index, np.array(count, dtype=float)[inside])
+            np.add.at(totals, index, np.array(total, dtype=float)[inside])
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = totals / counts
+        return cls(city_ids, buckets, {metric: means[i] for metric, i in metric_index.items()})
+
+
+def _nan_stat(func, *args, **kwargs):
+    # All-NaN rows (cities without data) legitimately produce NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return func(*args, **kwargs)
+
+
+def pairwise_deltas(matrix):
+    """``deltas[i, j]``: mean of city i minus city j over the buckets both have"""
+    return _nan_stat(np.nanmean, matrix[:, None, :] - matrix[None, :, :], axis=2)
+
+
+def pairwise_correlations(matrix, min_overlap=MIN_OVERLAP):
+    """Pearson correlation of every pair of rows over the buckets both have (NaN below ``min_overlap``)"""
+    valid = ~np.isnan(matrix)
+    x = np.where(valid, matrix, 0.0)
+    v = valid.astype(float)
+
+    # Sums restricted to the buckets shared by each pair, as matrix products
+    n = v @ v.T
+    sum_x = x @ v.T             # sum of row i over buckets shared with j
+    sum_xx = (x * x) @ v.T
+    sum_xy = x @ x.T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sum_xy - sum_x * sum_x.T / n
+        var = sum_xx - sum_x ** 2 / n
+        corr = cov / np.sqrt(var * var.T)
+    corr[n < min_overlap] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def bucket_extremes(matrix):
+    """How many buckets each row was the highest and the lowest in (buckets with no data skipped)"""
+    covered = ~np.isnan(matrix).all(axis=0)
+    columns = matrix[:, covered]
+    size = matrix.shape[0]
+    if not columns.size:
+        return np.zeros(size, dtype=int), np.zeros(size, dtype=int)
+    highest = np.bincount(np.nanargmax(columns, axis=0), minlength=size)
+    lowest = np.bincount(np.nanargmin(columns, axis=0), minlength=size)
+    return highest, lowest
+
+
+def _value(value, digits=2):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def _pairs(labels, matrix, digits=2):
+    return {
+        a: {b: _value(matrix[i, j], digits) for j, b in enumerate(labels) if i != j}
+        for i, a in enumerate(labels)
+    }
+
+
+def _latest(matrix):
+    """Last non-NaN value of each row"""
+    valid = ~np.isnan(matrix)
+    last = matrix.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    return np.where(valid.any(axis=1), matrix[np.arange(matrix.shape[0]), last], np.nan)
+
+
+def compare_metric(labels, matrix):
+    """Summary, ranking, pairwise deltas and correlations of one metric's cities x buckets matrix"""
+    means = _nan_stat(np.nanmean, matrix, axis=1)
+    minimums = _nan_stat(np.nanmin, matrix, axis=1)
+    maximums = _nan_stat(np.nanmax, matrix, axis=1)
+    latest = _latest(matrix)
+    coverage = (~np.isnan(matrix)).mean(axis=1) if matrix.shape[1] else np.zeros(len(labels))
+    highest, lowest = bucket_extremes(matrix)
+
+    ranked = [i for i in np.argsort(-np.nan_to_num(means, nan=-np.inf), kind='stable') if not np.isnan(means[i])]
+    return {
+        'summary': {
+            label: {
+                'mean': _value(means[i]),
+                'min': _value(minimums[i]),
+                'max': _value(maximums[i]),
+                'latest': _value(latest[i]),
+                'coverage': round(float(coverage[i]), 3),
+                'times_highest': int(highest[i]),
+                'times_lowest': int(lowest[i]),
+            } for i, label in enumerate(labels)
+        },
+        'ranking': [labels[i] for i in ranked],
+        'range': _value(means[ranked[0]] - means[ranked[-1]]) if ranked else None,
+        'deltas': _pairs(labels, pairwise_deltas(matrix)),
+        'correlations': _pairs(labels, pairwise_correlations(matrix), digits=3),
+    }
+
+
+def city_labels(cities):
+    """City names, with the country added where two compared cities share a name"""
+    names = [city['name'] for city in cities]
+    return [
+        city['name'] if names.count(city['name']) == 1 else f"{city['name']}, {city['country']}"
+        for city in cities
+    ]
+
+
+def comparison_cache_key(city_ids, metrics, bucket, hours, end):
+    cities = '-'.join(str(city_id) for city_id in sorted(city_ids))
+    # The current bucket is part of the key, so the window slides with the clock
+    return f"comparison:{cities}:{','.join(metrics)}:{bucket}:{hours}h:{int(end.timestamp())}"
+
+
+def compare_cities_series(cities, metrics=WEATHER_ROLLUP_METRICS, hours=168, bucket='hour',
+                          include_series=False, use_cache=True):
+    """Compare ``cities`` (dicts with ``id``, ``name`` and ``country``) over the last ``hours``"""
+    if bucket not in COMPARISON_BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(COMPARISON_BUCKETS)}")
+    unknown = set(metrics) - set(WEATHER_ROLLUP_METRICS)
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(sorted(unknown))}")
+    # Keyed by the city set, so results list cities in id order whatever the request order
+    cities = sorted({city['id']: city for city in cities}.values(), key=lambda city: city['id'])
+    cities = cities[:MAX_COMPARISON_CITIES]
+    hours = max(1, min(hours, MAX_COMPARISON_HOURS))
+    metrics = tuple(m for m in WEATHER_ROLLUP_METRICS if m in metrics)
+
+    end = truncate(timezone.now(), bucket)
+    start = end - timedelta(hours=hours)
+    city_ids = [city['id'] for city in cities]
+    cache_key = comparison_cache_key(city_ids, metrics, bucket, hours, end)
+    cache_key += ':series' if include_series else ''
+    if use_cache:
+        cached = WeatherCacheManager.get_cache(cache_key)
+        if cached is not None:
+            return cached
+
+    series = AlignedSeries.load(city_ids, metrics, start, end, bucket)
+    labels = city_labels(cities)
+    result = {
+        'cities': [dict(label=label, id=city['id'], name=city['name'], country=city['country'])
+                   for label, city in zip(labels, cities)],
+        'window': {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'bucket': bucket,
+            'buckets': len(series.buckets),
+        },
+        'metrics': {metric: compare_metric(labels, series[metric]) for metric in metrics},
+        'generated_at': timezone.now().isoformat(),
+    }
+    if include_series:
+        result['series'] = {
+            'buckets': [b.strftime(BUCKET_LABELS[bucket]) for b in series.buckets],
+            **{
+                metric: {label: [_value(v) for v in row] for label, row in zip(labels, series[metric])}
+                for metric in metrics
+            },
+        }
+
+    WeatherCacheManager.set_cache(cache_key, result, 'comparison')
+    return result
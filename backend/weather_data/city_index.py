@@ -0,0 +1,226 @@
+"""
+In-memory city index for listing and autocomplete
+"""
+import bisect
+import logging
+import threading
+import unicodedata
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from .cache_manager import WeatherCacheManager
+from .models import City
+
+logger = logging.getLogger('weather247')
+
+VERSION_KEY = 'city:index:version'
+FUZZY_THRESHOLD = 0.3
+SEARCH_MEMO_SIZE = 1024
+
+# Result ranks, best first
+RANK_EXACT, RANK_PREFIX, RANK_WORD_PREFIX, RANK_COUNTRY, RANK_SUBSTRING, RANK_FUZZY = range(6)
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse whitespace"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.lower().split())
+
+
+def trigrams(text):
+    """Contiguous three-character chunks of ``text``"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def word_trigrams(text):
+    """Trigrams of each word padded like pg_trgm, so short words still match"""
+    grams = set()
+    for word in text.split():
+        grams |= trigrams(f'  {word} ')
+    return grams
+
+
+class CityIndex:
+    """Prefix, substring (trigram) and fuzzy lookups over active cities.
+
+    Built from plain serialized city dicts so the same data can be shared
+    between workers through the cache and rebuilt cheaply in each process.
+    """
+
+    def __init__(self, cities, all_names=()):
+        self.cities = sorted(cities, key=lambda c: c['id'])
+        self.by_id = {c['id']: c for c in self.cities}
+        self.all_names = frozenset(normalize(name) for name in all_names)
+
+        self._names = {}
+        self._name_prefixes = []
+        self._word_prefixes = []
+        self._country_prefixes = []
+        self._substring_postings = defaultdict(set)
+        self._fuzzy_postings = defaultdict(set)
+        self._fuzzy_sizes = {}
+
+        for city in self.cities:
+            city_id = city['id']
+            name = normalize(city['name'])
+            country = normalize(city['country'])
+            self._names[city_id] = name
+
+            self._name_prefixes.append((name, city_id))
+            for word in name.split()[1:]:
+                self._word_prefixes.append((word, city_id))
+            self._country_prefixes.append((country, city_id))
+
+            for gram in trigrams(name):
+                self._substring_postings[gram].add(city_id)
+            grams = word_trigrams(f'{name} {country}')
+            self._fuzzy_sizes[city_id] = len(grams)
+            for gram in grams:
+                self._fuzzy_postings[gram].add(city_id)
+
+        self._name_prefixes.sort()
+        self._word_prefixes.sort()
+        self._country_prefixes.sort()
+
+        self._memo = {}
+        self._memo_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.cities)
+
+    def has_name(self, name):
+        """Whether any city (active or not) has this name, ignoring case"""
+        return normalize(name) in self.all_names
+
+    def find(self, name):
+        """Active city with exactly this name (ignoring case and accents), lowest id first; ``None`` if none"""
+        name = normalize(name)
+        matches = [city_id for key, city_id in self._prefix_matches(self._name_prefixes, name) if key == name]
+        return self.by_id[min(matches)] if matches else None
+
+    @staticmethod
+    def _prefix_matches(entries, prefix):
+        start = bisect.bisect_left(entries, (prefix,))
+        for key, city_id in entries[start:]:
+            if not key.startswith(prefix):
+                break
+            yield key, city_id
+
+    def _substring_matches(self, query):
+        if len(query) < 3:
+            return [city_id for city_id, name in self._names.items() if query in name]
+
+        postings = sorted((self._substring_postings.get(g, set()) for g in trigrams(query)), key=len)
+        candidates = set.intersection(*postings) if postings else set()
+        # Trigram hits are necessary but not sufficient for a substring match
+        return [city_id for city_id in candidates if query in self._names[city_id]]
+
+    def _fuzzy_matches(self, query):
+        query_grams = word_trigrams(query)
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for city_id in self._fuzzy_postings.get(gram, ()):
+                shared[city_id] += 1
+
+        for city_id, common in shared.items():
+            similarity = common / (len(query_grams) + self._fuzzy_sizes[city_id] - common)
+            if similarity >= FUZZY_THRESHOLD:
+                yield city_id, similarity
+
+    def search(self, query, limit=10):
+        """Cities matching ``query``: exact and prefix name matches first, then
+        word prefixes, country, substrings and finally fuzzy (typo) matches"""
+        query = normalize(query)
+        if not query:
+            return []
+
+        memo_key = (query, limit)
+        results = self._memo.get(memo_key)
+        if results is not None:
+            return results
+
+        best = {}
+
+        def consider(city_id, rank, score=1.0):
+            current = best.get(city_id)
+            if current is None or (rank, -score) < current:
+                best[city_id] = (rank, -score)
+
+        for name, city_id in self._prefix_matches(self._name_prefixes, query):
+            consider(city_id, RANK_EXACT if name == query else RANK_PREFIX)
+        for _, city_id in self._prefix_matches(self._word_prefixes, query):
+            consider(city_id, RANK_WORD_PREFIX)
+        for _, city_id in self._prefix_matches(self._country_prefixes, query):
+            consider(city_id, RANK_COUNTRY)
+        for city_id in self._substring_matches(query):
+            consider(city_id, RANK_SUBSTRING)
+        if len(best) < limit and len(query) >= 3:
+            for city_id, similarity in self._fuzzy_matches(query):
+                consider(city_id, RANK_FUZZY, similarity)
+
+        ranked = sorted(best, key=lambda city_id: (best[city_id], self._names[city_id]))
+        results = [self.by_id[city_id] for city_id in ranked[:limit]]
+
+        with self._memo_lock:
+            if len(self._memo) >= SEARCH_MEMO_SIZE:
+                self._memo.clear()
+            self._memo[memo_key] = results
+        return results
+
+
+def _data_key(version):
+    return f'{WeatherCacheManager.get_city_list_cache_key()}:{version}'
+
+
+def build_city_index_data():
+    """Serialized active cities plus every known name, as stored in the cache"""
+    from .serializers import CitySerializer
+
+    return {
+        'cities': list(CitySerializer(City.objects.filter(is_active=True).order_by('id'), many=True).data),
+        'all_names': list(City.objects.values_list('name', flat=True)),
+    }
+
+
+def get_city_index_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_city_index():
+    """Move every worker to a new index version; call after bulk City writes that skip signals"""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+_local_index = None
+_local_version = None
+_local_lock = threading.Lock()
+
+
+def get_city_index():
+    """Index for the current version, rebuilt at most once per version per process"""
+    global _local_index, _local_version
+
+    version = get_city_index_version()
+    if _local_index is not None and _local_version == version:
+        return _local_index
+
+    with _local_lock:
+        if _local_index is not None and _local_version == version:
+            return _local_index
+
+        data = WeatherCacheManager.get_cache(_data_key(version))
+        if data is None:
+            data = build_city_index_data()
+            WeatherCacheManager.set_cache(_data_key(version), data, 'city_list')
+            logger.info(f"Built city index version {version} with {len(data['cities'])} cities")
+
+        _local_index = CityIndex(data['cities'], data['all_names'])
+        _local_version = version
+        return _local_index
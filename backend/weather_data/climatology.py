@@ -0,0 +1,370 @@
+"""
+Climatological normals per city, day of year and hour
+
+Normals are built from the hourly metric rollups, which outlive the raw
+readings: for every local day of year and hour, the readings of the days
+around it (``CLIMATOLOGY_WINDOW_DAYS`` either side, every year on record)
+give a mean, a standard deviation and percentiles. They are stored in
+``ClimatologyNormal`` and packed per city into one float32 array of shape
+(metrics, days, hours, fields), shared through the cache and kept in each
+process, so scoring a reading against its normal is an array lookup.
+"""
+import logging
+import math
+import threading
+import uuid
+import warnings
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .cache_manager import WeatherCacheManager
+from .models import City, ClimatologyNormal, MetricRollup
+from .rollups import WEATHER_ROLLUP_METRICS, city_subject
+
+logger = logging.getLogger('weather247')
+
+CLIMATOLOGY_METRICS = WEATHER_ROLLUP_METRICS
+METRIC_INDEX = {metric: index for index, metric in enumerate(CLIMATOLOGY_METRICS)}
+
+PERCENTILE_LEVELS = (5, 10, 25, 50, 75, 90, 95)
+# Last axis of the packed array; names match the ClimatologyNormal fields
+FIELDS = ('count', 'mean', 'std') + tuple(f'p{level:02d}' for level in PERCENTILE_LEVELS)
+COUNT, MEAN, STD = range(3)
+PERCENTILES = slice(3, len(FIELDS))
+
+DAYS_PER_YEAR = 366
+HOURS_PER_DAY = 24
+GRID_SHAPE = (len(CLIMATOLOGY_METRICS), DAYS_PER_YEAR, HOURS_PER_DAY, len(FIELDS))
+
+# Readings a cell needs before readings are scored against it
+MIN_READINGS = 5
+# |z| from which a reading counts as anomalous
+ANOMALY_Z = 2.0
+# Fraction of today's departure from normal still present an hour later
+ANOMALY_PERSISTENCE = 0.9
+
+VERSION_KEY = 'climatology:version'
+
+# First day of each month on a leap-year calendar, so Feb 29 has its own slot
+_MONTH_OFFSETS = (0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335)
+
+
+def calendar_day(moment):
+    """0-based day of year on a leap-year calendar (Mar 1 is always 60)"""
+    return _MONTH_OFFSETS[moment.month - 1] + moment.day - 1
+
+
+@lru_cache(maxsize=None)
+def city_zone(name):
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f'Unknown timezone {name!r}; using UTC for climatology')
+        return ZoneInfo('UTC')
+
+
+def describe_percentile(percentile):
+    if percentile < 10:
+        return 'much_below_normal'
+    if percentile < 25:
+        return 'below_normal'
+    if percentile > 90:
+        return 'much_above_normal'
+    if percentile > 75:
+        return 'above_normal'
+    return 'normal'
+
+
+def _percentile_rank(value, quantiles, mean, std):
+    if quantiles[0] <= value <= quantiles[-1]:
+        return float(np.interp(value, quantiles, PERCENTILE_LEVELS))
+    # Beyond the stored percentiles: normal tail, kept outside the p05-p95 band
+    if std > 0:
+        tail = 50.0 * (1 + math.erf((value - mean) / (std * math.sqrt(2))))
+    else:
+        tail = 0.0 if value < mean else 100.0
+    return min(tail, PERCENTILE_LEVELS[0]) if value < quantiles[0] else max(tail, PERCENTILE_LEVELS[-1])
+
+
+class ClimatologyGrid:
+    """Normals of one city as a (metrics, days, hours, fields) float32 array"""
+
+    def __init__(self, city_id, timezone_name, values=None):
+        self.city_id = city_id
+        self.zone = city_zone(timezone_name)
+        self.values = values
+
+    @property
+    def is_empty(self):
+        return self.values is None
+
+    def position(self, moment):
+        local = moment.astimezone(self.zone)
+        return calendar_day(local), local.hour
+
+    def cell(self, metric, moment):
+        """Field vector (see ``FIELDS``) for the local day and hour of ``moment``, ``None`` if too sparse"""
+        if self.values is None or metric not in METRIC_INDEX:
+            return None
+        day, hour = self.position(moment)
+        row = self.values[METRIC_INDEX[metric], day, hour]
+        # NaN counts (empty cells) fail the comparison too
+        return row if row[COUNT] >= MIN_READINGS else None
+
+    def normal(self, metric, moment):
+        row = self.cell(metric, moment)
+        return float(row[MEAN]) if row is not None else None
+
+    def positions(self, timestamps):
+        """Local days of year and hours of epoch-second ``timestamps``, as int arrays"""
+        days, hours = np.empty(len(timestamps), dtype=int), np.empty(len(timestamps), dtype=int)
+        for index, timestamp in enumerate(timestamps):
+            days[index], hours[index] = self.position(datetime.fromtimestamp(float(timestamp), timezone.utc))
+        return days, hours
+
+    def cells(self, metric, positions):
+        """(moments, fields) normals of ``metric`` at ``positions``, NaN where unknown or too sparse"""
+        days, hours = positions
+        cells = np.full((len(days), len(FIELDS)), np.nan, dtype=np.float32)
+        if self.values is None or metric not in METRIC_INDEX:
+            return cells
+        rows = self.values[METRIC_INDEX[metric], days, hours]
+        known = rows[:, COUNT] >= MIN_READINGS
+        cells[known] = rows[known]
+        return cells
+
+    def normals(self, metric, moments):
+        """Normal means for several moments as a float array, NaN where unknown"""
+        return np.array([
+            value if value is not None else np.nan for value in (self.normal(metric, m) for m in moments)
+        ], dtype=float)
+
+    def score(self, metric, value, moment):
+        """How ``value`` compares with the normal for its place, day and hour; ``None`` without a normal"""
+        row = self.cell(metric, moment) if value is not None else None
+        if row is None:
+            return None
+
+        mean, std = float(row[MEAN]), float(row[STD])
+        quantiles = row[PERCENTILES].astype(float)
+        z_score = (value - mean) / std if std > 0 else None
+        percentile = _percentile_rank(value, quantiles, mean, std)
+        return {
+            'value': value,
+            'normal': round(mean, 1),
+            'std': round(std, 2),
+            'p10': round(float(quantiles[PERCENTILE_LEVELS.index(10)]), 1),
+            'p90': round(float(quantiles[PERCENTILE_LEVELS.index(90)]), 1),
+            'departure': round(value - mean, 1),
+            'z_score': round(z_score, 2) if z_score is not None else None,
+            'percentile': round(percentile, 1),
+            'category': describe_percentile(percentile),
+            'is_anomaly': z_score is not None and abs(z_score) >= ANOMALY_Z,
+            'samples': int(row[COUNT]),
+        }
+
+
+def build_city_climatology(city, window_days=None):
+    """Packed normals of ``city`` from all of its hourly rollups (NaN where there is no data)"""
+    window_days = settings.CLIMATOLOGY_WINDOW_DAYS if window_days is None else window_days
+    zone = city_zone(city.timezone)
+    grid = np.full(GRID_SHAPE, np.nan, dtype=np.float32)
+
+    columns = ([], [], [], [], [], [], [])
+    rows = MetricRollup.objects.filter(
+        subject=city_subject(city.id), metric__in=CLIMATOLOGY_METRICS, count__gt=0
+    ).values_list('metric', 'bucket_start', 'count', 'total', 'sum_squares')
+    for metric, bucket_start, count, total, sum_squares in rows.iterator():
+        local = bucket_start.astimezone(zone)
+        for column, value in zip(columns, (
+            METRIC_INDEX[metric], local.year, calendar_day(local), local.hour, count, total, sum_squares
+        )):
+            column.append(value)
+    if not columns[0]:
+        return grid
+
+    metric, year, day, hour = (np.array(column, dtype=int) for column in columns[:4])
+    count, total, sum_squares = (np.array(column, dtype=float) for column in columns[4:])
+    years, year = np.unique(year, return_inverse=True)
+
+    shape = GRID_SHAPE[:3]
+    cell_count, cell_total, cell_squares = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    # add.at: two UTC hours can share a local hour when clocks go back
+    np.add.at(cell_count, (metric, day, hour), count)
+    np.add.at(cell_total, (metric, day, hour), total)
+    np.add.at(cell_squares, (metric, day, hour), sum_squares)
+
+    # One hourly mean per year and cell: the sample the percentiles are taken over
+    hourly = np.full((len(years),) + shape, np.nan)
+    hourly[year, metric, day, hour] = total / count
+
+    # Pool the days around each day of year, wrapping Dec 31 onto Jan 1
+    offsets = range(-window_days, window_days + 1)
+    pooled_count = sum(np.roll(cell_count, k, axis=1) for k in offsets)
+    pooled_total = sum(np.roll(cell_total, k, axis=1) for k in offsets)
+    pooled_squares = sum(np.roll(cell_squares, k, axis=1) for k in offsets)
+    samples = np.concatenate([np.roll(hourly, k, axis=2) for k in offsets])
+
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        # Cells with no readings in the window are all-NaN slices
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = pooled_total / pooled_count
+        variance = np.maximum(pooled_squares / pooled_count - mean ** 2, 0.0)
+        quantiles = np.nanpercentile(samples, PERCENTILE_LEVELS, axis=0)
+
+    has_data = pooled_count > 0
+    grid[..., COUNT] = np.where(has_data, pooled_count, np.nan)
+    grid[..., MEAN] = mean
+    grid[..., STD] = np.sqrt(variance)
+    grid[..., PERCENTILES] = np.moveaxis(quantiles, 0, -1)
+    return grid
+
+
+def _grid_normals(city, grid):
+    normals = []
+    for metric, day, hour in zip(*np.nonzero(grid[..., COUNT] > 0)):
+        values = dict(zip(FIELDS, grid[metric, day, hour].tolist()))
+        values['count'] = int(values['count'])
+        normals.append(ClimatologyNormal(
+            city=city, metric=CLIMATOLOGY_METRICS[metric], day_of_year=int(day) + 1, hour=int(hour), **values
+        ))
+    return normals
+
+
+def load_city_grid(city_id):
+    """Packed normals of a city from the ``ClimatologyNormal`` table, ``None`` if it has none"""
+    rows = list(ClimatologyNormal.objects.filter(city_id=city_id).values_list(
+        'metric', 'day_of_year', 'hour', *FIELDS
+    ))
+    if not rows:
+        return None
+    columns = list(zip(*rows))
+    metric = np.fromiter((METRIC_INDEX.get(m, -1) for m in columns[0]), dtype=int, count=len(rows))
+    day = np.array(columns[1], dtype=int) - 1
+    hour = np.array(columns[2], dtype=int)
+    known = metric >= 0
+
+    grid = np.full(GRID_SHAPE, np.nan, dtype=np.float32)
+    grid[metric[known], day[known], hour[known]] = np.array(columns[3:], dtype=np.float32).T[known]
+    return grid
+
+
+def _grid_key(city_id, version):
+    return f'climatology:city:{city_id}:{version}'
+
+
+def _payload(timezone_name, grid):
+    return {'timezone': timezone_name, 'values': grid.tobytes() if grid is not None else None}
+
+
+def _store_payload(city_id, version, payload):
+    cache.set(_grid_key(city_id, version), payload, WeatherCacheManager.CACHE_TTL['climatology'])
+
+
+def get_climatology_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_climatology():
+    """Move every worker to a new climatology version; call after writing normals outside ``rebuild_climatology``"""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+_local_grids = OrderedDict()
+_local_version = None
+_local_lock = threading.Lock()
+
+
+def get_city_climatology(city_id):
+    """Grid of a city for the current version, read from the table at most once per version across workers"""
+    global _local_version
+
+    version = get_climatology_version()
+    with _local_lock:
+        if _local_version != version:
+            _local_grids.clear()
+            _local_version = version
+        grid = _local_grids.get(city_id)
+        if grid is not None:
+            _local_grids.move_to_end(city_id)
+            return grid
+
+    payload = cache.get(_grid_key(city_id, version))
+    if payload is None:
+        timezone_name = City.objects.filter(id=city_id).values_list('timezone', flat=True).first()
+        payload = _payload(timezone_name, load_city_grid(city_id))
+        _store_payload(city_id, version, payload)
+
+    values = payload['values']
+    grid = ClimatologyGrid(
+        city_id, payload['timezone'],
+        np.frombuffer(values, dtype=np.float32).reshape(GRID_SHAPE) if values is not None else None
+    )
+    with _local_lock:
+        if _local_version == version:
+            _local_grids[city_id] = grid
+            while len(_local_grids) > settings.CLIMATOLOGY_CACHE_CITIES:
+                _local_grids.popitem(last=False)
+    return grid
+
+
+def score_reading(city_id, metric, value, moment):
+    """``ClimatologyGrid.score`` for one value of a city"""
+    return get_city_climatology(city_id).score(metric, value, moment)
+
+
+def score_weather_data(weather_data, metrics=CLIMATOLOGY_METRICS):
+    """``{metric: score}`` of a reading against its city's normals (metrics without a normal left out)"""
+    grid = get_city_climatology(weather_data.city_id)
+    scores = {}
+    for metric in metrics:
+        score = grid.score(metric, getattr(weather_data, metric, None), weather_data.timestamp)
+        if score is not None:
+            scores[metric] = score
+    return scores
+
+
+def anomaly_persistence_forecast(city_id, metric, current_value, start, hours=24):
+    """Hourly values for the ``hours`` after ``start``, with today's departure from normal decaying
+    toward the normal; ``None`` when the city has no normals for the period"""
+    grid = get_city_climatology(city_id)
+    if grid.is_empty or current_value is None:
+        return None
+    normals = grid.normals(metric, [start + timedelta(hours=h) for h in range(hours + 1)])
+    if np.isnan(normals).any():
+        return None
+    departure = current_value - normals[0]
+    return normals[1:] + departure * ANOMALY_PERSISTENCE ** np.arange(1, hours + 1)
+
+
+def rebuild_climatology(city_ids=None, window_days=None):
+    """Recompute the normals of ``city_ids`` (default: active cities) from their rollups and publish them"""
+    cities = City.objects.filter(is_active=True) if city_ids is None else City.objects.filter(id__in=city_ids)
+    version = uuid.uuid4().hex
+    rebuilt, cells = 0, 0
+
+    for city in cities.order_by('id'):
+        grid = build_city_climatology(city, window_days)
+        normals = _grid_normals(city, grid)
+        with transaction.atomic():
+            ClimatologyNormal.objects.filter(city=city).delete()
+            ClimatologyNormal.objects.bulk_create(normals, batch_size=1000)
+        # Pre-load the new version so workers switch to it without reading the table
+        _store_payload(city.id, version, _payload(city.timezone, grid if normals else None))
+        rebuilt += 1
+        cells += len(normals)
+
+    cache.set(VERSION_KEY, version, None)
+    logger.info(f'Rebuilt climatology for {rebuilt} cities ({cells} cells)')
+    return {'cities': rebuilt, 'cells': cells, 'version': version}
@@ -0,0 +1,345 @@
+"""
+Incremental Parquet exports of history tables for BI tooling
+
+Each dataset is read in keyset-paginated chunks (bounded memory, short
+queries) and written as Hive-partitioned Parquet files::
+
+    <root>/<dataset>/day=YYYY-MM-DD/part-<run>-<n>.parquet
+
+A watermark stored next to the files records the last row exported, so
+each run only reads rows added (or, for ``api_usage``, updated) since the
+previous one. Part files are written under a hidden name and renamed once
+complete, and the watermark only advances after that, so readers such as
+``pyarrow.dataset``, DuckDB or Spark never see half-written files. A run
+that dies before saving its watermark is re-exported on the next one;
+every dataset carries its primary key for de-duplication.
+"""
+import json
+import logging
+import os
+import shutil
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .latency import merge_latency
+
+logger = logging.getLogger('weather247')
+
+WATERMARK_FILE = '_watermark.json'
+# Partitions written to at once before the least recently used file is closed
+MAX_OPEN_WRITERS = 32
+# Rows younger than this are left for the next run: their transaction may
+# not be visible yet, and skipping past it would lose rows committed late
+SETTLE_SECONDS = 60
+
+TIMESTAMP = pa.timestamp('us', tz='UTC')
+
+
+def _json(value):
+    return json.dumps(value, default=str) if value is not None else None
+
+
+def _latency_ms(q):
+    def convert(sketch_data):
+        value = merge_latency([sketch_data]).quantile(q)
+        return round(value * 1000, 1) if value is not None else None
+    return convert
+
+
+class Column:
+    """One exported column: ``lookup`` read with ``values_list``, optionally converted per value"""
+
+    def __init__(self, name, arrow_type, lookup=None, convert=None):
+        self.name = name
+        self.arrow_type = arrow_type
+        self.lookup = lookup or name
+        self.convert = convert
+
+
+class ExportDataset:
+    """A model exported incrementally, ordered by ``cursor_field`` (then id)"""
+
+    def __init__(self, name, model, columns, time_field, partition_column, cursor_field='id'):
+        self.name = name
+        self.model_label = model
+        self.columns = columns
+        self.time_field = time_field
+        self.partition_column = partition_column
+        self.cursor_field = cursor_field
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def schema(self):
+        return pa.schema([(column.name, column.arrow_type) for column in self.columns])
+
+    @property
+    def lookups(self):
+        """Distinct lookups read per row: id, cursor, time field and the exported columns"""
+        lookups = ['id', self.cursor_field, self.time_field] + [column.lookup for column in self.columns]
+        return list(dict.fromkeys(lookups))
+
+    def position(self, lookup):
+        return self.lookups.index(lookup)
+
+
+EXPORT_DATASETS = {
+    dataset.name: dataset for dataset in (
+        ExportDataset('weather_history', 'weather_data.WeatherData', [
+            Column('id', pa.int64()),
+            Column('city_id', pa.int64()),
+            Column('city', pa.string(), 'city__name'),
+            Column('country', pa.string(), 'city__country'),
+            Column('timestamp', TIMESTAMP),
+            Column('temperature', pa.float64()),
+            Column('feels_like', pa.float64()),
+            Column('humidity', pa.int32()),
+            Column('pressure', pa.float64()),
+            Column('visibility', pa.float64()),
+            Column('uv_index', pa.float64()),
+            Column('wind_speed', pa.float64()),
+            Column('wind_direction', pa.int32()),
+            Column('weather_condition', pa.string()),
+            Column('weather_description', pa.string()),
+            Column('cloudiness', pa.int32()),
+            Column('data_source', pa.string()),
+        ], time_field='timestamp', partition_column='timestamp'),
+        # Daily counters are updated in place: exported again whenever they change
+        ExportDataset('api_usage', 'weather_data.APIUsage', [
+            Column('id', pa.int64()),
+            Column('provider', pa.string(), 'provider__name'),
+            Column('date', pa.date32()),
+            Column('endpoint', pa.string()),
+            Column('request_count', pa.int64()),
+            Column('success_count', pa.int64()),
+            Column('error_count', pa.int64()),
+            Column('avg_response_time', pa.float64()),
+            Column('max_response_time', pa.float64()),
+            Column('p50_response_ms', pa.float64(), 'latency_sketch', _latency_ms(0.5)),
+            Column('p95_response_ms', pa.float64(), 'latency_sketch', _latency_ms(0.95)),
+            Column('p99_response_ms', pa.float64(), 'latency_sketch', _latency_ms(0.99)),
+            Column('cost', pa.decimal128(10, 6)),
+            Column('created_at', TIMESTAMP),
+            Column('updated_at', TIMESTAMP),
+        ], time_field='updated_at', partition_column='date', cursor_field='updated_at'),
+        ExportDataset('notification_logs', 'weather_data.NotificationLog', [
+            Column('id', pa.int64()),
+            Column('subscription_id', pa.int64()),
+            Column('user_id', pa.int64(), 'subscription__user_id'),
+            Column('notification_type', pa.string()),
+            Column('title', pa.string()),
+            Column('body', pa.string()),
+            Column('data', pa.string(), convert=_json),
+            Column('status', pa.string()),
+            Column('error_message', pa.string()),
+            Column('created_at', TIMESTAMP),
+        ], time_field='created_at', partition_column='created_at'),
+        # IP addresses and user agents stay in the database
+        ExportDataset('user_activity', 'accounts.UserActivity', [
+            Column('id', pa.int64()),
+            Column('user_id', pa.int64()),
+            Column('activity_type', pa.string()),
+            Column('description', pa.string()),
+            Column('metadata', pa.string(), convert=_json),
+            Column('timestamp', TIMESTAMP),
+        ], time_field='timestamp', partition_column='timestamp'),
+    )
+}
+
+
+def dataset_dir(root, name):
+    return os.path.join(root, name)
+
+
+def read_watermark(root, name):
+    """Saved watermark of a dataset (``cursor``, ``id``, ``rows``, ``exported_at``), ``None`` if never exported"""
+    try:
+        with open(os.path.join(dataset_dir(root, name), WATERMARK_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_watermark(root, name, watermark):
+    path = os.path.join(dataset_dir(root, name), WATERMARK_FILE)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(watermark, f, default=str)
+    os.replace(f'{path}.tmp', path)
+
+
+def _cursor_value(dataset, value):
+    if dataset.cursor_field == 'id' or value is None:
+        return value
+    return parse_datetime(value) if isinstance(value, str) else value
+
+
+def _after(dataset, cursor, last_id):
+    """Filter for rows past the (cursor, id) watermark"""
+    if dataset.cursor_field == 'id':
+        return Q(id__gt=last_id)
+    return Q(**{f'{dataset.cursor_field}__gt': cursor}) | Q(**{dataset.cursor_field: cursor, 'id__gt': last_id})
+
+
+def _partition(value):
+    if isinstance(value, datetime):
+        value = value.astimezone(dt_timezone.utc).date() if timezone.is_aware(value) else value.date()
+    return f'day={value.isoformat()}' if isinstance(value, date) else 'day=unknown'
+
+
+class PartitionWriters:
+    """Parquet writers per partition directory, at most ``MAX_OPEN_WRITERS`` open at a time"""
+
+    def __init__(self, root, schema, run_id):
+        self.root = root
+        self.schema = schema
+        self.run_id = run_id
+        self.open = OrderedDict()
+        self.sequence = 0
+        self.pending = []  # (hidden path, final path) of every file written
+
+    def write(self, partition, table):
+        writer = self.open.get(partition)
+        if writer is None:
+            directory = os.path.join(self.root, partition)
+            os.makedirs(directory, exist_ok=True)
+            name = f'part-{self.run_id}-{self.sequence:04d}.parquet'
+            self.sequence += 1
+            hidden = os.path.join(directory, f'.{name}')
+            self.pending.append((hidden, os.path.join(directory, name)))
+            writer = self.open[partition] = pq.ParquetWriter(hidden, self.schema, compression='zstd')
+            if len(self.open) > MAX_OPEN_WRITERS:
+                self.open.popitem(last=False)[1].close()
+        else:
+            self.open.move_to_end(partition)
+        writer.write_table(table)
+
+    def close(self):
+        for writer in self.open.values():
+            writer.close()
+        self.open.clear()
+
+    def publish(self):
+        """Rename the completed files to their visible names; returns their paths"""
+        for hidden, final in self.pending:
+            os.replace(hidden, final)
+        return [final for _, final in self.pending]
+
+    def discard(self):
+        self.close()
+        for hidden, _ in self.pending:
+            if os.path.exists(hidden):
+                os.remove(hidden)
+
+
+def _chunk_tables(dataset, rows):
+    """Arrow tables of a chunk, one per partition"""
+    columns = list(zip(*rows))
+    arrays = []
+    for column in dataset.columns:
+        values = columns[dataset.position(column.lookup)]
+        if column.convert:
+            values = [column.convert(value) for value in values]
+        arrays.append(pa.array(values, type=column.arrow_type))
+    table = pa.Table.from_arrays(arrays, schema=dataset.schema)
+
+    partitions = [_partition(value) for value in columns[dataset.position(dataset.partition_column)]]
+    if len(set(partitions)) == 1:
+        return {partitions[0]: table}
+    grouped = OrderedDict()
+    for position, partition in enumerate(partitions):
+        grouped.setdefault(partition, []).append(position)
+    return {partition: table.take(pa.array(positions)) for partition, positions in grouped.items()}
+
+
+def export_dataset(name, root=None, chunk_size=None, full=False, database=None, settle_seconds=SETTLE_SECONDS):
+    """Export the rows of dataset ``name`` added since its watermark (all rows with ``full``,
+    which replaces the previous export). Returns a summary of the run."""
+    dataset = EXPORT_DATASETS[name]
+    root = root or settings.ANALYTICS_EXPORT_DIR
+    chunk_size = chunk_size or settings.ANALYTICS_EXPORT_CHUNK_SIZE
+    database = database or settings.ANALYTICS_EXPORT_DATABASE
+    directory = dataset_dir(root, name)
+
+    if full and os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory, exist_ok=True)
+
+    watermark = read_watermark(root, name) or {}
+    cursor = _cursor_value(dataset, watermark.get('cursor'))
+    last_id = watermark.get('id')
+    cutoff = timezone.now() - timedelta(seconds=settle_seconds)
+
+    lookups = dataset.lookups
+    id_at, cursor_at, time_at = (dataset.position(f) for f in ('id', dataset.cursor_field, dataset.time_field))
+    order = ['id'] if dataset.cursor_field == 'id' else [dataset.cursor_field, 'id']
+    queryset = dataset.model.objects.using(database).order_by(*order)
+    if dataset.cursor_field != 'id':
+        queryset = queryset.filter(**{f'{dataset.cursor_field}__lte': cutoff})
+
+    run_id = f"{timezone.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    writers = PartitionWriters(directory, dataset.schema, run_id)
+    rows_exported = 0
+    partitions = set()
+    try:
+        while True:
+            page = queryset.filter(_after(dataset, cursor, last_id)) if last_id is not None else queryset
+            rows = list(page.values_list(*lookups)[:chunk_size])
+            done = len(rows) < chunk_size
+
+            if dataset.cursor_field == 'id':
+                # Stop at the first unsettled row so the watermark never passes it
+                settled = next((i for i, row in enumerate(rows) if row[time_at] > cutoff), None)
+                if settled is not None:
+                    rows, done = rows[:settled], True
+            if rows:
+                for partition, table in _chunk_tables(dataset, rows).items():
+                    writers.write(partition, table)
+                    partitions.add(partition)
+                rows_exported += len(rows)
+                last_id, cursor = rows[-1][id_at], rows[-1][cursor_at]
+            if done:
+                break
+        writers.close()
+        files = writers.publish()
+    except Exception:
+        writers.discard()
+        raise
+
+    if rows_exported:
+        write_watermark(root, name, {
+            'cursor': cursor,
+            'id': last_id,
+            'rows': watermark.get('rows', 0) + rows_exported,
+            'exported_at': timezone.now().isoformat(),
+        })
+    logger.info(f'Exported {rows_exported} {name} rows to {len(files)} Parquet files')
+    return {
+        'dataset': name,
+        'rows': rows_exported,
+        'files': len(files),
+        'partitions': sorted(partitions),
+        'watermark': read_watermark(root, name),
+    }
+
+
+def export_datasets(names=None, **kwargs):
+    """``export_dataset`` for each dataset in ``names`` (default: all); one failing dataset does not stop the others"""
+    results = []
+    for name in names or EXPORT_DATASETS:
+        try:
+            results.append(export_dataset(name, **kwargs))
+        except Exception as e:
+            logger.error(f'Error exporting {name}: {e}')
+            results.append({'dataset': name, 'error': str(e)})
+    return results
@@ -0,0 +1,310 @@
+"""
+Engineered features for the prediction models, shared by training and inference
+
+The features (calendar and cyclical time, lags, rolling statistics,
+pressure trend, heat index, dew point) are defined once, in
+``compute_features``, over float32 arrays of raw readings. Each row only
+depends on the ``WINDOW`` readings ending at it, with missing history
+filled from the oldest reading available.
+
+Training computes them over a city's whole history in one vectorised pass.
+For inference every city keeps a rolling buffer of its latest
+``FEATURE_STORE_ROWS`` readings and their feature rows in the cache; each
+ingested reading appends one row computed from the buffer's tail, a fixed
+amount of work per reading. Both paths see the same features.
+
+Training across cities reads their history a chunk of cities per query
+(``history_chunks``), so only one chunk is ever in memory.
+
+Ingestion only needs numpy; pandas is imported by the frame and series
+helpers that training and inference call.
+"""
+import logging
+import warnings
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .cache_manager import WeatherCacheManager, cache_lock
+from .models import WeatherData
+
+logger = logging.getLogger('weather247')
+
+RAW_COLUMNS = ('temperature', 'feels_like', 'humidity', 'pressure', 'wind_speed', 'wind_direction', 'cloudiness')
+RAW_INDEX = {column: index for index, column in enumerate(RAW_COLUMNS)}
+
+LAG_METRICS = ('temperature', 'humidity', 'pressure', 'wind_speed')
+LAGS = (1, 3, 6, 24)
+ROLLING_METRICS = ('temperature', 'humidity', 'pressure')
+# Readings a feature row depends on, itself included
+WINDOW = max(LAGS) + 1
+
+TIME_COLUMNS = ('hour', 'day_of_year', 'month', 'season', 'is_weekend', 'hour_sin', 'hour_cos', 'day_sin', 'day_cos')
+FEATURE_COLUMNS = (
+    list(RAW_COLUMNS)
+    + list(TIME_COLUMNS)
+    + [f'{metric}_lag_{lag}h' for metric in LAG_METRICS for lag in LAGS]
+    + [
+        f'{metric}_{stat}'
+        for metric in ROLLING_METRICS
+        for stat in ('rolling_mean_3h', 'rolling_std_3h', 'rolling_mean_6h', 'rolling_max_6h', 'rolling_min_6h')
+    ]
+    + ['pressure_trend', 'pressure_change_3h', 'heat_index', 'dew_point', 'temp_stability']
+)
+
+# Season of each month: winter, spring, summer, fall
+MONTH_SEASONS = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+
+
+def _lag(values, lag):
+    """``values`` shifted by ``lag`` readings, the first readings standing in for missing history"""
+    if not len(values):
+        return values.copy()
+    shifted = np.empty_like(values)
+    lag = min(lag, len(values))
+    shifted[:lag] = values[0]
+    shifted[lag:] = values[:len(values) - lag]
+    return shifted
+
+
+def _rolling(values, window):
+    """Trailing windows of ``values`` (n x window), NaN-padded where history is shorter"""
+    padded = np.concatenate([np.full(window - 1, np.nan), values])
+    return sliding_window_view(padded, window)
+
+
+def time_features(timestamps):
+    """Calendar and cyclical features of epoch-second ``timestamps`` (UTC), by ``TIME_COLUMNS``"""
+    seconds = np.asarray(timestamps, dtype=np.float64).astype('datetime64[s]')
+    dates = seconds.astype('datetime64[D]')
+    hours = ((seconds - dates) // np.timedelta64(1, 'h')).astype(np.int64)
+    days = (dates - dates.astype('datetime64[Y]')).astype(np.int64) + 1
+    months = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    # 1970-01-01 was a Thursday (weekday 3, Monday being 0)
+    weekdays = (dates.astype(np.int64) + 3) % 7
+    return {
+        'hour': hours,
+        'day_of_year': days,
+        'month': months,
+        'season': MONTH_SEASONS[months - 1],
+        'is_weekend': weekdays >= 5,
+        'hour_sin': np.sin(2 * np.pi * hours / 24),
+        'hour_cos': np.cos(2 * np.pi * hours / 24),
+        'day_sin': np.sin(2 * np.pi * days / 365),
+        'day_cos': np.cos(2 * np.pi * days / 365),
+    }
+
+
+def compute_features(raw, timestamps):
+    """Feature matrix (float32, ``FEATURE_COLUMNS``) of consecutive readings (n x ``RAW_COLUMNS``)"""
+    raw = np.asarray(raw, dtype=np.float32).astype(np.float64)
+    if not len(raw):
+        return np.empty((0, len(FEATURE_COLUMNS)), dtype=np.float32)
+    columns = {column: raw[:, index] for column, index in RAW_INDEX.items()}
+    columns.update(time_features(timestamps))
+
+    for metric in LAG_METRICS:
+        for lag in LAGS:
+            columns[f'{metric}_lag_{lag}h'] = _lag(columns[metric], lag)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for metric in ROLLING_METRICS:
+            last_3, last_6 = _rolling(columns[metric], 3), _rolling(columns[metric], 6)
+            columns[f'{metric}_rolling_mean_3h'] = np.nanmean(last_3, axis=1)
+            columns[f'{metric}_rolling_std_3h'] = _nan_std(last_3)
+            columns[f'{metric}_rolling_mean_6h'] = np.nanmean(last_6, axis=1)
+            columns[f'{metric}_rolling_max_6h'] = np.nanmax(last_6, axis=1)
+            columns[f'{metric}_rolling_min_6h'] = np.nanmin(last_6, axis=1)
+
+        temperature, humidity, pressure = columns['temperature'], columns['humidity'], columns['pressure']
+        columns['pressure_trend'] = pressure - _lag(pressure, 1)
+        columns['pressure_change_3h'] = pressure - _lag(pressure, 3)
+        columns['heat_index'] = temperature + 0.5 * (
+            temperature + 61.0 + ((temperature - 68.0) * 1.2) + (humidity * 0.094)
+        )
+        alpha = ((17.27 * temperature) / (237.7 + temperature)) + np.log(humidity / 100.0)
+        columns['dew_point'] = (237.7 * alpha) / (17.27 - alpha)
+        columns['temp_stability'] = _nan_std(_rolling(temperature, 6))
+
+    return np.column_stack([columns[column] for column in FEATURE_COLUMNS]).astype(np.float32)
+
+
+def _nan_std(windows):
+    # Sample standard deviation over the values present; a single value has none
+    counts = np.sum(~np.isnan(windows), axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        std = np.nanstd(windows, axis=1, ddof=1)
+    return np.where(counts > 1, std, 0.0)
+
+
+def _raw_rows(readings):
+    """``(ids, epoch timestamps, float32 raw matrix)`` of ``(id, timestamp, *RAW_COLUMNS)`` tuples"""
+    if not readings:
+        return (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64),
+                np.empty((0, len(RAW_COLUMNS)), dtype=np.float32))
+    ids, stamps, *values = zip(*readings)
+    return (
+        np.array(ids, dtype=np.int64),
+        np.array([stamp.timestamp() for stamp in stamps], dtype=np.float64),
+        np.array(values, dtype=np.float32).T,
+    )
+
+
+def history_features(city_id, start, end=None):
+    """Feature frame (``FEATURE_COLUMNS``, float32) of a city's readings since ``start``, in one query,
+    indexed by the readings' epoch timestamps"""
+    import pandas as pd
+
+    readings = WeatherData.objects.filter(city_id=city_id, timestamp__gte=start)
+    if end is not None:
+        readings = readings.filter(timestamp__lte=end)
+    _, timestamps, raw = _raw_rows(list(
+        readings.order_by('timestamp', 'id').values_list('id', 'timestamp', *RAW_COLUMNS)
+    ))
+    return pd.DataFrame(
+        compute_features(raw, timestamps), columns=FEATURE_COLUMNS, index=pd.Index(timestamps, name='timestamp')
+    )
+
+
+def history_chunks(city_ids, start, chunk_cities=50):
+    """``(city_id, epoch timestamps, feature matrix)`` of each city with readings since ``start``,
+    from one streamed query per ``chunk_cities`` cities"""
+    city_ids = list(city_ids)
+    for offset in range(0, len(city_ids), chunk_cities):
+        readings = WeatherData.objects.filter(
+            city_id__in=city_ids[offset:offset + chunk_cities], timestamp__gte=start
+        ).order_by('city_id', 'timestamp', 'id').values_list('city_id', 'id', 'timestamp', *RAW_COLUMNS)
+        for city_id, rows in groupby(readings.iterator(chunk_size=5000), key=itemgetter(0)):
+            _, timestamps, raw = _raw_rows([row[1:] for row in rows])
+            yield city_id, timestamps, compute_features(raw, timestamps)
+
+
+class CityFeatureBuffer:
+    """Latest readings of one city with their raw values and feature rows"""
+
+    def __init__(self, reading_ids, timestamps, raw, features):
+        self.reading_ids = reading_ids
+        self.timestamps = timestamps
+        self.raw = raw
+        self.features = features
+
+    def __len__(self):
+        return len(self.reading_ids)
+
+    @classmethod
+    def load(cls, city_id, size=None):
+        """Buffer of a city's latest ``size`` readings, from one query"""
+        size = size or settings.FEATURE_STORE_ROWS
+        readings = list(WeatherData.objects.filter(city_id=city_id).order_by('-timestamp', '-id').values_list(
+            'id', 'timestamp', *RAW_COLUMNS
+        )[:size])
+        reading_ids, timestamps, raw = _raw_rows(readings[::-1])
+        return cls(reading_ids, timestamps, raw, compute_features(raw, timestamps))
+
+    def append(self, reading_id, timestamp, raw_row, size=None):
+        """Buffer with one more reading, its feature row computed from the last ``WINDOW`` readings"""
+        size = size or settings.FEATURE_STORE_ROWS
+        reading_ids = np.append(self.reading_ids, reading_id)[-size:]
+        timestamps = np.append(self.timestamps, timestamp)[-size:]
+        raw = np.vstack([self.raw, np.asarray(raw_row, dtype=np.float32)])[-size:]
+        row = compute_features(raw[-WINDOW:], timestamps[-WINDOW:])[-1]
+        features = np.vstack([self.features, row])[-size:]
+        return CityFeatureBuffer(reading_ids, timestamps, raw, features)
+
+    def latest(self):
+        """Newest feature row, as a Series indexed by ``FEATURE_COLUMNS`` and named by its epoch timestamp"""
+        if not len(self):
+            return None
+        import pandas as pd
+
+        return pd.Series(self.features[-1], index=FEATURE_COLUMNS, name=float(self.timestamps[-1]))
+
+    def to_payload(self):
+        return {
+            'rows': len(self),
+            'ids': self.reading_ids.tobytes(),
+            'timestamps': self.timestamps.tobytes(),
+            'raw': self.raw.tobytes(),
+            'features': self.features.tobytes(),
+        }
+
+    @classmethod
+    def from_payload(cls, payload):
+        rows = payload['rows']
+        return cls(
+            np.frombuffer(payload['ids'], dtype=np.int64),
+            np.frombuffer(payload['timestamps'], dtype=np.float64),
+            np.frombuffer(payload['raw'], dtype=np.float32).reshape(rows, len(RAW_COLUMNS)),
+            np.frombuffer(payload['features'], dtype=np.float32).reshape(rows, len(FEATURE_COLUMNS)),
+        )
+
+
+def _buffer_key(city_id):
+    return f'features:city:{city_id}'
+
+
+def _store_buffer(city_id, buffer):
+    cache.set(_buffer_key(city_id), buffer.to_payload(), WeatherCacheManager.CACHE_TTL['feature_store'])
+
+
+def get_city_buffers(city_ids):
+    """Feature buffers by city id, from one cache round-trip (cities missing from the cache are reloaded)"""
+    payloads = cache.get_many([_buffer_key(city_id) for city_id in city_ids])
+    buffers = {}
+    for city_id in city_ids:
+        payload = payloads.get(_buffer_key(city_id))
+        if payload is not None:
+            buffers[city_id] = CityFeatureBuffer.from_payload(payload)
+        else:
+            buffers[city_id] = CityFeatureBuffer.load(city_id)
+            _store_buffer(city_id, buffers[city_id])
+    return buffers
+
+
+def latest_feature_rows(city_ids):
+    """Newest feature row by city id, for cities with readings"""
+    rows = {}
+    for city_id, buffer in get_city_buffers(city_ids).items():
+        latest = buffer.latest()
+        if latest is not None:
+            rows[city_id] = latest
+    return rows
+
+
+def record_reading(weather_data):
+    """Append a newly ingested reading to its city's buffer"""
+    key = _buffer_key(weather_data.city_id)
+    # Readings of one city ingested together must not overwrite each other's append
+    with cache_lock(key) as locked:
+        if not locked:
+            # Rebuilt from the table on next read, this reading included
+            cache.delete(key)
+            return
+        payload = cache.get(key)
+        if payload is None:
+            # Built from the table on first read, this reading included
+            return
+
+        buffer = CityFeatureBuffer.from_payload(payload)
+        timestamp = weather_data.timestamp.timestamp()
+        if weather_data.id in buffer.reading_ids:
+            return
+        if len(buffer) and timestamp < buffer.timestamps[-1]:
+            # Out of order: the buffer is rebuilt from the table on next read
+            cache.delete(key)
+            return
+        raw_row = [getattr(weather_data, column) for column in RAW_COLUMNS]
+        _store_buffer(weather_data.city_id, buffer.append(weather_data.id, timestamp, raw_row))
+
+
+def safe_record_reading(weather_data):
+    """Record without letting cache failures reach the ingestion path"""
+    try:
+        record_reading(weather_data)
+    except Exception as e:
+        logger.warning(f"Could not update the feature buffer of city {weather_data.city_id}: {e}")
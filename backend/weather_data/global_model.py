@@ -0,0 +1,199 @@
+"""
+Global prediction models, shared by every city
+
+The ``global`` model family is one estimator per metric, fitted on the
+readings of all cities together. Each row is a city's feature row (as the
+feature store computes it) with its time features moved to the forecast
+hour, the hours ahead, and city-level features: latitude, longitude,
+elevation and the city's climatological normal of the metric. The target
+is the metric that many hours after the reading. Four artifacts replace
+four per city, and any city with a reading is served, including cities the
+model never saw.
+
+Training streams the history ``ML_GLOBAL_CHUNK_CITIES`` cities per query
+and keeps a uniform reservoir sample of at most ``ML_GLOBAL_MAX_ROWS`` rows
+per metric, so memory is bounded whatever the number of cities. Every
+``VALIDATION_EVERY``-th city is held out: the published MAE is the error
+on cities the model was not fitted on.
+"""
+import logging
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .climatology import MEAN, STD, ClimatologyGrid, load_city_grid
+from .feature_store import FEATURE_COLUMNS, history_chunks, time_features
+from .model_registry import model_registry
+from .models import City
+
+logger = logging.getLogger('weather247')
+
+GLOBAL_FAMILY = 'global'
+GLOBAL_METRICS = ('temperature', 'humidity', 'pressure', 'wind_speed')
+
+CITY_COLUMNS = ('latitude', 'longitude', 'elevation')
+# The model's metric: its normal at the reading's hour and at the forecast hour
+CLIMATOLOGY_COLUMNS = ('normal_at_reading', 'normal_mean', 'normal_std')
+GLOBAL_FEATURE_COLUMNS = list(FEATURE_COLUMNS) + ['hours_ahead'] + list(CITY_COLUMNS) + list(CLIMATOLOGY_COLUMNS)
+COLUMN_INDEX = {column: index for index, column in enumerate(GLOBAL_FEATURE_COLUMNS)}
+
+TRAINING_DAYS = 90
+MAX_HOURS_AHEAD = 24
+# A reading this close to the target hour is its actual value
+MATCH_SECONDS = 1800
+MIN_TRAINING_ROWS = 100
+VALIDATION_EVERY = 10
+
+
+def city_features(city_ids):
+    """``{city_id: float32 array by CITY_COLUMNS}`` (NaN where unknown), from one query"""
+    return {
+        city_id: np.array([np.nan if value is None else value for value in values], dtype=np.float32)
+        for city_id, *values in City.objects.filter(id__in=list(city_ids)).values_list('id', *CITY_COLUMNS)
+    }
+
+
+def design_matrices(features, timestamps, hours_ahead, city_values, grid, metrics=GLOBAL_METRICS):
+    """``{metric: float32 matrix by GLOBAL_FEATURE_COLUMNS}`` of feature rows forecast ``hours_ahead``.
+
+    ``timestamps`` are the epoch seconds of the feature rows' readings and
+    ``grid`` the city's ``ClimatologyGrid``.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    hours_ahead = np.asarray(hours_ahead, dtype=np.float64)
+    targets = timestamps + hours_ahead * 3600
+
+    base = np.empty((len(features), len(GLOBAL_FEATURE_COLUMNS)), dtype=np.float32)
+    base[:, :len(FEATURE_COLUMNS)] = features
+    for name, values in time_features(targets).items():
+        base[:, COLUMN_INDEX[name]] = values
+    base[:, COLUMN_INDEX['hours_ahead']] = hours_ahead
+    base[:, COLUMN_INDEX[CITY_COLUMNS[0]]:COLUMN_INDEX[CITY_COLUMNS[-1]] + 1] = city_values
+
+    reading_positions, target_positions = grid.positions(timestamps), grid.positions(targets)
+    matrices = {}
+    for metric in metrics:
+        matrix = base if metric == metrics[-1] else base.copy()
+        at_target = grid.cells(metric, target_positions)
+        matrix[:, COLUMN_INDEX['normal_at_reading']] = grid.cells(metric, reading_positions)[:, MEAN]
+        matrix[:, COLUMN_INDEX['normal_mean']] = at_target[:, MEAN]
+        matrix[:, COLUMN_INDEX['normal_std']] = at_target[:, STD]
+        matrices[metric] = matrix
+    return matrices
+
+
+def training_pairs(timestamps, rng):
+    """Each reading paired with the one a random 1 to ``MAX_HOURS_AHEAD`` hours later, where there is one:
+    ``(reading indexes, hours ahead, target indexes)``"""
+    hours = rng.integers(1, MAX_HOURS_AHEAD + 1, len(timestamps))
+    wanted = timestamps + hours * 3600
+    after = np.minimum(np.searchsorted(timestamps, wanted), len(timestamps) - 1)
+    before = np.maximum(after - 1, 0)
+    nearest = np.where(np.abs(timestamps[after] - wanted) < np.abs(timestamps[before] - wanted), after, before)
+    matched = np.flatnonzero(np.abs(timestamps[nearest] - wanted) <= MATCH_SECONDS)
+    return matched, hours[matched], nearest[matched]
+
+
+class ReservoirSample:
+    """Uniform sample of at most ``capacity`` rows of a stream, in fixed memory"""
+
+    def __init__(self, capacity, width, rng):
+        self.capacity = capacity
+        self.rng = rng
+        self.X = np.empty((capacity, width), dtype=np.float32)
+        self.y = np.empty(capacity, dtype=np.float32)
+        self.seen = 0
+
+    def __len__(self):
+        return min(self.seen, self.capacity)
+
+    def add(self, X, y):
+        # Algorithm R: the n-th row seen replaces a random slot with probability capacity / n
+        positions = self.seen + np.arange(len(X))
+        slots = np.where(positions < self.capacity, positions, self.rng.integers(0, positions + 1))
+        kept = slots < self.capacity
+        self.X[slots[kept]] = X[kept]
+        self.y[slots[kept]] = y[kept]
+        self.seen += len(X)
+
+    def arrays(self):
+        return self.X[:len(self)], self.y[:len(self)]
+
+
+def _frame(X):
+    import pandas as pd
+
+    # Fitted and scored on named columns, like the per-city models
+    return pd.DataFrame(X, columns=GLOBAL_FEATURE_COLUMNS, copy=False)
+
+
+def fit_global_models(metrics=GLOBAL_METRICS, city_ids=None, days=TRAINING_DAYS, max_rows=None,
+                      chunk_cities=None, seed=42):
+    """Fit and publish one model per metric over the history of ``city_ids`` (default: active cities)"""
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.metrics import mean_absolute_error
+
+    started_at = time.monotonic()
+    max_rows = max_rows or settings.ML_GLOBAL_MAX_ROWS
+    chunk_cities = chunk_cities or settings.ML_GLOBAL_CHUNK_CITIES
+    rng = np.random.default_rng(seed)
+
+    cities = City.objects.filter(is_active=True) if city_ids is None else City.objects.filter(id__in=city_ids)
+    zones = dict(cities.order_by('id').values_list('id', 'timezone'))
+    city_ids = list(zones)
+    city_values = city_features(city_ids)
+    width = len(GLOBAL_FEATURE_COLUMNS)
+    samples = {
+        metric: (ReservoirSample(max_rows, width, rng),
+                 ReservoirSample(max(max_rows // VALIDATION_EVERY, 1), width, rng))
+        for metric in metrics
+    }
+
+    cities_read = 0
+    for city_id, timestamps, features in history_chunks(
+        city_ids, timezone.now() - timedelta(days=days), chunk_cities
+    ):
+        rows, hours, targets = training_pairs(timestamps, rng)
+        held_out = cities_read % VALIDATION_EVERY == VALIDATION_EVERY - 1
+        cities_read += 1
+        if not len(rows):
+            continue
+        # Read straight from the table: a training run must not fill the cache with every city's grid
+        grid = ClimatologyGrid(city_id, zones[city_id], load_city_grid(city_id))
+        matrices = design_matrices(features[rows], timestamps[rows], hours, city_values[city_id], grid, metrics)
+        for metric, matrix in matrices.items():
+            y = features[targets, COLUMN_INDEX[metric]]
+            known = ~np.isnan(y)
+            samples[metric][held_out].add(matrix[known], y[known])
+
+    trained, skipped = {}, []
+    for metric, (training, validation) in samples.items():
+        X, y = training.arrays()
+        if len(X) < MIN_TRAINING_ROWS:
+            logger.warning(f"Insufficient data to train the global {metric} model")
+            skipped.append(metric)
+            continue
+
+        estimator = HistGradientBoostingRegressor(max_iter=200, random_state=seed)
+        estimator.fit(_frame(X), y)
+        mae = None
+        if len(validation):
+            X_val, y_val = validation.arrays()
+            mae = float(mean_absolute_error(y_val, estimator.predict(_frame(X_val))))
+
+        record = model_registry.register(
+            estimator, metric, family=GLOBAL_FAMILY, mae=mae, data_points=len(X),
+            feature_columns=GLOBAL_FEATURE_COLUMNS
+        )
+        trained[metric] = {'version': record.label, 'mae': mae, 'rows_seen': training.seen}
+        logger.info(f"Trained global {metric} model on {len(X)} of {training.seen} rows, held-out MAE: {mae}")
+
+    return {
+        'cities': cities_read,
+        'trained': trained,
+        'skipped': skipped,
+        'elapsed_seconds': round(time.monotonic() - started_at, 2),
+    }
@@ -0,0 +1,311 @@
+"""
+Out-of-process inference server with micro-batching, and its client
+
+With ``ML_INFERENCE_MODE = 'server'`` web workers don't score models
+themselves: ``manage.py run_inference_server`` holds the model registry in
+one process, and the workers send it their ``(city, current weather)``
+requests over a Unix socket. Requests arriving within
+``ML_INFERENCE_BATCH_WINDOW_MS`` of each other are scored together, so the
+cities of concurrent requests share each model's ``predict`` call, and
+scikit-learn runs on one thread instead of competing with request threads
+for the GIL.
+
+Messages are length-prefixed JSON. The client gives up after
+``ML_INFERENCE_TIMEOUT_MS`` and answers with the baseline forecast instead.
+"""
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import stat
+import struct
+import threading
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .model_registry import DEFAULT_FAMILY
+
+logger = logging.getLogger('weather247')
+
+# Reading fields the predictor reads from the current weather
+CURRENT_FIELDS = ('temperature', 'humidity', 'pressure', 'wind_speed')
+# Longest a connection waits for its batch, whatever the client's timeout
+SERVER_WAIT_SECONDS = 30
+
+_HEADER = struct.Struct('>I')
+
+
+class InferenceUnavailable(Exception):
+    """The inference server could not be reached or did not answer in time"""
+
+
+def send_message(sock, message):
+    data = json.dumps(message).encode()
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _receive_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            raise ConnectionError('connection closed mid-message')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def receive_message(sock):
+    """Next message on ``sock``; ``None`` when the peer closed the connection between messages"""
+    header = sock.recv(_HEADER.size, socket.MSG_WAITALL)
+    if not header:
+        return None
+    if len(header) < _HEADER.size:
+        header += _receive_exactly(sock, _HEADER.size - len(header))
+    return json.loads(_receive_exactly(sock, _HEADER.unpack(header)[0]))
+
+
+def encode_request(city, current_weather):
+    """Wire form of a ``(city, current_weather)`` pair"""
+    return {
+        'city': {'id': city.id, 'name': city.name},
+        'current': {
+            'id': getattr(current_weather, 'id', None),
+            **{field: getattr(current_weather, field, None) for field in CURRENT_FIELDS},
+        },
+    }
+
+
+def decode_request(item):
+    """``(city, current_weather)`` stand-ins with the attributes the predictor reads"""
+    return SimpleNamespace(**item['city']), SimpleNamespace(**item['current'])
+
+
+def predict_requests(items, hours, family):
+    """Score wire-form requests with the advanced predictor (the server's default)"""
+    from .ai_predictions import advanced_predictor
+
+    # The batcher thread is long-lived: don't hold on to a dead or expired connection
+    close_old_connections()
+    return advanced_predictor.predict_advanced_batch(
+        [decode_request(item) for item in items], hours, family=family
+    )
+
+
+class _Job:
+    __slots__ = ('items', 'hours', 'family', 'done', 'result', 'error')
+
+    def __init__(self, items, hours, family):
+        self.items = items
+        self.hours = hours
+        self.family = family
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Collects jobs submitted from many threads and scores them together on one thread"""
+
+    def __init__(self, predict=predict_requests, window_ms=None, max_batch=None):
+        self.predict = predict
+        self.window = (settings.ML_INFERENCE_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_batch = max_batch or settings.ML_INFERENCE_MAX_BATCH
+        self.stats = {'batches': 0, 'jobs': 0, 'requests': 0, 'largest_batch': 0}
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._queue.put(None)
+        if self._thread:
+            self._thread.join()
+
+    def submit(self, items, hours, family=DEFAULT_FAMILY, timeout=SERVER_WAIT_SECONDS):
+        """Predictions for ``items``, scored with whatever else arrives in the same window"""
+        job = _Job(items, hours, family)
+        self._queue.put(job)
+        if not job.done.wait(timeout):
+            raise TimeoutError(f'no result within {timeout}s')
+        if job.error is not None:
+            raise RuntimeError(job.error)
+        return job.result
+
+    def _collect(self, first):
+        # The first job opens the window; more are taken until it closes or the batch is full
+        jobs, size = [first], len(first.items)
+        deadline = time.monotonic() + self.window
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                # Stop after this batch
+                self._queue.put(None)
+                break
+            jobs.append(job)
+            size += len(job.items)
+        return jobs
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            jobs = self._collect(first)
+
+            groups = {}
+            for job in jobs:
+                groups.setdefault((job.hours, job.family), []).append(job)
+            for (hours, family), group in groups.items():
+                self._score(group, hours, family)
+
+    def _score(self, jobs, hours, family):
+        items = [item for job in jobs for item in job.items]
+        try:
+            results = self.predict(items, hours, family)
+        except Exception as e:
+            logger.error(f'Inference batch of {len(items)} requests failed: {e}')
+            for job in jobs:
+                job.error = str(e)
+                job.done.set()
+            return
+
+        self.stats['batches'] += 1
+        self.stats['jobs'] += len(jobs)
+        self.stats['requests'] += len(items)
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], len(items))
+        offset = 0
+        for job in jobs:
+            job.result = results[offset:offset + len(job.items)]
+            offset += len(job.items)
+            job.done.set()
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # One connection may carry several requests
+        while True:
+            try:
+                message = receive_message(self.request)
+            except (OSError, ValueError):
+                return
+            if message is None:
+                return
+            try:
+                response = {'predictions': self.server.batcher.submit(
+                    message['requests'], message['hours'], message.get('family', DEFAULT_FAMILY)
+                )}
+            except Exception as e:
+                response = {'error': str(e)}
+            try:
+                send_message(self.request, response)
+            except OSError:
+                # Client gave up (timed out) before the answer was ready
+                return
+
+
+def _prepare_socket_path(path):
+    """Create the socket's directory owner-only and clear a stale socket, refusing anything else at ``path``"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if os.stat(directory).st_uid == os.getuid():
+        # Only this user may connect to the socket or replace it
+        os.chmod(directory, 0o700)
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+    # Left behind by a server that didn't shut down cleanly
+    os.unlink(path)
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server handing every request to one ``MicroBatcher``"""
+
+    daemon_threads = True
+
+    def __init__(self, path=None, batcher=None):
+        self.path = path or settings.ML_INFERENCE_SOCKET
+        self.batcher = batcher or MicroBatcher()
+        _prepare_socket_path(self.path)
+        super().__init__(self.path, _RequestHandler)
+
+    def serve_forever(self, poll_interval=0.5):
+        self.batcher.start()
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self.batcher.stop()
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class InferenceClient:
+    """Thin client of the inference server, with a timeout and the baseline forecast as fallback"""
+
+    def __init__(self, path=None, timeout_ms=None):
+        self._path = path
+        self._timeout_ms = timeout_ms
+
+    @property
+    def path(self):
+        return self._path or settings.ML_INFERENCE_SOCKET
+
+    @property
+    def timeout(self):
+        return (self._timeout_ms or settings.ML_INFERENCE_TIMEOUT_MS) / 1000
+
+    def predict(self, requests, hours, family=DEFAULT_FAMILY):
+        """Server predictions for ``(city, current_weather)`` pairs; raises ``InferenceUnavailable``"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Covers connecting, sending and waiting for the answer
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+            send_message(sock, {
+                'requests': [encode_request(city, current) for city, current in requests],
+                'hours': hours,
+                'family': family,
+            })
+            response = receive_message(sock)
+        except (OSError, ValueError) as e:
+            raise InferenceUnavailable(str(e) or e.__class__.__name__) from e
+        finally:
+            sock.close()
+
+        if response is None or 'error' in response:
+            raise InferenceUnavailable((response or {}).get('error', 'connection closed'))
+        return response['predictions']
+
+    def predict_batch(self, requests, hours=24, family=DEFAULT_FAMILY):
+        """Predictions for ``(city, current_weather)`` pairs, the baseline forecast if the server fails"""
+        try:
+            return self.predict(requests, hours, family)
+        except InferenceUnavailable as e:
+            logger.warning(f'Inference server unavailable, serving baseline predictions: {e}')
+            from .ai_predictions import advanced_predictor
+
+            return advanced_predictor.predict_baseline_batch(requests, hours)
+
+
+# Global instance
+inference_client = InferenceClient()
@@ -0,0 +1,98 @@
+"""
+Latency histograms for API paths and provider endpoints
+
+Latencies are folded into the mergeable quantile sketch used by the metric
+rollups, so p50/p95/p99 come out of a few hundred bin counts instead of
+raw samples, and histograms from several paths, days or workers combine
+by adding bins.
+"""
+import logging
+
+from django.core.cache import cache
+
+from .rollups import QuantileSketch
+
+logger = logging.getLogger('weather247')
+
+PATH_METRICS_PREFIX = 'perf_metrics'
+PATH_INDEX_KEY = f'{PATH_METRICS_PREFIX}:paths'
+PATH_METRICS_TTL = 3600  # 1 hour
+
+LATENCY_QUANTILES = {'p50': 0.5, 'p95': 0.95, 'p99': 0.99}
+
+
+def add_latency(sketch_data, seconds):
+    """Serialized sketch with ``seconds`` added"""
+    sketch = QuantileSketch.from_dict(sketch_data)
+    sketch.add(seconds)
+    return sketch.to_dict()
+
+
+def merge_latency(sketches_data):
+    """One sketch holding the bins of every serialized sketch given"""
+    merged = QuantileSketch()
+    for data in sketches_data:
+        if data:
+            merged.merge(QuantileSketch.from_dict(data))
+    return merged
+
+
+def latency_quantiles(sketch, digits=3, scale=1):
+    """``{'p50': ..., 'p95': ..., 'p99': ...}`` from a sketch, scaled and rounded; ``None`` when empty"""
+    result = {}
+    for name, q in LATENCY_QUANTILES.items():
+        value = sketch.quantile(q)
+        result[name] = round(value * scale, digits) if value is not None else None
+    return result
+
+
+def path_metrics_key(path):
+    return f'{PATH_METRICS_PREFIX}:{path.replace("/", "_")}'
+
+
+def record_path_latency(path, duration):
+    """Fold one request duration (seconds) into the running metrics of ``path``"""
+    key = path_metrics_key(path)
+    metrics = cache.get(key) or {'count': 0, 'total_time': 0, 'max_time': 0}
+
+    metrics['count'] += 1
+    metrics['total_time'] += duration
+    metrics['max_time'] = max(metrics['max_time'], duration)
+    metrics['avg_time'] = metrics['total_time'] / metrics['count']
+    metrics['latency_sketch'] = add_latency(metrics.get('latency_sketch'), duration)
+    metrics['path'] = path
+
+    cache.set(key, metrics, PATH_METRICS_TTL)
+
+    if metrics['count'] == 1:
+        paths = cache.get(PATH_INDEX_KEY) or []
+        if path not in paths:
+            cache.set(PATH_INDEX_KEY, paths + [path], None)
+
+
+def get_path_latency_stats(limit=20):
+    """Overall and per-path request latency (milliseconds), slowest p95 first"""
+    paths = cache.get(PATH_INDEX_KEY) or []
+    entries = cache.get_many([path_metrics_key(path) for path in paths])
+
+    per_path = []
+    for metrics in entries.values():
+        sketch = merge_latency([metrics.get('latency_sketch')])
+        per_path.append(dict(
+            path=metrics.get('path'),
+            count=metrics['count'],
+            avg_ms=round(metrics['avg_time'] * 1000, 1),
+            max_ms=round(metrics['max_time'] * 1000, 1),
+            **{f'{name}_ms': value for name, value in latency_quantiles(sketch, 1, 1000).items()},
+        ))
+    per_path.sort(key=lambda p: p['p95_ms'] or 0, reverse=True)
+
+    overall = merge_latency(m.get('latency_sketch') for m in entries.values())
+    count = sum(m['count'] for m in entries.values())
+    total = sum(m['total_time'] for m in entries.values())
+    return {
+        'request_count': count,
+        'avg_ms': round(total / count * 1000, 1) if count else None,
+        **{f'{name}_ms': value for name, value in latency_quantiles(overall, 1, 1000).items()},
+        'paths': per_path[:limit],
+    }
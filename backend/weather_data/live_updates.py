@@ -0,0 +1,240 @@
+"""
+Pub/sub fan-out for live weather updates
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('weather247')
+
+# Reading fields pushed to subscribers; deltas only carry the ones that changed
+LIVE_FIELDS = (
+    'temperature', 'feels_like', 'humidity', 'pressure', 'visibility', 'uv_index',
+    'wind_speed', 'wind_direction', 'weather_condition', 'weather_description',
+    'weather_icon', 'cloudiness',
+)
+
+CHANNEL_PREFIX = 'weather247:live:city:'
+LAST_PUBLISHED_TIMEOUT = 60 * 60 * 24
+
+
+def build_weather_payload(weather_data):
+    """Full live payload for a WeatherData row"""
+    payload = {field: getattr(weather_data, field) for field in LIVE_FIELDS}
+    payload.update({
+        'city_id': weather_data.city_id,
+        'city': weather_data.city.name,
+        'timestamp': weather_data.timestamp.isoformat() if weather_data.timestamp else None,
+    })
+    return payload
+
+
+def compute_delta(previous, current):
+    """Fields of ``current`` that differ from ``previous`` (all of them when there is no previous)"""
+    if previous is None:
+        return {field: current[field] for field in LIVE_FIELDS}
+    return {field: current[field] for field in LIVE_FIELDS if previous.get(field) != current[field]}
+
+
+class Subscription:
+    """Per-client queue of messages for a set of cities"""
+
+    def __init__(self, hub, city_ids, max_queue_size):
+        self.hub = hub
+        self.city_ids = frozenset(city_ids)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+        self.overflowed = False
+
+    def deliver(self, message):
+        # Runs on the subscriber's loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A client this far behind can't rebuild state from deltas; end the
+            # stream so it reconnects and starts over from a fresh snapshot
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            logger.warning(f"Live update subscriber fell behind on cities {sorted(self.city_ids)}")
+
+    async def get(self, timeout=None):
+        """Next message, ``None`` once the subscription overflowed; raises TimeoutError on timeout"""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class LiveUpdateHub:
+    """In-process fan-out from published messages to subscriber queues.
+
+    Messages may be dispatched from any thread (sync views, ``sync_to_async``
+    workers); delivery is handed to each subscriber's event loop.
+    """
+
+    def __init__(self, max_queue_size=100):
+        self.max_queue_size = max_queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, city_ids):
+        subscription = Subscription(self, city_ids, self.max_queue_size)
+        with self._lock:
+            for city_id in subscription.city_ids:
+                self._subscribers.setdefault(city_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for city_id in subscription.city_ids:
+                subscribers = self._subscribers.get(city_id)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[city_id]
+
+    def subscriber_count(self, city_id=None):
+        with self._lock:
+            if city_id is not None:
+                return len(self._subscribers.get(city_id, ()))
+            return len({s for subscribers in self._subscribers.values() for s in subscribers})
+
+    def dispatch(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(message['city_id'], ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # Loop already closed; the subscription is going away
+                self.unsubscribe(subscription)
+
+
+class InMemoryBroker:
+    """Publishes straight into the local hub (single process: dev server, tests)"""
+
+    def __init__(self):
+        self.hub = LiveUpdateHub()
+
+    def publish(self, message):
+        self.hub.dispatch(message)
+
+    async def subscribe(self, city_ids):
+        return self.hub.subscribe(city_ids)
+
+
+class RedisBroker:
+    """Publishes to Redis; each ASGI process runs one listener feeding its local hub.
+
+    One pattern subscription per process keeps Redis traffic at one copy of
+    each update per process, however many clients are connected to it.
+    """
+
+    def __init__(self, redis_url):
+        self.redis_url = redis_url
+        self.hub = LiveUpdateHub()
+        self._client = None
+        self._listener = None
+        self._listener_loop = None
+
+    def _get_client(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.redis_url)
+        return self._client
+
+    def publish(self, message):
+        self._get_client().publish(f"{CHANNEL_PREFIX}{message['city_id']}", json.dumps(message))
+
+    async def subscribe(self, city_ids):
+        loop = asyncio.get_running_loop()
+        if self._listener is None or self._listener.done() or self._listener_loop is not loop:
+            self._listener = loop.create_task(self._listen())
+            self._listener_loop = loop
+        return self.hub.subscribe(city_ids)
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            try:
+                client = aioredis.from_url(self.redis_url)
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                    async for item in pubsub.listen():
+                        if item['type'] != 'pmessage':
+                            continue
+                        try:
+                            self.hub.dispatch(json.loads(item['data']))
+                        except (ValueError, KeyError) as e:
+                            logger.warning(f"Dropping malformed live update: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Live update listener lost Redis connection: {e}")
+                await asyncio.sleep(1)
+
+
+_broker = None
+
+
+def get_broker():
+    """Broker selected by ``LIVE_UPDATES_BROKER``"""
+    global _broker
+    if _broker is None:
+        if getattr(settings, 'LIVE_UPDATES_BROKER', 'memory') == 'redis':
+            _broker = RedisBroker(settings.REDIS_URL)
+        else:
+            if not getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+                logger.warning(
+                    "LIVE_UPDATES_BROKER is 'memory': readings ingested by Celery workers will not reach "
+                    "this process's live update subscribers. Set it to 'redis' unless ingestion runs in-process."
+                )
+            _broker = InMemoryBroker()
+    return _broker
+
+
+def _last_published_key(city_id):
+    return f"live_weather:last:{city_id}"
+
+
+def publish_weather_update(weather_data):
+    """Publish what changed in a new reading since the last one sent for its city.
+
+    Returns the published message, or ``None`` when nothing changed.
+    """
+    payload = build_weather_payload(weather_data)
+    key = _last_published_key(weather_data.city_id)
+    previous = cache.get(key)
+    changes = compute_delta(previous, payload)
+    cache.set(key, payload, LAST_PUBLISHED_TIMEOUT)
+
+    if not changes:
+        return None
+
+    message = {
+        'city_id': payload['city_id'],
+        'city': payload['city'],
+        'timestamp': payload['timestamp'],
+        'changes': changes,
+        'full': previous is None,
+    }
+    get_broker().publish(message)
+    return message
+
+
+def safe_publish_weather_update(weather_data):
+    """Publish without letting broker failures reach the ingestion path"""
+    try:
+        return publish_weather_update(weather_data)
+    except Exception as e:
+        logger.warning(f"Could not publish live update for city {weather_data.city_id}: {e}")
+        return None
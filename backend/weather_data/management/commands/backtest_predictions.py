@@ -0,0 +1,43 @@
+"""
+Management command to backtest stored predictions against actual readings
+"""
+from django.core.management.base import BaseCommand
+
+from weather_data.backtesting import BACKTEST_METRICS, DEFAULT_BACKTEST_DAYS, accuracy_summary, run_backtest
+
+
+class Command(BaseCommand):
+    help = 'Compare stored predictions with the readings that followed and report MAE/RMSE per model version'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=DEFAULT_BACKTEST_DAYS,
+            help=f'Days evaluated on a first or --full run, and reported (default: {DEFAULT_BACKTEST_DAYS})',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute every day in --days instead of only the days not yet evaluated',
+        )
+        parser.add_argument(
+            '--metric',
+            choices=list(BACKTEST_METRICS),
+            default='temperature',
+            help='Metric reported (default: temperature)',
+        )
+
+    def handle(self, *args, **options):
+        summary = run_backtest(days=options['days'], full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Evaluated from {summary['first_day']}: {summary['errors_matched']} errors in "
+            f"{summary['rows']} rows ({summary['elapsed_seconds']}s)"
+        ))
+
+        rows = accuracy_summary(options['metric'], options['days'], group_by=('model_version', 'horizon_hours'))
+        for row in rows:
+            self.stdout.write(
+                f"  {row['model_version']:<14} +{row['horizon_hours']}h  n={row['count']:<6} "
+                f"MAE {row['mae']:.2f}  RMSE {row['rmse']:.2f}  bias {row['bias']:+.2f}"
+            )
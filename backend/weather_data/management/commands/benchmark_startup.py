@@ -0,0 +1,117 @@
+"""
+Management command to benchmark process startup time and memory
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules whose import dominates startup; reported when a scenario loads them
+HEAVY_MODULES = ('numpy', 'pandas', 'scipy', 'sklearn', 'joblib', 'pyarrow')
+
+BOOT = (
+    "import os, django\n"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'weather247_backend.settings')\n"
+    "django.setup()\n"
+)
+REPORT = (
+    "import json, sys\n"
+    f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))\n"
+)
+
+# Each scenario runs in a fresh interpreter
+SCENARIOS = {
+    # What every deploy and CI run pays
+    'check': ['manage.py', 'check'],
+    # A web worker after its first request: settings, apps and every view module
+    'web': ['-c', BOOT + "from django.urls import get_resolver\nget_resolver().url_patterns\n" + REPORT],
+    # A Celery worker: settings, apps and every task module
+    'worker': ['-c', BOOT + (
+        "from weather247_backend.celery import app\n"
+        "app.loader.import_default_modules()\n"
+    ) + REPORT],
+    # A worker that has predicted once, with the ML stack loaded
+    'predictor': ['-c', BOOT + (
+        "from weather247_backend.celery import app\n"
+        "app.loader.import_default_modules()\n"
+        "import pandas, sklearn.ensemble, joblib\n"
+        "from weather_data.ai_predictions import advanced_predictor\n"
+    ) + REPORT],
+}
+
+
+def measure(arguments):
+    """``(seconds, peak RSS in MB, heavy modules or None)`` of one run of ``python <arguments>``"""
+    started_at = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, *arguments], cwd=settings.BASE_DIR, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL, env=os.environ.copy()
+    )
+    output = process.stdout.read()
+    process.stdout.close()
+    # wait4 reports the peak RSS of this child alone
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started_at
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise CommandError(f"'{' '.join(arguments)[:60]}' exited with {process.returncode}")
+
+    # Kilobytes on Linux, bytes on macOS
+    peak_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    try:
+        modules = json.loads(output.decode().strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        modules = None
+    return elapsed, peak_mb, modules
+
+
+class Command(BaseCommand):
+    help = 'Measure startup time and peak RSS of manage.py check and web/Celery worker boot'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            dest='scenarios',
+            choices=list(SCENARIOS),
+            help='Scenario to run (repeatable; default: all)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per scenario; the median time is reported (default: 3)',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the results as JSON',
+        )
+
+    def handle(self, *args, **options):
+        results = []
+        for name in options['scenarios'] or list(SCENARIOS):
+            runs = [measure(SCENARIOS[name]) for _ in range(max(options['repeat'], 1))]
+            results.append({
+                'scenario': name,
+                'seconds': round(statistics.median(run[0] for run in runs), 3),
+                'peak_rss_mb': round(max(run[1] for run in runs), 1),
+                'heavy_modules': runs[-1][2],
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for result in results:
+            modules = result['heavy_modules']
+            loaded = 'n/a' if modules is None else (', '.join(modules) or 'none')
+            self.stdout.write(
+                f"{result['scenario']:<10} {result['seconds']:>7.3f}s {result['peak_rss_mb']:>8.1f} MB  "
+                f"heavy modules: {loaded}"
+            )
@@ -0,0 +1,61 @@
+"""
+Management command to export history tables as partitioned Parquet datasets
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from weather_data.columnar_export import EXPORT_DATASETS, export_datasets
+
+
+class Command(BaseCommand):
+    help = 'Export weather history, API usage, notification logs and user activity as Parquet for BI tooling'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dataset',
+            action='append',
+            dest='datasets',
+            choices=list(EXPORT_DATASETS),
+            help='Dataset to export (repeatable; default: all)',
+        )
+        parser.add_argument(
+            '--output-dir',
+            type=str,
+            help='Root directory of the datasets (default: ANALYTICS_EXPORT_DIR)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Rows read per query (default: ANALYTICS_EXPORT_CHUNK_SIZE)',
+        )
+        parser.add_argument(
+            '--database',
+            type=str,
+            help='Database alias to read from, e.g. a replica (default: ANALYTICS_EXPORT_DATABASE)',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Delete the existing export of each dataset and export every row again',
+        )
+
+    def handle(self, *args, **options):
+        results = export_datasets(
+            options['datasets'],
+            root=options['output_dir'],
+            chunk_size=options['chunk_size'],
+            database=options['database'],
+            full=options['full'],
+        )
+
+        failed = [r for r in results if 'error' in r]
+        for result in results:
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(f"{result['dataset']}: {result['error']}"))
+            else:
+                self.stdout.write(
+                    f"{result['dataset']}: {result['rows']} rows, {result['files']} files, "
+                    f"{len(result['partitions'])} partitions"
+                )
+        if failed:
+            raise CommandError(f'{len(failed)} dataset(s) failed to export')
+        self.stdout.write(self.style.SUCCESS('Export complete'))
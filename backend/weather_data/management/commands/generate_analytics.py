@@ -8,6 +8,7 @@ import os
 from pathlib import Path
 
 from weather_data.analytics import weather_analytics, health_monitor
+from weather_data.parallel_analytics import EXECUTION_MODES, run_city_analytics
 
 
 class Command(BaseCommand):
@@ -43,6 +44,26 @@ class Command(BaseCommand):
             action='store_true',
             help='Include system health check in report',
         )
+        parser.add_argument(
+            '--per-city',
+            action='store_true',
+            help='Also generate and cache weekly analytics for every active city',
+        )
+        parser.add_argument(
+            '--mode',
+            choices=EXECUTION_MODES,
+            help='Per-city execution: serial, process (local pool) or celery (default: ANALYTICS_EXECUTION_MODE)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Worker processes for --mode process (default: ANALYTICS_WORKERS)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Cities per chunk (default: ANALYTICS_CHUNK_SIZE)',
+        )
 
     def handle(self, *args, **options):
         output_dir = options['output_dir']
@@ -50,6 +71,7 @@ class Command(BaseCommand):
         hours = options['hours']
         days = options['days']
         include_health = options['health_check']
+        per_city = options['per_city']
         
         # Create output directory
         Path(output_dir).mkdir(exist_ok=True)
@@ -80,6 +102,14 @@ class Command(BaseCommand):
             self.stdout.write('Generating weather trends analytics...')
             reports['weather_trends'] = weather_analytics.get_weather_trends(days)
             
+            # Per-city analytics (if requested), chunked and optionally parallel
+            if per_city:
+                self.stdout.write('Generating per-city analytics...')
+                reports['city_analytics'] = run_city_analytics(
+                    days=days, mode=options['mode'], workers=options['workers'],
+                    chunk_size=options['chunk_size'], progress=self._report_progress
+                )
+            
             # System Health (if requested)
             if include_health:
                 self.stdout.write('Generating system health report...')
@@ -101,6 +131,14 @@ class Command(BaseCommand):
                 self.style.ERROR(f'Error generating reports: {e}')
             )
 
+    def _report_progress(self, done, total, result):
+        """Print one line per finished chunk"""
+        if 'error' in result:
+            status = self.style.ERROR(f"failed: {result['error']}")
+        else:
+            status = f"{result['processed']}/{result['cities']} cities"
+        self.stdout.write(f"  chunk {result['chunk'] + 1} done ({done}/{total}): {status}")
+
     def _save_json_reports(self, reports, output_dir, timestamp):
         """Save reports in JSON format"""
         
@@ -196,6 +234,20 @@ class Command(BaseCommand):
                     f.write(f"  Average Humidity: {stats.get('avg_humidity', 0)}%\n")
                 f.write("\n")
             
+            # Per-city Analytics Report
+            if 'city_analytics' in reports:
+                city_data = reports['city_analytics']
+                f.write("PER-CITY ANALYTICS\n")
+                f.write("-" * 30 + "\n")
+                f.write(f"Mode: {city_data.get('mode', 'N/A')}\n")
+                if 'task_id' in city_data:
+                    f.write(f"Dispatched {city_data.get('chunks', 0)} chunks (chord {city_data['task_id']})\n")
+                else:
+                    f.write(f"Cities Processed: {city_data.get('cities_processed', 0)}/{city_data.get('cities', 0)}\n")
+                    f.write(f"Chunks: {city_data.get('chunks', 0)} ({len(city_data.get('failed_chunks', []))} failed)\n")
+                    f.write(f"Elapsed: {city_data.get('elapsed_seconds', 0)}s\n")
+                f.write("\n")
+            
             # System Health Report
             if 'system_health' in reports:
                 health_data = reports['system_health']
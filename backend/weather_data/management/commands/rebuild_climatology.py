@@ -0,0 +1,31 @@
+"""
+Management command to rebuild climatological normals from the hourly metric rollups
+"""
+from django.core.management.base import BaseCommand
+
+from weather_data.climatology import rebuild_climatology
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per city, day-of-year and hour climatology normals from the metric rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--city',
+            type=int,
+            action='append',
+            dest='city_ids',
+            help='City id to rebuild (repeatable; default: all active cities)',
+        )
+        parser.add_argument(
+            '--window-days',
+            type=int,
+            help='Days either side of each day of year to pool (default: CLIMATOLOGY_WINDOW_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding climatology normals...')
+        result = rebuild_climatology(options['city_ids'], options['window_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt normals for {result['cities']} cities ({result['cells']} cells)"
+        ))
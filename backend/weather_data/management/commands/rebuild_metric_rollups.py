@@ -0,0 +1,27 @@
+"""
+Management command to rebuild metric rollups from raw weather and system metric rows
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from weather_data.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hourly metric rollups from raw rows (backfill, or after bulk imports)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='How many days back to rebuild (default: 30)',
+        )
+
+    def handle(self, *args, **options):
+        start = timezone.now() - timedelta(days=options['days'])
+        self.stdout.write(f"Rebuilding metric rollups since {start.isoformat()}...")
+        count = rebuild_rollups(start)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} rollups'))
@@ -0,0 +1,65 @@
+"""
+Management command to run the out-of-process inference server
+"""
+from django.core.management.base import BaseCommand
+
+from weather_data.inference_service import InferenceServer, MicroBatcher
+
+
+class Command(BaseCommand):
+    help = 'Serve AI predictions over a Unix socket, micro-batching concurrent requests (ML_INFERENCE_MODE=server)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket',
+            type=str,
+            help='Unix socket path to listen on (default: ML_INFERENCE_SOCKET)',
+        )
+        parser.add_argument(
+            '--window-ms',
+            type=int,
+            help='How long a batch waits for more requests (default: ML_INFERENCE_BATCH_WINDOW_MS)',
+        )
+        parser.add_argument(
+            '--max-batch',
+            type=int,
+            help='Most city requests scored in one batch (default: ML_INFERENCE_MAX_BATCH)',
+        )
+        parser.add_argument(
+            '--preload',
+            action='store_true',
+            help='Load every published model before accepting requests',
+        )
+
+    def handle(self, *args, **options):
+        if options['preload']:
+            self._preload()
+
+        batcher = MicroBatcher(window_ms=options['window_ms'], max_batch=options['max_batch'])
+        server = InferenceServer(options['socket'], batcher)
+        self.stdout.write(self.style.SUCCESS(
+            f'Inference server listening on {server.path} '
+            f'(window {batcher.window * 1000:g} ms, up to {batcher.max_batch} requests per batch)'
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            stats = batcher.stats
+            self.stdout.write(
+                f"Served {stats['requests']} requests from {stats['jobs']} calls in {stats['batches']} batches "
+                f"(largest {stats['largest_batch']})"
+            )
+
+    def _preload(self):
+        """Load the published models into the registry's LRU, so first requests don't pay for it"""
+        from weather_data.model_registry import model_registry
+        from weather_data.models import PredictionModel
+
+        published = PredictionModel.objects.filter(is_published=True).values_list('city_id', 'metric', 'family')
+        loaded = sum(
+            model_registry.get(city_id, metric, family) is not None for city_id, metric, family in published
+        )
+        self.stdout.write(f'Preloaded {loaded} published models')
@@ -0,0 +1,83 @@
+"""
+Management command to retrain and publish stale prediction models
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from weather_data.model_training import run_global_training, run_training
+
+
+class Command(BaseCommand):
+    help = 'Retrain the prediction models of cities whose published models are missing or stale'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--city',
+            type=int,
+            action='append',
+            dest='city_ids',
+            help='City id to train (repeatable; default: all active cities)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Cities trained at once in worker processes (default: ML_TRAINING_WORKERS)',
+        )
+        parser.add_argument(
+            '--n-jobs',
+            type=int,
+            help='Cores each estimator fits on (default: ML_TRAINING_N_JOBS)',
+        )
+        parser.add_argument(
+            '--max-age-hours',
+            type=int,
+            help='Retrain models older than this when newer readings exist (default: ML_RETRAIN_HOURS)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Retrain every model, stale or not',
+        )
+        parser.add_argument(
+            '--global',
+            action='store_true',
+            dest='global_models',
+            help="Train the global models shared by every city (default when ML_MODEL_MODE is 'global')",
+        )
+
+    def handle(self, *args, **options):
+        if options['global_models'] or settings.ML_MODEL_MODE == 'global':
+            return self._train_global(options)
+
+        self.stdout.write('Training prediction models...')
+        summary = run_training(
+            options['city_ids'], workers=options['workers'], n_jobs=options['n_jobs'],
+            max_age_hours=options['max_age_hours'], force=options['force'], progress=self._report_progress
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained {summary['models_trained']} models for {summary['cities']} cities "
+            f"({summary['mode']}) in {summary['elapsed_seconds']}s"
+        ))
+        for city_id, errors in summary['errors'].items():
+            self.stdout.write(self.style.ERROR(f"  city {city_id}: {errors}"))
+
+    def _train_global(self, options):
+        self.stdout.write('Training global prediction models...')
+        summary = run_global_training(
+            options['city_ids'], max_age_hours=options['max_age_hours'], force=options['force']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained {summary['models_trained']} global models over {summary['cities']} cities "
+            f"in {summary['elapsed_seconds']}s"
+        ))
+        for metric, info in summary['trained'].items():
+            self.stdout.write(
+                f"  {metric} {info['version']}: held-out MAE {info['mae']}, {info['rows_seen']} rows seen"
+            )
+        for scope, error in summary['errors'].items():
+            self.stdout.write(self.style.ERROR(f"  {scope}: {error}"))
+
+    def _report_progress(self, done, total, result):
+        """Print one line per finished city"""
+        trained = ', '.join(f"{metric} {info['version']}" for metric, info in result['trained'].items())
+        self.stdout.write(f"  city {result['city_id']} done ({done}/{total}): {trained or 'nothing trained'}")
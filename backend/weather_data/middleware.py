@@ -7,9 +7,10 @@ import time
 import logging
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
-from django.core.cache import cache
 from io import BytesIO
 
+from .latency import record_path_latency
+
 logger = logging.getLogger('weather247')
 
 
@@ -78,17 +79,12 @@ class PerformanceMonitoringMiddleware(MiddlewareMixin):
                     f'Slow request: {request.method} {request.path} took {duration:.2f}s'
                 )
             
-            # Store performance metrics in cache for analytics
+            # Store performance metrics (with a latency histogram) in cache for analytics
             try:
-                cache_key = f'perf_metrics:{request.path.replace("/", "_")}'
-                metrics = cache.get(cache_key, {'count': 0, 'total_time': 0, 'max_time': 0})
-                
-                metrics['count'] += 1
-                metrics['total_time'] += duration
-                metrics['max_time'] = max(metrics['max_time'], duration)
-                metrics['avg_time'] = metrics['total_time'] / metrics['count']
-                
-                cache.set(cache_key, metrics, 3600)  # Store for 1 hour
+                # Group by URL pattern so ids in the path don't split the histograms
+                match = getattr(request, 'resolver_match', None)
+                path = f'/{match.route}' if match and match.route else request.path
+                record_path_latency(path, duration)
                 
             except Exception as e:
                 logger.error(f'Performance metrics storage error: {e}')
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.10 on 2026-10-19 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_data', '0005_alertrule_weatheralert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(help_text='What was measured, e.g. city:12 or system:database', max_length=100)),
+                ('metric', models.CharField(max_length=50)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('sum_squares', models.FloatField(default=0)),
+                ('min_value', models.FloatField(blank=True, null=True)),
+                ('max_value', models.FloatField(blank=True, null=True)),
+                ('sketch', models.JSONField(blank=True, default=dict, help_text='Quantile sketch state')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['metric', 'bucket_start'], name='weather_dat_metric_677fd8_idx')],
+                'unique_together': {('subject', 'metric', 'bucket_start')},
+            },
+        ),
+    ]
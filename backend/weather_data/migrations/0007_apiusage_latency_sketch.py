@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_data', '0006_metricrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apiusage',
+            name='latency_sketch',
+            field=models.JSONField(blank=True, default=dict, help_text='Mergeable response time histogram (seconds)'),
+        ),
+    ]
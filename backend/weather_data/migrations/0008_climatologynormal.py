@@ -0,0 +1,43 @@
+# Generated by Django 4.2.10 on 2026-10-19 11:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_data', '0007_apiusage_latency_sketch'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='weatheralert',
+            name='alert_type',
+            field=models.CharField(choices=[('temperature_high', 'High Temperature'), ('temperature_low', 'Low Temperature'), ('wind_speed', 'High Wind'), ('visibility', 'Low Visibility'), ('severe_weather', 'Severe Weather'), ('climate_anomaly', 'Unusual for the Season'), ('custom', 'Custom')], max_length=50),
+        ),
+        migrations.CreateModel(
+            name='ClimatologyNormal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50)),
+                ('day_of_year', models.PositiveSmallIntegerField(help_text='1-366 on a leap-year calendar (Feb 29 is day 60)')),
+                ('hour', models.PositiveSmallIntegerField(help_text='Local hour of day, 0-23')),
+                ('count', models.IntegerField(default=0, help_text='Readings inside the smoothing window')),
+                ('mean', models.FloatField()),
+                ('std', models.FloatField()),
+                ('p05', models.FloatField()),
+                ('p10', models.FloatField()),
+                ('p25', models.FloatField()),
+                ('p50', models.FloatField()),
+                ('p75', models.FloatField()),
+                ('p90', models.FloatField()),
+                ('p95', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='climatology_normals', to='weather_data.city')),
+            ],
+            options={
+                'unique_together': {('city', 'metric', 'day_of_year', 'hour')},
+            },
+        ),
+    ]
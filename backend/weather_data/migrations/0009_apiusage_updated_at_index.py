@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-19 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_data', '0008_climatologynormal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='apiusage',
+            index=models.Index(fields=['updated_at', 'id'], name='weather_dat_updated_aa1cd2_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.10 on 2026-10-19 11:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_data', '0009_apiusage_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50)),
+                ('family', models.CharField(default='ensemble', max_length=30)),
+                ('version', models.PositiveIntegerField()),
+                ('algorithm', models.CharField(max_length=100)),
+                ('artifact_path', models.CharField(help_text='Joblib file, relative to ML_MODEL_DIR', max_length=255)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('mae', models.FloatField(blank=True, help_text='Cross-validated mean absolute error', null=True)),
+                ('data_points', models.IntegerField(default=0)),
+                ('feature_columns', models.JSONField(default=list)),
+                ('trained_at', models.DateTimeField()),
+                ('is_published', models.BooleanField(default=False)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('city', models.ForeignKey(blank=True, help_text='Empty for models shared by every city', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='prediction_models', to='weather_data.city')),
+            ],
+            options={
+                'ordering': ['-version'],
+                'indexes': [models.Index(fields=['city', 'family', 'is_published'], name='weather_dat_city_id_83a63c_idx')],
+                'unique_together': {('city', 'metric', 'family', 'version')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.10 on 2026-10-19 11:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_data', '0010_predictionmodel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionAccuracy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_version', models.CharField(max_length=20)),
+                ('metric', models.CharField(max_length=50)),
+                ('horizon_hours', models.PositiveSmallIntegerField(help_text='Hours between issuing and the predicted hour')),
+                ('date', models.DateField(help_text='Day of the predicted hours')),
+                ('count', models.IntegerField(default=0)),
+                ('abs_error_sum', models.FloatField(default=0)),
+                ('squared_error_sum', models.FloatField(default=0)),
+                ('error_sum', models.FloatField(default=0, help_text='Sum of predicted minus actual (bias)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prediction_accuracy', to='weather_data.city')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'model_version'], name='weather_dat_date_e58d3a_idx')],
+                'unique_together': {('city', 'model_version', 'metric', 'horizon_hours', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_data', '0011_predictionaccuracy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='elevation',
+            field=models.FloatField(blank=True, help_text='Elevation in metres above sea level', null=True),
+        ),
+    ]
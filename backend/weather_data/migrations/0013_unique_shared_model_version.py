@@ -0,0 +1,17 @@
+# Generated by Django 4.2.10 on 2026-10-19 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_data', '0012_city_elevation'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='predictionmodel',
+            constraint=models.UniqueConstraint(condition=models.Q(('city__isnull', True)), fields=('metric', 'family', 'version'), name='unique_shared_model_version'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.10 on 2026-10-19 12:42
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def issued_at_from_created_at(apps, schema_editor):
+    # Rows stored so far were rewritten by each newer run, so created_at is when they were issued
+    WeatherPrediction = apps.get_model('weather_data', 'WeatherPrediction')
+    WeatherPrediction.objects.update(issued_at=models.F('created_at'))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_data', '0013_unique_shared_model_version'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='weatherprediction',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='weatherprediction',
+            name='issued_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Hour the forecast run was issued; the horizon is prediction_date minus it'),
+        ),
+        migrations.RunPython(issued_at_from_created_at, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='weatherprediction',
+            unique_together={('city', 'prediction_date', 'model_version', 'issued_at')},
+        ),
+    ]
@@ -0,0 +1,250 @@
+"""
+Registry of trained prediction models
+
+Every trained model is a versioned ``PredictionModel`` row (MAE, feature
+columns, training time) plus an uncompressed joblib artifact under
+``ML_MODEL_DIR``. One version per city, metric and family is published;
+requests look the published versions up through the cache and load the
+artifacts lazily, with ``mmap_mode='r'`` so their numpy arrays are paged in
+from the OS page cache and shared read-only by every worker on the host.
+Each process keeps the loaded models in an LRU bounded by
+``ML_MODEL_CACHE_MB`` of artifact size.
+"""
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache_manager import WeatherCacheManager
+from .models import PredictionModel
+
+logger = logging.getLogger('weather247')
+
+DEFAULT_FAMILY = 'ensemble'
+# Concurrent trainings of one city, metric and family retry on the next version
+REGISTER_ATTEMPTS = 5
+
+
+class LoadedModel:
+    """A published estimator loaded for inference, with its registry metadata"""
+
+    __slots__ = ('record', 'estimator')
+
+    def __init__(self, record, estimator):
+        self.record = record
+        self.estimator = estimator
+
+    @property
+    def model_version(self):
+        return self.record['label']
+
+    @property
+    def feature_columns(self):
+        return self.record['feature_columns']
+
+    @property
+    def mae(self):
+        return self.record['mae']
+
+
+def _describe(model):
+    """Cacheable metadata of a ``PredictionModel``"""
+    return {
+        'id': model.id,
+        'metric': model.metric,
+        'family': model.family,
+        'version': model.version,
+        'label': model.label,
+        'algorithm': model.algorithm,
+        'path': model.artifact_path,
+        'size_bytes': model.size_bytes,
+        'mae': model.mae,
+        'data_points': model.data_points,
+        'feature_columns': model.feature_columns,
+        'trained_at': model.trained_at.isoformat(),
+    }
+
+
+class ModelRegistry:
+    """Versioned model artifacts on disk, published per city, metric and family"""
+
+    def __init__(self, root=None, memory_budget_mb=None):
+        self._root = root
+        self._memory_budget_mb = memory_budget_mb
+        self._loaded = OrderedDict()
+        self._loaded_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def root(self):
+        return self._root or settings.ML_MODEL_DIR
+
+    @property
+    def memory_budget(self):
+        budget = self._memory_budget_mb
+        if budget is None:
+            budget = settings.ML_MODEL_CACHE_MB
+        return budget * 1024 * 1024
+
+    def artifact_path(self, relative_path):
+        return os.path.join(self.root, relative_path)
+
+    def _published_key(self, city_id, family):
+        return f"ml:published:{family}:{city_id or 'global'}"
+
+    def register(self, estimator, metric, city=None, family=DEFAULT_FAMILY, mae=None, data_points=0,
+                 feature_columns=(), publish=True):
+        """Store ``estimator`` as the next version of its city, metric and family"""
+        city_id = city.id if city is not None else None
+        directory = os.path.join(family, str(city_id or 'global'), metric)
+        # Written under a name of its own; it takes the version's name once the row holds the version
+        staging_path = self.artifact_path(os.path.join(directory, f"{uuid.uuid4().hex}.tmp"))
+        size = self._write_artifact(estimator, staging_path)
+        try:
+            for attempt in range(1, REGISTER_ATTEMPTS + 1):
+                try:
+                    model = self._create_version(
+                        staging_path, directory, city_id=city_id, metric=metric, family=family,
+                        algorithm=type(estimator).__name__, size_bytes=size, mae=mae, data_points=data_points,
+                        feature_columns=list(feature_columns), publish=publish,
+                    )
+                    break
+                except IntegrityError:
+                    if attempt == REGISTER_ATTEMPTS:
+                        raise
+                    logger.info(f"Version of {family} {metric} model for city {city_id} taken, retrying")
+        finally:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+
+        logger.info(f"Registered {model}")
+        return model
+
+    def _create_version(self, staging_path, directory, publish, **fields):
+        with transaction.atomic():
+            latest = PredictionModel.objects.filter(
+                city_id=fields['city_id'], metric=fields['metric'], family=fields['family']
+            ).aggregate(latest=Max('version'))['latest']
+            version = (latest or 0) + 1
+            relative_path = os.path.join(directory, f"v{version}.joblib")
+            # Raises IntegrityError when a concurrent registration took the version first
+            model = PredictionModel.objects.create(
+                version=version, artifact_path=relative_path, trained_at=timezone.now(), **fields
+            )
+            os.replace(staging_path, self.artifact_path(relative_path))
+            if publish:
+                self.publish(model)
+        return model
+
+    def _write_artifact(self, estimator, path):
+        import joblib
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Uncompressed, so the arrays can be memory-mapped when loaded
+        joblib.dump(estimator, path)
+        return os.path.getsize(path)
+
+    def publish(self, model):
+        """Make ``model`` the version served for its city, metric and family"""
+        with transaction.atomic():
+            PredictionModel.objects.filter(
+                city_id=model.city_id, metric=model.metric, family=model.family, is_published=True
+            ).exclude(id=model.id).update(is_published=False)
+            model.is_published = True
+            model.published_at = timezone.now()
+            model.save(update_fields=['is_published', 'published_at'])
+            # Again on commit, in case a reader cached the old version meanwhile
+            self.invalidate(model.city_id, model.family)
+            transaction.on_commit(lambda: self.invalidate(model.city_id, model.family))
+        return model
+
+    def invalidate(self, city_id, family=DEFAULT_FAMILY):
+        """Drop the cached published versions of a city, e.g. after publishing from another process"""
+        cache.delete(self._published_key(city_id, family))
+
+    def published(self, city_id, family=DEFAULT_FAMILY):
+        """Metadata of the published models of a city (``None`` for shared models), by metric"""
+        key = self._published_key(city_id, family)
+        records = cache.get(key)
+        if records is None:
+            records = {
+                model.metric: _describe(model)
+                for model in PredictionModel.objects.filter(city_id=city_id, family=family, is_published=True)
+            }
+            cache.set(key, records, WeatherCacheManager.CACHE_TTL['model_registry'])
+        return records
+
+    def get(self, city_id, metric, family=DEFAULT_FAMILY):
+        """Published model of a city and metric, loaded on first use, or ``None``"""
+        record = self.published(city_id, family).get(metric)
+        if record is None:
+            return None
+        try:
+            return self.load(record)
+        except (OSError, EOFError, ValueError) as e:
+            logger.error(f"Could not load model {record['path']}: {e}")
+            return None
+
+    def load(self, record):
+        """Estimator of a registry record, from this process's LRU or memory-mapped from disk"""
+        with self._lock:
+            loaded = self._loaded.get(record['id'])
+            if loaded is not None:
+                self._loaded.move_to_end(record['id'])
+                return loaded
+
+        import joblib
+
+        estimator = joblib.load(self.artifact_path(record['path']), mmap_mode='r')
+        loaded = LoadedModel(record, estimator)
+
+        with self._lock:
+            if record['id'] not in self._loaded:
+                self._loaded[record['id']] = loaded
+                self._loaded_bytes += record['size_bytes']
+                # The newest model always stays, even when it alone exceeds the budget
+                while self._loaded_bytes > self.memory_budget and len(self._loaded) > 1:
+                    _, evicted = self._loaded.popitem(last=False)
+                    self._loaded_bytes -= evicted.record['size_bytes']
+            return self._loaded[record['id']]
+
+    def loaded_models(self):
+        """Ids of the models this process holds, least recently used first"""
+        with self._lock:
+            return list(self._loaded)
+
+    def clear(self):
+        with self._lock:
+            self._loaded.clear()
+            self._loaded_bytes = 0
+
+    def prune(self, keep=None):
+        """Delete unpublished versions beyond the newest ``keep`` of each city, metric and family"""
+        keep = settings.ML_MODEL_KEEP_VERSIONS if keep is None else keep
+        seen = {}
+        stale = []
+        for model in PredictionModel.objects.order_by('-version').iterator():
+            group = (model.city_id, model.metric, model.family)
+            seen[group] = seen.get(group, 0) + 1
+            if seen[group] > keep and not model.is_published:
+                stale.append(model)
+
+        for model in stale:
+            # Processes that still map the file keep their pages until they drop it
+            try:
+                os.remove(self.artifact_path(model.artifact_path))
+            except FileNotFoundError:
+                pass
+        PredictionModel.objects.filter(id__in=[model.id for model in stale]).delete()
+        return len(stale)
+
+
+# Global instance
+model_registry = ModelRegistry()
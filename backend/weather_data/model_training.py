@@ -0,0 +1,203 @@
+"""
+Background training pipeline for the advanced prediction models
+
+Prediction requests only read published models; this pipeline keeps them
+fresh. A city's metric is retrained when it has no published model yet, or
+when its model is older than ``ML_RETRAIN_HOURS`` and readings arrived
+since it was trained. Cities train in a ``ProcessPoolExecutor`` of
+``ML_TRAINING_WORKERS`` processes, each estimator using ``ML_TRAINING_N_JOBS``
+cores, and every fitted model is published to the model registry.
+
+With ``ML_MODEL_MODE = 'global'`` the pipeline instead refits the global
+models, one per metric for every city, once they are older than
+``ML_RETRAIN_HOURS``.
+"""
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .ai_predictions import ADVANCED_METRICS, MIN_TRAINING_READINGS, TRAINING_DAYS, advanced_predictor
+from .global_model import GLOBAL_FAMILY, fit_global_models
+from .model_registry import DEFAULT_FAMILY, model_registry
+from .models import City, PredictionModel, WeatherData
+from .parallel_analytics import _init_worker
+
+logger = logging.getLogger('weather247')
+
+
+def stale_models(city_ids=None, metrics=ADVANCED_METRICS, max_age_hours=None, force=False, now=None):
+    """``{city_id: [metrics]}`` whose published model is missing or stale, among cities with enough history"""
+    max_age_hours = settings.ML_RETRAIN_HOURS if max_age_hours is None else max_age_hours
+    now = now or timezone.now()
+
+    readings = WeatherData.objects.filter(timestamp__gte=now - timedelta(days=TRAINING_DAYS))
+    if city_ids is None:
+        readings = readings.filter(city__is_active=True)
+    else:
+        readings = readings.filter(city_id__in=city_ids)
+    history = {
+        row['city_id']: row['latest']
+        for row in readings.values('city_id').annotate(readings=Count('id'), latest=Max('timestamp'))
+        if row['readings'] >= MIN_TRAINING_READINGS
+    }
+
+    trained_at = {
+        (city_id, metric): trained
+        for city_id, metric, trained in PredictionModel.objects.filter(
+            city_id__in=list(history), metric__in=list(metrics), family=DEFAULT_FAMILY, is_published=True
+        ).values_list('city_id', 'metric', 'trained_at')
+    }
+
+    stale = {}
+    for city_id, latest_reading in sorted(history.items()):
+        for metric in metrics:
+            trained = trained_at.get((city_id, metric))
+            if (force or trained is None
+                    or (trained < now - timedelta(hours=max_age_hours) and latest_reading > trained)):
+                stale.setdefault(city_id, []).append(metric)
+    return stale
+
+
+def train_city(city_id, metrics, n_jobs=1):
+    """Fit and publish the models of one city, with failures returned instead of raised"""
+    result = {'city_id': city_id, 'trained': {}, 'skipped': [], 'errors': {}}
+    try:
+        city = City.objects.get(id=city_id)
+    except City.DoesNotExist:
+        result['errors'] = {metric: 'city not found' for metric in metrics}
+        return result
+
+    for metric in metrics:
+        try:
+            model = advanced_predictor.fit_ensemble_model(city, metric, n_jobs=n_jobs)
+            if model is None:
+                result['skipped'].append(metric)
+            else:
+                result['trained'][metric] = {'version': model.label, 'mae': model.mae}
+        except Exception as e:
+            logger.error(f'Training the {metric} model for {city.name} failed: {e}')
+            result['errors'][metric] = str(e)
+    return result
+
+
+def _train_in_processes(jobs, workers, n_jobs, on_result):
+    # Forked workers must not share the parent's database sockets
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {
+            executor.submit(train_city, city_id, metrics, n_jobs): (city_id, metrics)
+            for city_id, metrics in jobs.items()
+        }
+        for future in as_completed(futures):
+            city_id, metrics = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # Worker crashed (e.g. killed) rather than training raising
+                logger.error(f'Training city {city_id} lost its worker: {e}')
+                result = {'city_id': city_id, 'trained': {}, 'skipped': [],
+                          'errors': {metric: str(e) for metric in metrics}}
+            on_result(result)
+
+
+def run_training(city_ids=None, metrics=ADVANCED_METRICS, workers=None, n_jobs=None, max_age_hours=None,
+                 force=False, progress=None):
+    """Retrain and publish the stale models of ``city_ids`` (default: active cities).
+
+    ``workers`` cities train at once (default ``ML_TRAINING_WORKERS``), each
+    estimator fitting on ``n_jobs`` cores (default ``ML_TRAINING_N_JOBS``).
+    ``progress(done, total, result)`` is called after each city.
+    """
+    workers = workers or settings.ML_TRAINING_WORKERS
+    n_jobs = n_jobs or settings.ML_TRAINING_N_JOBS
+    jobs = stale_models(city_ids, metrics, max_age_hours, force)
+
+    mode = 'process'
+    if workers < 2 or len(jobs) < 2 or multiprocessing.current_process().daemon:
+        # Daemonic processes (e.g. Celery prefork children) cannot start a pool
+        mode = 'serial'
+
+    started_at = time.monotonic()
+    results = []
+
+    def on_result(result):
+        # Published in a worker: drop the published versions this process may have cached
+        model_registry.invalidate(result['city_id'])
+        results.append(result)
+        if progress:
+            progress(len(results), len(jobs), result)
+
+    if mode == 'process':
+        _train_in_processes(jobs, workers, n_jobs, on_result)
+    else:
+        for city_id, city_metrics in jobs.items():
+            on_result(train_city(city_id, city_metrics, n_jobs))
+
+    pruned = model_registry.prune()
+    summary = {
+        'mode': mode,
+        'cities': len(jobs),
+        'models_trained': sum(len(r['trained']) for r in results),
+        'models_skipped': sum(len(r['skipped']) for r in results),
+        'errors': {r['city_id']: r['errors'] for r in results if r['errors']},
+        'versions_pruned': pruned,
+        'elapsed_seconds': round(time.monotonic() - started_at, 2),
+        'generated_at': timezone.now().isoformat(),
+    }
+    logger.info(
+        f"Model training ({mode}): {summary['models_trained']} models for {summary['cities']} cities "
+        f"in {summary['elapsed_seconds']}s"
+    )
+    return summary
+
+
+def stale_global_metrics(metrics=ADVANCED_METRICS, max_age_hours=None, force=False, now=None):
+    """Metrics whose published global model is missing or older than ``max_age_hours``"""
+    max_age_hours = settings.ML_RETRAIN_HOURS if max_age_hours is None else max_age_hours
+    now = now or timezone.now()
+    trained_at = dict(PredictionModel.objects.filter(
+        city__isnull=True, metric__in=list(metrics), family=GLOBAL_FAMILY, is_published=True
+    ).values_list('metric', 'trained_at'))
+    return [
+        metric for metric in metrics
+        if force or trained_at.get(metric) is None or trained_at[metric] < now - timedelta(hours=max_age_hours)
+    ]
+
+
+def run_global_training(city_ids=None, metrics=ADVANCED_METRICS, max_age_hours=None, force=False):
+    """Refit and publish the stale global models over the history of ``city_ids`` (default: active cities)"""
+    started_at = time.monotonic()
+    stale = stale_global_metrics(metrics, max_age_hours, force)
+    result = {'cities': 0, 'trained': {}, 'skipped': []}
+    errors = {}
+    if stale:
+        try:
+            result = fit_global_models(stale, city_ids)
+        except Exception as e:
+            logger.error(f'Training the global models failed: {e}')
+            errors = {'global': str(e)}
+
+    pruned = model_registry.prune()
+    summary = {
+        'mode': 'global',
+        'cities': result['cities'],
+        'models_trained': len(result['trained']),
+        'models_skipped': len(result['skipped']),
+        'trained': result['trained'],
+        'errors': errors,
+        'versions_pruned': pruned,
+        'elapsed_seconds': round(time.monotonic() - started_at, 2),
+        'generated_at': timezone.now().isoformat(),
+    }
+    logger.info(
+        f"Model training (global): {summary['models_trained']} models over {summary['cities']} cities "
+        f"in {summary['elapsed_seconds']}s"
+    )
+    return summary
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 import json
 
 User = get_user_model()
@@ -11,6 +12,7 @@ class City(models.Model):
     country = models.CharField(max_length=100)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    elevation = models.FloatField(null=True, blank=True, help_text="Elevation in metres above sea level")
     timezone = models.CharField(max_length=50, default='UTC')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -136,11 +138,15 @@ class WeatherPrediction(models.Model):
     confidence_score = models.FloatField(help_text="Prediction confidence (0-1)")
     model_version = models.CharField(max_length=20, default='v1.0')
     features_used = models.JSONField(default=dict, help_text="Features used for prediction")
+    issued_at = models.DateTimeField(
+        default=timezone.now, help_text="Hour the forecast run was issued; the horizon is prediction_date minus it"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['prediction_date']
-        unique_together = ['city', 'prediction_date', 'model_version']
+        # One row per run: each predicted hour is kept at every horizon it was forecast
+        unique_together = ['city', 'prediction_date', 'model_version', 'issued_at']
 
     def __str__(self):
         return f"{self.city.name} - {self.prediction_date} - {self.predicted_temperature}°C (AI)"
@@ -528,6 +534,7 @@ class WeatherAlert(models.Model):
         ('wind_speed', 'High Wind'),
         ('visibility', 'Low Visibility'),
         ('severe_weather', 'Severe Weather'),
+        ('climate_anomaly', 'Unusual for the Season'),
         ('custom', 'Custom'),
     ]
 
@@ -564,3 +571,133 @@ class WeatherAlert(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - {self.city.name}: {self.alert_type} ({self.severity})"
+
+
+class MetricRollup(models.Model):
+    """Mergeable running aggregates of one metric for one subject over an hour"""
+    subject = models.CharField(max_length=100, help_text="What was measured, e.g. city:12 or system:database")
+    metric = models.CharField(max_length=50)
+    bucket_start = models.DateTimeField()
+
+    count = models.IntegerField(default=0)
+    total = models.FloatField(default=0)
+    sum_squares = models.FloatField(default=0)
+    min_value = models.FloatField(null=True, blank=True)
+    max_value = models.FloatField(null=True, blank=True)
+    sketch = models.JSONField(default=dict, blank=True, help_text="Quantile sketch state")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['subject', 'metric', 'bucket_start']
+        indexes = [
+            models.Index(fields=['metric', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} {self.metric} @ {self.bucket_start} (n={self.count})"
+
+
+class ClimatologyNormal(models.Model):
+    """Climatological normal of one metric for a city at one local day of year and hour"""
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='climatology_normals')
+    metric = models.CharField(max_length=50)
+    day_of_year = models.PositiveSmallIntegerField(help_text="1-366 on a leap-year calendar (Feb 29 is day 60)")
+    hour = models.PositiveSmallIntegerField(help_text="Local hour of day, 0-23")
+
+    count = models.IntegerField(default=0, help_text="Readings inside the smoothing window")
+    mean = models.FloatField()
+    std = models.FloatField()
+    p05 = models.FloatField()
+    p10 = models.FloatField()
+    p25 = models.FloatField()
+    p50 = models.FloatField()
+    p75 = models.FloatField()
+    p90 = models.FloatField()
+    p95 = models.FloatField()
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['city', 'metric', 'day_of_year', 'hour']
+
+    def __str__(self):
+        return f"{self.city.name} {self.metric} day {self.day_of_year} {self.hour:02d}h: {self.mean:.1f}"
+
+
+class PredictionModel(models.Model):
+    """A trained prediction model artifact, versioned per city, metric and model family"""
+    city = models.ForeignKey(
+        City, on_delete=models.CASCADE, related_name='prediction_models', null=True, blank=True,
+        help_text="Empty for models shared by every city"
+    )
+    metric = models.CharField(max_length=50)
+    family = models.CharField(max_length=30, default='ensemble')
+    version = models.PositiveIntegerField()
+    algorithm = models.CharField(max_length=100)
+    artifact_path = models.CharField(max_length=255, help_text="Joblib file, relative to ML_MODEL_DIR")
+    size_bytes = models.BigIntegerField(default=0)
+
+    mae = models.FloatField(null=True, blank=True, help_text="Cross-validated mean absolute error")
+    data_points = models.IntegerField(default=0)
+    feature_columns = models.JSONField(default=list)
+    trained_at = models.DateTimeField()
+
+    is_published = models.BooleanField(default=False)
+    published_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-version']
+        unique_together = ['city', 'metric', 'family', 'version']
+        constraints = [
+            # unique_together never matches shared models: NULL cities do not collide
+            models.UniqueConstraint(
+                fields=['metric', 'family', 'version'], condition=models.Q(city__isnull=True),
+                name='unique_shared_model_version'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['city', 'family', 'is_published']),
+        ]
+
+    @property
+    def label(self):
+        return f"{self.family}:v{self.version}"
+
+    def __str__(self):
+        owner = self.city.name if self.city_id else 'global'
+        return f"{owner} {self.metric} {self.label}{' (published)' if self.is_published else ''}"
+
+
+class PredictionAccuracy(models.Model):
+    """Backtested errors of one model version's predictions for a city, metric and horizon over a day"""
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='prediction_accuracy')
+    model_version = models.CharField(max_length=20)
+    metric = models.CharField(max_length=50)
+    horizon_hours = models.PositiveSmallIntegerField(help_text="Hours between issuing and the predicted hour")
+    date = models.DateField(help_text="Day of the predicted hours")
+
+    count = models.IntegerField(default=0)
+    abs_error_sum = models.FloatField(default=0)
+    squared_error_sum = models.FloatField(default=0)
+    error_sum = models.FloatField(default=0, help_text="Sum of predicted minus actual (bias)")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['city', 'model_version', 'metric', 'horizon_hours', 'date']
+        indexes = [
+            models.Index(fields=['date', 'model_version']),
+        ]
+
+    @property
+    def mae(self):
+        return self.abs_error_sum / self.count if self.count else None
+
+    @property
+    def rmse(self):
+        return (self.squared_error_sum / self.count) ** 0.5 if self.count else None
+
+    def __str__(self):
+        return f"{self.city.name} {self.model_version} {self.metric} +{self.horizon_hours}h {self.date} (n={self.count})"
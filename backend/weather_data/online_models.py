@@ -0,0 +1,171 @@
+"""
+Online forecasting models, updated with every ingested reading
+
+The ``online`` model family is an exponentially weighted seasonal
+baseline per city and metric: a level, an hour-of-day profile and the
+latest departure from both, decaying toward them over the horizon. Each
+ingested reading updates it in constant time and memory, so it picks up
+new data immediately, where the ensembles wait for their next retraining.
+Forecasts are a few array operations.
+
+A city's state (all metrics) is one small payload in the cache, updated
+on ingest. When it is missing it is rebuilt by replaying the last
+``BOOTSTRAP_DAYS`` of readings.
+"""
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from .cache_manager import WeatherCacheManager, cache_lock
+from .models import WeatherData
+
+logger = logging.getLogger('weather247')
+
+ONLINE_FAMILY = 'online'
+# Bumped whenever the update rule or its parameters change, so forecasts of
+# different versions are never mixed up (cached or stored)
+ONLINE_MODEL_VERSION = 1
+ONLINE_MODEL_LABEL = f'{ONLINE_FAMILY}:v{ONLINE_MODEL_VERSION}'
+
+ONLINE_METRICS = ('temperature', 'humidity', 'pressure', 'wind_speed')
+# Smoothing of the level, of each hour's seasonal offset and of the error
+# estimate; departures decay by DECAY per hour ahead
+LEVEL_SMOOTHING = 0.05
+SEASON_SMOOTHING = 0.1
+ERROR_SMOOTHING = 0.05
+DECAY = 0.8
+BOOTSTRAP_DAYS = 14
+
+
+def _hour_of_day(timestamps):
+    return (np.asarray(timestamps, dtype=np.float64) // 3600 % 24).astype(np.int64)
+
+
+class OnlineSeasonalModel:
+    """Level, hour-of-day profile and current departure of every ``ONLINE_METRICS`` of one city"""
+
+    def __init__(self, level=None, season=None, departure=None, mae=None, updates=0, last_timestamp=0.0):
+        metrics = len(ONLINE_METRICS)
+        self.level = np.zeros(metrics) if level is None else level
+        self.season = np.zeros((metrics, 24)) if season is None else season
+        self.departure = np.zeros(metrics) if departure is None else departure
+        self.mae = np.zeros(metrics) if mae is None else mae
+        self.updates = updates
+        self.last_timestamp = last_timestamp
+
+    def update(self, timestamp, values):
+        """Fold one reading (epoch seconds, values by ``ONLINE_METRICS``) into the model"""
+        values = np.asarray(values, dtype=np.float64)
+        if np.isnan(values).any():
+            # Skipped rather than poisoning the smoothed state
+            return False
+        if self.updates and timestamp <= self.last_timestamp:
+            # Readings older than the state can't be folded in
+            return False
+        hour = int(_hour_of_day(timestamp))
+
+        if not self.updates:
+            self.level = values.copy()
+        else:
+            # Track the one-step error as it would have been forecast
+            error = values - self.forecast([timestamp])[:, 0]
+            self.mae += ERROR_SMOOTHING * (np.abs(error) - self.mae)
+            self.level += LEVEL_SMOOTHING * (values - self.season[:, hour] - self.level)
+            self.season[:, hour] += SEASON_SMOOTHING * (values - self.level - self.season[:, hour])
+        self.departure = values - self.level - self.season[:, hour]
+        self.updates += 1
+        self.last_timestamp = timestamp
+        return True
+
+    def forecast(self, timestamps):
+        """Metrics x ``timestamps`` forecast (epoch seconds, after the last update)"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        hours_ahead = np.maximum((timestamps - self.last_timestamp) / 3600, 0)
+        return (
+            self.level[:, None]
+            + self.season[:, _hour_of_day(timestamps)]
+            + self.departure[:, None] * DECAY ** hours_ahead
+        )
+
+    def to_payload(self):
+        return {
+            'version': ONLINE_MODEL_VERSION,
+            'state': np.concatenate([self.level, self.season.ravel(), self.departure, self.mae]).tobytes(),
+            'updates': self.updates,
+            'last_timestamp': self.last_timestamp,
+        }
+
+    @classmethod
+    def from_payload(cls, payload):
+        """Model of a cached payload; ``None`` for payloads of another version"""
+        if payload.get('version') != ONLINE_MODEL_VERSION:
+            return None
+        metrics = len(ONLINE_METRICS)
+        level, season, departure, mae = np.split(
+            np.frombuffer(payload['state'], dtype=np.float64).copy(),
+            [metrics, metrics * 25, metrics * 26]
+        )
+        return cls(level, season.reshape(metrics, 24), departure, mae, payload['updates'], payload['last_timestamp'])
+
+
+def _state_key(city_id):
+    return f'online:city:{city_id}'
+
+
+def _store_model(city_id, model):
+    cache.set(_state_key(city_id), model.to_payload(), WeatherCacheManager.CACHE_TTL['online_models'])
+
+
+def bootstrap_model(city_id, now=None):
+    """Model of a city rebuilt by replaying its last ``BOOTSTRAP_DAYS`` of readings"""
+    since = (now or timezone.now()) - timedelta(days=BOOTSTRAP_DAYS)
+    model = OnlineSeasonalModel()
+    for timestamp, *values in WeatherData.objects.filter(city_id=city_id, timestamp__gte=since).order_by(
+        'timestamp', 'id'
+    ).values_list('timestamp', *ONLINE_METRICS).iterator():
+        model.update(timestamp.timestamp(), [np.nan if v is None else v for v in values])
+    return model
+
+
+def get_online_models(city_ids):
+    """Online model by city id, from one cache round-trip (missing ones are bootstrapped)"""
+    payloads = cache.get_many([_state_key(city_id) for city_id in city_ids])
+    models = {}
+    for city_id in city_ids:
+        payload = payloads.get(_state_key(city_id))
+        model = OnlineSeasonalModel.from_payload(payload) if payload is not None else None
+        if model is None:
+            model = bootstrap_model(city_id)
+            _store_model(city_id, model)
+        models[city_id] = model
+    return models
+
+
+def record_reading(weather_data):
+    """Update the online model of the reading's city"""
+    key = _state_key(weather_data.city_id)
+    # Readings of one city ingested together must not overwrite each other's update
+    with cache_lock(key) as locked:
+        if not locked:
+            # Replayed from the table on next use, this reading included
+            cache.delete(key)
+            return
+        payload = cache.get(key)
+        model = OnlineSeasonalModel.from_payload(payload) if payload is not None else None
+        if model is None:
+            # Bootstrapped from the table on first use, this reading included
+            return
+        values = [getattr(weather_data, metric) for metric in ONLINE_METRICS]
+        if model.update(weather_data.timestamp.timestamp(), [np.nan if v is None else v for v in values]):
+            _store_model(weather_data.city_id, model)
+
+
+def safe_record_reading(weather_data):
+    """Update without letting cache failures reach the ingestion path"""
+    try:
+        record_reading(weather_data)
+    except Exception as e:
+        logger.warning(f"Could not update the online model of city {weather_data.city_id}: {e}")
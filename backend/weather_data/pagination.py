@@ -0,0 +1,233 @@
+"""
+Keyset (cursor) pagination for list endpoints over growing tables
+"""
+import logging
+from django.core import signing
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+logger = logging.getLogger('weather247')
+
+
+class KeysetPagination(BasePagination):
+    """Newest-first pagination on a (timestamp, id) key.
+
+    Pages are selected with a ``WHERE (ts, id) < (last_ts, last_id)`` seek
+    instead of ``OFFSET``, so page 500 costs the same as page 1 and no
+    ``COUNT(*)`` is ever issued. Cursors are opaque and signed with
+    ``SECRET_KEY``, which stops clients from forging positions or replaying
+    a cursor against a different ordering field.
+    """
+
+    ordering_field = 'timestamp'
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    salt = 'weather247.pagination.keyset'
+
+    def __init__(self, ordering_field=None, page_size=None, max_page_size=None):
+        if ordering_field:
+            self.ordering_field = ordering_field
+        if page_size:
+            self.page_size = page_size
+        if max_page_size:
+            self.max_page_size = max_page_size
+        self.base_url = None
+        self.next_position = None
+        self.previous_position = None
+        self.has_next = False
+        self.has_previous = False
+
+    # Cursor encoding
+
+    def _get_salt(self):
+        return f'{self.salt}:{self.ordering_field}'
+
+    def encode_cursor(self, position, reverse=False):
+        """Encode a (timestamp, id) position as a signed, opaque token"""
+        timestamp, pk = position
+        payload = {'t': timestamp.isoformat(), 'i': pk, 'r': int(reverse)}
+        return signing.dumps(payload, salt=self._get_salt(), compress=True)
+
+    def decode_cursor(self, token):
+        """Decode a cursor token, returning ((timestamp, id), reverse) or None"""
+        if not token:
+            return None
+        try:
+            payload = signing.loads(token, salt=self._get_salt())
+            timestamp = parse_datetime(payload['t'])
+            if timestamp is None:
+                raise ValueError('Invalid cursor timestamp')
+            return (timestamp, int(payload['i'])), bool(payload.get('r'))
+        except (signing.BadSignature, KeyError, TypeError, ValueError) as e:
+            logger.debug(f'Rejected pagination cursor: {e}')
+            raise NotFound('Invalid cursor')
+
+    # Query construction
+
+    @staticmethod
+    def _get_params(request):
+        # Plain Django views only expose request.GET
+        return getattr(request, 'query_params', request.GET)
+
+    def get_page_size(self, request):
+        if request is not None and self.page_size_query_param:
+            try:
+                requested = int(self._get_params(request).get(self.page_size_query_param, self.page_size))
+            except (TypeError, ValueError):
+                requested = self.page_size
+            if requested > 0:
+                return min(requested, self.max_page_size)
+        return self.page_size
+
+    def _seek(self, queryset, position, reverse):
+        field = self.ordering_field
+        timestamp, pk = position
+        if reverse:
+            # Walking back towards newer rows
+            condition = Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'pk__gt': pk})
+            return queryset.filter(condition).order_by(field, 'pk')
+        condition = Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'pk__lt': pk})
+        return queryset.filter(condition).order_by(f'-{field}', '-pk')
+
+    def _position(self, item):
+        if isinstance(item, dict):
+            return item[self.ordering_field], item.get('pk', item.get('id'))
+        return getattr(item, self.ordering_field), item.pk
+
+    def paginate(self, queryset, cursor=None, page_size=None):
+        """Return one page of ``queryset`` after ``cursor`` (newest first)"""
+        page_size = page_size or self.page_size
+        decoded = self.decode_cursor(cursor)
+
+        if decoded:
+            position, reverse = decoded
+            queryset = self._seek(queryset, position, reverse)
+        else:
+            reverse = False
+            queryset = queryset.order_by(f'-{self.ordering_field}', '-pk')
+
+        # Fetch one extra row to learn whether another page exists
+        items = list(queryset[:page_size + 1])
+        has_more = len(items) > page_size
+        items = items[:page_size]
+
+        if reverse:
+            items.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_next = has_more
+            self.has_previous = decoded is not None
+
+        self.next_position = self._position(items[-1]) if items and self.has_next else None
+        self.previous_position = self._position(items[0]) if items and self.has_previous else None
+        return items
+
+    # DRF integration
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = self._get_params(request)
+        self.base_url = request.build_absolute_uri(request.path)
+        self.query_params = params.copy()
+        return self.paginate(
+            queryset,
+            cursor=params.get(self.cursor_query_param),
+            page_size=self.get_page_size(request),
+        )
+
+    def get_next_cursor(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_previous_cursor(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def _build_link(self, cursor):
+        if cursor is None or self.base_url is None:
+            return None
+        params = self.query_params.copy()
+        params[self.cursor_query_param] = cursor
+        return f'{self.base_url}?{params.urlencode()}'
+
+    def get_next_link(self):
+        return self._build_link(self.get_next_cursor())
+
+    def get_previous_link(self):
+        return self._build_link(self.get_previous_cursor())
+
+    def get_pagination_metadata(self):
+        """Pagination block for function views that build their own payload"""
+        return {
+            'next_cursor': self.get_next_cursor(),
+            'previous_cursor': self.get_previous_cursor(),
+            'has_next': self.has_next,
+            'has_previous': self.has_previous,
+        }
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class CreatedAtKeysetPagination(KeysetPagination):
+    """Keyset pagination for models stamped with ``created_at``"""
+    ordering_field = 'created_at'
+
+
+def paginate_by_keyset(queryset, request, ordering_field='timestamp', page_size=None, max_page_size=None):
+    """Paginate a queryset from a plain view and return (items, paginator)"""
+    paginator = KeysetPagination(
+        ordering_field=ordering_field, page_size=page_size, max_page_size=max_page_size
+    )
+    return paginator.paginate_queryset(queryset, request), paginator
+
+
+class EstimatedCountPaginator(Paginator):
+    """Admin changelist paginator that skips exact COUNT(*) on unfiltered tables.
+
+    Django admin needs page numbers, so it keeps OFFSET paging, but the total
+    comes from the planner's row estimate on PostgreSQL instead of a full scan.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[getattr(queryset, 'db', 'default')]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT reltuples FROM pg_class WHERE relname = %s',
+                        [queryset.model._meta.db_table]
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] > 0:
+                    return int(row[0])
+            except Exception as e:
+                logger.debug(f'Falling back to exact count: {e}')
+        return super().count
@@ -0,0 +1,210 @@
+"""
+Chunked per-city analytics with serial, process pool or Celery execution
+
+Cities are split into chunks; each chunk loads its rollups with one query
+and returns the weekly analytics of its cities plus a mergeable temperature
+aggregate. Chunks run in this process, in a ``ProcessPoolExecutor`` or as
+a Celery chord, and their results are merged into one summary. A failing
+chunk is reported in the summary without affecting the others.
+"""
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .cache_manager import WeatherCacheManager
+from .models import City
+from .rollups import WEATHER_ROLLUP_METRICS, RunningAggregate, city_subject, get_rolling_aggregates
+
+logger = logging.getLogger('weather247')
+
+EXECUTION_MODES = ('serial', 'process', 'celery')
+
+
+def chunked(items, size):
+    """Consecutive lists of at most ``size`` items"""
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def analyze_city_chunk(city_ids, days=7):
+    """Weekly analytics of one chunk of cities, from a single rollup query"""
+    cities = list(City.objects.filter(id__in=city_ids).values_list('id', 'name'))
+    aggregates = get_rolling_aggregates(
+        WEATHER_ROLLUP_METRICS, timezone.now() - timedelta(days=days),
+        subjects=[city_subject(city_id) for city_id, _ in cities]
+    )
+
+    analytics = {}
+    temperature_overall = RunningAggregate()
+    errors = []
+    for city_id, city_name in cities:
+        try:
+            temperature = aggregates.get((city_subject(city_id), 'temperature'))
+            if not temperature or not temperature.count:
+                continue
+            humidity = aggregates.get((city_subject(city_id), 'humidity'))
+
+            analytics[city_name] = {
+                'city': city_name,
+                'avg_temperature': temperature.mean,
+                'max_temperature': temperature.max_value,
+                'min_temperature': temperature.min_value,
+                'std_temperature': temperature.std,
+                'p95_temperature': temperature.quantile(0.95),
+                'avg_humidity': humidity.mean if humidity else None,
+                'data_points': temperature.count,
+                'generated_at': timezone.now().isoformat()
+            }
+            temperature_overall.merge(temperature)
+        except Exception as e:
+            logger.error(f'Error generating analytics for {city_name}: {e}')
+            errors.append(city_name)
+
+    return {
+        'cities': len(city_ids),
+        'processed': len(analytics),
+        'skipped': len(cities) - len(analytics) - len(errors),
+        'city_errors': errors,
+        'temperature': temperature_overall.to_dict(),
+        'analytics': analytics,
+    }
+
+
+def store_city_analytics(analytics):
+    """Cache the weekly analytics of each city in one round-trip"""
+    if analytics:
+        WeatherCacheManager.set_many_cache({
+            WeatherCacheManager.get_analytics_cache_key(city_name, 'weekly'): payload
+            for city_name, payload in analytics.items()
+        }, 'analytics')
+    return len(analytics)
+
+
+def _init_worker():
+    # Spawned workers start without Django; forked ones already have it
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def run_city_chunk(index, city_ids, days):
+    """``analyze_city_chunk`` tagged with its index, with failures returned instead of raised"""
+    try:
+        return dict(analyze_city_chunk(city_ids, days), chunk=index)
+    except Exception as e:
+        logger.error(f'Analytics chunk {index} ({len(city_ids)} cities) failed: {e}')
+        return {'chunk': index, 'cities': len(city_ids), 'error': str(e)}
+
+
+def _run_in_processes(chunks, days, workers, on_result):
+    # Forked workers must not share the parent's database sockets
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {
+            executor.submit(run_city_chunk, index, city_ids, days): (index, city_ids)
+            for index, city_ids in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            index, city_ids = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # Worker crashed (e.g. killed) rather than the chunk raising
+                logger.error(f'Analytics chunk {index} lost its worker: {e}')
+                result = {'chunk': index, 'cities': len(city_ids), 'error': str(e)}
+            on_result(result)
+
+
+def merge_chunk_results(results, started_at=None):
+    """Combine chunk results into one summary (counts, failed chunks, overall temperature)"""
+    temperature = RunningAggregate()
+    summary = {
+        'chunks': len(results),
+        'cities': 0,
+        'cities_processed': 0,
+        'cities_skipped': 0,
+        'city_errors': [],
+        'failed_chunks': [],
+    }
+    for result in sorted(results, key=lambda r: r['chunk']):
+        summary['cities'] += result['cities']
+        if 'error' in result:
+            summary['failed_chunks'].append(
+                {'chunk': result['chunk'], 'cities': result['cities'], 'error': result['error']}
+            )
+            continue
+        summary['cities_processed'] += result['processed']
+        summary['cities_skipped'] += result['skipped']
+        summary['city_errors'].extend(result['city_errors'])
+        temperature.merge(RunningAggregate.from_dict(result['temperature']))
+
+    summary['temperature'] = temperature.summary()
+    if started_at is not None:
+        summary['elapsed_seconds'] = round(time.monotonic() - started_at, 2)
+    summary['generated_at'] = timezone.now().isoformat()
+    return summary
+
+
+def run_city_analytics(city_ids=None, days=7, mode=None, workers=None, chunk_size=None, progress=None):
+    """Generate and cache weekly analytics for ``city_ids`` (default: active cities).
+
+    ``mode`` is 'serial', 'process' or 'celery' (default from
+    ``ANALYTICS_EXECUTION_MODE``). ``progress(done, total, result)`` is
+    called after each chunk in the local modes. Returns the merged summary,
+    or the dispatched chord's id in 'celery' mode.
+    """
+    mode = mode or settings.ANALYTICS_EXECUTION_MODE
+    workers = workers or settings.ANALYTICS_WORKERS
+    chunk_size = chunk_size or settings.ANALYTICS_CHUNK_SIZE
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(EXECUTION_MODES)}")
+
+    if city_ids is None:
+        city_ids = City.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)
+    chunks = chunked(city_ids, chunk_size)
+
+    if mode == 'celery' and chunks:
+        from celery import chord
+        from .tasks import generate_city_analytics_chunk, merge_city_analytics_chunks
+
+        result = chord(
+            generate_city_analytics_chunk.s(index, city_ids, days) for index, city_ids in enumerate(chunks)
+        )(merge_city_analytics_chunks.s())
+        logger.info(f'Dispatched {len(chunks)} analytics chunks as chord {result.id}')
+        return {'mode': mode, 'chunks': len(chunks), 'task_id': result.id}
+
+    if mode == 'process' and (workers < 2 or multiprocessing.current_process().daemon):
+        # Daemonic processes (e.g. Celery prefork children) cannot start a pool
+        logger.info('Process pool unavailable here; generating city analytics serially')
+        mode = 'serial'
+
+    started_at = time.monotonic()
+    results = []
+
+    def on_result(result):
+        if 'analytics' in result:
+            store_city_analytics(result.pop('analytics'))
+        results.append(result)
+        if progress:
+            progress(len(results), len(chunks), result)
+
+    if mode == 'process':
+        _run_in_processes(chunks, days, workers, on_result)
+    else:
+        for index, chunk in enumerate(chunks):
+            on_result(run_city_chunk(index, chunk, days))
+
+    summary = merge_chunk_results(results, started_at)
+    summary['mode'] = mode
+    logger.info(
+        f"City analytics ({mode}): {summary['cities_processed']}/{summary['cities']} cities, "
+        f"{len(summary['failed_chunks'])} failed chunks in {summary['elapsed_seconds']}s"
+    )
+    return summary
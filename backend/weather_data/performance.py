@@ -13,6 +13,7 @@ import gzip
 import json
 from io import BytesIO
 
+from .latency import get_path_latency_stats
 from .models import City, WeatherData, AirQualityData
 
 logger = logging.getLogger('weather247')
@@ -269,29 +270,16 @@ class PaginationOptimizer:
         }
     
     @staticmethod
-    def get_cursor_paginated_data(queryset, cursor_field='id', cursor_value=None, limit=20):
-        """Cursor-based pagination for better performance on large datasets"""
-        if cursor_value:
-            queryset = queryset.filter(**{f'{cursor_field}__gt': cursor_value})
+    def get_cursor_paginated_data(queryset, cursor=None, limit=20, ordering_field='timestamp'):
+        """Keyset pagination on (ordering_field, id) for large, growing tables"""
+        from .pagination import KeysetPagination
         
-        # Get one extra item to check if there are more results
-        items = list(queryset[:limit + 1])
-        
-        has_more = len(items) > limit
-        if has_more:
-            items = items[:limit]
-        
-        next_cursor = None
-        if has_more and items:
-            next_cursor = getattr(items[-1], cursor_field)
+        paginator = KeysetPagination(ordering_field=ordering_field, page_size=limit)
+        items = paginator.paginate(queryset, cursor=cursor, page_size=min(limit, paginator.max_page_size))
         
         return {
-            'data': [item for item in items],
-            'pagination': {
-                'has_more': has_more,
-                'next_cursor': next_cursor,
-                'limit': limit
-            }
+            'data': items,
+            'pagination': dict(paginator.get_pagination_metadata(), limit=limit)
         }
 
 
@@ -314,12 +302,8 @@ class PerformanceMonitor:
                 'key_count': 150
             }
             
-            # Response time metrics (would be collected from middleware)
-            response_stats = {
-                'avg_response_time': '120ms',
-                'p95_response_time': '250ms',
-                'p99_response_time': '500ms'
-            }
+            # Response time percentiles from the per-path histograms kept by the middleware
+            response_stats = get_path_latency_stats()
             
             return {
                 'database': db_stats,
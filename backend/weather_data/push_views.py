@@ -13,6 +13,8 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from .models import NotificationLog
+from .pagination import CreatedAtKeysetPagination
 from .push_notifications import PushNotificationService, PushSubscription
 
 logger = logging.getLogger(__name__)
@@ -183,6 +185,29 @@ def subscription_status(request):
         return Response({'error': 'Failed to get subscription status'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def notification_logs(request):
+    """List push notification delivery logs, newest first (staff may pass all=true)"""
+    logs = NotificationLog.objects.all()
+    if not (request.user.is_staff and request.GET.get('all') == 'true'):
+        logs = logs.filter(subscription__user=request.user)
+    
+    notification_type = request.GET.get('type')
+    if notification_type:
+        logs = logs.filter(notification_type=notification_type)
+    
+    paginator = CreatedAtKeysetPagination()
+    page = paginator.paginate_queryset(
+        logs.values(
+            'id', 'notification_type', 'title', 'body', 'data',
+            'status', 'error_message', 'created_at'
+        ),
+        request
+    )
+    return paginator.get_paginated_response(page)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def send_weather_alert(request):
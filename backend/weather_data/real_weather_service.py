@@ -34,10 +34,22 @@ logger = logging.getLogger('weather247')
 class OpenWeatherMapService:
     """Enhanced OpenWeatherMap API integration with caching and error handling"""
     
+    # Demo coordinates for major cities
+    DEMO_COORDINATES = {
+        'new york': (40.7128, -74.0060),
+        'london': (51.5074, -0.1278),
+        'tokyo': (35.6762, 139.6503),
+        'paris': (48.8566, 2.3522),
+        'sydney': (-33.8688, 151.2093),
+        'dubai': (25.2048, 55.2708),
+        'mumbai': (19.0760, 72.8777),
+        'singapore': (1.3521, 103.8198),
+    }
+    
     def __init__(self):
         self.api_key = getattr(settings, 'OPENWEATHERMAP_API_KEY', 'demo-key')
-        self.base_url = 'https://api.openweathermap.org/data/2.5'
-        self.geo_url = 'https://api.openweathermap.org/geo/1.0'
+        self.base_url = getattr(settings, 'OPENWEATHER_BASE_URL', 'https://api.openweathermap.org/data/2.5')
+        self.geo_url = getattr(settings, 'OPENWEATHER_GEO_URL', 'https://api.openweathermap.org/geo/1.0')
         self.cache_timeout = 900  # 15 minutes
         self.session = None
     
@@ -45,19 +57,7 @@ class OpenWeatherMapService:
         """Get coordinates for a city"""
         try:
             if self.api_key == 'demo-key':
-                # Return demo coordinates for major cities
-                demo_coords = {
-                    'new york': (40.7128, -74.0060),
-                    'london': (51.5074, -0.1278),
-                    'tokyo': (35.6762, 139.6503),
-                    'paris': (48.8566, 2.3522),
-                    'sydney': (-33.8688, 151.2093),
-                    'dubai': (25.2048, 55.2708),
-                    'mumbai': (19.0760, 72.8777),
-                    'singapore': (1.3521, 103.8198),
-                }
-                key = city_name.lower()
-                return demo_coords.get(key, (40.7128, -74.0060))
+                return self.DEMO_COORDINATES.get(city_name.lower(), (40.7128, -74.0060))
             
             query = f"{city_name}"
             if country_code:
@@ -151,8 +151,10 @@ class OpenWeatherMapService:
         response = requests.get(url, params=params, timeout=10)
         response.raise_for_status()
         
-        data = response.json()
-        
+        return self._save_current_weather(city_name, country_code, lat, lon, response.json())
+    
+    def _save_current_weather(self, city_name, country_code, lat, lon, data):
+        """Persist a current weather API payload"""
         # Get or create city (fix duplicate issue)
         city = City.objects.filter(name__iexact=city_name).first()
         if not city:
@@ -200,37 +202,39 @@ class OpenWeatherMapService:
             response = requests.get(url, params=params, timeout=10)
             response.raise_for_status()
             
-            data = response.json()
-            
-            # Get city by coordinates
-            city = City.objects.filter(
-                latitude__range=(lat-0.1, lat+0.1),
-                longitude__range=(lon-0.1, lon+0.1)
-            ).first()
-            
-            if not city:
-                return None
-            
-            components = data['list'][0]['components']
-            
-            air_quality = AirQualityData.objects.create(
-                city=city,
-                aqi=data['list'][0]['main']['aqi'],
-                pm2_5=components.get('pm2_5', 0),
-                pm10=components.get('pm10', 0),
-                co=components.get('co', 0),
-                no2=components.get('no2', 0),
-                o3=components.get('o3', 0),
-                so2=components.get('so2', 0),
-                timestamp=timezone.now()
-            )
-            
-            return air_quality
+            return self._save_air_quality(lat, lon, response.json())
             
         except Exception as e:
             logger.error(f"Error getting air quality for {lat}, {lon}: {e}")
             return self._get_demo_air_quality(lat, lon)
     
+    def _save_air_quality(self, lat, lon, data):
+        """Persist an air pollution API payload"""
+        # Get city by coordinates
+        city = City.objects.filter(
+            latitude__range=(lat-0.1, lat+0.1),
+            longitude__range=(lon-0.1, lon+0.1)
+        ).first()
+        
+        if not city:
+            return None
+        
+        components = data['list'][0]['components']
+        
+        air_quality = AirQualityData.objects.create(
+            city=city,
+            aqi=data['list'][0]['main']['aqi'],
+            pm2_5=components.get('pm2_5', 0),
+            pm10=components.get('pm10', 0),
+            co=components.get('co', 0),
+            no2=components.get('no2', 0),
+            o3=components.get('o3', 0),
+            so2=components.get('so2', 0),
+            timestamp=timezone.now()
+        )
+        
+        return air_quality
+    
     def get_forecast(self, city_name, country_code='', days=5):
         """Get weather forecast"""
         try:
@@ -254,42 +258,53 @@ class OpenWeatherMapService:
             response = requests.get(url, params=params, timeout=10)
             response.raise_for_status()
             
-            data = response.json()
-            
-            # Get city
-            city = City.objects.filter(name__iexact=city_name).first()
-            if not city:
-                return []
-            
-            forecasts = []
-            processed_dates = set()
-            
-            for item in data['list'][:days*8]:  # 8 forecasts per day (3-hour intervals)
-                forecast_date = datetime.fromtimestamp(item['dt']).date()
-                
-                if forecast_date not in processed_dates:
-                    forecast = WeatherForecast.objects.create(
-                        city=city,
-                        forecast_date=forecast_date,
-                        temperature_max=item['main']['temp_max'],
-                        temperature_min=item['main']['temp_min'],
-                        humidity=item['main']['humidity'],
-                        pressure=item['main']['pressure'],
-                        wind_speed=item['wind'].get('speed', 0) * 3.6,
-                        weather_condition=item['weather'][0]['main'],
-                        weather_description=item['weather'][0]['description'],
-                        precipitation_probability=item.get('pop', 0) * 100,
-                        created_at=timezone.now()
-                    )
-                    forecasts.append(forecast)
-                    processed_dates.add(forecast_date)
-            
-            return forecasts
+            return self._save_forecast(city_name, days, response.json())
             
         except Exception as e:
             logger.error(f"Error getting forecast for {city_name}: {e}")
             return self._get_demo_forecast(city_name, days)
     
+    def _save_forecast(self, city_name, days, data):
+        """Persist a forecast API payload, one row per day"""
+        # Get city
+        city = City.objects.filter(name__iexact=city_name).first()
+        if not city:
+            return []
+        
+        forecasts = []
+        processed_dates = set()
+        
+        for item in data['list'][:days*8]:  # 8 forecasts per day (3-hour intervals)
+            forecast_day = datetime.fromtimestamp(item['dt']).date()
+            
+            if forecast_day not in processed_dates:
+                # One row per city/day/source; refreshes update it in place
+                forecast, _ = WeatherForecast.objects.update_or_create(
+                    city=city,
+                    forecast_date=timezone.make_aware(datetime.combine(forecast_day, datetime.min.time())),
+                    data_source='openweathermap',
+                    defaults={
+                        'temperature_max': item['main']['temp_max'],
+                        'temperature_min': item['main']['temp_min'],
+                        'temperature_avg': item['main']['temp'],
+                        'humidity': item['main']['humidity'],
+                        'pressure': item['main']['pressure'],
+                        'wind_speed': item['wind'].get('speed', 0) * 3.6,
+                        'wind_direction': item['wind'].get('deg', 0),
+                        'weather_condition': item['weather'][0]['main'],
+                        'weather_description': item['weather'][0]['description'],
+                        'weather_icon': item['weather'][0].get('icon', '01d'),
+                        'cloudiness': item.get('clouds', {}).get('all', 0),
+                        'precipitation_probability': item.get('pop', 0) * 100,
+                    }
+                )
+                # The update path doesn't cache the city; async callers can't lazy-load it
+                forecast.city = city
+                forecasts.append(forecast)
+                processed_dates.add(forecast_day)
+        
+        return forecasts
+    
     def _get_demo_weather(self, city_name):
         """Generate demo weather data"""
         import random
@@ -395,25 +410,41 @@ class OpenWeatherMapService:
             return []
         
         forecasts = []
-        base_date = timezone.now().date()
+        base_date = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        conditions = [
+            ('Clear', 'clear sky', '01d'),
+            ('Clouds', 'few clouds', '02d'),
+            ('Rain', 'light rain', '10d'),
+            ('Snow', 'heavy snow', '13d')
+        ]
         
         for i in range(days):
             forecast_date = base_date + timedelta(days=i+1)
             base_temp = random.uniform(15, 30)
+            temperature_max = round(base_temp + random.uniform(0, 5), 1)
+            temperature_min = round(base_temp - random.uniform(0, 10), 1)
+            condition, description, icon = random.choice(conditions)
             
-            forecast = WeatherForecast.objects.create(
+            forecast, _ = WeatherForecast.objects.update_or_create(
                 city=city,
                 forecast_date=forecast_date,
-                temperature_max=round(base_temp + random.uniform(0, 5), 1),
-                temperature_min=round(base_temp - random.uniform(0, 10), 1),
-                humidity=random.randint(30, 90),
-                pressure=random.randint(1000, 1030),
-                wind_speed=round(random.uniform(0, 25), 1),
-                weather_condition=random.choice(['Clear', 'Clouds', 'Rain', 'Snow']),
-                weather_description=random.choice(['clear sky', 'few clouds', 'light rain', 'heavy snow']),
-                precipitation_probability=random.randint(0, 100),
-                created_at=timezone.now()
+                data_source='demo',
+                defaults={
+                    'temperature_max': temperature_max,
+                    'temperature_min': temperature_min,
+                    'temperature_avg': round((temperature_max + temperature_min) / 2, 1),
+                    'humidity': random.randint(30, 90),
+                    'pressure': random.randint(1000, 1030),
+                    'wind_speed': round(random.uniform(0, 25), 1),
+                    'wind_direction': random.randint(0, 360),
+                    'weather_condition': condition,
+                    'weather_description': description,
+                    'weather_icon': icon,
+                    'cloudiness': random.randint(0, 100),
+                    'precipitation_probability': random.randint(0, 100),
+                }
             )
+            forecast.city = city
             forecasts.append(forecast)
         
         return forecasts
@@ -474,8 +505,14 @@ class WeatherManager:
         except Exception:
             return None
     
-    def get_comprehensive_weather(self, city_name, country_code=''):
-        """Get comprehensive weather data with error handling"""
+    def get_comprehensive_weather(self, city_name, country_code='', include=None):
+        """Get comprehensive weather data with error handling
+
+        ``include`` limits the extra provider calls to the named sections
+        (``air_quality``, ``forecast``); skipped sections come back empty.
+        """
+        if include is None:
+            include = ('air_quality', 'forecast')
         try:
             # Get current weather with fallback
             current_weather = self.get_current_weather_with_fallback(city_name, country_code)
@@ -485,20 +522,22 @@ class WeatherManager:
             
             # Get air quality with error handling
             air_quality = None
-            try:
-                air_quality = self.primary_service.get_air_quality(
-                    current_weather.city.latitude,
-                    current_weather.city.longitude
-                )
-            except Exception as e:
-                logger.warning(f"Air quality data unavailable for {city_name}: {e}")
+            if 'air_quality' in include:
+                try:
+                    air_quality = self.primary_service.get_air_quality(
+                        current_weather.city.latitude,
+                        current_weather.city.longitude
+                    )
+                except Exception as e:
+                    logger.warning(f"Air quality data unavailable for {city_name}: {e}")
             
             # Get forecast with error handling
             forecast = []
-            try:
-                forecast = self.primary_service.get_forecast(city_name, country_code, 5)
-            except Exception as e:
-                logger.warning(f"Forecast data unavailable for {city_name}: {e}")
+            if 'forecast' in include:
+                try:
+                    forecast = self.primary_service.get_forecast(city_name, country_code, 5)
+                except Exception as e:
+                    logger.warning(f"Forecast data unavailable for {city_name}: {e}")
             
             return {
                 'current': current_weather,
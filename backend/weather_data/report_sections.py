@@ -0,0 +1,165 @@
+"""
+Materialized analytics report sections
+
+The analytics report is split into sections that are computed, versioned
+and cached independently. Each section has its own refresh cadence
+(``max_age``) and a dirty flag raised by the writes it depends on; a
+dirty section is recomputed once it is at least ``min_age`` old, so a
+burst of writes does not trigger a burst of recomputations. Readers get
+the stored section without touching the database unless it is stale.
+"""
+import logging
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .cache_manager import WeatherCacheManager
+
+logger = logging.getLogger('weather247')
+
+KEY_PREFIX = 'analytics:report'
+
+# Seconds a rebuild may hold the lock before another worker takes over
+REFRESH_LOCK_SECONDS = 120
+
+
+class ReportSection:
+    """One independently refreshed piece of the analytics report"""
+
+    def __init__(self, name, build, max_age, min_age=0, defaults=None):
+        self.name = name
+        self.build = build
+        self.max_age = max_age
+        self.min_age = min_age
+        self.defaults = defaults or {}
+
+    def params(self, **params):
+        """Section parameters, defaults filled in and unrelated keys dropped"""
+        return {key: params.get(key) or default for key, default in self.defaults.items()}
+
+    def key(self, params):
+        suffix = ''.join(f':{key}={value}' for key, value in sorted(params.items()))
+        return f'{KEY_PREFIX}:{self.name}{suffix}'
+
+
+def _build_api_usage(hours):
+    from .analytics import weather_analytics
+    return weather_analytics.get_api_usage_stats(hours)
+
+
+def _build_cache_performance():
+    from .analytics import weather_analytics
+    return weather_analytics.get_cache_performance_stats()
+
+
+def _build_data_freshness():
+    from .analytics import weather_analytics
+    return weather_analytics.get_data_freshness_stats()
+
+
+def _build_weather_trends(days):
+    from .analytics import weather_analytics
+    return weather_analytics.get_weather_trends(days)
+
+
+REPORT_SECTIONS = {
+    section.name: section for section in (
+        ReportSection('api_usage', _build_api_usage, max_age=900, min_age=60, defaults={'hours': 24}),
+        # Cache counters change without model writes: cadence only
+        ReportSection('cache_performance', _build_cache_performance, max_age=300),
+        ReportSection('data_freshness', _build_data_freshness, max_age=300, min_age=60),
+        ReportSection('weather_trends', _build_weather_trends, max_age=3600, min_age=300, defaults={'days': 7}),
+    )
+}
+
+# Sections whose inputs change with each kind of write
+WEATHER_DATA_SECTIONS = ('api_usage', 'data_freshness', 'weather_trends')
+CITY_SECTIONS = ('data_freshness', 'weather_trends')
+
+
+def _dirty_key(name):
+    return f'{KEY_PREFIX}:{name}:dirty_at'
+
+
+def mark_sections_dirty(*names):
+    """Flag sections (every parameter variant) for recomputation on their next read or refresh"""
+    now = time.time()
+    cache.set_many({_dirty_key(name): now for name in names}, None)
+
+
+def is_stale(section, entry, now=None, dirty_at=None):
+    if entry is None:
+        return True
+    now = now or time.time()
+    age = now - entry['built_at']
+    if age >= section.max_age:
+        return True
+    if dirty_at is None:
+        dirty_at = cache.get(_dirty_key(section.name))
+    return dirty_at is not None and dirty_at >= entry['built_at'] and age >= section.min_age
+
+
+def _rebuild(section, key, params, previous):
+    started = time.time()
+    data = section.build(**params)
+    if isinstance(data, dict) and 'error' in data:
+        # Stored like any result (e.g. "no data yet"); the next write or the cadence retries it
+        logger.info(f"Report section {section.name} built with error: {data['error']}")
+
+    entry = {
+        'data': data,
+        'version': (previous or {}).get('version', 0) + 1,
+        # Start time, so writes that land during the build keep the section dirty
+        'built_at': started,
+        'generated_at': timezone.now().isoformat(),
+    }
+    WeatherCacheManager.set_cache(key, entry, 'report_section')
+    logger.debug(f'Report section {section.name} v{entry["version"]} built in {time.time() - started:.2f}s')
+    return entry
+
+
+def get_report_section(name, force=False, **params):
+    """Stored entry of section ``name`` (``data``, ``version``, ``generated_at``), rebuilt only if stale"""
+    section = REPORT_SECTIONS[name]
+    params = section.params(**params)
+    key = section.key(params)
+
+    entry = WeatherCacheManager.get_cache(key)
+    if not force and not is_stale(section, entry):
+        return entry
+
+    # One worker rebuilds; the others keep serving the previous version
+    lock_key = f'{key}:lock'
+    locked = cache.add(lock_key, 1, REFRESH_LOCK_SECONDS)
+    if not locked and entry is not None and not force:
+        return entry
+    try:
+        return _rebuild(section, key, params, entry)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def get_report(names=None, **params):
+    """Report assembled from the stored sections, with per-section version metadata"""
+    report = {'sections': {}}
+    for name in names or REPORT_SECTIONS:
+        entry = get_report_section(name, **params)
+        report[name] = entry['data']
+        report['sections'][name] = {'version': entry['version'], 'generated_at': entry['generated_at']}
+    report['generated_at'] = timezone.now().isoformat()
+    return report
+
+
+def refresh_report_sections(force=False):
+    """Recompute the stale sections (default parameters) and return the names that were rebuilt"""
+    refreshed = []
+    for name, section in REPORT_SECTIONS.items():
+        before = WeatherCacheManager.get_cache(section.key(section.params()))
+        if not force and not is_stale(section, before):
+            continue
+        after = get_report_section(name, force=force)
+        if after.get('version') != (before or {}).get('version'):
+            refreshed.append(name)
+    return refreshed
@@ -0,0 +1,425 @@
+"""
+Incremental running aggregates (count, sum, sum of squares, min, max and a
+quantile sketch) kept per subject, metric and hour
+"""
+import logging
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .aggregation import truncate
+from .models import MetricRollup
+
+logger = logging.getLogger('weather247')
+
+WEATHER_ROLLUP_METRICS = ('temperature', 'humidity', 'pressure', 'wind_speed')
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with bounded relative error (DDSketch style).
+
+    Values are counted in logarithmic bins, so any quantile is returned
+    within ``relative_accuracy`` of the true value and two sketches merge
+    by adding bin counts. Bins are keyed by strings to round-trip through
+    JSON unchanged.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_bins=512):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = defaultdict(int)
+        self.negative = defaultdict(int)
+        self.zero_count = 0
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.positive.values()) + sum(self.negative.values())
+
+    def _key(self, magnitude):
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        if abs(value) < 1e-9:
+            self.zero_count += count
+        elif value > 0:
+            self.positive[self._key(value)] += count
+        else:
+            self.negative[self._key(-value)] += count
+        self._collapse()
+
+    def merge(self, other):
+        for key, count in other.positive.items():
+            self.positive[key] += count
+        for key, count in other.negative.items():
+            self.negative[key] += count
+        self.zero_count += other.zero_count
+        self._collapse()
+        return self
+
+    def _collapse(self):
+        # Fold the smallest magnitudes together once the bin budget is spent;
+        # accuracy is only lost for values closest to zero
+        for store in (self.positive, self.negative):
+            while len(store) > self.max_bins:
+                lowest, next_lowest = sorted(store)[:2]
+                store[next_lowest] += store.pop(lowest)
+
+    def quantile(self, q):
+        """Approximate value at quantile ``q`` (0..1), ``None`` when empty"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def to_dict(self):
+        return {
+            'accuracy': self.relative_accuracy,
+            'pos': {str(k): v for k, v in self.positive.items()},
+            'neg': {str(k): v for k, v in self.negative.items()},
+            'zero': self.zero_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(relative_accuracy=(data or {}).get('accuracy', 0.01))
+        if data:
+            sketch.positive.update({int(k): v for k, v in data.get('pos', {}).items()})
+            sketch.negative.update({int(k): v for k, v in data.get('neg', {}).items()})
+            sketch.zero_count = data.get('zero', 0)
+        return sketch
+
+
+class RunningAggregate:
+    """Count, sum, sum of squares, min, max and quantiles of a stream of values"""
+
+    def __init__(self, count=0, total=0.0, sum_squares=0.0, min_value=None, max_value=None, sketch=None):
+        self.count = count
+        self.total = total
+        self.sum_squares = sum_squares
+        self.min_value = min_value
+        self.max_value = max_value
+        self.sketch = sketch or QuantileSketch()
+
+    @classmethod
+    def from_rollup(cls, rollup):
+        return cls(
+            rollup.count, rollup.total, rollup.sum_squares, rollup.min_value, rollup.max_value,
+            QuantileSketch.from_dict(rollup.sketch)
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['count'], data['total'], data['sum_squares'], data['min'], data['max'],
+            QuantileSketch.from_dict(data['sketch'])
+        )
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'sum_squares': self.sum_squares,
+            'min': self.min_value,
+            'max': self.max_value,
+            'sketch': self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_values(cls, values):
+        aggregate = cls()
+        for value in values:
+            aggregate.add(value)
+        return aggregate
+
+    def add(self, value):
+        if value is None:
+            return
+        self.count += 1
+        self.total += value
+        self.sum_squares += value * value
+        self.min_value = value if self.min_value is None else min(self.min_value, value)
+        self.max_value = value if self.max_value is None else max(self.max_value, value)
+        self.sketch.add(value)
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.sum_squares += other.sum_squares
+        if other.min_value is not None:
+            self.min_value = other.min_value if self.min_value is None else min(self.min_value, other.min_value)
+        if other.max_value is not None:
+            self.max_value = other.max_value if self.max_value is None else max(self.max_value, other.max_value)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def variance(self):
+        if not self.count:
+            return None
+        # Population variance; clamp the rounding error of E[x²] - E[x]²
+        return max(self.sum_squares / self.count - self.mean ** 2, 0.0)
+
+    @property
+    def std(self):
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def apply_to(self, rollup):
+        rollup.count = self.count
+        rollup.total = self.total
+        rollup.sum_squares = self.sum_squares
+        rollup.min_value = self.min_value
+        rollup.max_value = self.max_value
+        rollup.sketch = self.sketch.to_dict()
+
+    def summary(self, digits=1):
+        def _r(value):
+            return round(value, digits) if value is not None else None
+
+        return {
+            'count': self.count,
+            'avg': _r(self.mean),
+            'min': _r(self.min_value),
+            'max': _r(self.max_value),
+            'std': _r(self.std),
+            'p50': _r(self.quantile(0.5)),
+            'p95': _r(self.quantile(0.95)),
+        }
+
+
+def merge_aggregates(aggregates):
+    merged = RunningAggregate()
+    for aggregate in aggregates:
+        merged.merge(aggregate)
+    return merged
+
+
+def city_subject(city_id):
+    return f'city:{city_id}'
+
+
+def system_subject(component):
+    return f'system:{component}'
+
+
+def _locked_rollups(subject, bucket_start, metrics):
+    return {
+        rollup.metric: rollup
+        for rollup in MetricRollup.objects.select_for_update().filter(
+            subject=subject, bucket_start=bucket_start, metric__in=list(metrics)
+        )
+    }
+
+
+def record_values(subject, values, timestamp=None):
+    """Fold ``{metric: value}`` into the hourly rollups of ``subject``"""
+    values = {metric: value for metric, value in values.items() if value is not None}
+    if not values:
+        return
+    bucket_start = truncate(timestamp or timezone.now(), 'hour')
+
+    with transaction.atomic():
+        rollups = _locked_rollups(subject, bucket_start, values)
+        missing = [metric for metric in values if metric not in rollups]
+        if missing:
+            # A row that doesn't exist can't be locked: insert empty ones first, letting a
+            # concurrent first reading win the race, then lock whichever rows exist
+            MetricRollup.objects.bulk_create([
+                MetricRollup(subject=subject, metric=metric, bucket_start=bucket_start) for metric in missing
+            ], ignore_conflicts=True)
+            rollups.update(_locked_rollups(subject, bucket_start, missing))
+        for metric, value in values.items():
+            rollup = rollups[metric]
+            aggregate = RunningAggregate.from_rollup(rollup)
+            aggregate.add(value)
+            aggregate.apply_to(rollup)
+            rollup.save()
+
+
+def record_weather_reading(weather_data):
+    record_values(
+        city_subject(weather_data.city_id),
+        {metric: getattr(weather_data, metric) for metric in WEATHER_ROLLUP_METRICS},
+        weather_data.timestamp
+    )
+
+
+def record_system_metric(system_metric):
+    record_values(
+        system_subject(system_metric.component),
+        {system_metric.metric_type: system_metric.metric_value},
+        system_metric.timestamp
+    )
+
+
+def _rollup_rows(metrics, start, end, subjects=None, subject_prefix=None):
+    rows = MetricRollup.objects.filter(metric__in=list(metrics), bucket_start__gte=truncate(start, 'hour'))
+    if end is not None:
+        rows = rows.filter(bucket_start__lte=end)
+    if subjects is not None:
+        rows = rows.filter(subject__in=list(subjects))
+    if subject_prefix:
+        rows = rows.filter(subject__startswith=subject_prefix)
+    return rows.only(
+        'subject', 'metric', 'bucket_start', 'count', 'total', 'sum_squares', 'min_value', 'max_value', 'sketch'
+    )
+
+
+def get_rolling_aggregates(metrics, start, end=None, subjects=None, subject_prefix=None):
+    """``{(subject, metric): RunningAggregate}`` for the window, merged from hourly rollups in one query"""
+    merged = {}
+    for rollup in _rollup_rows(metrics, start, end, subjects, subject_prefix):
+        key = (rollup.subject, rollup.metric)
+        aggregate = RunningAggregate.from_rollup(rollup)
+        if key in merged:
+            merged[key].merge(aggregate)
+        else:
+            merged[key] = aggregate
+    return merged
+
+
+def get_bucketed_aggregates(metrics, start, end=None, bucket='day', subjects=None, subject_prefix=None):
+    """``{(subject, metric): {bucket_start: RunningAggregate}}`` with hourly rollups merged per bucket"""
+    merged = defaultdict(dict)
+    for rollup in _rollup_rows(metrics, start, end, subjects, subject_prefix):
+        buckets = merged[(rollup.subject, rollup.metric)]
+        bucket_start = truncate(rollup.bucket_start, bucket)
+        aggregate = RunningAggregate.from_rollup(rollup)
+        if bucket_start in buckets:
+            buckets[bucket_start].merge(aggregate)
+        else:
+            buckets[bucket_start] = aggregate
+    return dict(merged)
+
+
+def _rebuild_start(model, subject_prefix, start):
+    """First hour from ``start`` whose raw ``model`` rows are all still present, ``None`` without any rows.
+
+    Retention cleanup deletes raw rows long before their rollups; the hours
+    before the oldest remaining row can't be recomputed and must be kept.
+    """
+    if model.objects.filter(timestamp__lt=start).exists():
+        return start
+    oldest = model.objects.filter(timestamp__gte=start).order_by('timestamp').values_list(
+        'timestamp', flat=True
+    ).first()
+    if oldest is None:
+        return None
+    oldest_hour = truncate(oldest, 'hour')
+    partial = oldest != oldest_hour and MetricRollup.objects.filter(
+        subject__startswith=subject_prefix, bucket_start=oldest_hour
+    ).exists()
+    # The oldest hour may have lost rows to cleanup: keep its rollups unless there are none to lose
+    return oldest_hour + timedelta(hours=1) if partial else max(start, oldest_hour)
+
+
+def rebuild_rollups(start, end=None):
+    """Recompute rollups from raw rows since ``start`` (backfill, or after bulk writes that skip signals).
+
+    Hours are rebuilt whole, and only where raw rows remain to rebuild them from.
+    """
+    from .models import SystemMetrics, WeatherData
+
+    start = truncate(start, 'hour')
+    end = end or timezone.now()
+    aggregates = defaultdict(RunningAggregate)
+    rebuilt = {}
+
+    weather_start = _rebuild_start(WeatherData, 'city:', start)
+    if weather_start is not None:
+        rebuilt['city:'] = weather_start
+        for reading in WeatherData.objects.filter(timestamp__range=(weather_start, end)).values(
+            'city_id', 'timestamp', *WEATHER_ROLLUP_METRICS
+        ).iterator():
+            bucket_start = truncate(reading['timestamp'], 'hour')
+            for metric in WEATHER_ROLLUP_METRICS:
+                aggregates[(city_subject(reading['city_id']), metric, bucket_start)].add(reading[metric])
+
+    system_start = _rebuild_start(SystemMetrics, 'system:', start)
+    if system_start is not None:
+        rebuilt['system:'] = system_start
+        for sample in SystemMetrics.objects.filter(timestamp__range=(system_start, end)).values(
+            'component', 'metric_type', 'metric_value', 'timestamp'
+        ).iterator():
+            bucket_start = truncate(sample['timestamp'], 'hour')
+            aggregates[(system_subject(sample['component']), sample['metric_type'], bucket_start)].add(
+                sample['metric_value']
+            )
+
+    rollups = []
+    for (subject, metric, bucket_start), aggregate in aggregates.items():
+        if not aggregate.count:
+            continue
+        rollup = MetricRollup(subject=subject, metric=metric, bucket_start=bucket_start)
+        aggregate.apply_to(rollup)
+        rollups.append(rollup)
+
+    with transaction.atomic():
+        for prefix, since in rebuilt.items():
+            MetricRollup.objects.filter(
+                subject__startswith=prefix, bucket_start__gte=since, bucket_start__lte=end
+            ).delete()
+        MetricRollup.objects.bulk_create(rollups, batch_size=500)
+
+    logger.info(f'Rebuilt {len(rollups)} metric rollups since {start.isoformat()}')
+    return len(rollups)
+
+
+def update_performance_baselines(days=7):
+    """Refresh PerformanceBaseline rows from the system metric rollups of the last ``days``"""
+    from .models import PerformanceBaseline, SystemMetrics
+
+    metric_types = [choice for choice, _ in SystemMetrics.METRIC_TYPES]
+    aggregates = get_rolling_aggregates(
+        metric_types, timezone.now() - timedelta(days=days), subject_prefix='system:'
+    )
+
+    updated = 0
+    for (subject, metric_type), aggregate in aggregates.items():
+        if not aggregate.count:
+            continue
+        PerformanceBaseline.objects.update_or_create(
+            metric_type=metric_type,
+            component=subject.split(':', 1)[1],
+            defaults={
+                'baseline_value': aggregate.quantile(0.5),
+                'warning_threshold': aggregate.quantile(0.95),
+                'critical_threshold': aggregate.quantile(0.99),
+                'min_value': aggregate.min_value,
+                'max_value': aggregate.max_value,
+                'avg_value': aggregate.mean,
+                'std_deviation': aggregate.std,
+                'sample_size': aggregate.count,
+            }
+        )
+        updated += 1
+    return updated
@@ -1,15 +1,16 @@
 from rest_framework import serializers
 from .models import City, WeatherData, AirQualityData, WeatherForecast, HistoricalWeatherData, WeatherPrediction, UserWeatherPreference
+from .sparse_fields import SparseFieldsMixin
 from .api_management import APIProvider, APIUsage, APIFailover
 from .models import AlertRule, WeatherAlert
 
 
-class CitySerializer(serializers.ModelSerializer):
+class CitySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for City model"""
     class Meta:
         model = City
         fields = (
-            'id', 'name', 'country', 'latitude', 'longitude', 'timezone',
+            'id', 'name', 'country', 'latitude', 'longitude', 'elevation', 'timezone',
             'is_active', 'created_at', 'updated_at'
         )
         read_only_fields = (
@@ -17,7 +18,7 @@ class CitySerializer(serializers.ModelSerializer):
         )
 
 
-class WeatherDataSerializer(serializers.ModelSerializer):
+class WeatherDataSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for WeatherData model"""
     city = CitySerializer(read_only=True)
 
@@ -34,7 +35,7 @@ class WeatherDataSerializer(serializers.ModelSerializer):
         )
 
 
-class AirQualityDataSerializer(serializers.ModelSerializer):
+class AirQualityDataSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for AirQualityData model"""
     city = CitySerializer(read_only=True)
 
@@ -49,7 +50,7 @@ class AirQualityDataSerializer(serializers.ModelSerializer):
         )
 
 
-class WeatherForecastSerializer(serializers.ModelSerializer):
+class WeatherForecastSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for WeatherForecast model"""
     city = CitySerializer(read_only=True)
 
@@ -66,7 +67,7 @@ class WeatherForecastSerializer(serializers.ModelSerializer):
         )
 
 
-class HistoricalWeatherDataSerializer(serializers.ModelSerializer):
+class HistoricalWeatherDataSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for HistoricalWeatherData model"""
     city = CitySerializer(read_only=True)
 
@@ -91,10 +92,10 @@ class WeatherPredictionSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'city', 'prediction_date', 'predicted_temperature',
             'predicted_humidity', 'predicted_pressure', 'predicted_wind_speed',
-            'predicted_condition', 'confidence_score', 'model_version', 'features_used', 'created_at'
+            'predicted_condition', 'confidence_score', 'model_version', 'features_used', 'issued_at', 'created_at'
         )
         read_only_fields = (
-            'city', 'model_version', 'created_at'
+            'city', 'model_version', 'issued_at', 'created_at'
         )
 
 
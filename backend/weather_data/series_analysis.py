@@ -0,0 +1,148 @@
+"""
+Vectorized analysis of weather time series (trends, seasonality, anomalies)
+
+The analytics view runs these helpers on the hourly means of the metric rollups;
+every statistic below is computed on whole arrays, with missing values
+carried as NaN.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+
+# Percent change over the window, as fitted by the regression line, that
+# counts as a trend rather than noise
+TREND_THRESHOLD_PERCENT = 5.0
+
+
+class MetricSeries:
+    """Timestamps (epoch seconds) plus one float array per metric"""
+
+    def __init__(self, timestamps, columns):
+        self.timestamps = np.asarray(timestamps, dtype=float)
+        self.columns = {metric: np.asarray(values, dtype=float) for metric, values in columns.items()}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, metric):
+        return self.columns[metric]
+
+    def __contains__(self, metric):
+        return metric in self.columns
+
+    @property
+    def span_seconds(self):
+        return float(self.timestamps[-1] - self.timestamps[0]) if len(self) else 0.0
+
+
+def _valid(timestamps, values):
+    mask = ~np.isnan(values)
+    return timestamps[mask], values[mask]
+
+
+def linear_slope(timestamps, values):
+    """Least-squares slope of ``values`` over ``timestamps`` (units per second), ``None`` if undefined"""
+    x, y = _valid(timestamps, values)
+    if len(x) < 2:
+        return None
+    x = x - x.mean()
+    denominator = np.dot(x, x)
+    if denominator == 0:
+        return None
+    return float(np.dot(x, y - y.mean()) / denominator)
+
+
+def linear_fit(timestamps, values):
+    """Fitted regression line evaluated at every timestamp (flat at the mean when no slope is defined)"""
+    x, y = _valid(timestamps, values)
+    if not len(y):
+        return np.full_like(timestamps, np.nan)
+    slope = linear_slope(timestamps, values) or 0.0
+    return y.mean() + slope * (timestamps - x.mean())
+
+
+Decomposition = namedtuple('Decomposition', 'trend seasonal residual profile slope')
+
+
+def seasonal_decompose(timestamps, values, period=SECONDS_PER_DAY, bins=24):
+    """Split ``values`` into a linear trend, a periodic profile and a residual.
+
+    Trend and profile are fitted jointly (one level per phase bin, hour of
+    day by default, plus a shared slope), so a partial cycle at either end
+    of the window does not leak into the slope. Windows shorter than one
+    period get a plain linear fit and a zero profile. ``trend``,
+    ``seasonal`` and ``residual`` align with ``values``; ``slope`` is per
+    second and ``None`` when undefined.
+    """
+    phase = ((timestamps % period) / period * bins).astype(int) % bins
+    profile = np.zeros(bins)
+    slope = None
+
+    present = ~np.isnan(values)
+    t, y, p = timestamps[present], values[present], phase[present]
+    if len(t) >= 2 and t[-1] - t[0] >= period:
+        counts = np.bincount(p, minlength=bins)
+        occupied = counts > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_t = np.bincount(p, weights=t, minlength=bins) / counts
+            mean_y = np.bincount(p, weights=y, minlength=bins) / counts
+        # Within-bin slope estimator: regress deviations from each bin's means
+        dt, dy = t - mean_t[p], y - mean_y[p]
+        denominator = np.dot(dt, dt)
+        if denominator > 0:
+            slope = float(np.dot(dt, dy) / denominator)
+            levels = mean_y[occupied] - slope * mean_t[occupied]
+            intercept = np.average(levels, weights=counts[occupied])
+            profile[occupied] = levels - intercept
+            trend = intercept + slope * timestamps
+
+    if slope is None:
+        slope = linear_slope(timestamps, values)
+        trend = linear_fit(timestamps, values)
+
+    seasonal = profile[phase]
+    return Decomposition(trend, seasonal, values - trend - seasonal, profile, slope)
+
+
+def zscore_anomalies(values, threshold=3.0):
+    """Boolean mask of values more than ``threshold`` standard deviations from the mean"""
+    present = values[~np.isnan(values)]
+    std = present.std() if len(present) else 0.0
+    if not std:
+        return np.zeros(len(values), dtype=bool)
+    mean = present.mean()
+    with np.errstate(invalid='ignore'):
+        return np.abs((values - mean) / std) > threshold
+
+
+def trend_direction(slope, span_seconds, mean):
+    """'increasing', 'decreasing' or 'stable' from the fitted change relative to the mean"""
+    if slope is None or not mean or not span_seconds:
+        return 'stable'
+    change_percent = slope * span_seconds / abs(mean) * 100
+    if change_percent > TREND_THRESHOLD_PERCENT:
+        return 'increasing'
+    if change_percent < -TREND_THRESHOLD_PERCENT:
+        return 'decreasing'
+    return 'stable'
+
+
+def trend_summary(series, metric, mean=None, anomaly_threshold=3.0):
+    """Regression slope (per day), trend direction and anomaly count of one metric.
+
+    ``mean`` defaults to the mean of the series; pass the window mean when
+    the series holds aggregates (hourly means) rather than readings.
+    """
+    values = series[metric]
+    if mean is None:
+        mean = float(np.nanmean(values)) if np.any(~np.isnan(values)) else None
+    decomposition = seasonal_decompose(series.timestamps, values)
+    slope = decomposition.slope
+    return {
+        'slope_per_day': slope * SECONDS_PER_DAY if slope is not None else None,
+        'trend': trend_direction(slope, series.span_seconds, mean),
+        # Deviations from the expected trend and daily cycle, not from the raw mean
+        'anomalies': int(zscore_anomalies(decomposition.residual, anomaly_threshold).sum()),
+    }
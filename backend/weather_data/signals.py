@@ -0,0 +1,76 @@
+"""
+Signal handlers for the weather_data app
+"""
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .city_index import invalidate_city_index
+from .feature_store import safe_record_reading
+from .live_updates import safe_publish_weather_update
+from .online_models import safe_record_reading as safe_update_online_model
+from .models import City, SystemMetrics, WeatherData
+from .report_sections import CITY_SECTIONS, WEATHER_DATA_SECTIONS, mark_sections_dirty
+from .rollups import record_system_metric, record_weather_reading
+
+logger = logging.getLogger('weather247')
+
+
+@receiver(post_save, sender=WeatherData)
+def publish_new_weather_reading(sender, instance, created, raw=False, **kwargs):
+    """Push every newly ingested reading to live subscribers once it is committed"""
+    if created and not raw:
+        transaction.on_commit(lambda: safe_publish_weather_update(instance))
+
+
+@receiver(post_save, sender=WeatherData)
+def append_reading_features(sender, instance, created, raw=False, **kwargs):
+    """Append each committed reading to its city's feature buffer"""
+    if created and not raw:
+        transaction.on_commit(lambda: safe_record_reading(instance))
+
+
+@receiver(post_save, sender=WeatherData)
+def update_online_model(sender, instance, created, raw=False, **kwargs):
+    """Fold each committed reading into its city's online forecasting model"""
+    if created and not raw:
+        transaction.on_commit(lambda: safe_update_online_model(instance))
+
+
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def invalidate_city_index_on_write(sender, **kwargs):
+    """Version the in-memory city index on every City write.
+
+    Bumped immediately so the writing request sees its change, and again on
+    commit so no worker keeps an index rebuilt from pre-commit rows.
+    """
+    invalidate_city_index()
+    transaction.on_commit(invalidate_city_index)
+    mark_sections_dirty(*CITY_SECTIONS)
+
+
+@receiver(post_save, sender=WeatherData)
+def roll_up_weather_reading(sender, instance, created, raw=False, **kwargs):
+    """Fold each new reading into the hourly running aggregates of its city and flag the report sections built on it"""
+    if created and not raw:
+        _record_rollup(record_weather_reading, instance)
+        mark_sections_dirty(*WEATHER_DATA_SECTIONS)
+
+
+@receiver(post_save, sender=SystemMetrics)
+def roll_up_system_metric(sender, instance, created, raw=False, **kwargs):
+    """Fold each system metric sample into the rollups behind the performance baselines"""
+    if created and not raw:
+        _record_rollup(record_system_metric, instance)
+
+
+def _record_rollup(record, instance):
+    # Savepoint: a failed rollup must not roll back or block the write itself
+    try:
+        with transaction.atomic():
+            record(instance)
+    except Exception as e:
+        logger.warning(f"Could not update metric rollups for {instance!r}: {e}")
@@ -0,0 +1,101 @@
+"""
+Sparse fieldsets and include controls for API responses
+"""
+
+
+def parse_field_list(value):
+    """Split a comma separated query value into an ordered list of names"""
+    if not value:
+        return []
+    names = []
+    for name in value.split(','):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _get_params(request):
+    # Plain Django views only expose request.GET
+    return getattr(request, 'query_params', request.GET)
+
+
+def get_requested_fields(request, section=None):
+    """Return the ``?fields=`` list for a request, or None when not given.
+
+    With ``section`` set, the JSON:API style ``?fields[section]=`` parameter is
+    read instead so responses bundling several record types can trim each one.
+    """
+    if request is None:
+        return None
+    param = f'fields[{section}]' if section else 'fields'
+    value = _get_params(request).get(param)
+    if value is None:
+        return None
+    return parse_field_list(value)
+
+
+def get_included_sections(request, available, default=None):
+    """Return the set of response sections selected with ``?include=``.
+
+    Unknown names are ignored. Without the parameter every section in
+    ``default`` (or ``available`` when no default is given) is returned.
+    """
+    value = _get_params(request).get('include') if request is not None else None
+    if value is None:
+        return set(available if default is None else default)
+    return {name for name in parse_field_list(value) if name in available}
+
+
+def split_field_paths(fields):
+    """Split dotted field paths into top-level names and nested selections.
+
+    ``['temperature', 'city.name']`` becomes ``({'temperature', 'city'},
+    {'city': ['name']})``. A bare ``city`` keeps the whole nested object.
+    """
+    top_level = set()
+    whole = set()
+    nested = {}
+    for path in fields:
+        name, _, rest = path.partition('.')
+        top_level.add(name)
+        if rest:
+            nested.setdefault(name, []).append(rest)
+        else:
+            whole.add(name)
+    return top_level, {name: sub for name, sub in nested.items() if name not in whole}
+
+
+class SparseFieldsMixin:
+    """Serializer mixin that trims output to a requested set of fields.
+
+    Pass ``fields=`` when constructing the serializer; ``None`` keeps the full
+    shape. Dropped fields are never evaluated, so an unrequested nested
+    relation costs no query.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            self.restrict_fields(fields)
+
+    def restrict_fields(self, fields):
+        top_level, nested = split_field_paths(fields)
+        for name in set(self.fields) - top_level:
+            self.fields.pop(name)
+
+        for name, sub_fields in nested.items():
+            field = self.fields.get(name)
+            target = getattr(field, 'child', field)
+            if isinstance(target, SparseFieldsMixin):
+                target.restrict_fields(sub_fields)
+
+
+class SparseFieldsViewMixin:
+    """Generic view mixin passing ``?fields=`` through to the serializer"""
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request is not None and self.request.method == 'GET':
+            kwargs.setdefault('fields', get_requested_fields(self.request))
+        return super().get_serializer(*args, **kwargs)
@@ -5,6 +5,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotFound
 from django.utils import timezone
 from django.http import JsonResponse
 from django.contrib.admin.views.decorators import staff_member_required
@@ -16,6 +17,7 @@ import json
 
 from .system_monitoring_core import system_monitor, system_diagnostics
 from .models import SystemMetrics, SystemAlert, SystemHealthCheck
+from .pagination import paginate_by_keyset
 
 
 @api_view(['GET'])
@@ -51,8 +53,10 @@ def system_metrics(request):
         if component:
             queryset = queryset.filter(component=component)
         
-        # Get metrics
-        metrics = queryset.order_by('-timestamp')[:1000]  # Limit to 1000 records
+        # Keyset page instead of a fixed slice so older metrics stay reachable
+        metrics, paginator = paginate_by_keyset(
+            queryset, request, 'timestamp', page_size=200, max_page_size=1000
+        )
         
         metrics_data = []
         for metric in metrics:
@@ -70,6 +74,7 @@ def system_metrics(request):
         return Response({
             'metrics': metrics_data,
             'count': len(metrics_data),
+            'pagination': paginator.get_pagination_metadata(),
             'filters': {
                 'type': metric_type,
                 'component': component,
@@ -77,6 +82,8 @@ def system_metrics(request):
             }
         })
         
+    except NotFound as e:
+        return Response({'error': str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response(
             {'error': str(e)}, 
@@ -107,7 +114,10 @@ def system_alerts(request):
             queryset = queryset.filter(component=component)
         
         # Get alerts
-        alerts = queryset.order_by('-created_at')[:100]  # Limit to 100 records
+        alerts, paginator = paginate_by_keyset(
+            queryset.select_related('acknowledged_by', 'resolved_by'),
+            request, 'created_at', page_size=100
+        )
         
         alerts_data = []
         for alert in alerts:
@@ -132,6 +142,7 @@ def system_alerts(request):
         return Response({
             'alerts': alerts_data,
             'count': len(alerts_data),
+            'pagination': paginator.get_pagination_metadata(),
             'filters': {
                 'status': alert_status,
                 'severity': severity,
@@ -140,6 +151,8 @@ def system_alerts(request):
             }
         })
         
+    except NotFound as e:
+        return Response({'error': str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response(
             {'error': str(e)}, 
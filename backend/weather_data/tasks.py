@@ -2,6 +2,7 @@
 Celery tasks for background weather data processing
 """
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 import logging
@@ -229,51 +230,31 @@ def monitor_api_quota():
 
 
 @shared_task
-def generate_weather_analytics():
-    """Generate weather analytics and cache results"""
+def generate_weather_analytics(mode=None, workers=None, chunk_size=None):
+    """Generate weekly analytics for every active city and cache the results
+
+    Cities are processed in chunks; ``mode`` ('serial', 'process' or
+    'celery') and the worker/chunk sizes default to the ANALYTICS_* settings.
+    """
     logger.info('Generating weather analytics')
     
     try:
-        from django.db.models import Avg, Max, Min, Count
-        
-        # Get analytics for all active cities
-        cities = City.objects.filter(is_active=True)
-        analytics_generated = 0
-        
-        for city in cities:
-            try:
-                # Get recent weather data for analytics
-                recent_weather = WeatherData.objects.filter(
-                    city=city,
-                    timestamp__gte=timezone.now() - timedelta(days=7)
-                )
-                
-                if recent_weather.exists():
-                    analytics = {
-                        'city': city.name,
-                        'avg_temperature': recent_weather.aggregate(Avg('temperature'))['temperature__avg'],
-                        'max_temperature': recent_weather.aggregate(Max('temperature'))['temperature__max'],
-                        'min_temperature': recent_weather.aggregate(Min('temperature'))['temperature__min'],
-                        'avg_humidity': recent_weather.aggregate(Avg('humidity'))['humidity__avg'],
-                        'data_points': recent_weather.count(),
-                        'generated_at': timezone.now().isoformat()
-                    }
-                    
-                    # Cache the analytics
-                    cache_key = WeatherCacheManager.get_analytics_cache_key(city.name, 'weekly')
-                    WeatherCacheManager.set_cache(cache_key, analytics, 'analytics')
-                    
-                    analytics_generated += 1
-                    logger.debug(f'Generated analytics for {city.name}')
-                
-            except Exception as e:
-                logger.error(f'Error generating analytics for {city.name}: {e}')
+        from .parallel_analytics import run_city_analytics
         
-        logger.info(f'Analytics generation completed: {analytics_generated} cities processed')
+        summary = run_city_analytics(mode=mode, workers=workers, chunk_size=chunk_size)
+        if summary['mode'] == 'celery':
+            return {
+                'message': 'Analytics generation dispatched',
+                'chunks': summary['chunks'],
+                'chord_id': summary['task_id'],
+                'timestamp': timezone.now().isoformat()
+            }
         
         return {
             'message': 'Analytics generation completed',
-            'cities_processed': analytics_generated,
+            'cities_processed': summary['cities_processed'],
+            'failed_chunks': summary['failed_chunks'],
+            'elapsed_seconds': summary['elapsed_seconds'],
             'timestamp': timezone.now().isoformat()
         }
         
@@ -285,33 +266,183 @@ def generate_weather_analytics():
             'timestamp': timezone.now().isoformat()
         }
 
-@share
-d_task
-def generate_analytics_report():
-    """Generate and cache analytics reports"""
-    logger.info('Generating analytics reports')
+
+@shared_task
+def generate_city_analytics_chunk(index, city_ids, days=7):
+    """Generate and cache the analytics of one chunk of cities (chord header task)"""
+    from .parallel_analytics import run_city_chunk, store_city_analytics
+    
+    # Errors are returned, not raised, so one bad chunk doesn't fail the chord
+    result = run_city_chunk(index, city_ids, days)
+    if 'analytics' in result:
+        store_city_analytics(result.pop('analytics'))
+    return result
+
+
+@shared_task
+def merge_city_analytics_chunks(results):
+    """Merge the chunk results of a parallel analytics run (chord callback)"""
+    from .parallel_analytics import merge_chunk_results
+    
+    summary = merge_chunk_results(results)
+    logger.info(
+        f"Parallel analytics completed: {summary['cities_processed']}/{summary['cities']} cities, "
+        f"{len(summary['failed_chunks'])} failed chunks"
+    )
+    return summary
+
+
+@shared_task
+def update_performance_baselines(days=7):
+    """Refresh performance baselines from the system metric rollups"""
+    logger.info('Updating performance baselines')
+    
+    try:
+        from .rollups import update_performance_baselines as update_baselines
+        
+        updated = update_baselines(days)
+        logger.info(f'Performance baselines updated: {updated} metric/component pairs')
+        
+        return {
+            'message': 'Performance baselines updated',
+            'baselines_updated': updated,
+            'timestamp': timezone.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f'Error updating performance baselines: {e}')
+        return {
+            'status': 'error',
+            'message': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
+@shared_task
+def rebuild_climatology(city_ids=None, window_days=None):
+    """Recompute the climatological normals from the hourly rollups"""
+    logger.info('Rebuilding climatology normals')
+    
+    try:
+        from .climatology import rebuild_climatology as rebuild
+        
+        result = rebuild(city_ids, window_days)
+        
+        return {
+            'message': 'Climatology rebuilt',
+            'cities': result['cities'],
+            'cells': result['cells'],
+            'timestamp': timezone.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f'Error rebuilding climatology: {e}')
+        return {
+            'status': 'error',
+            'message': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
+@shared_task
+def train_prediction_models(city_ids=None, force=False):
+    """Retrain and publish the prediction models of cities with stale or missing models"""
+    logger.info('Training prediction models')
+    
+    try:
+        from .model_training import run_global_training, run_training
+        
+        if settings.ML_MODEL_MODE == 'global':
+            summary = run_global_training(city_ids, force=force)
+        else:
+            summary = run_training(city_ids, force=force)
+        
+        return {
+            'message': 'Prediction models trained',
+            'cities': summary['cities'],
+            'models_trained': summary['models_trained'],
+            'errors': summary['errors'],
+            'timestamp': timezone.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f'Error training prediction models: {e}')
+        return {
+            'status': 'error',
+            'message': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
+@shared_task
+def evaluate_prediction_accuracy(full=False):
+    """Backtest the stored predictions whose hours have passed against the readings of those hours"""
+    logger.info('Evaluating prediction accuracy')
     
     try:
-        from .analytics import weather_analytics, health_monitor
-        
-        # Generate all analytics
-        analytics_data = {
-            'api_usage': weather_analytics.get_api_usage_stats(24),
-            'cache_performance': weather_analytics.get_cache_performance_stats(),
-            'data_freshness': weather_analytics.get_data_freshness_stats(),
-            'weather_trends': weather_analytics.get_weather_trends(7),
-            'generated_at': timezone.now().isoformat()
+        from .backtesting import run_backtest
+        
+        summary = run_backtest(full=full)
+        
+        return {
+            'message': 'Prediction accuracy evaluated',
+            'first_day': summary['first_day'],
+            'rows': summary['rows'],
+            'errors_matched': summary['errors_matched'],
+            'timestamp': timezone.now().isoformat()
         }
         
-        # Cache the analytics data
-        cache_key = 'analytics:daily_report'
-        WeatherCacheManager.set_cache(cache_key, analytics_data, 'analytics')
+    except Exception as e:
+        logger.error(f'Error evaluating prediction accuracy: {e}')
+        return {
+            'status': 'error',
+            'message': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
+@shared_task
+def export_analytics_datasets(datasets=None, full=False):
+    """Append rows added since the last export to the Parquet datasets used by BI tooling"""
+    logger.info('Exporting analytics datasets')
+    
+    try:
+        from .columnar_export import export_datasets
+        
+        results = export_datasets(datasets, full=full)
+        
+        return {
+            'message': 'Analytics datasets exported',
+            'rows': {r['dataset']: r.get('rows') for r in results},
+            'errors': {r['dataset']: r['error'] for r in results if 'error' in r},
+            'timestamp': timezone.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f'Error exporting analytics datasets: {e}')
+        return {
+            'status': 'error',
+            'message': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
+@shared_task
+def generate_analytics_report(force=False):
+    """Refresh the stale sections of the materialized analytics report"""
+    logger.info('Refreshing analytics report sections')
+    
+    try:
+        from .report_sections import get_report, refresh_report_sections
+        
+        # Only sections past their cadence or flagged dirty are recomputed
+        refreshed = refresh_report_sections(force=force)
+        analytics_data = get_report()
         
-        logger.info('Analytics report generated and cached successfully')
+        logger.info(f"Analytics report sections refreshed: {', '.join(refreshed) or 'none'}")
         
         return {
             'message': 'Analytics report generated successfully',
             'timestamp': timezone.now().isoformat(),
+            'refreshed_sections': refreshed,
+            'section_versions': {
+                name: meta['version'] for name, meta in analytics_data['sections'].items()
+            },
             'data_points': {
                 'api_requests': analytics_data['api_usage'].get('total_requests', 0),
                 'cache_hit_rate': analytics_data['cache_performance'].get('estimated_hit_rate', 0),
@@ -398,7 +529,6 @@ def cleanup_analytics_cache():
         
         # For now, we'll just clean specific known keys
         old_keys = [
-            'analytics:daily_report',
             'health:latest_report'
         ]
         
@@ -422,8 +552,7 @@ def cleanup_analytics_cache():
             'message': str(e),
             'timestamp': timezone.now().isoformat()
         }
-@shared
-_task
+@shared_task
 def optimize_system_performance():
     """Periodic system performance optimization"""
     logger.info('Starting system performance optimization')
@@ -526,8 +655,7 @@ def database_maintenance():
             'message': str(e),
             'timestamp': timezone.now().isoformat()
         }
-# Import 
-API monitoring tasks
+# Import API monitoring tasks
 from .api_monitoring_tasks import (
     monitor_api_health,
     cleanup_old_usage_records,
@@ -0,0 +1,115 @@
+"""
+Tests for time-bucketed aggregation and the analytics queries
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Max
+from django.test import TestCase
+from django.utils import timezone
+
+from .aggregation import bucket_range, combine_series, time_bucket_series, truncate
+from .analytics import WeatherAnalytics
+from .models import City, WeatherData
+
+
+class TimeBucketSeriesTest(TestCase):
+    """Test dense bucketed series and the analytics query counts"""
+
+    def setUp(self):
+        # Mid-hour and safely in the past so every reading falls in a known bucket
+        self.now = truncate(timezone.now() - timedelta(hours=1), 'hour') + timedelta(minutes=30)
+        self.london = City.objects.create(name='London', country='GB', latitude=51.5, longitude=-0.1)
+        self.paris = City.objects.create(name='Paris', country='FR', latitude=48.9, longitude=2.4)
+
+        readings = [
+            (self.london, 0, 10.0), (self.london, 0, 14.0),
+            (self.london, 3, 8.0), (self.paris, 1, 20.0),
+        ]
+        for city, hours_ago, temperature in readings:
+            weather = WeatherData.objects.create(
+                city=city, temperature=temperature, feels_like=temperature, humidity=50, pressure=1010,
+                wind_speed=5, wind_direction=90, weather_condition='Clear',
+                weather_description='clear sky', weather_icon='01d', cloudiness=0
+            )
+            WeatherData.objects.filter(pk=weather.pk).update(timestamp=self.now - timedelta(hours=hours_ago))
+
+    def test_ungrouped_series_is_gap_filled(self):
+        start = self.now - timedelta(hours=4)
+        with self.assertNumQueries(1):
+            series = time_bucket_series(
+                WeatherData.objects.all(), {'count': Count('id'), 'max_temp': Max('temperature')},
+                start, self.now, bucket='hour'
+            )
+
+        self.assertEqual([p['bucket'] for p in series], bucket_range(start, self.now, 'hour'))
+        self.assertEqual([p['count'] for p in series], [0, 1, 0, 1, 2])
+        self.assertEqual([p['max_temp'] for p in series], [None, 8.0, None, 20.0, 14.0])
+
+    def test_grouped_series_and_combination(self):
+        start = self.now - timedelta(hours=4)
+        buckets = bucket_range(start, self.now, 'hour')
+        series = time_bucket_series(
+            WeatherData.objects.all(), {'count': Count('id')}, start, self.now,
+            group_by='city__name', groups=['Tokyo']
+        )
+
+        self.assertEqual(set(series), {'London', 'Paris', 'Tokyo'})
+        self.assertEqual([p['count'] for p in series['London']], [0, 1, 0, 0, 2])
+        self.assertEqual([p['count'] for p in series['Tokyo']], [0] * 5)
+
+        combined = combine_series(series.values(), {'count': 'sum'}, buckets)
+        self.assertEqual([p['count'] for p in combined], [0, 1, 0, 1, 2])
+
+    def test_analytics_run_in_one_query(self):
+        analytics = WeatherAnalytics()
+
+        with self.assertNumQueries(1):
+            usage = analytics.get_api_usage_stats(hours=6)
+        self.assertEqual(usage['total_requests'], 4)
+        self.assertEqual(usage['unique_cities'], 2)
+        self.assertEqual(usage['top_cities'][0], {'city__name': 'London', 'request_count': 3})
+        self.assertEqual(sum(h['requests'] for h in usage['hourly_breakdown']), 4)
+
+        # Rollups plus the city names
+        with self.assertNumQueries(2):
+            trends = analytics.get_weather_trends(days=2)
+        self.assertEqual(trends['total_data_points'], 4)
+        self.assertEqual(trends['overall_stats']['avg_temperature'], 13.0)
+        self.assertEqual(trends['overall_stats']['max_temperature'], 20.0)
+        self.assertEqual(len(trends['daily_trends']), 3)
+        self.assertEqual(trends['top_cities'][0]['temp_range'], 6.0)
+
+
+class DataFreshnessStatsTest(TestCase):
+    """Test the grouped freshness query and the paged city details"""
+
+    def setUp(self):
+        now = timezone.now()
+        for i, minutes_ago in enumerate([5, 20, 60, 240, 600, None]):
+            city = City.objects.create(name=f'City {i}', country='XX', latitude=i, longitude=i)
+            if minutes_ago is None:
+                continue
+            weather = WeatherData.objects.create(
+                city=city, temperature=float(i), feels_like=float(i), humidity=50, pressure=1010,
+                wind_speed=5, wind_direction=90, weather_condition='Clear',
+                weather_description='clear sky', weather_icon='01d', cloudiness=0
+            )
+            WeatherData.objects.filter(pk=weather.pk).update(timestamp=now - timedelta(minutes=minutes_ago))
+
+    def test_counts_in_constant_queries(self):
+        with self.assertNumQueries(2):
+            stats = WeatherAnalytics().get_data_freshness_stats(page_size=2)
+
+        self.assertEqual(stats['total_cities'], 6)
+        self.assertEqual(stats['freshness_counts'], {
+            'very_fresh': 1, 'fresh': 1, 'stale': 1, 'very_stale': 1, 'no_data': 2
+        })
+        self.assertEqual([c['city'] for c in stats['city_details']], ['City 0', 'City 1'])
+        self.assertEqual([c['temperature'] for c in stats['city_details']], [0.0, 1.0])
+        self.assertEqual(stats['city_details_pagination']['total_pages'], 3)
+
+    def test_filter_by_status(self):
+        stats = WeatherAnalytics().get_data_freshness_stats(status='no_data', page=1)
+        self.assertEqual([c['city'] for c in stats['city_details']], ['City 4', 'City 5'])
+        self.assertEqual([c['temperature'] for c in stats['city_details']], [4.0, None])
+        self.assertEqual(stats['city_details_pagination']['count'], 2)
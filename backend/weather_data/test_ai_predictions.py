@@ -0,0 +1,221 @@
+"""
+Tests for batched 24-hour inference
+"""
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+import numpy as np
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .ai_predictions import AdvancedWeatherPredictor, WeatherAIPredictor, advanced_predictor
+from .management.commands.benchmark_startup import SCENARIOS, measure
+from .model_registry import model_registry
+from .models import City, WeatherData, WeatherPrediction
+
+MODEL_DIR = tempfile.mkdtemp()
+FEATURE_COLUMNS = ['temperature', 'hour', 'hour_sin', 'temperature_lag_1h']
+
+
+class RecordingModel:
+    """Estimator that returns one feature column and records the size of every predict call"""
+
+    calls = []
+
+    def __init__(self, column, offset=0.0):
+        self.column = column
+        self.offset = offset
+
+    def predict(self, X):
+        RecordingModel.calls.append(len(X))
+        return X[self.column].to_numpy(dtype=float) + self.offset
+
+
+def add_hourly_readings(city, temperatures):
+    now = timezone.now()
+    # Oldest first, the order readings are ingested in
+    for position, temperature in enumerate(temperatures):
+        hours_ago = len(temperatures) - 1 - position
+        reading = WeatherData.objects.create(
+            city=city, temperature=temperature, feels_like=temperature, humidity=60, pressure=1010,
+            wind_speed=4, wind_direction=90, weather_condition='Clear',
+            weather_description='clear sky', weather_icon='01d', cloudiness=0
+        )
+        WeatherData.objects.filter(id=reading.id).update(timestamp=now - timedelta(hours=hours_ago))
+    return WeatherData.objects.filter(city=city).latest('timestamp')
+
+
+@override_settings(ML_MODEL_DIR=MODEL_DIR)
+class BatchInferenceTest(TestCase):
+    """Test horizon feature matrices and one predict call per model"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MODEL_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(model_registry.clear)
+        RecordingModel.calls = []
+        self.cities, self.current = [], []
+        for i, base in enumerate([10.0, 20.0]):
+            city = City.objects.create(name=f'Batch {i}', country='XX', latitude=i, longitude=i)
+            self.cities.append(city)
+            self.current.append(add_hourly_readings(city, [base + step for step in range(30)]))
+            model_registry.register(RecordingModel('temperature', 1.0), 'temperature', city=city,
+                                    mae=0.5, feature_columns=FEATURE_COLUMNS)
+            model_registry.register(RecordingModel('hour'), 'humidity', city=city,
+                                    feature_columns=FEATURE_COLUMNS)
+
+    def test_horizon_features_move_time_columns(self):
+        predictor = AdvancedWeatherPredictor()
+        row = predictor.latest_feature_rows([self.cities[0]])[self.cities[0].id]
+        start = timezone.now().replace(hour=22)
+        times = [start + timedelta(hours=h) for h in range(1, 5)]
+
+        matrix = predictor.horizon_features(row, FEATURE_COLUMNS, times)
+
+        self.assertEqual(matrix.shape, (4, 4))
+        np.testing.assert_array_equal(matrix[:, 0], [39.0] * 4)
+        np.testing.assert_array_equal(matrix[:, 1], [23, 0, 1, 2])
+        np.testing.assert_allclose(matrix[:, 2], np.sin(2 * np.pi * np.array([23, 0, 1, 2]) / 24))
+        np.testing.assert_array_equal(matrix[:, 3], [38.0] * 4)
+
+    def test_batch_makes_one_predict_call_per_model(self):
+        results = advanced_predictor.predict_advanced_batch(list(zip(self.cities, self.current)))
+
+        # Two cities x two trained metrics, each a single 24-row call
+        self.assertEqual(RecordingModel.calls, [24] * 4)
+        self.assertEqual(len(results), 2)
+        self.assertEqual([p['temperature'] for p in results[0]], [40.0] * 24)
+        self.assertEqual([p['temperature'] for p in results[1]], [50.0] * 24)
+
+        expected_hours = [(timezone.now() + timedelta(hours=h)).hour for h in range(1, 25)]
+        self.assertEqual([p['humidity'] for p in results[0]], expected_hours)
+        self.assertEqual(results[0][0]['model_version'], 'ensemble:v1')
+        # Metrics without a model keep the current value
+        self.assertEqual({p['pressure'] for p in results[1]}, {1010.0})
+
+        single = advanced_predictor.predict_advanced_24h(self.cities[1], self.current[1])
+        self.assertEqual([p['temperature'] for p in single], [p['temperature'] for p in results[1]])
+
+    def test_cities_query_predicts_in_one_batch(self):
+        with patch.object(advanced_predictor, 'predict_advanced_batch',
+                          wraps=advanced_predictor.predict_advanced_batch) as batch, \
+                patch('weather_data.views.weather_manager.get_comprehensive_weather', return_value=None):
+            response = APIClient().get(reverse('ai-predictions'), {'cities': 'Batch 0,Nowhere,Batch 1'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(batch.call_count, 1)
+        results = response.data['results']
+        self.assertEqual([r['city'] for r in results], ['Batch 0', 'Nowhere', 'Batch 1'])
+        self.assertEqual(results[1]['error'], 'City not found')
+        self.assertEqual(results[2]['predictions'][0]['temperature'], 50.0)
+
+
+@override_settings(ML_MODEL_DIR=MODEL_DIR)
+class PredictionCacheTest(TestCase):
+    """Test cached predictions and once-per-hour persistence"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(model_registry.clear)
+        RecordingModel.calls = []
+        self.city = City.objects.create(name='Cacheton', country='XX', latitude=5, longitude=5)
+        self.current = add_hourly_readings(self.city, [10.0 + step for step in range(30)])
+        model_registry.register(RecordingModel('temperature', 1.0), 'temperature', city=self.city,
+                                feature_columns=FEATURE_COLUMNS)
+
+    def _predict(self, current=None):
+        return advanced_predictor.predict_advanced_24h(self.city, current or self.current)
+
+    def test_predictions_are_reused_until_the_inputs_change(self):
+        first = self._predict()
+        self.assertEqual(self._predict(), first)
+        self.assertEqual(len(RecordingModel.calls), 1)
+
+        # A new reading is a new key, its features appended on ingest
+        with self.captureOnCommitCallbacks(execute=True):
+            newer = add_hourly_readings(self.city, [35.0])
+        self.assertEqual(self._predict(newer)[0]['temperature'], 36.0)
+        self.assertEqual(len(RecordingModel.calls), 2)
+
+        # So is a newly published model
+        model_registry.register(RecordingModel('temperature', 2.0), 'temperature', city=self.city,
+                                feature_columns=FEATURE_COLUMNS)
+        predictions = self._predict(newer)
+        self.assertEqual(predictions[0]['temperature'], 37.0)
+        self.assertEqual(predictions[0]['model_version'], 'ensemble:v2')
+        self.assertEqual(len(RecordingModel.calls), 3)
+
+    def test_forecast_hours_are_anchored_to_the_hour(self):
+        predictions = self._predict()
+        bucket = timezone.now().replace(minute=0, second=0, microsecond=0)
+        self.assertEqual(predictions[0]['datetime'], (bucket + timedelta(hours=1)).isoformat())
+
+    def test_predictions_are_stored_once_per_hour(self):
+        predictions = self._predict()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(advanced_predictor.store_predictions([(self.city, predictions)]), 4)
+        with self.assertNumQueries(0):
+            self.assertEqual(advanced_predictor.store_predictions([(self.city, predictions)]), 0)
+
+        stored = WeatherPrediction.objects.filter(city=self.city)
+        self.assertEqual(stored.count(), 4)
+        self.assertEqual(set(stored.values_list('model_version', flat=True)), {'ensemble:v1'})
+        self.assertEqual(stored.first().predicted_temperature, 40.0)
+
+        # Rows of the same hour and model are updated in place
+        cache.clear()
+        predictions[0]['temperature'] = 41.0
+        advanced_predictor.store_predictions([(self.city, predictions)])
+        self.assertEqual(WeatherPrediction.objects.filter(city=self.city).count(), 4)
+        self.assertEqual(WeatherPrediction.objects.filter(city=self.city).first().predicted_temperature, 41.0)
+
+    def test_failed_writes_are_retried(self):
+        predictions = self._predict()
+
+        with patch.object(WeatherPrediction.objects, 'bulk_create', side_effect=DatabaseError('down')):
+            with self.assertRaises(DatabaseError):
+                advanced_predictor.store_predictions([(self.city, predictions)])
+
+        self.assertEqual(advanced_predictor.store_predictions([(self.city, predictions)]), 4)
+        self.assertEqual(WeatherPrediction.objects.filter(city=self.city).count(), 4)
+
+
+class SimplePredictorTest(TestCase):
+    """Test the single-model predictor scores the whole horizon at once"""
+
+    def test_predict_24h_scales_and_predicts_once(self):
+        city = City.objects.create(name='Simple', country='XX', latitude=0, longitude=0)
+        current = add_hourly_readings(city, [12.0] * 12)
+        predictor = WeatherAIPredictor()
+        self.assertTrue(predictor.train_model(city))
+
+        with patch.object(predictor.model, 'predict', wraps=predictor.model.predict) as predict:
+            predictions = predictor.predict_24h(city, current)
+
+        self.assertEqual(predict.call_count, 1)
+        self.assertEqual(predict.call_args[0][0].shape, (24, 12))
+        self.assertEqual(len(predictions), 24)
+        self.assertEqual(predictions[0]['confidence'], 100.0)
+        self.assertEqual(predictions[-1]['confidence'], 70.0)
+
+
+class LazyImportTest(TestCase):
+    """Test web and Celery workers boot without the ML stack"""
+
+    def test_workers_boot_without_pandas_or_sklearn(self):
+        for scenario in ('web', 'worker'):
+            _, peak_mb, modules = measure(SCENARIOS[scenario])
+            self.assertGreater(peak_mb, 0)
+            self.assertNotIn('pandas', modules, scenario)
+            self.assertNotIn('sklearn', modules, scenario)
@@ -182,6 +182,23 @@ class APIManagementTestCase(TestCase):
         self.assertEqual(stats['usage']['total_errors'], 2)
         self.assertEqual(stats['usage']['success_rate'], 97.5)
     
+    def test_provider_latency_percentiles(self):
+        """Test response time percentiles from the per-endpoint histograms"""
+        for i in range(100):
+            api_manager._track_usage(self.provider, 'weather', True, 0.1 + i * 0.001)
+        for _ in range(5):
+            api_manager._track_usage(self.provider, 'forecast', False, 2.0)
+        
+        stats = api_manager.get_provider_statistics(self.provider.id, days=7)
+        
+        usage = stats['usage']
+        self.assertEqual(usage['total_requests'], 105)
+        self.assertAlmostEqual(usage['p50_response_time'], 0.152, delta=0.003)
+        self.assertAlmostEqual(usage['p99_response_time'], 2.0, delta=0.03)
+        self.assertAlmostEqual(usage['avg_response_time'], (sum(0.1 + i * 0.001 for i in range(100)) + 10) / 105, 3)
+        self.assertAlmostEqual(stats['endpoint_latency']['weather']['p95'], 0.195, delta=0.003)
+        self.assertEqual(stats['endpoint_latency']['forecast']['requests'], 5)
+    
     def test_cost_analysis(self):
         """Test cost analysis functionality"""
         # Create usage data with costs
@@ -0,0 +1,92 @@
+"""
+Tests for the async (ASGI) weather read path
+"""
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User
+from route_planner.models import Route
+from .async_weather_service import async_weather_manager
+from .models import City, WeatherData
+
+
+@override_settings(ROOT_URLCONF='weather247_backend.asgi_urls')
+class AsyncWeatherViewsTest(TestCase):
+    """Test async views mounted by the ASGI URLconf"""
+
+    def setUp(self):
+        # Keep provider calls on generated demo data
+        patcher = patch.object(async_weather_manager.primary_service.sync_service, 'api_key', 'demo-key')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.city = City.objects.create(name='London', country='GB', latitude=51.5074, longitude=-0.1278)
+        WeatherData.objects.create(
+            city=self.city, temperature=18.0, feels_like=17.0, humidity=60, pressure=1015,
+            wind_speed=10, wind_direction=200, weather_condition='Clouds',
+            weather_description='few clouds', weather_icon='02d', cloudiness=20
+        )
+
+    def test_async_paths_shadow_sync_views(self):
+        self.assertEqual(reverse('async-current-weather', args=[1]), reverse('current-weather', args=[1]))
+
+    async def test_current_weather(self):
+        url = reverse('async-current-weather', args=[self.city.id])
+        response = await self.async_client.get(url, {'fields': 'temperature,city.name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'temperature': 18.0, 'city': {'name': 'London'}})
+
+        response = await self.async_client.get(reverse('async-current-weather', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_weather_by_name_include(self):
+        response = await self.async_client.get(
+            reverse('async-weather-by-name'), {'city': 'London', 'include': 'current,forecast'}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(set(data), {'current', 'forecast'})
+        self.assertEqual(data['current']['city']['name'], 'London')
+
+    async def test_repeated_forecasts_are_served(self):
+        # Later requests the same day update the stored forecast rows in place
+        for _ in range(2):
+            response = await self.async_client.get(
+                reverse('async-weather-by-name'), {'city': 'London', 'include': 'forecast'}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['forecast'][0]['city']['name'], 'London')
+
+            response = await self.async_client.get(reverse('async-weather-forecast', args=[self.city.id]))
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json())
+
+    async def test_multiple_cities(self):
+        response = await self.async_client.get(reverse('async-multiple-cities'), {'cities': 'London,Paris'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['city'] for c in response.json()['cities']], ['London', 'Paris'])
+
+    async def test_route_weather_requires_authentication(self):
+        user = await sync_to_async(User.objects.create_user)(
+            username='async_user', email='async@example.com', password='testpass123'
+        )
+        route = await Route.objects.acreate(
+            user=user, name='Async Route', start_location='A', end_location='B',
+            start_latitude=51.5, start_longitude=-0.1, end_latitude=51.6, end_longitude=-0.2,
+            waypoints=[[51.5, -0.1], [51.6, -0.2]], distance_km=12, estimated_duration_minutes=20
+        )
+        url = reverse('async-route-weather', args=[route.id])
+
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 401)
+
+        token = await Token.objects.acreate(user=user)
+        response = await self.async_client.get(
+            url, {'fields': 'id,name'}, headers={'Authorization': f'Token {token.key}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'id': route.id, 'name': 'Async Route'})
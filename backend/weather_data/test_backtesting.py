@@ -0,0 +1,142 @@
+"""
+Tests for backtesting stored predictions against actual readings
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .ai_predictions import advanced_predictor
+from .backtesting import accuracy_summary, evaluate, run_backtest
+from .models import City, PredictionAccuracy, WeatherData, WeatherPrediction
+
+
+class BacktestingTest(TestCase):
+    """Test predictions are matched to readings and reduced to error sums"""
+
+    def setUp(self):
+        cache.clear()
+        self.city = City.objects.create(name='Backtestville', country='XX', latitude=6, longitude=6)
+        self.now = timezone.now().replace(minute=10, second=0, microsecond=0)
+        self.base = self.now.replace(hour=0, minute=0) - timedelta(days=1)
+
+    def _reading(self, timestamp, temperature):
+        reading = WeatherData.objects.create(
+            city=self.city, temperature=temperature, feels_like=temperature, humidity=50, pressure=1010,
+            wind_speed=4, wind_direction=90, weather_condition='Clear',
+            weather_description='clear sky', weather_icon='01d', cloudiness=0
+        )
+        WeatherData.objects.filter(id=reading.id).update(timestamp=timestamp)
+
+    def _prediction(self, hour, temperature, model_version, horizon=1):
+        WeatherPrediction.objects.create(
+            city=self.city, prediction_date=hour, predicted_temperature=temperature, predicted_humidity=50,
+            predicted_pressure=1010, predicted_wind_speed=4, predicted_condition='Clear',
+            confidence_score=0.9, model_version=model_version,
+            # Issued a few minutes past the hour, ``horizon`` hours ahead
+            issued_at=hour - timedelta(hours=horizon) + timedelta(minutes=5)
+        )
+
+    def _day_of_predictions(self):
+        for step in range(6):
+            hour = self.base + timedelta(hours=step)
+            # Readings up to half an hour either side of the hour count
+            self._reading(hour + timedelta(minutes=20 if step % 2 else -20), 20.0)
+            self._prediction(hour, 21.0, 'ensemble:v1')
+            self._prediction(hour, 18.0, 'online:v1', horizon=3)
+        # No reading for this hour: not evaluated
+        self._prediction(self.base + timedelta(hours=10), 99.0, 'ensemble:v1')
+
+    def test_errors_per_model_version_and_horizon(self):
+        self._day_of_predictions()
+
+        with self.assertNumQueries(2):
+            results = evaluate(self.base, self.base + timedelta(days=1))
+
+        day = self.base.date()
+        self.assertEqual(results[(self.city.id, 'ensemble:v1', 'temperature', 1, day)], [6.0, 6.0, 6.0, 6.0])
+        self.assertEqual(results[(self.city.id, 'online:v1', 'temperature', 3, day)], [6.0, 12.0, 24.0, -12.0])
+        self.assertEqual(results[(self.city.id, 'ensemble:v1', 'humidity', 1, day)][1], 0.0)
+
+    def test_stored_runs_keep_every_horizon(self):
+        # Hourly runs, each storing its first four hours: the 4-hour forecast of an hour
+        # is not overwritten by the 1-hour forecast issued three runs later
+        for run in range(6):
+            issued = self.base + timedelta(hours=run)
+            predictions = [{
+                'hour': hour, 'datetime': (issued + timedelta(hours=hour)).isoformat(), 'temperature': 20.0 + hour,
+                'humidity': 50, 'pressure': 1010, 'wind_speed': 4, 'condition': 'Clear', 'confidence': 90,
+                'model_version': 'ensemble:v1',
+            } for hour in range(1, 25)]
+            advanced_predictor.store_predictions([(self.city, predictions)])
+        for step in range(1, 11):
+            self._reading(self.base + timedelta(hours=step), 20.0)
+
+        results = evaluate(self.base, self.base + timedelta(days=1))
+
+        day = self.base.date()
+        # Six forecasts at each horizon, each off by its horizon
+        for horizon in range(1, 5):
+            self.assertEqual(results[(self.city.id, 'ensemble:v1', 'temperature', horizon, day)][:2],
+                             [6.0, 6.0 * horizon])
+
+    def test_run_stores_rows_and_summaries(self):
+        self._day_of_predictions()
+
+        summary = run_backtest(now=self.now)
+
+        self.assertEqual(summary['errors_matched'], 6 * 2 * 4)
+        self.assertEqual(PredictionAccuracy.objects.filter(metric='temperature').count(), 2)
+        by_version = {row['model_version']: row for row in accuracy_summary()}
+        self.assertEqual(by_version['ensemble:v1'], {
+            'model_version': 'ensemble:v1', 'count': 6, 'mae': 1.0, 'rmse': 1.0, 'bias': 1.0
+        })
+        self.assertEqual((by_version['online:v1']['mae'], by_version['online:v1']['bias']), (2.0, -2.0))
+        self.assertEqual(
+            [(row['model_version'], row['horizon_hours']) for row in
+             accuracy_summary(group_by=('model_version', 'horizon_hours'))],
+            [('ensemble:v1', 1), ('online:v1', 3)]
+        )
+        self.assertEqual(accuracy_summary(city_ids=[]), [])
+
+        # Cached until the next run
+        with self.assertNumQueries(0):
+            accuracy_summary()
+
+    def test_runs_are_incremental(self):
+        self._day_of_predictions()
+        run_backtest(now=self.now)
+
+        # A later hour of the last evaluated day, and the next day
+        for hour in (self.base + timedelta(hours=12), self.base + timedelta(days=1)):
+            self._reading(hour, 10.0)
+            self._prediction(hour, 14.0, 'ensemble:v1')
+
+        summary = run_backtest(now=self.now + timedelta(hours=1))
+
+        self.assertEqual(summary['first_day'], self.base.date().isoformat())
+        rows = PredictionAccuracy.objects.filter(metric='temperature', model_version='ensemble:v1')
+        self.assertEqual(sorted(rows.values_list('date', 'count')), [
+            (self.base.date(), 7), ((self.base + timedelta(days=1)).date(), 1)
+        ])
+        by_version = {row['model_version']: row for row in accuracy_summary()}
+        self.assertEqual(by_version['ensemble:v1']['count'], 8)
+        self.assertEqual(by_version['ensemble:v1']['mae'], 1.75)
+
+    def test_analytics_view_reports_accuracy(self):
+        self._day_of_predictions()
+        run_backtest(now=self.now)
+
+        response = APIClient().get(reverse('prediction-analytics'), {'city': 'Backtestville'})
+
+        self.assertEqual(response.status_code, 200)
+        accuracy = response.data['accuracy']
+        self.assertEqual({row['model_version'] for row in accuracy['by_model_version']}, {'ensemble:v1', 'online:v1'})
+        self.assertEqual(len(accuracy['by_horizon']), 2)
+
+        response = APIClient().get(reverse('prediction-analytics'), {'city': 'Nowhere'})
+        self.assertEqual(response.data['accuracy']['by_model_version'], [])
+        self.assertEqual(APIClient().get(reverse('prediction-analytics'), {'metric': 'rain'}).status_code, 400)
@@ -0,0 +1,105 @@
+"""
+Tests for the aligned multi-city comparison
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .aggregation import truncate
+from .city_comparison import compare_cities_series, pairwise_correlations, pairwise_deltas
+from .city_index import get_city_index
+from .models import City, MetricRollup
+from .rollups import RunningAggregate, city_subject
+
+
+class PairwiseStatsTest(TestCase):
+    """Test the vectorized pairwise statistics against direct computations"""
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.matrix = rng.normal(20, 5, size=(4, 50))
+        self.matrix[1] = self.matrix[0] * 0.5 + rng.normal(0, 1, 50)
+
+    def test_correlations_match_corrcoef(self):
+        np.testing.assert_allclose(pairwise_correlations(self.matrix), np.corrcoef(self.matrix), atol=1e-9)
+
+    def test_gaps_use_shared_buckets_only(self):
+        matrix = self.matrix.copy()
+        matrix[0, :20] = np.nan
+        matrix[2, 40:] = np.nan
+
+        corr = pairwise_correlations(matrix)
+        shared = slice(20, 40)
+        self.assertAlmostEqual(corr[0, 2], np.corrcoef(matrix[0, shared], matrix[2, shared])[0, 1])
+        self.assertAlmostEqual(
+            pairwise_deltas(matrix)[0, 2], np.mean(matrix[0, shared] - matrix[2, shared])
+        )
+
+    def test_too_little_overlap_has_no_correlation(self):
+        matrix = self.matrix[:2].copy()
+        matrix[0, 2:] = np.nan
+        self.assertTrue(np.isnan(pairwise_correlations(matrix)[0, 1]))
+
+
+class CityComparisonTest(TestCase):
+    """Test the comparison built from the hourly rollups"""
+
+    def setUp(self):
+        cache.clear()
+        self.now = truncate(timezone.now(), 'hour')
+        self.cities = []
+        for offset, name in ((0.0, 'Basel'), (5.0, 'Bern'), (-3.0, 'Chur')):
+            city = City.objects.create(name=name, country='CH', latitude=47, longitude=8)
+            self.cities.append({'id': city.id, 'name': city.name, 'country': city.country})
+            rollups = []
+            for hours_ago in range(48):
+                bucket_start = self.now - timedelta(hours=hours_ago)
+                value = 10 + offset + (hours_ago % 24) / 4
+                rollup = MetricRollup(subject=city_subject(city.id), metric='temperature', bucket_start=bucket_start)
+                RunningAggregate.from_values([value, value]).apply_to(rollup)
+                rollups.append(rollup)
+            MetricRollup.objects.bulk_create(rollups)
+
+    def test_rankings_deltas_and_correlations(self):
+        with self.assertNumQueries(1):
+            result = compare_cities_series(self.cities, metrics=['temperature'], hours=24)
+
+        temperature = result['metrics']['temperature']
+        self.assertEqual(result['window']['buckets'], 25)
+        self.assertEqual(temperature['ranking'], ['Bern', 'Basel', 'Chur'])
+        self.assertEqual(temperature['range'], 8.0)
+        self.assertEqual(temperature['deltas']['Bern']['Chur'], 8.0)
+        self.assertEqual(temperature['correlations']['Basel']['Bern'], 1.0)
+        self.assertEqual(temperature['summary']['Bern']['times_highest'], 25)
+        self.assertEqual(temperature['summary']['Chur']['coverage'], 1.0)
+
+    def test_day_buckets_and_cache(self):
+        result = compare_cities_series(self.cities, metrics=['temperature'], hours=48, bucket='day', include_series=True)
+        self.assertEqual(len(result['series']['buckets']), result['window']['buckets'])
+        self.assertEqual(len(result['series']['temperature']['Basel']), result['window']['buckets'])
+
+        # Same city set in another order: served from the cache
+        with self.assertNumQueries(0):
+            again = compare_cities_series(
+                self.cities[::-1], metrics=['temperature'], hours=48, bucket='day', include_series=True
+            )
+        self.assertEqual(again['metrics'], result['metrics'])
+
+    def test_series_mode_view(self):
+        get_city_index()
+        response = APIClient().get(reverse('compare-cities'), {
+            'cities': 'basel,Bern,Atlantis', 'mode': 'series', 'metrics': 'temperature', 'hours': 24
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['name'] for c in response.data['cities']], ['Basel', 'Bern'])
+        self.assertEqual(response.data['not_found'], ['Atlantis'])
+        self.assertEqual(response.data['metrics']['temperature']['ranking'], ['Bern', 'Basel'])
+
+        response = APIClient().get(reverse('compare-cities'), {'cities': 'Basel,Bern', 'mode': 'series', 'bucket': 'week'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,92 @@
+"""
+Tests for the in-memory city index
+"""
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from . import city_index
+from .city_index import CityIndex, get_city_index
+from .models import City
+
+
+def _city(city_id, name, country):
+    return {'id': city_id, 'name': name, 'country': country, 'latitude': 0.0, 'longitude': 0.0}
+
+
+class CityIndexSearchTest(TestCase):
+    """Test ranking and matching of CityIndex.search"""
+
+    def setUp(self):
+        self.index = CityIndex([
+            _city(1, 'London', 'GB'),
+            _city(2, 'Londonderry', 'GB'),
+            _city(3, 'New London', 'US'),
+            _city(4, 'São Paulo', 'BR'),
+            _city(5, 'Barcelona', 'ES'),
+            _city(6, 'East London', 'ZA'),
+        ], all_names=['London', 'Old Town'])
+
+    def names(self, query, limit=10):
+        return [city['name'] for city in self.index.search(query, limit)]
+
+    def test_exact_then_prefix_then_word_prefix(self):
+        self.assertEqual(
+            self.names('london'), ['London', 'Londonderry', 'East London', 'New London']
+        )
+
+    def test_substring_and_accents(self):
+        self.assertEqual(self.names('celon'), ['Barcelona'])
+        self.assertEqual(self.names('sao'), ['São Paulo'])
+
+    def test_country_prefix(self):
+        self.assertEqual(self.names('es'), ['Barcelona'])
+
+    def test_fuzzy_match_for_typos(self):
+        self.assertEqual(self.names('barcelna')[0], 'Barcelona')
+        self.assertEqual(self.names('zzzz'), [])
+
+    def test_has_name_includes_inactive_cities(self):
+        self.assertTrue(self.index.has_name('old town'))
+        self.assertFalse(self.index.has_name('Paris'))
+
+
+class CityIndexVersioningTest(TestCase):
+    """Test lazy loading, versioning and the SQL-free read path"""
+
+    def setUp(self):
+        cache.clear()
+        patcher = patch.multiple(city_index, _local_index=None, _local_version=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = APIClient()
+        City.objects.create(name='Lisbon', country='PT', latitude=38.7223, longitude=-9.1393)
+
+    def test_city_writes_bump_version(self):
+        first = get_city_index()
+        self.assertIs(get_city_index(), first)
+
+        City.objects.create(name='Porto', country='PT', latitude=41.1579, longitude=-8.6291)
+        second = get_city_index()
+        self.assertIsNot(second, first)
+        self.assertEqual([c['name'] for c in second.cities], ['Lisbon', 'Porto'])
+
+    def test_index_is_shared_through_cache(self):
+        get_city_index()
+        # A fresh process picks up the cached data without querying
+        city_index._local_index = None
+        with self.assertNumQueries(0):
+            self.assertEqual(len(get_city_index()), 1)
+
+    def test_list_and_search_skip_sql_when_warm(self):
+        self.client.get(reverse('city-list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('city-list'))
+            self.assertEqual([c['name'] for c in response.data['results']], ['Lisbon'])
+
+            response = self.client.get(reverse('search-cities'), {'q': 'lisbn'})
+            self.assertEqual(response.data['results'][0]['name'], 'Lisbon')
@@ -0,0 +1,207 @@
+"""
+Tests for the climatology normals and their use by analytics and alerts
+"""
+import math
+import random
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import climatology
+from .ai_predictions import advanced_predictor
+from .alert_system import WeatherAlertEngine
+from .climatology import (
+    anomaly_persistence_forecast, calendar_day, get_city_climatology, rebuild_climatology, score_reading
+)
+from .model_registry import model_registry
+from .models import City, ClimatologyNormal, MetricRollup, WeatherData
+from .rollups import RunningAggregate, city_subject
+from .test_ai_predictions import FEATURE_COLUMNS, RecordingModel, add_hourly_readings
+
+
+def diurnal_temperature(hour):
+    return 15 + 5 * math.sin((hour - 9) / 24 * 2 * math.pi)
+
+
+def add_rollups(city, start, days, rng, years=(0, 1, 2)):
+    """Hourly temperature rollups (four readings each) for ``days`` days from ``start`` in several past years"""
+    rollups = []
+    for years_back in years:
+        first = start.replace(year=start.year - years_back, minute=0, second=0, microsecond=0)
+        for offset in range(days * 24):
+            bucket_start = first + timedelta(hours=offset)
+            local_hour = bucket_start.astimezone(climatology.city_zone(city.timezone)).hour
+            values = [diurnal_temperature(local_hour) + rng.gauss(0, 1) for _ in range(4)]
+            rollup = MetricRollup(subject=city_subject(city.id), metric='temperature', bucket_start=bucket_start)
+            RunningAggregate.from_values(values).apply_to(rollup)
+            rollups.append(rollup)
+    MetricRollup.objects.bulk_create(rollups)
+
+
+def reset_local_grids():
+    climatology._local_grids.clear()
+    climatology._local_version = None
+
+
+class ClimatologyTest(TestCase):
+    """Test building, storing, loading and scoring the normals"""
+
+    def setUp(self):
+        cache.clear()
+        reset_local_grids()
+        self.city = City.objects.create(name='Normalton', country='XX', latitude=10, longitude=10)
+        self.june = datetime(2025, 6, 5, tzinfo=dt_timezone.utc)
+        add_rollups(self.city, self.june, 20, random.Random(3))
+
+    def test_calendar_day_keeps_a_slot_for_leap_day(self):
+        self.assertEqual(calendar_day(datetime(2024, 2, 29)), 59)
+        self.assertEqual(calendar_day(datetime(2023, 3, 1)), 60)
+        self.assertEqual(calendar_day(datetime(2024, 3, 1)), 60)
+        self.assertEqual(calendar_day(datetime(2023, 12, 31)), 365)
+
+    def test_rebuild_stores_pooled_normals(self):
+        result = rebuild_climatology()
+        self.assertEqual(result['cities'], 1)
+
+        moment = datetime(2025, 6, 15, 14, tzinfo=dt_timezone.utc)
+        normal = ClimatologyNormal.objects.get(
+            city=self.city, metric='temperature', day_of_year=calendar_day(moment) + 1, hour=14
+        )
+        # 15 pooled days x 3 years x 4 readings
+        self.assertEqual(normal.count, 180)
+        self.assertAlmostEqual(normal.mean, diurnal_temperature(14), delta=0.3)
+        self.assertAlmostEqual(normal.std, 1.0, delta=0.2)
+        self.assertLess(normal.p10, normal.p50)
+        self.assertLess(normal.p50, normal.p90)
+
+    def test_score_reading(self):
+        rebuild_climatology()
+        moment = datetime(2025, 6, 15, 14, tzinfo=dt_timezone.utc)
+        normal = diurnal_temperature(14)
+
+        typical = score_reading(self.city.id, 'temperature', round(normal, 1), moment)
+        self.assertEqual(typical['category'], 'normal')
+        self.assertAlmostEqual(typical['percentile'], 50, delta=15)
+        self.assertFalse(typical['is_anomaly'])
+
+        hot = score_reading(self.city.id, 'temperature', normal + 6, moment)
+        self.assertEqual(hot['category'], 'much_above_normal')
+        self.assertGreater(hot['percentile'], 95)
+        self.assertTrue(hot['is_anomaly'])
+
+        # No normals outside the recorded season, or for metrics never rolled up
+        self.assertIsNone(score_reading(self.city.id, 'temperature', 10, moment.replace(month=1)))
+        self.assertIsNone(score_reading(self.city.id, 'pressure', 1010, moment))
+
+    def test_hours_are_local_to_the_city(self):
+        tokyo = City.objects.create(name='Tokyo', country='JP', latitude=35.7, longitude=139.7, timezone='Asia/Tokyo')
+        add_rollups(tokyo, self.june, 20, random.Random(5), years=(0,))
+        rebuild_climatology([tokyo.id])
+
+        # 05:00 UTC is 14:00 in Tokyo
+        grid = get_city_climatology(tokyo.id)
+        moment = datetime(2025, 6, 15, 5, tzinfo=dt_timezone.utc)
+        self.assertEqual(grid.position(moment)[1], 14)
+        self.assertAlmostEqual(grid.normal('temperature', moment), diurnal_temperature(14), delta=0.5)
+
+    def test_scoring_reads_the_table_once(self):
+        rebuild_climatology()
+        moment = datetime(2025, 6, 15, 14, tzinfo=dt_timezone.utc)
+
+        # Published with the rebuild: no query at all
+        with self.assertNumQueries(0):
+            score_reading(self.city.id, 'temperature', 20, moment)
+
+        # A worker without the cache entry loads the table once, then shares it
+        cache.delete(climatology._grid_key(self.city.id, climatology.get_climatology_version()))
+        reset_local_grids()
+        with self.assertNumQueries(2):
+            score_reading(self.city.id, 'temperature', 20, moment)
+        reset_local_grids()
+        with self.assertNumQueries(0):
+            score_reading(self.city.id, 'temperature', 20, moment)
+
+    def test_persistence_forecast_relaxes_toward_normal(self):
+        rebuild_climatology()
+        start = datetime(2025, 6, 15, 14, tzinfo=dt_timezone.utc)
+        forecast = anomaly_persistence_forecast(self.city.id, 'temperature', diurnal_temperature(14) + 5, start, 24)
+
+        self.assertEqual(len(forecast), 24)
+        departures = [value - diurnal_temperature((14 + h) % 24) for h, value in enumerate(forecast, start=1)]
+        self.assertGreater(departures[0], departures[-1])
+        self.assertGreater(departures[-1], 0)
+        self.assertIsNone(anomaly_persistence_forecast(self.city.id, 'pressure', 1010, start))
+
+
+class ClimatologyConsumersTest(TestCase):
+    """Test the analytics view and the alert engine score readings against the normals"""
+
+    def setUp(self):
+        cache.clear()
+        reset_local_grids()
+        self.city = City.objects.create(name='Seasonville', country='XX', latitude=1, longitude=1)
+        now = timezone.now()
+        add_rollups(self.city, now - timedelta(days=10), 20, random.Random(11), years=(1, 2))
+        rebuild_climatology()
+
+        hour = now.hour
+        self.reading = WeatherData.objects.create(
+            city=self.city, temperature=round(diurnal_temperature(hour) + 8, 1), feels_like=20, humidity=50,
+            pressure=1012, visibility=10, wind_speed=5, wind_direction=90, weather_condition='Clear',
+            weather_description='clear sky', weather_icon='01d', cloudiness=0
+        )
+
+    def test_alert_engine_flags_unseasonal_readings(self):
+        alerts = WeatherAlertEngine().evaluate_weather_conditions(self.reading)
+        anomaly = [alert for alert in alerts if alert['type'] == 'climate_anomaly']
+
+        self.assertEqual(len(anomaly), 1)
+        self.assertEqual(anomaly[0]['metric'], 'temperature')
+        self.assertEqual(anomaly[0]['severity'], 'high')
+        self.assertIn('above the normal', anomaly[0]['message'])
+
+        typical = SimpleNamespace(**{
+            field: getattr(self.reading, field) for field in (
+                'city', 'city_id', 'timestamp', 'pressure', 'wind_speed', 'visibility', 'weather_description'
+            )
+        }, temperature=round(diurnal_temperature(self.reading.timestamp.hour), 1))
+        self.assertEqual(WeatherAlertEngine().evaluate_weather_conditions(typical), [])
+
+    def test_analytics_climatology_section(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(
+            username='climate', email='climate@example.com', password='secret-pass-123'
+        ))
+        response = client.get(reverse('weather-analytics'), {'city': 'Seasonville', 'include': 'climatology'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'climatology'})
+        self.assertEqual(set(response.data['climatology']), {'temperature'})
+        self.assertTrue(response.data['climatology']['temperature']['is_anomaly'])
+
+    def test_published_models_win_over_the_normals(self):
+        outlook = advanced_predictor.predict_advanced_24h(self.city, self.reading)
+        self.assertEqual(outlook[0]['model_version'], 'climatology')
+        self.assertIsNone(outlook[0]['model_accuracy'])
+        self.assertNotEqual(outlook[-1]['temperature'], self.reading.temperature)
+
+        model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, model_dir, ignore_errors=True)
+        self.addCleanup(model_registry.clear)
+        current = add_hourly_readings(self.city, [10.0 + step for step in range(30)])
+        with self.settings(ML_MODEL_DIR=model_dir):
+            model_registry.register(RecordingModel('temperature', 1.0), 'temperature', city=self.city,
+                                    mae=0.5, feature_columns=FEATURE_COLUMNS)
+            predictions = advanced_predictor.predict_advanced_24h(self.city, current)
+
+        self.assertEqual([p['temperature'] for p in predictions], [40.0] * 24)
+        self.assertEqual(predictions[0]['model_version'], 'ensemble:v1')
+        self.assertEqual(predictions[0]['model_accuracy'], 0.5)
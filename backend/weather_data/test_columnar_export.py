@@ -0,0 +1,134 @@
+"""
+Tests for the incremental Parquet exports
+"""
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+import pyarrow.dataset as ds
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import UserActivity
+
+from . import columnar_export
+from .api_management import APIProvider, APIUsage
+from .columnar_export import export_dataset, export_datasets, read_watermark
+from .models import City, NotificationLog, PushSubscription, WeatherData
+
+
+class ColumnarExportTest(TestCase):
+    """Test chunked, partitioned and incremental exports"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.city = City.objects.create(name='Oslo', country='NO', latitude=59.9, longitude=10.7)
+
+    def _readings(self, count, days_ago=0):
+        for i in range(count):
+            reading = WeatherData.objects.create(
+                city=self.city, temperature=5.0 + i, feels_like=4.0, humidity=70, pressure=1008,
+                wind_speed=6, wind_direction=200, weather_condition='Clouds',
+                weather_description='overcast', weather_icon='04d', cloudiness=80
+            )
+            WeatherData.objects.filter(id=reading.id).update(timestamp=timezone.now() - timedelta(days=days_ago))
+
+    def _read(self, name):
+        return ds.dataset(os.path.join(self.root, name), format='parquet', partitioning='hive').to_table()
+
+    def _export(self, name, **kwargs):
+        return export_dataset(name, root=self.root, settle_seconds=0, **kwargs)
+
+    def test_chunked_partitioned_export(self):
+        self._readings(3, days_ago=2)
+        self._readings(2)
+
+        result = self._export('weather_history', chunk_size=2)
+
+        self.assertEqual(result['rows'], 5)
+        self.assertEqual(len(result['partitions']), 2)
+        table = self._read('weather_history')
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(set(table.column('city').to_pylist()), {'Oslo'})
+        self.assertEqual(sorted(table.column('temperature').to_pylist()), [5.0, 5.0, 6.0, 6.0, 7.0])
+        self.assertEqual(read_watermark(self.root, 'weather_history')['id'], WeatherData.objects.latest('id').id)
+
+    def test_incremental_export_reads_only_new_rows(self):
+        self._readings(3)
+        self._export('weather_history')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self._export('weather_history')['rows'], 0)
+
+        self._readings(2)
+        self.assertEqual(self._export('weather_history')['rows'], 2)
+        ids = self._read('weather_history').column('id').to_pylist()
+        self.assertEqual(sorted(ids), sorted(WeatherData.objects.values_list('id', flat=True)))
+
+    def test_unsettled_rows_wait_for_the_next_run(self):
+        self._readings(2)
+        result = export_dataset('weather_history', root=self.root)
+        self.assertEqual(result['rows'], 0)
+        self.assertIsNone(read_watermark(self.root, 'weather_history'))
+
+    def test_updated_usage_rows_are_exported_again(self):
+        provider = APIProvider.objects.create(
+            name='export_provider', display_name='Export Provider', base_url='https://api.test.com',
+            api_key='key', cost_per_request=Decimal('0.001')
+        )
+        usage = APIUsage.objects.create(
+            provider=provider, date=timezone.now().date(), endpoint='weather', request_count=10, cost=Decimal('0.01')
+        )
+        self.assertEqual(self._export('api_usage')['rows'], 1)
+
+        usage.request_count = 25
+        usage.save()
+        self.assertEqual(self._export('api_usage')['rows'], 1)
+
+        table = self._read('api_usage').sort_by('updated_at').to_pydict()
+        self.assertEqual(table['request_count'], [10, 25])
+        self.assertEqual(table['cost'], [Decimal('0.010000')] * 2)
+
+    def test_failed_run_publishes_nothing(self):
+        self._readings(4)
+        original = columnar_export._chunk_tables
+        calls = []
+
+        def failing_second_chunk(dataset, rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError('disk full')
+            return original(dataset, rows)
+
+        with patch.object(columnar_export, '_chunk_tables', failing_second_chunk):
+            with self.assertRaises(RuntimeError):
+                self._export('weather_history', chunk_size=2)
+
+        files = [f for _, _, names in os.walk(self.root) for f in names]
+        self.assertEqual(files, [])
+        self.assertEqual(self._export('weather_history')['rows'], 4)
+
+    def test_all_datasets(self):
+        user = get_user_model().objects.create_user(username='bi', email='bi@example.com', password='secret-pass-123')
+        UserActivity.objects.create(user=user, activity_type='login', ip_address='10.0.0.1', metadata={'via': 'web'})
+        subscription = PushSubscription.objects.create(
+            user=user, endpoint='https://push.example.com/1', p256dh_key='key', auth_key='auth'
+        )
+        NotificationLog.objects.create(
+            subscription=subscription, notification_type='test', title='Hi', body='Body', status='sent'
+        )
+
+        results = export_datasets(root=self.root, settle_seconds=0)
+
+        self.assertEqual({r['dataset']: r['rows'] for r in results}, {
+            'weather_history': 0, 'api_usage': 0, 'notification_logs': 1, 'user_activity': 1
+        })
+        activity = self._read('user_activity')
+        self.assertNotIn('ip_address', activity.column_names)
+        self.assertEqual(activity.column('metadata').to_pylist(), ['{"via": "web"}'])
+        self.assertEqual(self._read('notification_logs').column('user_id').to_pylist(), [user.id])
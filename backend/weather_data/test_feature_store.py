@@ -0,0 +1,122 @@
+"""
+Tests for the per-city feature store
+"""
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from .feature_store import (
+    FEATURE_COLUMNS, RAW_COLUMNS, WINDOW, CityFeatureBuffer, compute_features, get_city_buffers,
+    history_features, latest_feature_rows, record_reading,
+)
+from .models import City, WeatherData
+
+
+def add_reading(city, timestamp, temperature):
+    reading = WeatherData.objects.create(
+        city=city, temperature=temperature, feels_like=temperature - 1, humidity=50 + temperature % 7,
+        pressure=1000 + temperature % 11, wind_speed=3, wind_direction=180, weather_condition='Clear',
+        weather_description='clear sky', weather_icon='01d', cloudiness=10
+    )
+    WeatherData.objects.filter(id=reading.id).update(timestamp=timestamp)
+    reading.timestamp = timestamp
+    return reading
+
+
+class FeatureStoreTest(TestCase):
+    """Test the rolling buffers match the batch features used for training"""
+
+    def setUp(self):
+        cache.clear()
+        self.city = City.objects.create(name='Featureton', country='XX', latitude=1, longitude=1)
+        self.start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=60)
+        for hour in range(40):
+            add_reading(self.city, self.start + timedelta(hours=hour), 10.0 + (hour * 7) % 13)
+
+    def _history(self):
+        return history_features(self.city.id, self.start - timedelta(hours=1)).to_numpy()
+
+    def test_buffer_rows_match_history_features(self):
+        history = self._history()
+        self.assertEqual(history.shape, (40, len(FEATURE_COLUMNS)))
+        self.assertEqual(history.dtype, np.float32)
+
+        # A buffer shorter than the history still holds WINDOW readings per row
+        buffer = CityFeatureBuffer.load(self.city.id, size=WINDOW)
+        self.assertEqual(len(buffer), WINDOW)
+        np.testing.assert_allclose(buffer.features[-1], history[-1], rtol=1e-6)
+
+    def test_ingested_readings_append_the_same_rows(self):
+        get_city_buffers([self.city.id])
+
+        for hour in range(40, 45):
+            reading = add_reading(self.city, self.start + timedelta(hours=hour), 30.0 - hour % 5)
+            with patch('weather_data.feature_store.compute_features', wraps=compute_features) as compute:
+                record_reading(reading)
+            # Only the tail of the buffer is recomputed
+            self.assertEqual(len(compute.call_args[0][0]), WINDOW)
+
+        buffer = get_city_buffers([self.city.id])[self.city.id]
+        self.assertEqual(buffer.reading_ids[-1], reading.id)
+        np.testing.assert_allclose(buffer.features[-5:], self._history()[-5:], rtol=1e-6)
+        np.testing.assert_allclose(
+            latest_feature_rows([self.city.id])[self.city.id].to_numpy(), self._history()[-1], rtol=1e-6
+        )
+
+    def test_concurrent_readings_are_both_appended(self):
+        get_city_buffers([self.city.id])
+        readings = [add_reading(self.city, self.start + timedelta(hours=hour), 20.0) for hour in (40, 41)]
+        append = CityFeatureBuffer.append
+
+        def slow_append(buffer, *args, **kwargs):
+            # Long enough for the other reading to read the same buffer without a lock
+            time.sleep(0.1)
+            return append(buffer, *args, **kwargs)
+
+        with patch.object(CityFeatureBuffer, 'append', slow_append):
+            threads = [threading.Thread(target=record_reading, args=(reading,)) for reading in readings]
+            for thread in threads:
+                thread.start()
+                time.sleep(0.02)
+            for thread in threads:
+                thread.join()
+
+        buffer = get_city_buffers([self.city.id])[self.city.id]
+        self.assertEqual(list(buffer.reading_ids[-2:]), [reading.id for reading in readings])
+
+    def test_payload_round_trip(self):
+        buffer = CityFeatureBuffer.load(self.city.id)
+        restored = CityFeatureBuffer.from_payload(buffer.to_payload())
+
+        np.testing.assert_array_equal(restored.reading_ids, buffer.reading_ids)
+        np.testing.assert_array_equal(restored.timestamps, buffer.timestamps)
+        np.testing.assert_array_equal(restored.raw, buffer.raw)
+        np.testing.assert_array_equal(restored.features, buffer.features)
+        self.assertEqual(restored.raw.shape[1], len(RAW_COLUMNS))
+
+    def test_out_of_order_reading_resets_the_buffer(self):
+        get_city_buffers([self.city.id])
+        late = add_reading(self.city, self.start + timedelta(hours=20, minutes=30), 99.0)
+
+        record_reading(late)
+
+        self.assertIsNone(cache.get(f'features:city:{self.city.id}'))
+        # Rebuilt from the table, in timestamp order
+        buffer = get_city_buffers([self.city.id])[self.city.id]
+        self.assertIn(late.id, buffer.reading_ids)
+        self.assertEqual(list(buffer.timestamps), sorted(buffer.timestamps))
+
+    def test_uncached_cities_are_not_buffered_on_ingest(self):
+        reading = add_reading(self.city, self.start + timedelta(hours=41), 20.0)
+        record_reading(reading)
+        self.assertIsNone(cache.get(f'features:city:{self.city.id}'))
+
+    def test_city_without_readings_has_no_row(self):
+        empty = City.objects.create(name='Empty', country='XX', latitude=2, longitude=2)
+        self.assertEqual(set(latest_feature_rows([self.city.id, empty.id])), {self.city.id})
@@ -0,0 +1,154 @@
+"""
+Tests for the global prediction models shared by every city
+"""
+import shutil
+import tempfile
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .ai_predictions import advanced_predictor
+from .global_model import (
+    GLOBAL_FAMILY, GLOBAL_FEATURE_COLUMNS, MAX_HOURS_AHEAD, ReservoirSample, fit_global_models, training_pairs,
+)
+from .model_registry import model_registry
+from .model_training import run_global_training
+from .models import City, PredictionModel, WeatherData
+
+MODEL_DIR = tempfile.mkdtemp()
+
+
+class ReservoirSampleTest(SimpleTestCase):
+    """Test the bounded uniform sample training rows are kept in"""
+
+    def test_keeps_at_most_capacity_rows_sampled_uniformly(self):
+        sample = ReservoirSample(100, 1, np.random.default_rng(0))
+        for start in range(0, 10000, 250):
+            values = np.arange(start, start + 250, dtype=np.float32)
+            sample.add(values[:, None], values)
+
+        X, y = sample.arrays()
+        self.assertEqual((len(X), sample.seen), (100, 10000))
+        np.testing.assert_array_equal(X[:, 0], y)
+        # Drawn from the whole stream, not just its start or end
+        self.assertEqual(len(np.unique(y)), 100)
+        self.assertLess(abs(y.mean() - 5000), 1000)
+
+    def test_short_streams_are_kept_whole(self):
+        sample = ReservoirSample(100, 2, np.random.default_rng(0))
+        sample.add(np.ones((30, 2), dtype=np.float32), np.arange(30, dtype=np.float32))
+        self.assertEqual(sorted(sample.arrays()[1]), list(range(30)))
+
+
+class TrainingPairsTest(SimpleTestCase):
+    """Test readings are paired with the reading the drawn number of hours later"""
+
+    def test_pairs_match_within_half_an_hour(self):
+        # Hourly readings, a few minutes late, with hours 30-39 missing
+        hours = np.array([h for h in range(100) if not 30 <= h < 40])
+        timestamps = hours * 3600.0 + np.where(hours % 2, 600, 0)
+
+        rows, ahead, targets = training_pairs(timestamps, np.random.default_rng(1))
+
+        self.assertTrue(np.all((ahead >= 1) & (ahead <= MAX_HOURS_AHEAD)))
+        np.testing.assert_array_equal(hours[targets] - hours[rows], ahead)
+        # Nothing is paired with a missing hour or past the end
+        self.assertLess(len(rows), len(hours))
+        self.assertTrue(np.all(timestamps[targets] > timestamps[rows]))
+
+
+@override_settings(ML_MODEL_DIR=MODEL_DIR, ML_GLOBAL_CHUNK_CITIES=2)
+class GlobalModelTest(TestCase):
+    """Test one model per metric is trained over all cities and serves any of them"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MODEL_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(model_registry.clear)
+        self.now = timezone.now()
+        self.cities = [self._city(f'Global {i}', latitude=10 * i) for i in range(3)]
+        for city in self.cities:
+            self._readings(city, 120)
+
+    def _city(self, name, latitude):
+        return City.objects.create(name=name, country='XX', latitude=latitude, longitude=latitude / 2)
+
+    def _readings(self, city, count):
+        # Warmer toward the equator, with a daily cycle
+        for hours_ago in range(count - 1, -1, -1):
+            moment = self.now - timedelta(hours=hours_ago)
+            temperature = 30 - city.latitude / 2 + 4 * np.sin(2 * np.pi * moment.hour / 24)
+            reading = WeatherData.objects.create(
+                city=city, temperature=temperature, feels_like=temperature, humidity=60, pressure=1012,
+                wind_speed=4, wind_direction=90, weather_condition='Clear',
+                weather_description='clear sky', weather_icon='01d', cloudiness=0
+            )
+            WeatherData.objects.filter(id=reading.id).update(timestamp=moment)
+        return WeatherData.objects.filter(city=city).latest('timestamp')
+
+    def test_fits_one_shared_model_per_metric(self):
+        summary = fit_global_models(max_rows=200)
+
+        self.assertEqual(summary['cities'], 3)
+        self.assertEqual(set(summary['trained']), {'temperature', 'humidity', 'pressure', 'wind_speed'})
+        models = PredictionModel.objects.filter(family=GLOBAL_FAMILY)
+        self.assertEqual(models.count(), 4)
+        self.assertFalse(models.filter(city__isnull=False).exists())
+        temperature = models.get(metric='temperature')
+        # Memory is bounded by the sample, however many rows were seen
+        self.assertEqual(temperature.data_points, 200)
+        self.assertGreater(summary['trained']['temperature']['rows_seen'], 200)
+        self.assertEqual(temperature.feature_columns, GLOBAL_FEATURE_COLUMNS)
+
+    def test_serves_trained_new_and_empty_cities(self):
+        fit_global_models()
+        newcomer = self._city('Global newcomer', latitude=15)
+        current = self._readings(newcomer, 30)
+        empty = self._city('Global empty', latitude=5)
+        requests = [
+            (self.cities[0], WeatherData.objects.filter(city=self.cities[0]).latest('timestamp')),
+            (newcomer, current),
+            (empty, current),
+        ]
+
+        trained, new, baseline = advanced_predictor.predict_advanced_batch(requests, family=GLOBAL_FAMILY)
+
+        self.assertEqual(len(trained), 24)
+        self.assertEqual(trained[0]['model_version'], f'{GLOBAL_FAMILY}:v1')
+        self.assertEqual(new[0]['model_version'], f'{GLOBAL_FAMILY}:v1')
+        self.assertEqual(baseline[0]['model_version'], 'baseline')
+        # Learnt from the other cities: between its neighbours' temperatures
+        self.assertTrue(all(15 <= p['temperature'] <= 35 for p in new))
+
+    def test_without_published_models_serves_the_baseline(self):
+        current = WeatherData.objects.filter(city=self.cities[0]).latest('timestamp')
+        predictions = advanced_predictor.predict_advanced_batch([(self.cities[0], current)], family=GLOBAL_FAMILY)
+        self.assertEqual(predictions[0][0]['model_version'], 'baseline')
+
+    def test_training_runs_only_when_models_are_stale(self):
+        first = run_global_training()
+        second = run_global_training()
+
+        self.assertEqual((first['mode'], first['models_trained']), ('global', 4))
+        self.assertEqual(second['models_trained'], 0)
+        self.assertEqual(run_global_training(force=True)['models_trained'], 4)
+
+    def test_view_selects_the_global_models(self):
+        fit_global_models()
+
+        response = APIClient().get(reverse('ai-predictions'), {'city': 'Global 1', 'model': 'global'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['predictions'][0]['model_version'], f'{GLOBAL_FAMILY}:v1')
+
+        with override_settings(ML_MODEL_MODE='global'):
+            response = APIClient().get(reverse('ai-predictions'), {'city': 'Global 2'})
+        self.assertEqual(response.data['predictions'][0]['model_version'], f'{GLOBAL_FAMILY}:v1')
@@ -0,0 +1,180 @@
+"""
+Tests for the out-of-process inference server and its client
+"""
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .inference_service import InferenceClient, InferenceServer, InferenceUnavailable, MicroBatcher
+from .models import City, WeatherData
+
+
+def echo_predict(calls, delay=0.0):
+    """Stand-in predict: one prediction per request, echoing its city and temperature"""
+    def predict(items, hours, family):
+        calls.append(len(items))
+        time.sleep(delay)
+        return [
+            [{'hour': 1, 'city': item['city']['name'], 'temperature': item['current']['temperature'],
+              'model_version': 'ensemble:v1'}] * hours
+            for item in items
+        ]
+    return predict
+
+
+def pair(name, temperature):
+    return SimpleNamespace(id=len(name), name=name), SimpleNamespace(
+        id=1, temperature=temperature, humidity=50, pressure=1010.0, wind_speed=3.0
+    )
+
+
+class MicroBatcherTest(SimpleTestCase):
+    """Test concurrent jobs are scored in one call and routed back"""
+
+    def test_jobs_in_one_window_share_a_predict_call(self):
+        calls = []
+        batcher = MicroBatcher(echo_predict(calls), window_ms=200, max_batch=10).start()
+        self.addCleanup(batcher.stop)
+        results = {}
+
+        def submit(name, count):
+            items = [{'city': {'id': i, 'name': f'{name}{i}'}, 'current': {'temperature': i}} for i in range(count)]
+            results[name] = batcher.submit(items, 2)
+
+        threads = [threading.Thread(target=submit, args=(name, count)) for name, count in [('a', 1), ('b', 3)]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, [4])
+        self.assertEqual([r[0]['city'] for r in results['a']], ['a0'])
+        self.assertEqual([r[0]['city'] for r in results['b']], ['b0', 'b1', 'b2'])
+        self.assertEqual(len(results['b'][0]), 2)
+        self.assertEqual(batcher.stats['largest_batch'], 4)
+
+    def test_full_batch_is_scored_without_waiting(self):
+        calls = []
+        batcher = MicroBatcher(echo_predict(calls), window_ms=5000, max_batch=2).start()
+        self.addCleanup(batcher.stop)
+
+        started_at = time.monotonic()
+        batcher.submit([{'city': {'name': 'x'}, 'current': {'temperature': 1}}] * 2, 1)
+        self.assertLess(time.monotonic() - started_at, 1)
+
+    def test_failures_reach_every_job(self):
+        batcher = MicroBatcher(lambda items, hours, family: 1 / 0, window_ms=0).start()
+        self.addCleanup(batcher.stop)
+        with self.assertRaises(RuntimeError):
+            batcher.submit([{'city': {'name': 'x'}, 'current': {}}], 1)
+
+
+class InferenceServerTest(SimpleTestCase):
+    """Test the client against a live server on a temporary socket"""
+
+    def _serve(self, predict):
+        path = os.path.join(tempfile.mkdtemp(), 'inference.sock')
+        server = InferenceServer(path, MicroBatcher(predict, window_ms=20))
+        thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        thread.start()
+
+        def shutdown():
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        self.addCleanup(shutdown)
+        return path
+
+    def test_round_trip(self):
+        calls = []
+        client = InferenceClient(self._serve(echo_predict(calls)), timeout_ms=2000)
+
+        predictions = client.predict([pair('Oslo', 4.0), pair('Rome', 21.5)], 3)
+
+        self.assertEqual(calls, [2])
+        self.assertEqual([p[0]['city'] for p in predictions], ['Oslo', 'Rome'])
+        self.assertEqual(predictions[1][0]['temperature'], 21.5)
+        self.assertEqual(len(predictions[0]), 3)
+
+    def test_slow_server_times_out(self):
+        client = InferenceClient(self._serve(echo_predict([], delay=1.0)), timeout_ms=100)
+        with self.assertRaises(InferenceUnavailable):
+            client.predict([pair('Oslo', 4.0)], 1)
+
+    def test_socket_directory_is_owner_only(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        path = os.path.join(root, 'run', 'inference.sock')
+
+        server = InferenceServer(path, MicroBatcher(echo_predict([])))
+        server.server_close()
+
+        self.assertEqual(stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode), 0o700)
+
+    def test_only_a_stale_socket_is_replaced(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        path = os.path.join(root, 'inference.sock')
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+
+        InferenceServer(path, MicroBatcher(echo_predict([]))).server_close()
+
+        # Anything else at the path is left alone
+        with open(path, 'w') as other:
+            other.write('not a socket')
+        with self.assertRaises(FileExistsError):
+            InferenceServer(path, MicroBatcher(echo_predict([])))
+        self.assertTrue(os.path.isfile(path))
+
+    def test_missing_server_is_unavailable(self):
+        client = InferenceClient(os.path.join(tempfile.mkdtemp(), 'missing.sock'), timeout_ms=100)
+        with self.assertRaises(InferenceUnavailable):
+            client.predict([pair('Oslo', 4.0)], 1)
+
+
+class InferenceFallbackTest(TestCase):
+    """Test requests fall back to the baseline forecast when the server is down"""
+
+    def setUp(self):
+        cache.clear()
+        self.city = City.objects.create(name='Fallbackton', country='XX', latitude=3, longitude=3)
+        self.current = WeatherData.objects.create(
+            city=self.city, temperature=17.0, feels_like=17.0, humidity=40, pressure=1015,
+            wind_speed=2, wind_direction=0, weather_condition='Clear',
+            weather_description='clear sky', weather_icon='01d', cloudiness=0
+        )
+
+    def test_client_serves_baseline_without_a_server(self):
+        client = InferenceClient(os.path.join(tempfile.mkdtemp(), 'missing.sock'), timeout_ms=100)
+
+        predictions = client.predict_batch([(self.city, self.current)])[0]
+
+        self.assertEqual(len(predictions), 24)
+        self.assertEqual(predictions[0]['model_version'], 'baseline')
+        self.assertEqual(predictions[0]['temperature'], 17.0)
+
+    @override_settings(ML_INFERENCE_MODE='server')
+    def test_view_predicts_through_the_client(self):
+        with patch('weather_data.inference_service.inference_client.predict',
+                   return_value=[[{'hour': 1, 'datetime': '2026-01-01T01:00:00+00:00', 'temperature': 99.0,
+                                  'model_version': 'ensemble:v7'}]]) as predict, \
+                patch('weather_data.ai_predictions.advanced_predictor.predict_advanced_batch',
+                      side_effect=AssertionError('scored in the web process')):
+            response = APIClient().get(reverse('ai-predictions'), {'city': 'Fallbackton'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(predict.call_count, 1)
+        self.assertEqual(response.data['predictions'][0]['temperature'], 99.0)
@@ -0,0 +1,52 @@
+"""
+Tests for request latency histograms
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .latency import get_path_latency_stats, merge_latency, record_path_latency
+from .models import City
+
+
+class PathLatencyTest(TestCase):
+    """Test per-path histograms and the performance metrics built on them"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_percentiles_without_raw_samples(self):
+        for i in range(1, 201):
+            record_path_latency('/api/slow/', i / 1000)
+        record_path_latency('/api/fast/', 0.002)
+
+        stats = get_path_latency_stats()
+        self.assertEqual(stats['request_count'], 201)
+        self.assertEqual([p['path'] for p in stats['paths']], ['/api/slow/', '/api/fast/'])
+
+        slow = stats['paths'][0]
+        self.assertAlmostEqual(slow['p50_ms'], 100, delta=2)
+        self.assertAlmostEqual(slow['p99_ms'], 198, delta=3)
+        self.assertEqual(slow['max_ms'], 200.0)
+
+    def test_histograms_merge(self):
+        record_path_latency('/a/', 0.01)
+        record_path_latency('/b/', 0.03)
+        entries = cache.get_many(['perf_metrics:_a_', 'perf_metrics:_b_'])
+        self.assertEqual(merge_latency(e['latency_sketch'] for e in entries.values()).count, 2)
+
+    def test_middleware_groups_by_url_pattern(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(
+            username='ops', email='ops@example.com', password='secret-pass-123'
+        ))
+        for name in ('Oslo', 'Rome'):
+            city = City.objects.create(name=name, country='XX', latitude=0, longitude=0)
+            client.get(reverse('city-detail', args=[city.id]))
+
+        response = client.get(reverse('performance-metrics'))
+        paths = {p['path']: p for p in response.data['response_times']['paths']}
+        self.assertEqual(paths['/api/weather/cities/<int:pk>/']['count'], 2)
+        self.assertIsNotNone(response.data['response_times']['p95_ms'])
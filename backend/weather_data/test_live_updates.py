@@ -0,0 +1,133 @@
+"""
+Tests for the live weather update channel
+"""
+import asyncio
+import json
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import live_updates
+from .live_updates import InMemoryBroker, publish_weather_update
+from .models import City, WeatherData
+
+
+def _reading(city, **overrides):
+    values = dict(
+        city=city, temperature=18.0, feels_like=17.0, humidity=60, pressure=1015,
+        wind_speed=10, wind_direction=200, weather_condition='Clouds',
+        weather_description='few clouds', weather_icon='02d', cloudiness=20
+    )
+    values.update(overrides)
+    return WeatherData.objects.create(**values)
+
+
+def _parse_event(chunk):
+    if isinstance(chunk, bytes):
+        chunk = chunk.decode()
+    lines = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+    return lines['event'], json.loads(lines['data'])
+
+
+class LiveUpdatesTestBase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.broker = InMemoryBroker()
+        patcher = patch.object(live_updates, '_broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.city = City.objects.create(name='London', country='GB', latitude=51.5074, longitude=-0.1278)
+
+
+class PublishWeatherUpdateTest(LiveUpdatesTestBase):
+    """Test delta computation and publishing"""
+
+    def test_publishes_only_changed_fields(self):
+        first = publish_weather_update(_reading(self.city))
+        self.assertTrue(first['full'])
+        self.assertEqual(first['changes']['temperature'], 18.0)
+
+        self.assertIsNone(publish_weather_update(_reading(self.city)))
+
+        delta = publish_weather_update(_reading(self.city, temperature=19.5, humidity=55))
+        self.assertFalse(delta['full'])
+        self.assertEqual(delta['changes'], {'temperature': 19.5, 'humidity': 55})
+
+    def test_new_reading_is_published_on_commit(self):
+        with patch.object(self.broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                _reading(self.city)
+        publish.assert_called_once()
+        self.assertEqual(publish.call_args[0][0]['city_id'], self.city.id)
+
+    def test_broker_failure_does_not_break_ingestion(self):
+        with patch.object(self.broker, 'publish', side_effect=ConnectionError('redis down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                weather = _reading(self.city)
+        self.assertTrue(WeatherData.objects.filter(id=weather.id).exists())
+
+
+class BrokerSelectionTest(TestCase):
+    """Test the broker follows LIVE_UPDATES_BROKER and warns when updates can't cross processes"""
+
+    def setUp(self):
+        patcher = patch.object(live_updates, '_broker', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_redis_is_the_default_with_a_redis_celery_broker(self):
+        from django.conf import settings
+
+        self.assertTrue(settings.CELERY_BROKER_URL.startswith('redis://'))
+        self.assertEqual(settings.LIVE_UPDATES_BROKER, 'redis')
+        self.assertIsInstance(live_updates.get_broker(), live_updates.RedisBroker)
+
+    @override_settings(LIVE_UPDATES_BROKER='memory')
+    def test_memory_broker_warns(self):
+        with self.assertLogs('weather247', level='WARNING') as logs:
+            self.assertIsInstance(live_updates.get_broker(), InMemoryBroker)
+        self.assertIn("LIVE_UPDATES_BROKER is 'memory'", logs.output[0])
+
+@override_settings(
+    ROOT_URLCONF='weather247_backend.asgi_urls',
+    LIVE_UPDATES_HEARTBEAT_SECONDS=0.1,
+    LIVE_UPDATES_MAX_STREAM_SECONDS=1,
+)
+class LiveWeatherStreamTest(LiveUpdatesTestBase):
+    """Test the Server-Sent Events stream"""
+
+    def test_rejects_bad_city_list(self):
+        url = reverse('live-weather-stream')
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cities': 'London'}).status_code, 400)
+
+    async def test_snapshot_then_deltas(self):
+        await sync_to_async(_reading)(self.city)
+        await sync_to_async(publish_weather_update)(await WeatherData.objects.select_related('city').afirst())
+
+        response = await self.async_client.get(reverse('live-weather-stream'), {'cities': str(self.city.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        events = response.streaming_content
+        self.assertTrue((await anext(events)).startswith(b'retry:'))
+        event, data = _parse_event(await anext(events))
+        self.assertEqual(event, 'snapshot')
+        self.assertEqual((data['city'], data['temperature']), ('London', 18.0))
+
+        self.assertEqual(self.broker.hub.subscriber_count(self.city.id), 1)
+        await sync_to_async(publish_weather_update)(await sync_to_async(_reading)(self.city, temperature=21.0))
+
+        event, data = _parse_event(await asyncio.wait_for(anext(events), 5))
+        self.assertEqual(event, 'weather')
+        self.assertEqual(data['changes'], {'temperature': 21.0})
+
+        # Bounded stream: heartbeats until the deadline, then the subscription is released
+        rest = [chunk async for chunk in events]
+        self.assertIn(b': keepalive\n\n', rest)
+        self.assertEqual(self.broker.hub.subscriber_count(), 0)
@@ -0,0 +1,173 @@
+"""
+Tests for the model registry and its use by the advanced predictor
+"""
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from sklearn.linear_model import LinearRegression
+
+from .ai_predictions import AdvancedWeatherPredictor
+from .model_registry import ModelRegistry, model_registry
+from .models import City, PredictionModel, WeatherData
+
+
+def fitted_model(slope, size=50):
+    X = np.random.default_rng(size).normal(size=(size, 3))
+    return LinearRegression().fit(X, X @ np.array([slope, 0.0, 1.0]))
+
+
+class ModelRegistryTest(TestCase):
+    """Test versioning, publishing, lazy memory-mapped loading and eviction"""
+
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.registry = ModelRegistry(root=self.root)
+        self.city = City.objects.create(name='Modelton', country='XX', latitude=1, longitude=1)
+
+    def test_register_publishes_the_next_version(self):
+        first = self.registry.register(fitted_model(1), 'temperature', city=self.city, mae=1.5,
+                                       data_points=50, feature_columns=['a', 'b', 'c'])
+        second = self.registry.register(fitted_model(2), 'temperature', city=self.city, mae=1.2)
+
+        self.assertEqual((first.version, second.version), (1, 2))
+        self.assertEqual(second.label, 'ensemble:v2')
+        self.assertTrue(os.path.exists(os.path.join(self.root, second.artifact_path)))
+        first.refresh_from_db()
+        self.assertFalse(first.is_published)
+        self.assertTrue(second.is_published)
+
+        loaded = self.registry.get(self.city.id, 'temperature')
+        self.assertEqual(loaded.model_version, 'ensemble:v2')
+        self.assertEqual(loaded.mae, 1.2)
+        self.assertIsNone(self.registry.get(self.city.id, 'humidity'))
+
+        # Pinning an older version back
+        self.registry.publish(first)
+        self.assertEqual(self.registry.get(self.city.id, 'temperature').model_version, 'ensemble:v1')
+
+    def test_artifacts_load_lazily_and_memory_mapped(self):
+        model = self.registry.register(fitted_model(3), 'pressure', city=self.city)
+        self.assertEqual(self.registry.loaded_models(), [])
+
+        loaded = self.registry.get(self.city.id, 'pressure')
+        self.assertIsInstance(loaded.estimator.coef_, np.memmap)
+        self.assertFalse(loaded.estimator.coef_.flags.writeable)
+        np.testing.assert_allclose(loaded.estimator.predict([[1.0, 0.0, 0.0]]), [3.0], atol=1e-6)
+        self.assertEqual(self.registry.loaded_models(), [model.id])
+
+        # Published versions come from the cache and the model from the process LRU
+        with self.assertNumQueries(0):
+            self.assertIs(self.registry.get(self.city.id, 'pressure'), loaded)
+
+    def test_least_recently_used_models_are_evicted(self):
+        models = [
+            self.registry.register(fitted_model(1), metric, city=self.city)
+            for metric in ('temperature', 'humidity', 'pressure', 'wind_speed')
+        ]
+        # Room for two artifacts
+        registry = ModelRegistry(root=self.root, memory_budget_mb=2.5 * models[0].size_bytes / 2 ** 20)
+
+        for model in models[:3]:
+            registry.get(self.city.id, model.metric)
+        self.assertEqual(registry.loaded_models(), [models[1].id, models[2].id])
+
+        registry.get(self.city.id, 'humidity')
+        registry.get(self.city.id, 'wind_speed')
+        self.assertEqual(registry.loaded_models(), [models[1].id, models[3].id])
+
+    def test_concurrent_registrations_take_separate_versions(self):
+        real_aggregate = QuerySet.aggregate
+        for city in (self.city, None):
+            competing = self.registry.register(fitted_model(1), 'wind_speed', city=city)
+            reads = []
+
+            def aggregate(queryset, *args, **kwargs):
+                reads.append(queryset)
+                # The first read does not see the other training's version yet
+                return {'latest': None} if len(reads) == 1 else real_aggregate(queryset, *args, **kwargs)
+
+            with self.subTest(city=city), patch.object(QuerySet, 'aggregate', autospec=True, side_effect=aggregate):
+                model = self.registry.register(fitted_model(2), 'wind_speed', city=city)
+
+                self.assertEqual((competing.version, model.version, len(reads)), (1, 2, 2))
+                directory = os.path.dirname(os.path.join(self.root, model.artifact_path))
+                self.assertEqual(sorted(os.listdir(directory)), ['v1.joblib', 'v2.joblib'])
+                np.testing.assert_allclose(
+                    self.registry.get(city and city.id, 'wind_speed').estimator.coef_, [2.0, 0.0, 1.0], atol=1e-6
+                )
+
+    def test_prune_keeps_recent_and_published_versions(self):
+        models = [self.registry.register(fitted_model(slope), 'humidity', city=self.city) for slope in range(4)]
+        self.registry.publish(models[0])
+
+        self.assertEqual(self.registry.prune(keep=2), 1)
+        self.assertEqual(
+            sorted(PredictionModel.objects.values_list('version', flat=True)), [1, 3, 4]
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.root, models[1].artifact_path)))
+
+
+class AdvancedPredictorRegistryTest(TestCase):
+    """Test the advanced predictor trains into and serves from the registry"""
+
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.addCleanup(model_registry.clear)
+        self.city = City.objects.create(name='Trainville', country='XX', latitude=1, longitude=1)
+        now = timezone.now()
+        readings = [
+            WeatherData(
+                city=self.city, temperature=15 + 5 * np.sin(i / 24 * 2 * np.pi), feels_like=14, humidity=60 + i % 10,
+                pressure=1010 + i % 5, wind_speed=5, wind_direction=90, weather_condition='Clear',
+                weather_description='clear sky', weather_icon='01d', cloudiness=0
+            ) for i in range(120)
+        ]
+        WeatherData.objects.bulk_create(readings)
+        for i, reading in enumerate(WeatherData.objects.order_by('id')):
+            WeatherData.objects.filter(id=reading.id).update(timestamp=now - timedelta(hours=120 - i))
+
+    def test_training_registers_a_published_model(self):
+        with override_settings(ML_MODEL_DIR=self.root):
+            predictor = AdvancedWeatherPredictor()
+            self.assertTrue(predictor.train_ensemble_model(self.city, 'temperature'))
+
+            record = PredictionModel.objects.get(city=self.city, metric='temperature')
+            self.assertTrue(record.is_published)
+            self.assertIn('humidity_lag_1h', record.feature_columns)
+            self.assertNotIn('weather_icon', record.feature_columns)
+
+            # A fresh predictor (another worker) serves the published version
+            info = AdvancedWeatherPredictor().get_model_info(self.city, 'temperature')
+            self.assertEqual(info['model_version'], 'ensemble:v1')
+            self.assertEqual(info['accuracy'], record.mae)
+
+    def test_trained_model_forecasts_the_daily_cycle(self):
+        with override_settings(ML_MODEL_DIR=self.root):
+            AdvancedWeatherPredictor().fit_ensemble_model(self.city, 'temperature')
+            current = WeatherData.objects.filter(city=self.city).latest('timestamp')
+            predictions = AdvancedWeatherPredictor().predict_advanced_batch([(self.city, current)], use_cache=False)[0]
+
+        # Reading i was taken 120 - i hours ago at 15 + 5 sin(2πi/24); the newest is reading 119
+        hours = np.array([
+            119 + (timezone.datetime.fromisoformat(p['datetime']) - current.timestamp).total_seconds() / 3600
+            for p in predictions
+        ])
+        expected = 15 + 5 * np.sin(hours / 24 * 2 * np.pi)
+        predicted = np.array([p['temperature'] for p in predictions])
+
+        # Not the newest reading carried forward: the cycle, in phase
+        self.assertGreater(predicted.max() - predicted.min(), 6)
+        self.assertGreater(np.corrcoef(predicted, expected)[0, 1], 0.9)
+        self.assertLess(np.abs(predicted - expected).mean(), 1.5)
@@ -0,0 +1,116 @@
+"""
+Tests for the background model training pipeline
+"""
+import shutil
+import tempfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from sklearn.dummy import DummyRegressor
+
+from .ai_predictions import ADVANCED_METRICS, advanced_predictor
+from .model_registry import model_registry
+from .model_training import run_training, stale_models
+from .models import City, PredictionModel, WeatherData
+
+MODEL_DIR = tempfile.mkdtemp()
+
+
+def add_readings(city, count, end=None):
+    end = end or timezone.now()
+    WeatherData.objects.bulk_create([
+        WeatherData(
+            city=city, temperature=15 + 5 * np.sin(i / 24 * 2 * np.pi), feels_like=14, humidity=60 + i % 10,
+            pressure=1010 + i % 5, wind_speed=5, wind_direction=90, weather_condition='Clear',
+            weather_description='clear sky', weather_icon='01d', cloudiness=0
+        ) for i in range(count)
+    ])
+    for i, reading_id in enumerate(
+        WeatherData.objects.filter(city=city).order_by('-id').values_list('id', flat=True)[:count]
+    ):
+        WeatherData.objects.filter(id=reading_id).update(timestamp=end - timedelta(hours=i))
+
+
+def fake_train_city(city_id, metrics, n_jobs=1):
+    """Stand-in for train_city that needs no database (runs in pool workers)"""
+    return {
+        'city_id': city_id, 'trained': {metric: {'version': 'ensemble:v1', 'mae': 1.0} for metric in metrics},
+        'skipped': [], 'errors': {},
+    }
+
+
+@override_settings(ML_MODEL_DIR=MODEL_DIR)
+class ModelTrainingTest(TestCase):
+    """Test stale model selection, training runs and the request path"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MODEL_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(model_registry.clear)
+        self.city = City.objects.create(name='Trainville', country='XX', latitude=1, longitude=1)
+        self.sparse = City.objects.create(name='Sparseville', country='XX', latitude=2, longitude=2)
+        # Latest readings a day old
+        self.yesterday = timezone.now() - timedelta(days=1)
+        add_readings(self.city, 120, self.yesterday)
+        add_readings(self.sparse, 10, self.yesterday)
+
+    def _publish(self, metric, trained_at):
+        estimator = DummyRegressor().fit(np.zeros((2, 1)), [18.0, 18.0])
+        model = model_registry.register(estimator, metric, city=self.city, feature_columns=['temperature'])
+        PredictionModel.objects.filter(id=model.id).update(trained_at=trained_at)
+
+    def test_stale_models(self):
+        self.assertEqual(stale_models(), {self.city.id: ADVANCED_METRICS})
+
+        # Fresh model: skipped; old model with newer readings: retrained
+        self._publish('temperature', timezone.now())
+        self._publish('humidity', timezone.now() - timedelta(days=2))
+        self.assertEqual(stale_models(), {self.city.id: ['humidity', 'pressure', 'wind_speed']})
+
+        # Old model but no readings since it was trained: nothing to learn
+        self._publish('humidity', timezone.now() - timedelta(hours=12))
+        self.assertEqual(stale_models(max_age_hours=6), {self.city.id: ['pressure', 'wind_speed']})
+
+        self.assertEqual(stale_models(force=True), {self.city.id: ADVANCED_METRICS})
+
+    def test_serial_run_publishes_models(self):
+        summary = run_training(metrics=['temperature'], workers=1)
+
+        self.assertEqual(summary['mode'], 'serial')
+        self.assertEqual((summary['cities'], summary['models_trained']), (1, 1))
+        self.assertEqual(summary['errors'], {})
+        self.assertEqual(model_registry.get(self.city.id, 'temperature').model_version, 'ensemble:v1')
+
+        # Nothing stale anymore
+        self.assertEqual(run_training(metrics=['temperature'], workers=1)['cities'], 0)
+
+    def test_process_pool_trains_cities_in_workers(self):
+        add_readings(self.sparse, 110, self.yesterday)
+        progress = []
+        with patch('weather_data.model_training.train_city', fake_train_city):
+            summary = run_training(workers=2, progress=lambda done, total, result: progress.append(done))
+
+        self.assertEqual(summary['mode'], 'process')
+        self.assertEqual(summary['models_trained'], 8)
+        self.assertEqual(progress, [1, 2])
+
+    def test_requests_never_train(self):
+        current = SimpleNamespace(temperature=18.0, humidity=55, pressure=1012.0, wind_speed=4.0)
+        with patch.object(advanced_predictor, 'fit_ensemble_model', side_effect=AssertionError('trained')):
+            predictions = advanced_predictor.predict_advanced_24h(self.city, current)
+            self.assertEqual(len(predictions), 24)
+            self.assertEqual(predictions[0]['model_version'], 'baseline')
+            self.assertEqual(predictions[0]['pressure'], 1012.0)
+
+            self._publish('temperature', timezone.now())
+            predictions = advanced_predictor.predict_advanced_24h(self.city, current)
+            self.assertEqual(predictions[0]['model_version'], 'ensemble:v1')
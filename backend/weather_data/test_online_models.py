@@ -0,0 +1,162 @@
+"""
+Tests for the online forecasting models
+"""
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .ai_predictions import advanced_predictor
+from .models import City, WeatherData, WeatherPrediction
+from .online_models import (
+    ONLINE_METRICS, ONLINE_MODEL_LABEL, OnlineSeasonalModel, get_online_models, record_reading,
+)
+
+START = 1_700_000_000 // 86400 * 86400  # a UTC midnight
+
+
+def daily_cycle(hours):
+    """Temperature peaking at noon, other metrics constant"""
+    temperature = 15 + 5 * np.sin(2 * np.pi * (np.asarray(hours) % 24 - 6) / 24)
+    return np.column_stack([temperature, np.full_like(temperature, 60), np.full_like(temperature, 1012),
+                            np.full_like(temperature, 4)])
+
+
+class OnlineSeasonalModelTest(SimpleTestCase):
+    """Test the constant-time update rule and its forecasts"""
+
+    def test_learns_the_daily_cycle(self):
+        model = OnlineSeasonalModel()
+        hours = np.arange(24 * 30)
+        for hour, values in zip(hours, daily_cycle(hours)):
+            self.assertTrue(model.update(START + hour * 3600, values))
+
+        ahead = hours[-1] + np.arange(1, 25)
+        forecast = model.forecast(START + ahead * 3600)
+        self.assertEqual(forecast.shape, (len(ONLINE_METRICS), 24))
+        np.testing.assert_allclose(forecast.T, daily_cycle(ahead), atol=1.0)
+        # One-step errors shrink as the profile is learnt
+        self.assertLess(model.mae[0], 1.0)
+
+    def test_departures_decay_toward_the_profile(self):
+        model = OnlineSeasonalModel()
+        for hour in range(48):
+            model.update(START + hour * 3600, [10, 60, 1012, 4])
+        model.update(START + 48 * 3600, [20, 60, 1012, 4])
+
+        forecast = model.forecast(START + np.array([49, 60, 97]) * 3600)[0]
+        self.assertGreater(forecast[0], forecast[1])
+        self.assertAlmostEqual(forecast[2], 10.5, delta=0.5)
+
+    def test_old_and_incomplete_readings_are_skipped(self):
+        model = OnlineSeasonalModel()
+        model.update(START + 3600, [10, 60, 1012, 4])
+
+        self.assertFalse(model.update(START, [30, 60, 1012, 4]))
+        self.assertFalse(model.update(START + 7200, [np.nan, 60, 1012, 4]))
+        self.assertEqual(model.updates, 1)
+
+    def test_payload_round_trip(self):
+        model = OnlineSeasonalModel()
+        for hour, values in enumerate(daily_cycle(range(30))):
+            model.update(START + hour * 3600, values)
+
+        restored = OnlineSeasonalModel.from_payload(model.to_payload())
+
+        np.testing.assert_array_equal(restored.season, model.season)
+        np.testing.assert_array_equal(restored.forecast([START + 40 * 3600]), model.forecast([START + 40 * 3600]))
+        self.assertEqual((restored.updates, restored.last_timestamp), (30, model.last_timestamp))
+        self.assertIsNone(OnlineSeasonalModel.from_payload({**model.to_payload(), 'version': 0}))
+
+
+class OnlineIngestTest(TestCase):
+    """Test ingestion updates cached models and requests can select them"""
+
+    def setUp(self):
+        cache.clear()
+        self.city = City.objects.create(name='Onlineton', country='XX', latitude=4, longitude=4)
+        now = timezone.now()
+        for hours_ago in range(48, 0, -1):
+            self.current = self._add(now - timedelta(hours=hours_ago), 10.0 + hours_ago % 3)
+
+    def _add(self, timestamp, temperature):
+        reading = WeatherData.objects.create(
+            city=self.city, temperature=temperature, feels_like=temperature, humidity=55, pressure=1011,
+            wind_speed=3, wind_direction=90, weather_condition='Clear',
+            weather_description='clear sky', weather_icon='01d', cloudiness=0
+        )
+        WeatherData.objects.filter(id=reading.id).update(timestamp=timestamp)
+        reading.timestamp = timestamp
+        return reading
+
+    def test_bootstrap_then_update_per_reading(self):
+        model = get_online_models([self.city.id])[self.city.id]
+        self.assertEqual(model.updates, 48)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reading = WeatherData.objects.create(
+                city=self.city, temperature=25.0, feels_like=25.0, humidity=55, pressure=1011,
+                wind_speed=3, wind_direction=90, weather_condition='Clear',
+                weather_description='clear sky', weather_icon='01d', cloudiness=0
+            )
+
+        # Updated in place from the cache, not replayed from the table
+        with self.assertNumQueries(0):
+            model = get_online_models([self.city.id])[self.city.id]
+        self.assertEqual(model.updates, 49)
+        self.assertEqual(model.last_timestamp, reading.timestamp.timestamp())
+
+    def test_concurrent_readings_both_update_the_model(self):
+        get_online_models([self.city.id])
+        now = timezone.now()
+        readings = [self._add(now - timedelta(minutes=minutes), 20.0) for minutes in (30, 20)]
+        update = OnlineSeasonalModel.update
+
+        def slow_update(model, *args):
+            # Long enough for the other reading to load the same state without a lock
+            time.sleep(0.1)
+            return update(model, *args)
+
+        with patch.object(OnlineSeasonalModel, 'update', slow_update):
+            threads = [threading.Thread(target=record_reading, args=(reading,)) for reading in readings]
+            for thread in threads:
+                thread.start()
+                time.sleep(0.02)
+            for thread in threads:
+                thread.join()
+
+        model = get_online_models([self.city.id])[self.city.id]
+        self.assertEqual(model.updates, 50)
+        self.assertEqual(model.last_timestamp, readings[-1].timestamp.timestamp())
+
+    def test_online_family_serves_forecasts(self):
+        predictions = advanced_predictor.predict_advanced_batch([(self.city, self.current)], family='online')[0]
+
+        self.assertEqual(len(predictions), 24)
+        self.assertEqual(predictions[0]['model_version'], ONLINE_MODEL_LABEL)
+        self.assertTrue(all(9 <= p['temperature'] <= 13 for p in predictions))
+
+    def test_city_without_readings_gets_the_baseline(self):
+        empty = City.objects.create(name='Emptyton', country='XX', latitude=5, longitude=5)
+        predictions = advanced_predictor.predict_advanced_batch([(empty, self.current)], family='online')[0]
+        self.assertEqual(predictions[0]['model_version'], 'baseline')
+
+    def test_view_selects_the_model_family(self):
+        response = APIClient().get(reverse('ai-predictions'), {'city': 'Onlineton', 'model': 'online'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['predictions'][0]['model_version'], ONLINE_MODEL_LABEL)
+        self.assertEqual(
+            set(WeatherPrediction.objects.filter(city=self.city).values_list('model_version', flat=True)),
+            {ONLINE_MODEL_LABEL}
+        )
+
+        response = APIClient().get(reverse('ai-predictions'), {'city': 'Onlineton', 'model': 'lstm'})
+        self.assertEqual(response.status_code, 400)
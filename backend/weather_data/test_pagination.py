@@ -0,0 +1,131 @@
+"""
+Tests for keyset (cursor) pagination
+"""
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from .models import City, WeatherData, SystemMetrics
+from .pagination import KeysetPagination
+
+
+class KeysetPaginationTest(TestCase):
+    """Test cursor encoding and page traversal"""
+
+    def setUp(self):
+        self.city = City.objects.create(name='Keyset City', country='KC', latitude=1.0, longitude=2.0)
+        base = timezone.now()
+        for i in range(25):
+            weather = WeatherData.objects.create(
+                city=self.city, temperature=i, feels_like=i, humidity=50, pressure=1013,
+                wind_speed=5, wind_direction=90, weather_condition='Clear',
+                weather_description='clear sky', weather_icon='01d', cloudiness=0
+            )
+            # Pairs of rows share a timestamp so the id tie-breaker is exercised
+            WeatherData.objects.filter(pk=weather.pk).update(timestamp=base - timedelta(minutes=i // 2))
+
+    def test_pages_cover_all_rows_once(self):
+        """Walking next cursors visits every row exactly once, newest first"""
+        paginator = KeysetPagination(page_size=10)
+        seen = []
+        cursor = None
+        while True:
+            page = paginator.paginate(WeatherData.objects.all(), cursor=cursor)
+            seen.extend(item.pk for item in page)
+            cursor = paginator.get_next_cursor()
+            if not cursor:
+                break
+
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        expected = list(WeatherData.objects.order_by('-timestamp', '-pk').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_prior_page(self):
+        """A previous cursor walks back to the same rows"""
+        paginator = KeysetPagination(page_size=10)
+        first = paginator.paginate(WeatherData.objects.all())
+        second = paginator.paginate(WeatherData.objects.all(), cursor=paginator.get_next_cursor())
+        self.assertTrue(paginator.has_previous)
+
+        back = paginator.paginate(WeatherData.objects.all(), cursor=paginator.get_previous_cursor())
+        self.assertEqual([w.pk for w in back], [w.pk for w in first])
+        self.assertNotEqual([w.pk for w in second], [w.pk for w in first])
+
+    def test_tampered_cursor_rejected(self):
+        """Cursors that fail signature checks raise NotFound"""
+        paginator = KeysetPagination(page_size=10)
+        paginator.paginate(WeatherData.objects.all())
+        cursor = paginator.get_next_cursor()
+
+        with self.assertRaises(NotFound):
+            paginator.paginate(WeatherData.objects.all(), cursor=cursor[:-2] + 'xx')
+
+        # A cursor signed for another ordering field is not accepted either
+        with self.assertRaises(NotFound):
+            KeysetPagination(ordering_field='created_at').decode_cursor(cursor)
+
+
+    def test_historical_endpoint_pages_readings_with_window_trends(self):
+        """Historical data is paged by cursor while trends and counts cover the whole window"""
+        url = reverse('historical-data')
+        response = APIClient().get(url, {'city': 'Keyset City', 'days': 1, 'page_size': 10})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']), 10)
+        self.assertEqual(response.data['data_points'], 25)
+        self.assertEqual(response.data['trends']['temperature']['max'], 24)
+        # The newest page, in time order (ties broken by id) for the dashboard chart
+        page = response.data['data']
+        self.assertEqual([row['timestamp'] for row in page], sorted(row['timestamp'] for row in page))
+        self.assertEqual(page[-1]['temperature'], 1)
+
+        seen = [row['id'] for row in response.data['data']]
+        cursor = response.data['pagination']['next_cursor']
+        while cursor:
+            response = APIClient().get(url, {'city': 'Keyset City', 'days': 1, 'page_size': 10, 'cursor': cursor})
+            seen += [row['id'] for row in response.data['data']]
+            cursor = response.data['pagination']['next_cursor']
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+        response = APIClient().get(url, {'city': 'Keyset City', 'cursor': 'forged'})
+        self.assertEqual(response.status_code, 404)
+
+class KeysetPaginationAPITest(TestCase):
+    """Test keyset pagination on monitoring endpoints"""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_user(
+            username='keyset_admin', email='keyset@example.com', password='testpass123', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+        for i in range(5):
+            SystemMetrics.objects.create(
+                metric_type='cpu_usage', metric_name='CPU Usage', metric_value=i, component='system'
+            )
+
+    def test_system_metrics_cursor(self):
+        """Metrics endpoint returns a cursor for the next page"""
+        url = reverse('system_monitoring:system_metrics')
+        response = self.client.get(url, {'page_size': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        next_cursor = response.data['pagination']['next_cursor']
+        self.assertIsNotNone(next_cursor)
+
+        response = self.client.get(url, {'page_size': 3, 'cursor': next_cursor})
+        self.assertEqual(response.data['count'], 2)
+        self.assertIsNone(response.data['pagination']['next_cursor'])
+
+    def test_invalid_cursor_returns_404(self):
+        """Garbage cursors are rejected with 404 rather than a server error"""
+        url = reverse('system_monitoring:system_metrics')
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
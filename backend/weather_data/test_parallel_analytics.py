@@ -0,0 +1,78 @@
+"""
+Tests for chunked and parallel per-city analytics
+"""
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from .cache_manager import WeatherCacheManager
+from .models import City, WeatherData
+from .parallel_analytics import RunningAggregate, analyze_city_chunk, chunked, run_city_analytics
+
+FAILING_CITY_ID = -1
+
+
+def fake_chunk(city_ids, days=7):
+    """Stand-in for analyze_city_chunk that needs no database (runs in pool workers)"""
+    if FAILING_CITY_ID in city_ids:
+        raise RuntimeError('bad chunk')
+    return {
+        'cities': len(city_ids), 'processed': len(city_ids), 'skipped': 0, 'city_errors': [],
+        'temperature': RunningAggregate.from_values(city_ids).to_dict(), 'analytics': {},
+    }
+
+
+class ParallelAnalyticsTest(TestCase):
+    """Test chunking, merging, progress and failure isolation"""
+
+    def setUp(self):
+        self.cities = []
+        for i, temperature in enumerate([10.0, 12.0, 14.0, 16.0, 18.0]):
+            city = City.objects.create(name=f'City {i}', country='XX', latitude=i, longitude=i)
+            WeatherData.objects.create(
+                city=city, temperature=temperature, feels_like=temperature, humidity=60, pressure=1010,
+                wind_speed=3, wind_direction=0, weather_condition='Clear',
+                weather_description='clear sky', weather_icon='01d', cloudiness=0
+            )
+            self.cities.append(city)
+        City.objects.create(name='Empty', country='XX', latitude=9, longitude=9)
+
+    def test_chunked(self):
+        self.assertEqual(chunked(range(5), 2), [[0, 1], [2, 3], [4]])
+
+    def test_serial_run_merges_chunks_and_caches_cities(self):
+        progress = []
+        summary = run_city_analytics(
+            mode='serial', chunk_size=2, progress=lambda done, total, result: progress.append((done, total))
+        )
+
+        self.assertEqual(progress, [(1, 3), (2, 3), (3, 3)])
+        self.assertEqual((summary['cities'], summary['cities_processed'], summary['cities_skipped']), (6, 5, 1))
+        self.assertEqual(summary['temperature']['avg'], 14.0)
+        self.assertEqual(summary['failed_chunks'], [])
+
+        cached = WeatherCacheManager.get_cache(WeatherCacheManager.get_analytics_cache_key('City 3', 'weekly'))
+        self.assertEqual(cached['avg_temperature'], 16.0)
+
+    def test_failing_chunk_is_isolated(self):
+        def flaky_chunk(city_ids, days=7):
+            if self.cities[2].id in city_ids:
+                raise RuntimeError('database went away')
+            return analyze_city_chunk(city_ids, days)
+
+        with patch('weather_data.parallel_analytics.analyze_city_chunk', flaky_chunk):
+            summary = run_city_analytics(mode='serial', chunk_size=2)
+
+        self.assertEqual(summary['cities_processed'], 3)
+        self.assertEqual(summary['failed_chunks'], [{'chunk': 1, 'cities': 2, 'error': 'database went away'}])
+
+    def test_process_pool_runs_chunks_in_workers(self):
+        with patch('weather_data.parallel_analytics.analyze_city_chunk', fake_chunk):
+            summary = run_city_analytics(
+                city_ids=[1, 2, 3, 4, FAILING_CITY_ID, 5], mode='process', workers=2, chunk_size=2
+            )
+
+        self.assertEqual(summary['mode'], 'process')
+        self.assertEqual(summary['cities_processed'], 4)
+        self.assertEqual([c['chunk'] for c in summary['failed_chunks']], [2])
+        self.assertEqual(summary['temperature']['avg'], 2.5)
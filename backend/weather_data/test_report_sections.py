@@ -0,0 +1,100 @@
+"""
+Tests for the materialized analytics report sections
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .models import City, WeatherData
+from .report_sections import REPORT_SECTIONS, get_report, get_report_section, refresh_report_sections
+from .tasks import generate_analytics_report
+
+
+class ReportSectionsTest(TestCase):
+    """Test versioning, dirty flags and partial recomputation"""
+
+    def setUp(self):
+        cache.clear()
+        self.city = City.objects.create(name='Lima', country='PE', latitude=-12.0, longitude=-77.0)
+
+    def _reading(self):
+        WeatherData.objects.create(
+            city=self.city, temperature=19.0, feels_like=19.0, humidity=80, pressure=1012,
+            wind_speed=4, wind_direction=180, weather_condition='Clouds',
+            weather_description='overcast', weather_icon='04d', cloudiness=90
+        )
+
+    def test_fresh_sections_are_served_without_queries(self):
+        first = get_report_section('data_freshness')
+        self.assertEqual(first['version'], 1)
+
+        with self.assertNumQueries(0):
+            second = get_report_section('data_freshness')
+        self.assertEqual(second['version'], 1)
+
+    def test_dirty_section_waits_for_min_age(self):
+        get_report_section('api_usage')
+        self._reading()
+        self.assertEqual(get_report_section('api_usage')['version'], 1)
+
+        with patch.object(REPORT_SECTIONS['api_usage'], 'min_age', 0):
+            entry = get_report_section('api_usage')
+        self.assertEqual(entry['version'], 2)
+        self.assertEqual(entry['data']['total_requests'], 1)
+
+    def test_refresh_rebuilds_only_stale_sections(self):
+        self.assertEqual(refresh_report_sections(), list(REPORT_SECTIONS))
+
+        self._reading()
+        with patch.object(REPORT_SECTIONS['api_usage'], 'min_age', 0), \
+                patch.object(REPORT_SECTIONS['weather_trends'], 'min_age', 0):
+            result = generate_analytics_report()
+
+        # data_freshness is dirty too but still inside its min_age
+        self.assertEqual(result['refreshed_sections'], ['api_usage', 'weather_trends'])
+        self.assertEqual(result['section_versions'], {
+            'api_usage': 2, 'cache_performance': 1, 'data_freshness': 1, 'weather_trends': 2
+        })
+
+    def test_parameter_variants_are_separate_sections(self):
+        report = get_report(['api_usage'], hours=6)
+        self.assertEqual(report['api_usage']['period'], 'Last 6 hours')
+        self.assertEqual(get_report_section('api_usage')['data']['period'], 'Last 24 hours')
+
+    def test_empty_trends_are_stored_until_new_data(self):
+        self.assertIn('error', get_report_section('weather_trends')['data'])
+        with self.assertNumQueries(0):
+            get_report_section('weather_trends')
+
+        self._reading()
+        with patch.object(REPORT_SECTIONS['weather_trends'], 'min_age', 0):
+            entry = get_report_section('weather_trends')
+        self.assertEqual((entry['version'], entry['data']['total_data_points']), (2, 1))
+
+
+class AnalyticsDashboardTest(TestCase):
+    """Test the dashboard and health report read the stored sections"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        user = get_user_model().objects.create_user(
+            username='analyst', email='analyst@example.com', password='secret-pass-123'
+        )
+        self.client.force_authenticate(user)
+
+    def test_dashboard_assembled_from_sections(self):
+        response = self.client.get(reverse('analytics-dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(response.data['sections']), {'api_usage', 'cache_performance', 'data_freshness', 'weather_trends'}
+        )
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('analytics-dashboard'))
+            response = self.client.get(reverse('health-report'))
+        self.assertIn('overall_status', response.data)
@@ -0,0 +1,147 @@
+"""
+Tests for incremental metric rollups
+"""
+import random
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from . import rollups
+from .models import City, MetricRollup, PerformanceBaseline, SystemMetrics, WeatherData
+from .rollups import (
+    QuantileSketch, RunningAggregate, city_subject, get_rolling_aggregates, rebuild_rollups, record_values,
+    update_performance_baselines
+)
+
+
+class RunningAggregateTest(TestCase):
+    """Test the mergeable aggregate state"""
+
+    def test_merge_matches_single_pass(self):
+        rng = random.Random(7)
+        values = [rng.uniform(-20, 40) for _ in range(2000)]
+
+        merged = RunningAggregate.from_values(values[:700]).merge(RunningAggregate.from_values(values[700:]))
+        single = RunningAggregate.from_values(values)
+
+        self.assertEqual(merged.count, single.count)
+        self.assertAlmostEqual(merged.mean, sum(values) / len(values))
+        self.assertAlmostEqual(merged.std, single.std)
+        self.assertEqual((merged.min_value, merged.max_value), (min(values), max(values)))
+        self.assertEqual(merged.quantile(0.9), single.quantile(0.9))
+
+    def test_sketch_quantiles_within_relative_accuracy(self):
+        values = sorted(float(v) for v in range(1, 1001))
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+        sketch = QuantileSketch.from_dict(sketch.to_dict())
+
+        for q in (0.5, 0.95, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertLessEqual(abs(sketch.quantile(q) - exact) / exact, 0.011)
+
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+
+
+class MetricRollupIngestTest(TestCase):
+    """Test rollups maintained on ingest and the queries served from them"""
+
+    def setUp(self):
+        self.city = City.objects.create(name='Oslo', country='NO', latitude=59.9, longitude=10.7)
+
+    def _reading(self, temperature):
+        return WeatherData.objects.create(
+            city=self.city, temperature=temperature, feels_like=temperature, humidity=70, pressure=1000,
+            wind_speed=3, wind_direction=0, weather_condition='Clouds',
+            weather_description='overcast', weather_icon='04d', cloudiness=90
+        )
+
+    def test_ingest_updates_hourly_rollups(self):
+        for temperature in (-4.0, 2.0, 5.0):
+            self._reading(temperature)
+
+        rollup = MetricRollup.objects.get(subject=city_subject(self.city.id), metric='temperature')
+        self.assertEqual((rollup.count, rollup.total, rollup.min_value, rollup.max_value), (3, 3.0, -4.0, 5.0))
+
+        with self.assertNumQueries(1):
+            aggregates = get_rolling_aggregates(['temperature', 'humidity'], timezone.now() - timedelta(days=7))
+        self.assertEqual(aggregates[(city_subject(self.city.id), 'humidity')].mean, 70)
+
+    def test_rebuild_matches_incremental(self):
+        for temperature in (1.0, 2.0, 6.0):
+            self._reading(temperature)
+        before = get_rolling_aggregates(['temperature'], timezone.now() - timedelta(days=1))
+
+        MetricRollup.objects.all().delete()
+        rebuild_rollups(timezone.now() - timedelta(days=1))
+        after = get_rolling_aggregates(['temperature'], timezone.now() - timedelta(days=1))
+
+        key = (city_subject(self.city.id), 'temperature')
+        self.assertEqual((after[key].count, after[key].total), (before[key].count, before[key].total))
+
+    def test_concurrent_first_values_of_an_hour_are_both_kept(self):
+        subject = city_subject(self.city.id)
+        locked_rollups = rollups._locked_rollups
+        calls = []
+
+        def lock_after_a_concurrent_insert(subject, bucket_start, metrics):
+            calls.append(metrics)
+            if len(calls) == 1:
+                # Another worker inserts the hour's row right after this one found none
+                rollup = MetricRollup(subject=subject, metric='temperature', bucket_start=bucket_start)
+                RunningAggregate.from_values([1.0]).apply_to(rollup)
+                rollup.save()
+                return {}
+            return locked_rollups(subject, bucket_start, metrics)
+
+        with patch.object(rollups, '_locked_rollups', side_effect=lock_after_a_concurrent_insert):
+            record_values(subject, {'temperature': 3.0})
+
+        rollup = MetricRollup.objects.get(subject=subject, metric='temperature')
+        self.assertEqual((rollup.count, rollup.total), (2, 4.0))
+
+    def _reading_at(self, timestamp, temperature):
+        reading = self._reading(temperature)
+        WeatherData.objects.filter(id=reading.id).update(timestamp=timestamp)
+
+    def test_rebuild_keeps_the_first_partial_hour(self):
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=2)
+        self._reading_at(hour + timedelta(minutes=10), 1.0)
+        self._reading_at(hour + timedelta(minutes=40), 3.0)
+        MetricRollup.objects.all().delete()
+
+        rebuild_rollups(hour + timedelta(minutes=30))
+
+        rollup = MetricRollup.objects.get(subject=city_subject(self.city.id), metric='temperature')
+        self.assertEqual((rollup.bucket_start, rollup.count, rollup.total), (hour, 2, 4.0))
+
+    def test_rebuild_keeps_rollups_older_than_the_raw_rows(self):
+        now = timezone.now()
+        self._reading_at(now - timedelta(days=2), 5.0)
+        # Rolled up before its raw readings were cleaned up
+        old = MetricRollup.objects.create(
+            subject=city_subject(self.city.id), metric='temperature',
+            bucket_start=(now - timedelta(days=40)).replace(minute=0, second=0, microsecond=0), count=4, total=8.0
+        )
+
+        rebuild_rollups(now - timedelta(days=60))
+
+        self.assertTrue(MetricRollup.objects.filter(id=old.id).exists())
+        self.assertEqual(MetricRollup.objects.filter(metric='temperature').count(), 2)
+
+    def test_performance_baselines_from_rollups(self):
+        for value in range(1, 101):
+            SystemMetrics.objects.create(
+                metric_type='response_time', metric_name='Response Time', metric_value=float(value),
+                metric_unit='ms', component='api'
+            )
+
+        self.assertEqual(update_performance_baselines(days=1), 1)
+        baseline = PerformanceBaseline.objects.get(metric_type='response_time', component='api')
+        self.assertEqual(baseline.sample_size, 100)
+        self.assertAlmostEqual(baseline.avg_value, 50.5)
+        self.assertAlmostEqual(baseline.warning_threshold, 95, delta=1.5)
+        self.assertLess(baseline.baseline_value, baseline.warning_threshold)
@@ -0,0 +1,96 @@
+"""
+Tests for the vectorized time series analysis
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import City, WeatherData
+from .rollups import rebuild_rollups
+from .series_analysis import (
+    SECONDS_PER_DAY, MetricSeries, linear_slope, seasonal_decompose, trend_direction, trend_summary,
+    zscore_anomalies
+)
+from .views import _calculate_historical_summary, _get_historical_aggregates, _identify_weather_patterns
+
+
+class SeriesAnalysisTest(TestCase):
+    """Test the array helpers on known signals"""
+
+    def setUp(self):
+        # Four days of hourly readings: +0.5/day trend, ±4 daily cycle
+        self.timestamps = np.arange(0, 4 * SECONDS_PER_DAY, 3600, dtype=float)
+        hours = self.timestamps % SECONDS_PER_DAY / 3600
+        self.cycle = 4 * np.sin(hours / 24 * 2 * np.pi)
+        self.values = 10 + 0.5 * self.timestamps / SECONDS_PER_DAY + self.cycle
+
+    def test_slope_ignores_missing_values(self):
+        line = 2.0 + 3.0 * self.timestamps
+        line[5] = np.nan
+        self.assertAlmostEqual(linear_slope(self.timestamps, line), 3.0)
+        self.assertIsNone(linear_slope(np.array([1.0]), np.array([2.0])))
+
+    def test_decomposition_recovers_daily_cycle(self):
+        spiked = self.values.copy()
+        spiked[30] += 25
+
+        decomposition = seasonal_decompose(self.timestamps, self.values)
+        self.assertAlmostEqual(decomposition.slope * SECONDS_PER_DAY, 0.5)
+        np.testing.assert_allclose(decomposition.profile, self.cycle[:24], atol=1e-9)
+        self.assertLess(np.abs(decomposition.residual).max(), 1e-9)
+
+        residual = seasonal_decompose(self.timestamps, spiked).residual
+        self.assertEqual(list(np.flatnonzero(zscore_anomalies(residual))), [30])
+
+    def test_short_window_falls_back_to_linear_fit(self):
+        decomposition = seasonal_decompose(self.timestamps[:12], self.values[:12])
+        self.assertFalse(decomposition.profile.any())
+        self.assertAlmostEqual(decomposition.slope, linear_slope(self.timestamps[:12], self.values[:12]))
+
+    def test_trend_direction_uses_fitted_change(self):
+        span = 4 * SECONDS_PER_DAY
+        self.assertEqual(trend_direction(0.5 / SECONDS_PER_DAY, span, 10.0), 'increasing')
+        self.assertEqual(trend_direction(-0.5 / SECONDS_PER_DAY, span, 10.0), 'decreasing')
+        self.assertEqual(trend_direction(0.01 / SECONDS_PER_DAY, span, 10.0), 'stable')
+        self.assertEqual(trend_direction(None, span, 10.0), 'stable')
+
+    def test_trend_summary(self):
+        series = MetricSeries(self.timestamps, {'temperature': self.values})
+        stats = trend_summary(series, 'temperature')
+        self.assertAlmostEqual(stats['slope_per_day'], 0.5, delta=0.05)
+        self.assertEqual((stats['trend'], stats['anomalies']), ('increasing', 0))
+        # Relative to the mean passed in: the same change is small against a larger mean
+        self.assertEqual(trend_summary(series, 'temperature', mean=100.0)['trend'], 'stable')
+
+
+class HistoricalHelpersTest(TestCase):
+    """Test the analytics view helpers on stored readings"""
+
+    def setUp(self):
+        self.city = City.objects.create(name='Cairo', country='EG', latitude=30.0, longitude=31.2)
+        now = timezone.now()
+        for hours_ago in range(48):
+            weather = WeatherData.objects.create(
+                city=self.city, temperature=35.0 - hours_ago * 0.1, feels_like=35.0, humidity=20,
+                pressure=1008, wind_speed=10, wind_direction=0, weather_condition='Clear',
+                weather_description='clear sky', weather_icon='01d', cloudiness=0
+            )
+            WeatherData.objects.filter(pk=weather.pk).update(timestamp=now - timedelta(hours=hours_ago))
+
+    def test_summary_and_patterns_read_the_rollups(self):
+        end = timezone.now()
+        rebuild_rollups(end - timedelta(days=3))
+
+        # The rollup rows only, never the readings
+        with self.assertNumQueries(1):
+            historical_data = _get_historical_aggregates(self.city, end - timedelta(days=3), end)
+        summary = _calculate_historical_summary(historical_data)
+        self.assertEqual(summary['temperature']['max'], 35.0)
+        self.assertEqual(summary['temperature']['slope_per_day'], 2.4)
+        self.assertEqual(summary['humidity']['trend'], 'stable')
+
+        self.assertEqual([p['type'] for p in _identify_weather_patterns(historical_data)], ['heat_wave'])
+        empty = _get_historical_aggregates(self.city, end - timedelta(days=10), end - timedelta(days=5))
+        self.assertEqual((_calculate_historical_summary(empty), _identify_weather_patterns(empty)), ({}, []))
@@ -0,0 +1,96 @@
+"""
+Tests for sparse fieldsets and include controls
+"""
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from route_planner.models import Route, RouteAlert
+from .models import City, WeatherData
+from .serializers import WeatherDataSerializer
+from .sparse_fields import split_field_paths
+
+
+class SparseFieldsSerializerTest(TestCase):
+    """Test serializer field trimming"""
+
+    def setUp(self):
+        self.city = City.objects.create(name='Sparse City', country='SC', latitude=1.0, longitude=2.0)
+        self.weather = WeatherData.objects.create(
+            city=self.city, temperature=21.5, feels_like=21.0, humidity=40, pressure=1012,
+            wind_speed=3, wind_direction=180, weather_condition='Clear',
+            weather_description='clear sky', weather_icon='01d', cloudiness=0
+        )
+
+    def test_split_field_paths(self):
+        top_level, nested = split_field_paths(['temperature', 'city.name', 'city.country'])
+        self.assertEqual(top_level, {'temperature', 'city'})
+        self.assertEqual(nested, {'city': ['name', 'country']})
+
+        # A bare name keeps the whole nested object
+        self.assertEqual(split_field_paths(['city.name', 'city'])[1], {})
+
+    def test_unrequested_relation_is_not_loaded(self):
+        """Dropping the nested city skips its query entirely"""
+        weather = WeatherData.objects.get(pk=self.weather.pk)
+        with self.assertNumQueries(0):
+            data = WeatherDataSerializer(weather, fields=['temperature', 'humidity']).data
+        self.assertEqual(set(data), {'temperature', 'humidity'})
+
+    def test_nested_fields(self):
+        data = WeatherDataSerializer(self.weather, fields=['temperature', 'city.name']).data
+        self.assertEqual(data['city'], {'name': 'Sparse City'})
+
+
+class SparseFieldsAPITest(TestCase):
+    """Test ?fields= and ?include= on weather and route endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.city = City.objects.create(name='Sparse City', country='SC', latitude=1.0, longitude=2.0)
+        WeatherData.objects.create(
+            city=self.city, temperature=21.5, feels_like=21.0, humidity=40, pressure=1012,
+            wind_speed=3, wind_direction=180, weather_condition='Clear',
+            weather_description='clear sky', weather_icon='01d', cloudiness=0
+        )
+
+    def test_current_weather_fields(self):
+        url = reverse('current-weather', args=[self.city.id])
+        response = self.client.get(url, {'fields': 'temperature,timestamp'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'temperature', 'timestamp'})
+
+    @patch('weather_data.views.weather_manager.get_comprehensive_weather')
+    def test_analytics_include_skips_provider(self, mock_comprehensive):
+        """Historical-only analytics never calls the weather providers"""
+        response = self.client.get(reverse('weather-analytics'), {
+            'city': 'Sparse City', 'include': 'historical_summary,weather_patterns'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'historical_summary', 'weather_patterns'})
+        self.assertEqual(response.data['historical_summary']['temperature']['avg'], 21.5)
+        mock_comprehensive.assert_not_called()
+
+    def test_route_include(self):
+        user = User.objects.create_user(username='sparse_user', email='sparse@example.com', password='testpass123')
+        route = Route.objects.create(
+            user=user, name='Sparse Route', start_location='A', end_location='B',
+            start_latitude=1.0, start_longitude=2.0, end_latitude=1.5, end_longitude=2.5,
+            waypoints=[[1.0, 2.0], [1.5, 2.5]], distance_km=70, estimated_duration_minutes=60
+        )
+        RouteAlert.objects.create(
+            route=route, alert_type='rain', severity='low', location_latitude=1.2,
+            location_longitude=2.2, distance_from_start_km=20, message='Light rain'
+        )
+        self.client.force_authenticate(user=user)
+        url = reverse('route-detail', args=[route.id])
+
+        response = self.client.get(url)
+        self.assertIn('weather_points', response.data)
+        self.assertEqual(len(response.data['alerts']), 1)
+
+        response = self.client.get(url, {'fields': 'id,name', 'include': 'alerts'})
+        self.assertEqual(set(response.data), {'id', 'name', 'alerts'})
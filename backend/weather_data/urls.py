@@ -95,6 +95,7 @@ urlpatterns = [
     path('push-notifications/daily-forecast/', views.send_daily_forecast, name='push-daily-forecast'),
     path('push-notifications/stats/', views.subscription_stats, name='push-subscription-stats'),
     path('push-notifications/cleanup/', views.cleanup_subscriptions, name='push-cleanup-subscriptions'),
+    path('push-notifications/logs/', views.notification_logs, name='push-notification-logs'),
     
     # Alerts API
     path('alerts/rules/', views.alert_rules, name='alert-rules'),
@@ -2,9 +2,12 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
 from django.shortcuts import get_object_or_404
+from django.conf import settings
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db.models import Avg, Count, Max, Min
 from django.utils import timezone
 from datetime import timedelta
 from .models import City, WeatherData, AirQualityData, WeatherForecast
@@ -14,14 +17,25 @@ from .serializers import (
 )
 from .validators import WeatherDataValidator, CityValidator
 from .cache_manager import WeatherCacheManager, invalidate_city_cache
-from .real_weather_service import weather_manager, weather_aggregator, weather_processor
+from .city_index import get_city_index
+from .global_model import GLOBAL_FAMILY
+from .model_registry import DEFAULT_FAMILY
+from .online_models import ONLINE_FAMILY
+from .city_comparison import COMPARISON_BUCKETS, MAX_COMPARISON_CITIES, compare_cities_series
+from .climatology import score_weather_data
+from .rollups import WEATHER_ROLLUP_METRICS, city_subject, get_bucketed_aggregates, merge_aggregates
+from .series_analysis import MetricSeries, trend_summary
+from .pagination import CreatedAtKeysetPagination, paginate_by_keyset
+from .sparse_fields import get_requested_fields, get_included_sections
+from .real_weather_service import weather_manager, weather_processor
 # Lazy import to avoid heavy ML deps during basic operations
 # from .ai_predictions import ai_predictor, advanced_predictor
 # from .alert_system import alert_engine, process_weather_alerts  # Temporarily disabled
 from .push_views import (
     PushSubscriptionView, verify_subscription, update_preferences,
     send_test_notification, subscription_status, send_weather_alert,
-    send_daily_forecast, subscription_stats, cleanup_subscriptions
+    send_daily_forecast, subscription_stats, cleanup_subscriptions,
+    notification_logs
 )
 import logging
 from .models import AlertRule, WeatherAlert
@@ -37,6 +51,14 @@ class CityListCreateView(generics.ListCreateAPIView):
     serializer_class = CitySerializer
     permission_classes = [AllowAny]
 
+    def list(self, request, *args, **kwargs):
+        # Served from the precomputed city index; City writes bump its version
+        cities = get_city_index().cities
+        page = self.paginate_queryset(cities)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(cities)
+
 
 class CityDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a city"""
@@ -58,8 +80,9 @@ def get_current_weather(request, city_id):
             timestamp__gte=timezone.now() - timedelta(minutes=30)
         ).first()
         
+        fields = get_requested_fields(request)
         if recent_weather:
-            serializer = WeatherDataSerializer(recent_weather)
+            serializer = WeatherDataSerializer(recent_weather, fields=fields)
             return Response(serializer.data)
         
         # Fetch new data from API
@@ -68,7 +91,7 @@ def get_current_weather(request, city_id):
         )
         
         if weather_data:
-            serializer = WeatherDataSerializer(weather_data)
+            serializer = WeatherDataSerializer(weather_data, fields=fields)
             return Response(serializer.data)
         else:
             return Response(
@@ -84,10 +107,18 @@ def get_current_weather(request, city_id):
         )
 
 
+# Sections of the city weather response selectable with ?include=
+CITY_WEATHER_SECTIONS = ('current', 'air_quality', 'forecast')
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_weather_by_city_name(request):
-    """Get current weather by city name"""
+    """Get current weather by city name
+
+    ``?include=current,air_quality,forecast`` selects the response sections
+    (default: current) and ``?fields=`` trims the current weather record.
+    """
     city_name = request.GET.get('city')
     country = request.GET.get('country', '')
     
@@ -97,15 +128,26 @@ def get_weather_by_city_name(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    sections = get_included_sections(request, CITY_WEATHER_SECTIONS, default=('current',))
+    fields = get_requested_fields(request)
+    
     try:
-        # Get current weather data with fallback and error handling
-        weather_data = weather_manager.get_current_weather_with_fallback(city_name, country)
+        response_data = {}
         
-        if weather_data:
+        # Current conditions also resolve the coordinates used for air quality
+        weather_data = None
+        if sections & {'current', 'air_quality'}:
+            weather_data = weather_manager.get_current_weather_with_fallback(city_name, country)
+            if not weather_data:
+                return Response(
+                    {'error': 'Unable to fetch weather data for this city'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        
+        if 'current' in sections:
             # Handle both model instances and plain objects (e.g., mocks in tests)
-            from .models import WeatherData
             if isinstance(weather_data, WeatherData):
-                current_payload = WeatherDataSerializer(weather_data).data
+                current_payload = WeatherDataSerializer(weather_data, fields=fields).data
             else:
                 city_obj = getattr(weather_data, 'city', None)
                 city_payload = CitySerializer(city_obj).data if city_obj else None
@@ -115,24 +157,39 @@ def get_weather_by_city_name(request):
                     'weather_condition': getattr(weather_data, 'weather_condition', None),
                     'city': city_payload,
                 }
-            response_data = {
-                'current': current_payload,
-                'air_quality': None,
-                'forecast': []
-            }
-            return Response(response_data)
-        else:
-            return Response(
-                {'error': 'Unable to fetch weather data for this city'},
-                status=status.HTTP_404_NOT_FOUND
-            )
+            response_data['current'] = current_payload
+        
+        if 'air_quality' in sections:
+            air_quality = None
+            try:
+                air_quality = weather_manager.primary_service.get_air_quality(
+                    weather_data.city.latitude, weather_data.city.longitude
+                )
+            except Exception as e:
+                logger.warning(f"Air quality data unavailable for {city_name}: {e}")
+            response_data['air_quality'] = AirQualityDataSerializer(
+                air_quality, fields=get_requested_fields(request, 'air_quality')
+            ).data if air_quality else None
+        
+        if 'forecast' in sections:
+            forecast = weather_manager.primary_service.get_forecast(city_name, country, 5) or []
+            response_data['forecast'] = WeatherForecastSerializer(
+                forecast, many=True, fields=get_requested_fields(request, 'forecast')
+            ).data
+        
+        if 'include' not in request.GET:
+            # Response shape predating ?include=
+            response_data.setdefault('air_quality', None)
+            response_data.setdefault('forecast', [])
+        
+        return Response(response_data)
             
     except Exception as e:
         logger.error(f"Error getting weather by city name: {e}")
         # Try demo fallback to keep endpoint resilient
         try:
             fallback = weather_manager._get_demo_weather(city_name)
-            return Response({'current': WeatherDataSerializer(fallback).data, 'air_quality': None, 'forecast': []})
+            return Response({'current': WeatherDataSerializer(fallback, fields=fields).data, 'air_quality': None, 'forecast': []})
         except Exception:
             return Response(
                 {'error': 'Internal server error'},
@@ -153,7 +210,9 @@ def get_forecast(request, city_id):
             city.name, city.country, days
         )
         
-        serializer = WeatherForecastSerializer(forecasts, many=True)
+        serializer = WeatherForecastSerializer(
+            forecasts, many=True, fields=get_requested_fields(request)
+        )
         return Response(serializer.data)
         
     except Exception as e:
@@ -181,7 +240,7 @@ def get_air_quality(request, city_id):
         )
         
         if air_quality:
-            serializer = AirQualityDataSerializer(air_quality)
+            serializer = AirQualityDataSerializer(air_quality, fields=get_requested_fields(request))
             return Response(serializer.data)
         else:
             return Response(
@@ -211,13 +270,14 @@ def get_multiple_cities_weather(request):
         )
     
     try:
+        fields = get_requested_fields(request)
         results = []
         for city_name in city_names[:10]:  # Limit to 10 cities
             weather_data = weather_manager.get_current_weather_with_fallback(city_name)
             if weather_data:
                 results.append({
                     'city': city_name,
-                    'current': WeatherDataSerializer(weather_data).data,
+                    'current': WeatherDataSerializer(weather_data, fields=fields).data,
                     'air_quality': None  # Temporarily disabled
                 })
         
@@ -254,16 +314,24 @@ def refresh_weather_data(request):
 def get_ai_predictions(request):
     """Get AI-powered 24-hour weather predictions
     - Accepts ?city=Name or ?cities=Name1,Name2
+    - Optional ?model=ensemble, online or global picks the model family (default:
+      global when ML_MODEL_MODE is 'global', else ensemble)
     - Persists summary predictions to WeatherPrediction
     """
     city_name = request.GET.get('city')
     cities_param = request.GET.get('cities')
+    family = request.GET.get('model', GLOBAL_FAMILY if settings.ML_MODEL_MODE == 'global' else DEFAULT_FAMILY)
     
     if not city_name and not cities_param:
         return Response(
             {'error': 'City name is required (use city or cities query param)'},
             status=status.HTTP_400_BAD_REQUEST
         )
+    if family not in (DEFAULT_FAMILY, ONLINE_FAMILY, GLOBAL_FAMILY):
+        return Response(
+            {'error': f'model must be one of: {DEFAULT_FAMILY}, {ONLINE_FAMILY}, {GLOBAL_FAMILY}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     requested_names = []
     if cities_param:
@@ -272,17 +340,14 @@ def get_ai_predictions(request):
         requested_names = [city_name.strip()]
     
     results = []
-    try:
-        from .models import WeatherPrediction
-    except Exception:
-        WeatherPrediction = None
-    
     try:
         from .ai_predictions import advanced_predictor
     except Exception:
         advanced_predictor = None
     
     try:
+        # Result index, city and current weather of each city to predict
+        pending = []
         for name in requested_names:
             # Get city and current weather
             city = City.objects.filter(name__iexact=name).first()
@@ -302,41 +367,40 @@ def get_ai_predictions(request):
                     results.append({'city': name, 'error': 'Unable to get current weather data'})
                     continue
             
-            # Generate predictions
-            predictions = []
-            if advanced_predictor:
-                try:
-                    predictions = advanced_predictor.predict_advanced_24h(city, current_weather)
-                except Exception:
-                    predictions = []
-            
-            # Persist lightweight summary predictions (optional)
-            if WeatherPrediction and predictions:
-                try:
-                    for p in predictions[:4]:  # store first 4 hours to avoid bloat
-                        WeatherPrediction.objects.update_or_create(
-                            city=city,
-                            prediction_date=p.get('datetime'),
-                            model_version='v1.0',
-                            defaults={
-                                'predicted_temperature': p.get('temperature', 0),
-                                'predicted_humidity': int(p.get('humidity', 0)) if p.get('humidity') is not None else 0,
-                                'predicted_pressure': float(p.get('pressure', 0)) if p.get('pressure') is not None else 0,
-                                'predicted_wind_speed': float(p.get('wind_speed', 0)) if p.get('wind_speed') is not None else 0,
-                                'predicted_condition': p.get('condition', 'Unknown'),
-                                'confidence_score': float(p.get('confidence', 0)) / 100.0 if p.get('confidence') else 0.0,
-                                'features_used': {'source': 'advanced_predictor'}
-                            }
-                        )
-                except Exception:
-                    pass
-            
-            results.append({
+            pending.append((len(results), city, current_weather))
+            results.append(None)
+        
+        # Generate predictions for all cities at once (one inference per model)
+        batch = []
+        if advanced_predictor and pending:
+            pairs = [(city, current_weather) for _, city, current_weather in pending]
+            try:
+                if settings.ML_INFERENCE_MODE == 'server':
+                    # Scored by the inference server, baseline if it doesn't answer in time
+                    from .inference_service import inference_client
+                    batch = inference_client.predict_batch(pairs, family=family)
+                else:
+                    batch = advanced_predictor.predict_advanced_batch(pairs, family=family)
+            except Exception:
+                batch = []
+        
+        # Persist lightweight summary predictions, once per city and hour
+        if advanced_predictor and batch:
+            try:
+                advanced_predictor.store_predictions(
+                    [(city, predictions) for (_, city, _), predictions in zip(pending, batch)]
+                )
+            except Exception as e:
+                logger.warning(f"Could not store AI predictions: {e}")
+        
+        for position, (index, city, current_weather) in enumerate(pending):
+            predictions = batch[position] if batch else []
+            results[index] = {
                 'city': city.name,
                 'current_weather': WeatherDataSerializer(current_weather).data,
                 'predictions': predictions,
                 'generated_at': timezone.now().isoformat()
-            })
+            }
         
         if len(results) == 1:
             return Response(results[0])
@@ -353,7 +417,11 @@ def get_ai_predictions(request):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_historical_data(request):
-    """Get historical weather data for trends analysis"""
+    """Get historical weather data for trends analysis
+    - Readings are keyset-paginated from the newest page back (?cursor=, ?page_size=);
+      each page is returned oldest first, ready to plot
+    - Trends cover the whole ?days= window, from one aggregate query
+    """
     city_name = request.GET.get('city')
     days = int(request.GET.get('days', 30))
     
@@ -378,42 +446,43 @@ def get_historical_data(request):
         historical_data = WeatherData.objects.filter(
             city=city,
             timestamp__range=(start_date, end_date)
-        ).order_by('timestamp')
+        )
         
         if not historical_data.exists():
             # Generate demo historical data
-            historical_data = _generate_demo_historical_data(city, days)
-        
-        # Serialize data
-        serialized_data = WeatherDataSerializer(historical_data, many=True).data
-        
-        # Calculate trends
-        temps = [float(d['temperature']) for d in serialized_data]
-        humidity = [float(d['humidity']) for d in serialized_data]
+            _generate_demo_historical_data(city, days)
         
+        # Trends over the window are aggregated in the database, not from the page
+        stats = historical_data.aggregate(
+            data_points=Count('id'),
+            temperature_avg=Avg('temperature'), temperature_min=Min('temperature'),
+            temperature_max=Max('temperature'),
+            humidity_avg=Avg('humidity'), humidity_min=Min('humidity'), humidity_max=Max('humidity'),
+        )
         trends = {
-            'temperature': {
-                'avg': round(sum(temps) / len(temps), 1) if temps else 0,
-                'min': round(min(temps), 1) if temps else 0,
-                'max': round(max(temps), 1) if temps else 0,
+            metric: {
+                'avg': round(stats[f'{metric}_avg'] or 0, 1),
+                'min': round(stats[f'{metric}_min'] or 0, 1),
+                'max': round(stats[f'{metric}_max'] or 0, 1),
                 'trend': 'stable'  # Could implement trend analysis
-            },
-            'humidity': {
-                'avg': round(sum(humidity) / len(humidity), 1) if humidity else 0,
-                'min': round(min(humidity), 1) if humidity else 0,
-                'max': round(max(humidity), 1) if humidity else 0,
-                'trend': 'stable'
             }
+            for metric in ('temperature', 'humidity')
         }
         
+        readings, paginator = paginate_by_keyset(historical_data, request)
+        
         return Response({
             'city': city.name,
             'period': f'{days} days',
-            'data': serialized_data,
+            # Newest first picks the page; the page itself reads in time order
+            'data': WeatherDataSerializer(list(readings)[::-1], many=True).data,
+            'pagination': paginator.get_pagination_metadata(),
             'trends': trends,
-            'data_points': len(serialized_data)
+            'data_points': stats['data_points']
         })
         
+    except NotFound:
+        raise
     except Exception as e:
         logger.error(f"Error getting historical data: {e}")
         return Response(
@@ -455,7 +524,14 @@ def _generate_demo_historical_data(city, days):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def compare_cities(request):
-    """Compare weather data across multiple cities"""
+    """Compare weather data across multiple cities
+
+    By default the current conditions of up to 6 cities are fetched and
+    compared. ``?mode=series`` compares the stored history of up to 10
+    cities instead: aligned ``bucket`` (hour/day) series over the last
+    ``hours`` (default 168) for ``metrics``, with rankings, pairwise deltas
+    and correlations; ``?series=true`` adds the aligned series themselves.
+    """
     city_names = request.GET.get('cities', '').split(',')
     city_names = [name.strip() for name in city_names if name.strip()]
     
@@ -465,6 +541,9 @@ def compare_cities(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    if request.GET.get('mode') == 'series':
+        return _compare_city_series(request, city_names)
+    
     try:
         comparison_data = []
         
@@ -508,6 +587,56 @@ def compare_cities(request):
         )
 
 
+def _compare_city_series(request, city_names):
+    try:
+        hours = int(request.GET.get('hours', 168))
+    except ValueError:
+        return Response({'error': 'hours must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    bucket = request.GET.get('bucket', 'hour')
+    if bucket not in COMPARISON_BUCKETS:
+        return Response(
+            {'error': f"bucket must be one of: {', '.join(COMPARISON_BUCKETS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    metrics = [m.strip() for m in request.GET.get('metrics', '').split(',') if m.strip()] or WEATHER_ROLLUP_METRICS
+    unknown = [m for m in metrics if m not in WEATHER_ROLLUP_METRICS]
+    if unknown:
+        return Response(
+            {'error': f"Unknown metrics: {', '.join(unknown)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        # Names resolve through the in-memory city index: no query when warm
+        index = get_city_index()
+        cities, not_found = [], []
+        for name in city_names[:MAX_COMPARISON_CITIES]:
+            city = index.find(name)
+            if city:
+                cities.append(city)
+            else:
+                not_found.append(name)
+        
+        if len({city['id'] for city in cities}) < 2:
+            return Response(
+                {'error': 'At least 2 known cities are required for comparison', 'not_found': not_found},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        comparison = compare_cities_series(
+            cities, metrics=metrics, hours=hours, bucket=bucket,
+            include_series=request.GET.get('series', '').lower() in ('1', 'true', 'yes')
+        )
+        return Response(dict(comparison, not_found=not_found))
+        
+    except Exception as e:
+        logger.error(f"Error comparing city series: {e}")
+        return Response(
+            {'error': 'Internal server error'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def trigger_weather_alerts(request):
@@ -543,10 +672,22 @@ def trigger_weather_alerts(request):
         )
 
 
+# Sections of the analytics response selectable with ?include=
+ANALYTICS_SECTIONS = (
+    'current', 'air_quality', 'forecast', 'historical_summary',
+    'weather_patterns', 'severity_score', 'recommendations', 'climatology'
+)
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_weather_analytics(request):
-    """Get comprehensive weather analytics for a city"""
+    """Get comprehensive weather analytics for a city
+
+    ``?include=`` selects sections (default: all); sections left out are not
+    fetched, queried or serialized. ``?fields[current]=``, ``?fields[forecast]=``
+    and ``?fields[air_quality]=`` trim the individual records.
+    """
     city_name = request.GET.get('city')
     days = int(request.GET.get('days', 7))
     
@@ -556,6 +697,8 @@ def get_weather_analytics(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    sections = get_included_sections(request, ANALYTICS_SECTIONS)
+    
     try:
         city = City.objects.filter(name__iexact=city_name).first()
         if not city:
@@ -564,33 +707,56 @@ def get_weather_analytics(request):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Get comprehensive weather data
-        weather_data = weather_aggregator.get_comprehensive_weather_data(city_name)
-        if not weather_data:
-            return Response(
-                {'error': 'Unable to fetch weather data'},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
+        analytics = {}
+        current = None
+        
+        # Provider data, limited to the sections that need it
+        if sections & {'current', 'air_quality', 'forecast', 'severity_score', 'recommendations'}:
+            weather_data = weather_manager.get_comprehensive_weather(
+                city_name, include=sections & {'air_quality', 'forecast'}
             )
+            if not weather_data:
+                return Response(
+                    {'error': 'Unable to fetch weather data'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            
+            current = weather_data['current']
+            if 'current' in sections:
+                analytics['current'] = WeatherDataSerializer(
+                    current, fields=get_requested_fields(request, 'current')
+                ).data
+            if 'air_quality' in sections:
+                analytics['air_quality'] = AirQualityDataSerializer(
+                    weather_data['air_quality'], fields=get_requested_fields(request, 'air_quality')
+                ).data if weather_data['air_quality'] else None
+            if 'forecast' in sections:
+                analytics['forecast'] = WeatherForecastSerializer(
+                    weather_data['forecast'], many=True, fields=get_requested_fields(request, 'forecast')
+                ).data
+        
+        # Historical data for analytics
+        if sections & {'historical_summary', 'weather_patterns'}:
+            end_date = timezone.now()
+            start_date = end_date - timedelta(days=days)
+            
+            # Hourly running aggregates: O(hours), no row scan
+            historical_data = _get_historical_aggregates(city, start_date, end_date)
+            
+            if 'historical_summary' in sections:
+                analytics['historical_summary'] = _calculate_historical_summary(historical_data)
+            if 'weather_patterns' in sections:
+                analytics['weather_patterns'] = _identify_weather_patterns(historical_data)
         
-        # Get historical data for analytics
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
+        if 'severity_score' in sections:
+            analytics['severity_score'] = weather_processor.get_weather_severity_score(current)
+        if 'recommendations' in sections:
+            analytics['recommendations'] = _generate_weather_recommendations(current)
         
-        historical_data = WeatherData.objects.filter(
-            city=city,
-            timestamp__range=(start_date, end_date)
-        ).order_by('timestamp')
-        
-        # Calculate analytics
-        analytics = {
-            'current': WeatherDataSerializer(weather_data['current']).data,
-            'air_quality': AirQualityDataSerializer(weather_data['air_quality']).data if weather_data['air_quality'] else None,
-            'forecast': WeatherForecastSerializer(weather_data['forecast'], many=True).data,
-            'historical_summary': _calculate_historical_summary(historical_data),
-            'weather_patterns': _identify_weather_patterns(historical_data),
-            'severity_score': weather_processor.get_weather_severity_score(weather_data['current']),
-            'recommendations': _generate_weather_recommendations(weather_data['current'])
-        }
+        # Latest reading against the normals for this place, day of year and hour
+        if 'climatology' in sections:
+            reading = current or WeatherData.objects.filter(city=city).order_by('-timestamp').first()
+            analytics['climatology'] = score_weather_data(reading) if reading else {}
         
         return Response(analytics)
         
@@ -602,82 +768,89 @@ def get_weather_analytics(request):
         )
 
 
+def _get_historical_aggregates(city, start_date, end_date):
+    """Per-metric running aggregates for the window, and the series of hourly means"""
+    return _historical_from_buckets(get_bucketed_aggregates(
+        WEATHER_ROLLUP_METRICS, start_date, end_date, bucket='hour', subjects=[city_subject(city.id)]
+    ))
+
+
+def _historical_from_buckets(buckets):
+    """``(totals by metric, MetricSeries of hourly means)`` of ``{(subject, metric): {hour: aggregate}}``"""
+    hours = sorted({hour for by_hour in buckets.values() for hour in by_hour})
+    totals = {metric: merge_aggregates(by_hour.values()) for (_, metric), by_hour in buckets.items()}
+    # Stamped at mid-hour; NaN where a metric has no reading in that hour
+    hourly = MetricSeries([hour.timestamp() + 1800 for hour in hours], {
+        metric: [by_hour[hour].mean if hour in by_hour else None for hour in hours]
+        for (_, metric), by_hour in buckets.items()
+    })
+    return totals, hourly
+
+
 def _calculate_historical_summary(historical_data):
-    """Calculate summary statistics from historical data"""
-    if not historical_data.exists():
-        return {}
-    
-    data = list(historical_data.values('temperature', 'humidity', 'pressure', 'wind_speed'))
-    
+    """Calculate summary statistics from the historical aggregates"""
+    totals, hourly = historical_data
     summary = {}
     for metric in ['temperature', 'humidity', 'pressure', 'wind_speed']:
-        values = [d[metric] for d in data if d[metric] is not None]
-        if values:
+        overall = totals.get(metric)
+        if overall and overall.count:
+            trend = trend_summary(hourly, metric, overall.mean)
             summary[metric] = {
-                'avg': round(sum(values) / len(values), 1),
-                'min': round(min(values), 1),
-                'max': round(max(values), 1),
-                'trend': _calculate_trend(values)
+                'avg': round(overall.mean, 1),
+                'min': round(overall.min_value, 1),
+                'max': round(overall.max_value, 1),
+                'std': round(overall.std, 1),
+                'p95': round(overall.quantile(0.95), 1),
+                'slope_per_day': round(trend['slope_per_day'], 2) if trend['slope_per_day'] is not None else None,
+                'anomalies': trend['anomalies'],
+                'trend': trend['trend']
             }
     
     return summary
 
 
-def _calculate_trend(values):
-    """Calculate trend direction for a series of values"""
-    if len(values) < 2:
-        return 'stable'
-    
-    first_half = values[:len(values)//2]
-    second_half = values[len(values)//2:]
-    
-    first_avg = sum(first_half) / len(first_half)
-    second_avg = sum(second_half) / len(second_half)
-    
-    change_percent = ((second_avg - first_avg) / first_avg) * 100
-    
-    if change_percent > 5:
-        return 'increasing'
-    elif change_percent < -5:
-        return 'decreasing'
-    else:
-        return 'stable'
-
-
 def _identify_weather_patterns(historical_data):
-    """Identify weather patterns from historical data"""
+    """Identify weather patterns from the historical aggregates"""
+    totals, hourly = historical_data
     patterns = []
     
-    if not historical_data.exists():
-        return patterns
+    def _mean(metric):
+        return totals[metric].mean if metric in totals else None
     
     # Temperature patterns
-    temps = list(historical_data.values_list('temperature', flat=True))
-    if temps:
-        avg_temp = sum(temps) / len(temps)
-        if avg_temp > 30:
-            patterns.append({
-                'type': 'heat_wave',
-                'description': 'Sustained high temperatures detected',
-                'confidence': 0.8
-            })
-        elif avg_temp < 5:
-            patterns.append({
-                'type': 'cold_spell',
-                'description': 'Extended cold period detected',
-                'confidence': 0.8
-            })
+    avg_temp = _mean('temperature')
+    if avg_temp is None:
+        return patterns
+    if avg_temp > 30:
+        patterns.append({
+            'type': 'heat_wave',
+            'description': 'Sustained high temperatures detected',
+            'confidence': 0.8
+        })
+    elif avg_temp < 5:
+        patterns.append({
+            'type': 'cold_spell',
+            'description': 'Extended cold period detected',
+            'confidence': 0.8
+        })
     
     # Wind patterns
-    wind_speeds = list(historical_data.values_list('wind_speed', flat=True))
-    if wind_speeds:
-        avg_wind = sum(wind_speeds) / len(wind_speeds)
-        if avg_wind > 25:
-            patterns.append({
-                'type': 'windy_period',
-                'description': 'Consistently high wind speeds',
-                'confidence': 0.7
-            })
+    avg_wind = _mean('wind_speed')
+    if avg_wind is not None and avg_wind > 25:
+        patterns.append({
+            'type': 'windy_period',
+            'description': 'Consistently high wind speeds',
+            'confidence': 0.7
+        })
+    
+    # Hours far off the trend and daily cycle
+    anomalies = trend_summary(hourly, 'temperature', avg_temp)['anomalies']
+    if anomalies:
+        patterns.append({
+            'type': 'temperature_anomaly',
+            'description': f'{anomalies} hour(s) deviate more than 3σ from the expected daily cycle',
+            'confidence': 0.6
+        })
     
     return patterns
 
@@ -727,46 +900,54 @@ def _generate_weather_recommendations(weather_data):
     return recommendations
 
 
+# Cities shown on the map when none are requested
+DEFAULT_MAP_CITIES = ['New York', 'London', 'Tokyo', 'Paris', 'Sydney', 'Dubai', 'Mumbai', 'Singapore']
+
+
+def _get_map_cities(request):
+    """Parse ?cities= for the map endpoints, limited to 20 cities"""
+    cities = request.GET.get('cities', '').split(',')
+    cities = [city.strip() for city in cities if city.strip()]
+    return (cities or DEFAULT_MAP_CITIES)[:20]
+
+
+def _build_map_entry(city_name, weather_data):
+    """Format comprehensive weather data as a map marker"""
+    current = weather_data['current']
+    return {
+        'city': city_name,
+        'coordinates': {
+            'lat': float(current.city.latitude),
+            'lng': float(current.city.longitude)
+        },
+        'weather': {
+            'temperature': current.temperature,
+            'condition': current.weather_condition,
+            'description': current.weather_description,
+            'humidity': current.humidity,
+            'wind_speed': current.wind_speed,
+            'pressure': current.pressure
+        },
+        'air_quality': {
+            'aqi': weather_data['air_quality'].aqi if weather_data['air_quality'] else None
+        },
+        'severity_score': weather_processor.get_weather_severity_score(current),
+        'last_updated': current.timestamp.isoformat()
+    }
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_weather_map_data(request):
     """Get weather data formatted for map visualization"""
     try:
-        cities = request.GET.get('cities', '').split(',')
-        cities = [city.strip() for city in cities if city.strip()]
-        
-        if not cities:
-            # Default cities for map
-            cities = ['New York', 'London', 'Tokyo', 'Paris', 'Sydney', 'Dubai', 'Mumbai', 'Singapore']
-        
         map_data = []
         
-        for city_name in cities[:20]:  # Limit to 20 cities
+        for city_name in _get_map_cities(request):
             try:
-                weather_data = weather_aggregator.get_comprehensive_weather_data(city_name)
+                weather_data = weather_manager.get_comprehensive_weather(city_name, include=('air_quality',))
                 if weather_data and weather_data['current']:
-                    current = weather_data['current']
-                    
-                    map_data.append({
-                        'city': city_name,
-                        'coordinates': {
-                            'lat': float(current.city.latitude),
-                            'lng': float(current.city.longitude)
-                        },
-                        'weather': {
-                            'temperature': current.temperature,
-                            'condition': current.weather_condition,
-                            'description': current.weather_description,
-                            'humidity': current.humidity,
-                            'wind_speed': current.wind_speed,
-                            'pressure': current.pressure
-                        },
-                        'air_quality': {
-                            'aqi': weather_data['air_quality'].aqi if weather_data['air_quality'] else None
-                        },
-                        'severity_score': weather_processor.get_weather_severity_score(current),
-                        'last_updated': current.timestamp.isoformat()
-                    })
+                    map_data.append(_build_map_entry(city_name, weather_data))
             except Exception as e:
                 logger.error(f"Error getting map data for {city_name}: {e}")
                 continue
@@ -804,22 +985,18 @@ def search_cities(request):
         )
     
     try:
-        # Search existing cities
-        cities = City.objects.filter(
-            name__icontains=query,
-            is_active=True
-        ).order_by('name')[:10]
-        
-        results = []
-        for city in cities:
-            results.append({
-                'id': city.id,
-                'name': city.name,
-                'country': city.country,
-                'latitude': city.latitude,
-                'longitude': city.longitude,
+        index = get_city_index()
+        results = [
+            {
+                'id': city['id'],
+                'name': city['name'],
+                'country': city['country'],
+                'latitude': city['latitude'],
+                'longitude': city['longitude'],
                 'exists': True
-            })
+            }
+            for city in index.search(query, limit=10)
+        ]
         
         # If we have fewer than 5 results, suggest some common cities
         if len(results) < 5:
@@ -836,12 +1013,7 @@ def search_cities(request):
             
             for suggestion in suggestions:
                 if query.lower() in suggestion['name'].lower():
-                    # Check if city already exists
-                    existing = City.objects.filter(
-                        name__iexact=suggestion['name']
-                    ).first()
-                    
-                    if not existing and len(results) < 10:
+                    if not index.has_name(suggestion['name']) and len(results) < 10:
                         results.append({
                             'id': None,
                             'name': suggestion['name'],
@@ -1380,22 +1552,19 @@ def system_health(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def analytics_dashboard(request):
-    """Get comprehensive analytics dashboard data"""
+    """Get comprehensive analytics dashboard data
+
+    Assembled from the materialized report sections; only sections that are
+    past their refresh cadence or flagged dirty are recomputed.
+    """
     try:
-        from .analytics import weather_analytics
+        from .report_sections import get_report
         
         # Get query parameters
         hours = int(request.GET.get('hours', 24))
         days = int(request.GET.get('days', 7))
         
-        # Gather all analytics data
-        dashboard_data = {
-            'api_usage': weather_analytics.get_api_usage_stats(hours),
-            'cache_performance': weather_analytics.get_cache_performance_stats(),
-            'data_freshness': weather_analytics.get_data_freshness_stats(),
-            'weather_trends': weather_analytics.get_weather_trends(days),
-            'generated_at': timezone.now().isoformat()
-        }
+        dashboard_data = get_report(hours=hours, days=days)
         
         return Response(dashboard_data)
         
@@ -1451,9 +1620,20 @@ def cache_analytics(request):
 def data_freshness_monitor(request):
     """Get data freshness monitoring information"""
     try:
-        from .analytics import weather_analytics
+        from .analytics import weather_analytics, FRESHNESS_STATUSES
+        
+        status_filter = request.GET.get('status') or None
+        if status_filter and status_filter not in FRESHNESS_STATUSES:
+            return Response(
+                {'error': f"status must be one of: {', '.join(FRESHNESS_STATUSES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        page = request.GET.get('page', 1)
+        page_size = min(max(int(request.GET.get('page_size', 50)), 1), 200)
         
-        freshness_stats = weather_analytics.get_data_freshness_stats()
+        freshness_stats = weather_analytics.get_data_freshness_stats(
+            status=status_filter, page=page, page_size=page_size
+        )
         
         return Response(freshness_stats)
         
@@ -1609,30 +1789,40 @@ def optimize_cache(request):
 def optimized_weather_data(request):
     """Get weather data with performance optimizations"""
     try:
-        from .performance import db_optimizer, PaginationOptimizer
+        from .performance import PaginationOptimizer
         
         # Get query parameters
         city_id = request.GET.get('city_id')
-        page = int(request.GET.get('page', 1))
         page_size = int(request.GET.get('page_size', 20))
-        use_cursor = request.GET.get('cursor') == 'true'
-        cursor_value = request.GET.get('cursor_value')
+        cursor = request.GET.get('cursor')
         
-        # Get optimized weather data
+        queryset = WeatherData.objects.select_related('city').only(
+            'id', 'temperature', 'humidity', 'pressure', 'weather_condition',
+            'timestamp', 'city__name', 'city__country'
+        )
         if city_id:
-            queryset = db_optimizer.get_optimized_weather_data(city_id=city_id, limit=1000)
-        else:
-            queryset = db_optimizer.get_optimized_weather_data(limit=1000)
-        
-        # Apply pagination
-        if use_cursor:
-            result = PaginationOptimizer.get_cursor_paginated_data(
-                queryset, cursor_value=cursor_value, limit=page_size
-            )
-        else:
-            result = PaginationOptimizer.get_optimized_paginated_data(
-                queryset, page, page_size
-            )
+            queryset = queryset.filter(city_id=city_id)
+        
+        # Keyset pagination: deep pages cost the same as the first and no COUNT(*) is run
+        page = PaginationOptimizer.get_cursor_paginated_data(
+            queryset, cursor=cursor, limit=page_size
+        )
+        result = {
+            'data': [
+                {
+                    'id': item.id,
+                    'city': item.city.name,
+                    'country': item.city.country,
+                    'temperature': item.temperature,
+                    'humidity': item.humidity,
+                    'pressure': item.pressure,
+                    'weather_condition': item.weather_condition,
+                    'timestamp': item.timestamp.isoformat(),
+                }
+                for item in page['data']
+            ],
+            'pagination': page['pagination']
+        }
         
         # Use compression for large responses
         from .performance import ResponseCompressor
@@ -1642,6 +1832,8 @@ def optimized_weather_data(request):
         else:
             return Response(result)
         
+    except NotFound as e:
+        return Response({'error': str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         logger.error(f'Error getting optimized weather data: {e}')
         return Response(
@@ -2391,15 +2583,20 @@ def alert_rule_detail(request, rule_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_alerts(request):
-    """List recent weather alerts for the authenticated user"""
-    alerts = WeatherAlert.objects.filter(user=request.user).order_by('-created_at')[:100]
-    return Response(WeatherAlertSerializer(alerts, many=True).data)
+    """List recent weather alerts for the authenticated user, newest first"""
+    paginator = CreatedAtKeysetPagination()
+    alerts = paginator.paginate_queryset(
+        WeatherAlert.objects.filter(user=request.user), request
+    )
+    return paginator.get_paginated_response(WeatherAlertSerializer(alerts, many=True).data)
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def prediction_analytics(request):
-    """Simple analytics over stored WeatherPrediction rows"""
+    """Analytics over stored WeatherPrediction rows, with backtested MAE/RMSE per model version and horizon
+    - Optional ?metric= (default temperature) and ?city=Name
+    """
     try:
         from .models import WeatherPrediction
     except Exception:
@@ -2418,8 +2615,26 @@ def prediction_analytics(request):
     for c in cities:
         city_counts[c] = city_counts.get(c, 0) + 1
     
+    # Backtested errors against the readings that followed (cached until the next run)
+    from .backtesting import BACKTEST_METRICS, DEFAULT_BACKTEST_DAYS, accuracy_summary
+    metric = request.GET.get('metric', 'temperature')
+    if metric not in BACKTEST_METRICS:
+        return Response(
+            {'error': f"metric must be one of: {', '.join(BACKTEST_METRICS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    city_ids = None
+    if request.GET.get('city'):
+        city_ids = list(City.objects.filter(name__iexact=request.GET['city']).values_list('id', flat=True))
+    
     return Response({
         'predictions_stored': count,
         'sample_avg_temp': avg_temp,
-        'top_cities': sorted(city_counts.items(), key=lambda kv: kv[1], reverse=True)[:5]
+        'top_cities': sorted(city_counts.items(), key=lambda kv: kv[1], reverse=True)[:5],
+        'accuracy': {
+            'metric': metric,
+            'days': DEFAULT_BACKTEST_DAYS,
+            'by_model_version': accuracy_summary(metric, city_ids=city_ids),
+            'by_horizon': accuracy_summary(metric, group_by=('model_version', 'horizon_hours'), city_ids=city_ids),
+        },
     })
\ No newline at end of file
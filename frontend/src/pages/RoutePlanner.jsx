@@ -76,7 +76,7 @@ const RoutePlanner = () => {
       });
       if (response.ok) {
         const data = await response.json();
-        setSavedRoutes(data);
+        setSavedRoutes(data.results ?? data);
       } else {
         setError('Failed to fetch saved routes');
       }
@@ -164,6 +164,26 @@ class ApiService {
     }
   }
 
+  // Live updates (served by the ASGI deployment) instead of polling.
+  // onSnapshot gets each city's latest reading, onUpdate only the changed fields.
+  subscribeToWeatherUpdates(cityIds, { onSnapshot, onUpdate, onError } = {}) {
+    const params = new URLSearchParams({ cities: cityIds.join(',') });
+    const source = new EventSource(`${API_BASE_URL}/weather/live/?${params}`);
+
+    source.addEventListener('snapshot', (event) => {
+      if (onSnapshot) onSnapshot(JSON.parse(event.data));
+    });
+    source.addEventListener('weather', (event) => {
+      if (onUpdate) onUpdate(JSON.parse(event.data));
+    });
+    source.onerror = (error) => {
+      // EventSource reconnects by itself and resends the snapshot
+      if (onError) onError(error);
+    };
+
+    return () => source.close();
+  }
+
   async getForecast(cityId, days = 5) {
     try {
       const params = new URLSearchParams({ days: days.toString() });
@@ -402,11 +422,13 @@ class ApiService {
     return true;
   }
 
-  async getRecentAlerts() {
-    const response = await fetch(`${API_BASE_URL}/weather/alerts/recent/`, {
+  async getRecentAlerts(cursor = null) {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    const response = await fetch(`${API_BASE_URL}/weather/alerts/recent/${query}`, {
       headers: this.getHeaders(),
     });
-    return this.handleResponse(response);
+    const data = await this.handleResponse(response);
+    return data.results ?? data;
   }
 
   // Route planning methods
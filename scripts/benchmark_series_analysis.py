@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of the historical analytics of the weather analytics view
+
+Compares the previous pure-Python helpers of the view (per-row loops over
+``values()`` dicts of every reading in the window) with the path the view
+runs now: the city's hourly rollups merged into window totals, and
+``series_analysis.trend_summary`` on the series of hourly means
+(``views._historical_from_buckets``, ``_calculate_historical_summary`` and
+``_identify_weather_patterns``). Both sides start from data already in
+memory: the readings for the loops, the hourly aggregates the rollup table
+holds for the new path. Only the computation is measured, not the database
+round-trip, which for the new path reads one row per metric and hour
+instead of every reading.
+
+    python scripts/benchmark_series_analysis.py --readings 4320 --interval 600 --repeat 5
+
+The loops are O(readings) and the rollup path O(hours), so the comparison
+depends on how many readings fall in each hour; both row counts a request
+would load are printed alongside the timings.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'weather247_backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from weather_data.rollups import RunningAggregate, city_subject  # noqa: E402
+from weather_data.views import (  # noqa: E402
+    _calculate_historical_summary, _historical_from_buckets, _identify_weather_patterns,
+)
+
+METRICS = ('temperature', 'humidity', 'pressure', 'wind_speed')
+
+
+def make_rows(count, interval, seed=42):
+    rng = random.Random(seed)
+    start = 1_700_000_000
+    rows = []
+    for i in range(count):
+        ts = start + i * interval
+        hour = (ts % 86400) / 3600
+        temperature = 15 + 6 * math.sin((hour - 9) / 24 * 2 * math.pi) + i * 1e-5 + rng.gauss(0, 1.5)
+        if rng.random() < 0.001:
+            temperature += 15
+        rows.append({
+            'timestamp': ts,
+            'temperature': temperature,
+            'humidity': rng.randint(30, 95),
+            'pressure': 1013 + rng.gauss(0, 6),
+            'wind_speed': abs(rng.gauss(12, 6)),
+        })
+    return rows
+
+
+def hourly_buckets(rows):
+    """``{(subject, metric): {hour: RunningAggregate}}``, as ``get_bucketed_aggregates`` returns the rollups"""
+    buckets = defaultdict(dict)
+    for row in rows:
+        hour = datetime.fromtimestamp(row['timestamp'] // 3600 * 3600, tz=timezone.utc)
+        for metric in METRICS:
+            by_hour = buckets[(city_subject(1), metric)]
+            by_hour.setdefault(hour, RunningAggregate()).add(row[metric])
+    return dict(buckets)
+
+
+# Previous helpers, as they were in weather_data/views.py
+
+def legacy_trend(values):
+    if len(values) < 2:
+        return 'stable'
+    first_half = values[:len(values) // 2]
+    second_half = values[len(values) // 2:]
+    first_avg = sum(first_half) / len(first_half)
+    second_avg = sum(second_half) / len(second_half)
+    change_percent = ((second_avg - first_avg) / first_avg) * 100
+    if change_percent > 5:
+        return 'increasing'
+    elif change_percent < -5:
+        return 'decreasing'
+    return 'stable'
+
+
+def legacy_helpers(rows):
+    summary = {}
+    for metric in METRICS:
+        values = [d[metric] for d in rows if d[metric] is not None]
+        if values:
+            summary[metric] = {
+                'avg': round(sum(values) / len(values), 1),
+                'min': round(min(values), 1),
+                'max': round(max(values), 1),
+                'trend': legacy_trend(values),
+            }
+    temps = [d['temperature'] for d in rows]
+    wind_speeds = [d['wind_speed'] for d in rows]
+    patterns = (sum(temps) / len(temps), sum(wind_speeds) / len(wind_speeds))
+    return summary, patterns
+
+
+def rollup_path(buckets):
+    historical_data = _historical_from_buckets(buckets)
+    return _calculate_historical_summary(historical_data), _identify_weather_patterns(historical_data)
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # A 30-day window of readings every ten minutes by default
+    parser.add_argument('--readings', type=int, default=4320)
+    parser.add_argument('--interval', type=int, default=600, help='seconds between readings')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.readings, args.interval)
+    buckets = hourly_buckets(rows)
+    hours = len(next(iter(buckets.values())))
+
+    results = [
+        ('loop (previous helpers)', best_of(lambda: legacy_helpers(rows), args.repeat)),
+        ('rollups (view path)', best_of(lambda: rollup_path(buckets), args.repeat)),
+    ]
+
+    print(f'{args.readings} readings, {hours} hours, best of {args.repeat}')
+    print(f'  rows loaded: {args.readings} readings vs {hours * len(METRICS)} rollups')
+    for name, seconds in results:
+        print(f'  {name:<26} {seconds * 1000:9.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
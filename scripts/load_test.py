@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+"""
+Load test comparing the WSGI and ASGI deployments of the weather read path
+
+The provider round-trip dominates the read path, so the comparison runs
+against a local stub of the OpenWeatherMap API that answers after a fixed
+delay. Typical session (from the backend directory):
+
+    # 1. Stub provider with 250 ms upstream latency
+    python ../scripts/load_test.py stub-provider --port 9100 --delay-ms 250
+
+    # 2. Point the backend at the stub
+    export OPENWEATHER_API_KEY=load-test
+    export OPENWEATHER_BASE_URL=http://127.0.0.1:9100/data/2.5
+    export OPENWEATHER_GEO_URL=http://127.0.0.1:9100/geo/1.0
+
+    # 3. Start both modes (raise the anonymous throttle for the run)
+    export API_THROTTLE_ANON=1000000/hour
+    gunicorn weather247_backend.wsgi -w 4 -b 127.0.0.1:8000                # WSGI (sync views)
+    uvicorn weather247_backend.asgi:application --workers 1 --port 8001    # ASGI (async views)
+
+    # 4. Drive both with the same request mix
+    python ../scripts/load_test.py run \\
+        --target wsgi=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001 \\
+        --path "/api/weather/current/?city=Load{i}" --concurrency 50 --requests 400
+
+``{i}`` in ``--path`` is replaced by the request number, so every request
+misses the current weather cache and waits on the provider.
+
+Endpoints that upsert several rows per request (forecast) hit "database is
+locked" on SQLite under concurrency in either mode; run those against
+PostgreSQL.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+import httpx
+
+
+def stub_provider_app(delay):
+    """Minimal ASGI app answering the OpenWeatherMap endpoints used by the backend"""
+    now = int(time.time())
+    payloads = {
+        '/geo/1.0/direct': [{'name': 'Load', 'lat': 51.5074, 'lon': -0.1278}],
+        '/data/2.5/weather': {
+            'cod': 200,
+            'main': {'temp': 18.2, 'feels_like': 17.6, 'humidity': 64, 'pressure': 1014},
+            'wind': {'speed': 4.1, 'deg': 220},
+            'weather': [{'main': 'Clouds', 'description': 'broken clouds', 'icon': '04d'}],
+            'clouds': {'all': 75},
+            'visibility': 10000,
+        },
+        '/data/2.5/forecast': {
+            'list': [
+                {
+                    'dt': now + hour * 3600,
+                    'main': {'temp': 17.0, 'temp_min': 14.0, 'temp_max': 20.0, 'humidity': 70, 'pressure': 1012},
+                    'wind': {'speed': 3.5, 'deg': 200},
+                    'weather': [{'main': 'Rain', 'description': 'light rain', 'icon': '10d'}],
+                    'clouds': {'all': 80},
+                    'pop': 0.4,
+                }
+                for hour in range(0, 120, 3)
+            ]
+        },
+        '/data/2.5/air_pollution': {
+            'list': [{
+                'main': {'aqi': 2},
+                'components': {'co': 230.3, 'no2': 14.2, 'o3': 68.7, 'so2': 3.1, 'pm2_5': 6.4, 'pm10': 9.8},
+            }]
+        },
+    }
+
+    async def app(scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        await asyncio.sleep(delay)
+        payload = payloads.get(scope['path'])
+        status = 200 if payload is not None else 404
+        body = json.dumps(payload if payload is not None else {'cod': 404}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json')],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    return app
+
+
+async def run_target(name, base_url, path, total, concurrency, timeout):
+    """Fire ``total`` GET requests with at most ``concurrency`` in flight"""
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path.format(i=i))
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        'target': name,
+        'requests': total,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(total / elapsed, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1),
+        'p50_ms': round(percentile(0.50), 1),
+        'p95_ms': round(percentile(0.95), 1),
+        'p99_ms': round(percentile(0.99), 1),
+    }
+
+
+def print_results(results):
+    columns = ['target', 'requests', 'errors', 'elapsed_s', 'throughput_rps', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms']
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print('  '.join(c.ljust(widths[c]) for c in columns))
+    for result in results:
+        print('  '.join(str(result[c]).ljust(widths[c]) for c in columns))
+
+    if len(results) > 1:
+        baseline = results[0]
+        for result in results[1:]:
+            ratio = result['throughput_rps'] / baseline['throughput_rps'] if baseline['throughput_rps'] else 0
+            print(f"\n{result['target']} vs {baseline['target']}: {ratio:.1f}x throughput")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    stub = subparsers.add_parser('stub-provider', help='Serve a fake OpenWeatherMap API with fixed latency')
+    stub.add_argument('--host', default='127.0.0.1')
+    stub.add_argument('--port', type=int, default=9100)
+    stub.add_argument('--delay-ms', type=int, default=250)
+
+    run = subparsers.add_parser('run', help='Run the load test against one or more targets')
+    run.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                     help='Server to test; repeat to compare (the first is the baseline)')
+    run.add_argument('--path', default='/api/weather/current/?city=Load{i}')
+    run.add_argument('--requests', '-n', type=int, default=400)
+    run.add_argument('--concurrency', '-c', type=int, default=50)
+    run.add_argument('--timeout', type=float, default=60.0)
+    run.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    args = parser.parse_args()
+
+    if args.command == 'stub-provider':
+        import uvicorn
+        uvicorn.run(stub_provider_app(args.delay_ms / 1000), host=args.host, port=args.port, log_level='warning')
+        return 0
+
+    results = []
+    for target in args.target:
+        name, _, url = target.partition('=')
+        if not url:
+            parser.error(f'--target must be NAME=URL, got {target!r}')
+        print(f'Running {args.requests} requests against {name} ({url}) with concurrency {args.concurrency}...')
+        results.append(asyncio.run(
+            run_target(name, url, args.path, args.requests, args.concurrency, args.timeout)
+        ))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())